@@ -1,17 +1,19 @@
 ## IMPORTS ###########################################################################################################
 import os
+import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 ## CLASSES ############################################################################################################
-from services import contentAnalyzer, databaseController, repoScraper, networkVisualizer
+from services import databaseController, repoScraper, networkVisualizer
+from services.instrumentation import METRICS, configure_logging, write_reports
+from services.profiling import profile_stage, start_profiling, add_profile_arguments
 ## CONFIGUREATION #####################################################################################################
 RUN_STYLE = 'INIT' # 'PROD'
 ## FUNCTIONS ############################################################################################################
 def initialize_database():
     connection, cursor = Local_database.connect()
-    Local_database.drop_db()
-    Local_database.create_tables()
-    Local_database.load_test_data()
+    Local_database.initialize_database()
+    Local_database.disconnect()
     
 def fetch_network_data(visualizer):
         connection, cursor = visualizer.connect()
@@ -19,12 +21,17 @@ def fetch_network_data(visualizer):
         return repos, file_objects, domains, content
     
 def create_network_graph(visualizer):
-    G = visualizer.create_network_graph(repos, file_objects, domains, content)
-    visualizer.plot_graph(G)        
+    # Aggregated overview: per-file and per-domain supernodes instead of one node per content chunk
+    G = visualizer.create_aggregated_graph()
+    visualizer.plot_graph(G, output_file=os.getenv("GRAPH_OUTPUT"))
     visualizer.close()
 ## MAIN ##############################################################################################################
 ## Test 1 Full Repo Transformation
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape, analyze and visualize the configured repositories.")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = start_profiling(args.profile, args.profile_dir)
 
     print("Starting the main program.")
     st = datetime.now()
@@ -32,15 +39,16 @@ if __name__ == "__main__":
 
     # Load environment variables
     load_dotenv()
+    configure_logging()
     GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
     REPO = os.getenv("MAIN_REPO")
     DATABASE = os.getenv("DATABASE")
     OPENAPI_TOKEN = os.getenv("OPENAI_TOKEN")
     
     # Initialize Classes
-    Local_database = databaseController.DatabaseInitializer(DATABASE)
+    Local_database = databaseController.Database(DATABASE)
     Local_repoScraper = repoScraper.RepoScraper(DATABASE, GITHUB_TOKEN)
-    Local_gptController = contentAnalyzer.GPTContentAnalyzer(DATABASE)
+    Local_repoScraper.repo_list = [repo.strip() for repo in REPO.split(",")]
     Local_networkVisualizer = networkVisualizer.InteractiveNetworkGraphVisualizer(DATABASE)
     
     # Initialize Database
@@ -48,13 +56,21 @@ if __name__ == "__main__":
         initialize_database() 
                    
     # Scrape the Repo, Analyze the Content, Create Domain Relationships
-    Local_repoScraper.run()
+    with profile_stage("scrape"):
+        Local_repoScraper.run()
     
     et = datetime.now()
     duration = et - st
     
     print(f"Program completed in {duration} seconds.")
     
-    repos, file_objects, domains, content = fetch_network_data(Local_networkVisualizer)
-    create_network_graph(Local_networkVisualizer)
+    Local_networkVisualizer.connect()
+    with profile_stage("visualize"):
+        create_network_graph(Local_networkVisualizer)
+    profiler.close()
+
+    # Per-stage timings and counters (METRICS_JSON / METRICS_PROM name the report files)
+    write_reports()
+    for stage in METRICS.report()["stages"]:
+        print(f"{stage['stage']} {stage['labels'] or ''}: {stage['count']} x {stage['mean_seconds']:.4f}s = {stage['total_seconds']:.2f}s")
     
\ No newline at end of file
@@ -0,0 +1,293 @@
+## SUMMARY ###########################################################################################################
+# Class: AnalysisBackend
+# - complete: One completion for a prompt, with its token usage
+# - complete_many: Completions for several prompts; failures are returned in place of their completion
+# Class: OpenAIBackend
+# - Chat completions from OpenAI or any OpenAI-compatible server (base_url), several requests in flight at once
+# Class: LocalModelBackend
+# - In-process GPT2TokenGenerator; prompts are generated in padded batches on local CPUs, without network calls
+# Functions:
+# - create_backend: Backend selected by name ("openai", "openai-compatible", "local")
+## LIBRARIES ###########################################################################################################
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+BACKENDS = ("openai", "openai-compatible", "local")
+ANALYSIS_BACKEND = os.getenv("ANALYSIS_BACKEND", "openai")
+OPENAI_MODEL = "gpt-3.5-turbo"
+LOCAL_MODEL = "gpt2"
+CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "1"))  # Requests in flight (HTTP) or torch threads (local)
+BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH", "1"))  # Analysis requests dispatched together
+LOCAL_BATCH_SIZE = 4          # Prompts per forward pass of the local model
+TEMPERATURE = 0.7
+CONTEXT_TOKENS = {"gpt-3.5-turbo": 16385, "gpt-4o-mini": 128000, "gpt-4o": 128000}
+DEFAULT_CONTEXT_TOKENS = 8192  # Servers of unknown models
+ANSWER_CUE = "\n\nAnswer:\n"
+
+# Text and token usage of one completion; truncated is True when it stopped at max_tokens
+Completion = namedtuple("Completion", ["text", "prompt_tokens", "completion_tokens", "truncated"])
+
+## CLASSES ###########################################################################################################
+class AnalysisBackend:
+    name = None
+
+    def __init__(self, model, concurrency=1):
+        """
+        :param model: Model name, recorded on the analysis run and used for pricing
+        :param concurrency: Requests processed at once by complete_many
+        """
+        self.model = model
+        self.concurrency = max(1, concurrency)
+
+    @property
+    def context_tokens(self):
+        """Context window of the model, in tokens."""
+        return CONTEXT_TOKENS.get(self.model, DEFAULT_CONTEXT_TOKENS)
+
+    def complete(self, system_prompt, prompt, max_tokens):
+        """
+        :param system_prompt: Instructions sent before the prompt
+        :param prompt: The prompt
+        :param max_tokens: Completion limit
+        :return: A Completion; errors are raised
+        """
+        raise NotImplementedError
+
+    def complete_many(self, system_prompt, requests):
+        """
+        Run several prompts, up to self.concurrency at a time. The order of the results is the order of the requests.
+
+        :param system_prompt: Instructions sent before every prompt
+        :param requests: (prompt, max_tokens) pairs
+        :return: A list holding a Completion, or the exception raised, for every request
+        """
+        def attempt(request):
+            try:
+                return self.complete(system_prompt, *request)
+            except Exception as e:
+                return e
+
+        if self.concurrency == 1 or len(requests) < 2:
+            return [attempt(request) for request in requests]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(requests))) as executor:
+            return list(executor.map(attempt, requests))
+
+    def close(self):
+        """Release the client or model."""
+
+
+class OpenAIBackend(AnalysisBackend):
+    name = "openai"
+
+    def __init__(self, model=OPENAI_MODEL, api_key=None, base_url=None, concurrency=CONCURRENCY, timeout=60.0):
+        """
+        Chat completions API. With a base_url, any server that implements it (vLLM, llama.cpp, Ollama, LM Studio)
+        is used instead of OpenAI. The client is created on the first request, so importing and configuring the
+        analyzer does not need a key.
+
+        :param model: Model name sent with each request
+        :param api_key: API key (default: OPENAI_TOKEN; local servers that ignore it get a placeholder)
+        :param base_url: URL of an OpenAI-compatible server, e.g. http://localhost:8000/v1 (default: OpenAI)
+        :param concurrency: Requests in flight at once in complete_many
+        :param timeout: Seconds before a request fails
+        """
+        super().__init__(model, concurrency)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.client = None
+        self.lock = threading.Lock()  # The first concurrent requests share one client
+        if base_url:
+            self.name = "openai-compatible"
+
+    def connect(self):
+        """Create the client, once."""
+        with self.lock:
+            if self.client is None:
+                from openai import OpenAI
+                api_key = self.api_key or os.getenv("OPENAI_TOKEN") or ("local" if self.base_url else None)
+                self.client = OpenAI(api_key=api_key, base_url=self.base_url, timeout=self.timeout, max_retries=2)
+        return self.client
+
+    def complete(self, system_prompt, prompt, max_tokens):
+        client = self.client or self.connect()
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=TEMPERATURE
+        )
+        choice = response.choices[0]
+        prompt_tokens = response.usage.prompt_tokens if response.usage else None
+        completion_tokens = response.usage.completion_tokens if response.usage else None
+        return Completion(choice.message.content, prompt_tokens, completion_tokens, choice.finish_reason == "length")
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+class LocalModelBackend(AnalysisBackend):
+    name = "local"
+
+    def __init__(self, model=LOCAL_MODEL, batch_size=LOCAL_BATCH_SIZE, threads=None, quantize=True, generator=None):
+        """
+        In-process generation with GPT2TokenGenerator. Nothing leaves the machine, and throughput depends only on the
+        local CPUs: prompts are padded into batches of batch_size and generated together. The model is loaded on the
+        first request.
+
+        :param model: Hugging Face model name or local path of a GPT-2 family model
+        :param batch_size: Prompts per forward pass
+        :param threads: torch intra-op threads (default: torch's own choice)
+        :param quantize: Apply dynamic int8 quantization on load
+        :param generator: An already loaded GPT2TokenGenerator to use instead of loading one
+        """
+        super().__init__(model, 1)
+        self.batch_size = max(1, batch_size)
+        self.threads = threads
+        self.quantize = quantize
+        self.generator = generator
+        self.ready = False
+
+    @property
+    def context_tokens(self):
+        if self.generator is not None and self.generator.initialized:
+            return self.generator.model.config.n_positions
+        return 1024
+
+    def load(self):
+        """Load the model and tokenizer, and set the thread count."""
+        import torch
+        try:
+            from services.localContentAnalyzer import GPT2TokenGenerator
+        except ImportError:
+            from localContentAnalyzer import GPT2TokenGenerator
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        if self.generator is None:
+            self.generator = GPT2TokenGenerator(self.model, quantize=self.quantize)
+        if not self.generator.initialized:
+            self.generator.load_model_and_tokenizer()
+        tokenizer = self.generator.tokenizer
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"  # Generated tokens follow every prompt directly
+        self.ready = True
+        return self.generator
+
+    def encode(self, system_prompt, prompt, max_tokens):
+        """
+        :return: Token ids of the prompt, cut so that the prompt and max_tokens fit the context window. The end of a
+                 long prompt is dropped, but the answer cue is kept.
+        """
+        tokenizer = self.generator.tokenizer
+        body = tokenizer.encode(f"{system_prompt}\n\n{prompt.strip()}")
+        cue = tokenizer.encode(ANSWER_CUE)
+        room = max(1, self.context_tokens - max_tokens - len(cue))
+        return body[:room] + cue
+
+    def complete(self, system_prompt, prompt, max_tokens):
+        result = self.complete_many(system_prompt, [(prompt, max_tokens)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def complete_many(self, system_prompt, requests):
+        """
+        Generate the prompts in padded batches; prompts with the same max_tokens are batched together.
+
+        :param system_prompt: Instructions placed before every prompt
+        :param requests: (prompt, max_tokens) pairs
+        :return: A list holding a Completion, or the exception raised, for every request
+        """
+        import torch
+        try:
+            generator = self.generator if self.ready else self.load()
+        except Exception as e:
+            return [e] * len(requests)
+        tokenizer = generator.tokenizer
+
+        results = [None] * len(requests)
+        by_limit = {}
+        for index, (_, max_tokens) in enumerate(requests):
+            by_limit.setdefault(max_tokens, []).append(index)
+        batches = [(max_tokens, indexes[start:start + self.batch_size])
+                   for max_tokens, indexes in by_limit.items() for start in range(0, len(indexes), self.batch_size)]
+        for max_tokens, indexes in batches:
+            try:
+                encoded = [self.encode(system_prompt, requests[index][0], max_tokens) for index in indexes]
+                width = max(len(ids) for ids in encoded)
+                input_ids = torch.tensor([[tokenizer.pad_token_id] * (width - len(ids)) + ids for ids in encoded])
+                attention_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in encoded])
+                with torch.inference_mode():
+                    output = generator.model.generate(
+                        input_ids,
+                        attention_mask=attention_mask,
+                        max_new_tokens=max_tokens,
+                        no_repeat_ngram_size=2,
+                        top_k=50,
+                        top_p=0.95,
+                        temperature=TEMPERATURE,
+                        do_sample=True,
+                        pad_token_id=tokenizer.pad_token_id
+                    )
+                for row, index in enumerate(indexes):
+                    generated = output[row, width:].tolist()
+                    stopped = tokenizer.eos_token_id in generated
+                    if stopped:
+                        generated = generated[:generated.index(tokenizer.eos_token_id)]
+                    results[index] = Completion(tokenizer.decode(generated, skip_special_tokens=True),
+                                                len(encoded[row]), len(generated), not stopped)
+            except Exception as e:
+                for index in indexes:
+                    results[index] = e
+        return results
+
+    def close(self):
+        self.generator = None
+        self.ready = False
+
+## FUNCTIONS #########################################################################################################
+def create_backend(name=None, model=None, base_url=None, concurrency=None, batch_size=None):
+    """
+    :param name: "openai", "openai-compatible" or "local" (default: ANALYSIS_BACKEND)
+    :param model: Model name (default: gpt-3.5-turbo for OpenAI, ANALYSIS_MODEL or "gpt2" otherwise)
+    :param base_url: Server URL for "openai-compatible" (default: ANALYSIS_BASE_URL)
+    :param concurrency: Requests in flight for HTTP backends, torch threads for "local" (default: ANALYSIS_CONCURRENCY)
+    :param batch_size: Prompts per forward pass for "local" (default: LOCAL_BATCH_SIZE)
+    :return: An AnalysisBackend
+    """
+    name = name or ANALYSIS_BACKEND
+    concurrency = concurrency or CONCURRENCY
+    if name == "openai":
+        return OpenAIBackend(model or OPENAI_MODEL, concurrency=concurrency)
+    if name == "openai-compatible":
+        base_url = base_url or os.getenv("ANALYSIS_BASE_URL")
+        if not base_url:
+            raise ValueError("The openai-compatible backend needs a base URL (ANALYSIS_BASE_URL).")
+        return OpenAIBackend(model or os.getenv("ANALYSIS_MODEL", LOCAL_MODEL), base_url=base_url,
+                             concurrency=concurrency)
+    if name == "local":
+        return LocalModelBackend(model or os.getenv("ANALYSIS_MODEL", LOCAL_MODEL),
+                                 batch_size=batch_size or LOCAL_BATCH_SIZE,
+                                 threads=concurrency if concurrency > 1 else None)
+    raise ValueError(f"Unknown analysis backend {name!r}; expected one of {', '.join(BACKENDS)}.")
+
+def add_backend_arguments(parser):
+    """Add --backend, --model, --base-url, --concurrency and --local-batch-size to an argparse parser."""
+    parser.add_argument("--backend", choices=BACKENDS, default=ANALYSIS_BACKEND, help="Where chunks are analyzed")
+    parser.add_argument("--model", default=None, help="Model name for the backend")
+    parser.add_argument("--base-url", default=None, help="URL of an OpenAI-compatible server")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Requests in flight (HTTP backends) or torch threads (local backend)")
+    parser.add_argument("--local-batch-size", type=int, default=LOCAL_BATCH_SIZE,
+                        help="Prompts per forward pass of the local backend")
+    return parser
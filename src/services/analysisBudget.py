@@ -0,0 +1,338 @@
+## SUMMARY ###########################################################################################################
+# Class: TokenLedger
+# - start / finish: Open and close an analysis_runs row for one scrape
+# - allows: Whether a call of the estimated size still fits the token and cost budget (hard cap, worst case)
+# - completion_limit: max_tokens for the next call; lowered once the budget runs low under the "degrade" policy
+# - charge: Record one LLM call's usage on the run (and its content row through record_content)
+# - record_content: Store the tokens paid for a content row
+# - repo_usage / run_usage: Token and cost rollups per repository and per run
+# Class: AdaptiveChunker
+# - observe: Fit prompt and completion tokens as linear functions of chunk length from the calls made so far
+# - chunk_chars: Largest chunk size that is not expected to truncate completions or overflow the context window
+## LIBRARIES ###########################################################################################################
+import os
+import argparse
+import sqlite3
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+DB = os.getenv("DATABASE")
+TOKEN_BUDGET = int(os.getenv("TOKEN_BUDGET")) if os.getenv("TOKEN_BUDGET") else None      # Tokens per run
+COST_BUDGET = float(os.getenv("COST_BUDGET")) if os.getenv("COST_BUDGET") else None      # USD per run
+BUDGET_POLICIES = ("stop", "degrade")
+DEGRADE_FRACTION = 0.2        # Under "degrade", calls get the degraded completion limit below this budget share
+DEGRADED_MAX_TOKENS = 150     # Enough for the summary and domain percentages, without long explanations
+# USD per 1K (prompt, completion) tokens; models not listed are accounted in tokens only
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+}
+CHARS_PER_TOKEN = 4.0         # Estimate for source code and English before any usage has been observed
+# Chunk sizes (characters) the adaptive chunker picks from. Few, fixed sizes keep chunk boundaries (and so the
+# deduplicated chunk blobs) identical across repositories chunked at the same size.
+CHUNK_SIZES = (500, 1000, 2000, 4000, 8000)
+CONTEXT_TOKENS = 16385        # Context window of gpt-3.5-turbo
+MIN_OBSERVATIONS = 8          # Calls observed before the chunk size adapts
+COMPLETION_HEADROOM = 0.8     # Expected completion must stay below this share of the completion limit
+
+## FUNCTIONS #########################################################################################################
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """
+    :return: USD cost of a call, or 0.0 for models without a known price
+    """
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+## CLASSES ###########################################################################################################
+class TokenLedger:
+    def __init__(self, connection, model, token_budget=TOKEN_BUDGET, cost_budget=COST_BUDGET, policy="stop",
+                 max_tokens=500):
+        """
+        Token accounting and budget for one analysis run. Usage is written to the run row after every call, so the
+        rollups are current even if the run is interrupted.
+
+        :param connection: An open sqlite3 connection (tables already created)
+        :param model: Model name, used for pricing
+        :param token_budget: Hard cap on prompt + completion tokens for the run (None: unlimited)
+        :param cost_budget: Hard cap on USD for the run (None: unlimited)
+        :param policy: "stop" analyzes at full size until the cap; "degrade" first lowers the completion limit
+        :param max_tokens: Normal completion limit
+        """
+        if policy not in BUDGET_POLICIES:
+            raise ValueError(f"Unknown budget policy {policy!r} (use one of {', '.join(BUDGET_POLICIES)})")
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.model = model
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.policy = policy
+        self.max_tokens = max_tokens
+        self.run_id = None
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.chunks = {"analyzed": 0, "cached": 0, "skipped": 0, "failed": 0}
+        self.exhausted = False
+
+    def start(self):
+        """Insert the run row. :return: self"""
+        self.cursor.execute(
+            "INSERT INTO analysis_runs (started_at, model, status, token_budget, cost_budget) VALUES (?, ?, 'running', ?, ?)",
+            (utc_now(), self.model, self.token_budget, self.cost_budget)
+        )
+        self.run_id = self.cursor.lastrowid
+        self.connection.commit()
+        return self
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def remaining_share(self):
+        """:return: Smallest remaining fraction of the token and cost budgets (1.0 without a budget)"""
+        shares = [1.0]
+        if self.token_budget:
+            shares.append(1 - self.total_tokens / self.token_budget)
+        if self.cost_budget:
+            shares.append(1 - self.cost / self.cost_budget)
+        return max(0.0, min(shares))
+
+    def completion_limit(self):
+        """:return: max_tokens for the next call"""
+        if self.policy == "degrade" and self.remaining_share() < DEGRADE_FRACTION:
+            return min(self.max_tokens, DEGRADED_MAX_TOKENS)
+        return self.max_tokens
+
+    def allows(self, estimated_prompt_tokens, completion_tokens=None):
+        """
+        Whether the next call fits the budget even if it uses its whole completion limit. Once a call does not fit,
+        the run is exhausted and every later call is refused, so chunk order decides what gets analyzed.
+
+        :param estimated_prompt_tokens: Estimated prompt size of the next call
+        :param completion_tokens: max_tokens of the call (default: completion_limit())
+        :return: True if the call may be made
+        """
+        if self.exhausted:
+            return False
+        completion_tokens = completion_tokens or self.completion_limit()
+        if self.token_budget is not None and \
+                self.total_tokens + estimated_prompt_tokens + completion_tokens > self.token_budget:
+            self.exhausted = True
+        elif self.cost_budget is not None and \
+                self.cost + call_cost(self.model, estimated_prompt_tokens, completion_tokens) > self.cost_budget:
+            self.exhausted = True
+        if self.exhausted:
+            print(f"Analysis budget reached after {self.llm_calls} calls ({self.total_tokens} tokens, "
+                  f"${self.cost:.4f}); remaining chunks are stored without analysis.")
+        return not self.exhausted
+
+    def charge(self, prompt_tokens, completion_tokens):
+        """
+        Record one LLM call on the run.
+
+        :param prompt_tokens: Prompt tokens reported by the API
+        :param completion_tokens: Completion tokens reported by the API
+        """
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += call_cost(self.model, prompt_tokens, completion_tokens)
+        self.update_run("running")
+
+    def count_chunk(self, outcome):
+        """
+        :param outcome: "analyzed", "cached" (reused a stored analysis), "skipped" (budget reached) or "failed"
+                        (the backend call failed)
+        """
+        self.chunks[outcome] += 1
+
+    def record_content(self, content_id, prompt_tokens=None, completion_tokens=None):
+        """
+        Attach the run and the tokens paid for its analysis to a content row (None for cached or skipped chunks).
+        """
+        self.cursor.execute(
+            "UPDATE content SET run_id = ?, prompt_tokens = ?, completion_tokens = ? WHERE id = ?",
+            (self.run_id, prompt_tokens, completion_tokens, content_id)
+        )
+
+    def update_run(self, status):
+        if self.run_id is None:
+            return
+        self.cursor.execute(
+            """
+            UPDATE analysis_runs SET status = ?, llm_calls = ?, prompt_tokens = ?, completion_tokens = ?, cost = ?,
+                chunks_analyzed = ?, chunks_cached = ?, chunks_skipped = ?, chunks_failed = ?
+            WHERE id = ?
+            """,
+            (status, self.llm_calls, self.prompt_tokens, self.completion_tokens, self.cost, self.chunks["analyzed"],
+             self.chunks["cached"], self.chunks["skipped"], self.chunks["failed"], self.run_id)
+        )
+
+    def finish(self, status=None):
+        """
+        Close the run row.
+
+        :param status: Final status (default: "budget_exhausted" if the budget was reached, else "completed")
+        """
+        self.update_run(status or ("budget_exhausted" if self.exhausted else "completed"))
+        self.cursor.execute("UPDATE analysis_runs SET finished_at = ? WHERE id = ?", (utc_now(), self.run_id))
+        self.connection.commit()
+        print(f"Analysis run {self.run_id}: {self.llm_calls} LLM calls, {self.prompt_tokens} prompt + "
+              f"{self.completion_tokens} completion tokens, ${self.cost:.4f}; chunks {self.chunks['analyzed']} analyzed, "
+              f"{self.chunks['cached']} cached, {self.chunks['skipped']} skipped, {self.chunks['failed']} failed.")
+
+    def repo_usage(self, run_id=None):
+        """
+        :param run_id: Only this run (default: every run)
+        :return: (repo, chunks, analyzed chunks, prompt tokens, completion tokens) per repository, costliest first
+        """
+        self.cursor.execute(
+            """
+            SELECT repo, SUM(chunks), SUM(analyzed_chunks), SUM(prompt_tokens), SUM(completion_tokens)
+            FROM repo_token_usage WHERE ? IS NULL OR run_id = ?
+            GROUP BY repo_id ORDER BY SUM(prompt_tokens) + SUM(completion_tokens) DESC
+            """,
+            (run_id, run_id)
+        )
+        return self.cursor.fetchall()
+
+    def run_usage(self, limit=20):
+        """
+        :return: (id, started_at, status, llm calls, prompt tokens, completion tokens, cost) of the latest runs
+        """
+        self.cursor.execute(
+            "SELECT id, started_at, status, llm_calls, prompt_tokens, completion_tokens, cost FROM analysis_runs "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return self.cursor.fetchall()
+
+class AdaptiveChunker:
+    def __init__(self, default_chars=CHUNK_SIZES[0], sizes=CHUNK_SIZES, context_tokens=CONTEXT_TOKENS):
+        """
+        Chooses the chunk size from the token usage of the calls made so far.
+
+        Every request repeats the instructions and the domain list, and returns a summary whose length depends
+        little on the chunk. Both are fitted by least squares as tokens = fixed + per_char * chunk characters. The
+        tokens spent per character of covered source are (fixed prompt + fixed completion) / size + per_char terms,
+        which fall as chunks grow. So the cheapest size for a given coverage is the largest one whose expected
+        completion still fits the completion limit (a truncated analysis loses coverage) and whose prompt fits the
+        context window.
+
+        :param default_chars: Chunk size until MIN_OBSERVATIONS calls have been observed
+        :param sizes: Candidate chunk sizes in characters
+        :param context_tokens: Context window of the model
+        """
+        self.default_chars = default_chars
+        self.sizes = sorted(sizes)
+        self.context_tokens = context_tokens
+        # Running sums for the two regressions: n, sum x, sum x^2, and sum y, sum xy for prompt and completion
+        self.n = 0
+        self.sum_x = self.sum_xx = 0.0
+        self.sum_prompt = self.sum_x_prompt = 0.0
+        self.sum_completion = self.sum_x_completion = 0.0
+        self.truncated_at = None  # Smallest chunk size whose completion was cut off by the limit
+
+    def observe(self, chunk_chars, prompt_tokens, completion_tokens, truncated=False):
+        """
+        :param chunk_chars: Characters of chunk text in the prompt
+        :param prompt_tokens: Prompt tokens reported by the API
+        :param completion_tokens: Completion tokens reported by the API
+        :param truncated: Whether the completion stopped at the limit (finish_reason "length")
+        """
+        self.n += 1
+        self.sum_x += chunk_chars
+        self.sum_xx += chunk_chars * chunk_chars
+        self.sum_prompt += prompt_tokens
+        self.sum_x_prompt += chunk_chars * prompt_tokens
+        self.sum_completion += completion_tokens
+        self.sum_x_completion += chunk_chars * completion_tokens
+        if truncated:
+            self.truncated_at = chunk_chars if self.truncated_at is None else min(self.truncated_at, chunk_chars)
+
+    def fit(self, sum_y, sum_xy, default_slope):
+        """
+        :return: (intercept, slope) of the least-squares line; with too little spread in chunk lengths the slope
+            falls back to default_slope
+        """
+        mean_x, mean_y = self.sum_x / self.n, sum_y / self.n
+        variance = self.sum_xx / self.n - mean_x * mean_x
+        if variance < 1.0:
+            slope = default_slope
+        else:
+            slope = max(0.0, (sum_xy / self.n - mean_x * mean_y) / variance)
+        return max(0.0, mean_y - slope * mean_x), slope
+
+    def model(self):
+        """
+        :return: ((prompt fixed, prompt per char), (completion fixed, completion per char)), or None before
+            MIN_OBSERVATIONS calls
+        """
+        if self.n < MIN_OBSERVATIONS:
+            return None
+        return (self.fit(self.sum_prompt, self.sum_x_prompt, 1 / CHARS_PER_TOKEN),
+                self.fit(self.sum_completion, self.sum_x_completion, 0.0))
+
+    def estimate_prompt_tokens(self, prompt_chars, chunk_chars):
+        """
+        :param prompt_chars: Length of the whole prompt
+        :param chunk_chars: Length of the chunk in it
+        :return: Expected prompt tokens of a call
+        """
+        fitted = self.model()
+        if fitted is None:
+            return int(prompt_chars / CHARS_PER_TOKEN) + 1
+        (fixed, per_char), _ = fitted
+        return int(fixed + per_char * chunk_chars) + 1
+
+    def chunk_chars(self, completion_limit):
+        """
+        :param completion_limit: max_tokens of the next calls
+        :return: Chunk size in characters
+        """
+        fitted = self.model()
+        if fitted is None:
+            return self.default_chars
+        (prompt_fixed, prompt_per_char), (completion_fixed, completion_per_char) = fitted
+        best = self.sizes[0]
+        for size in self.sizes:
+            if self.truncated_at is not None and size >= self.truncated_at and size > self.sizes[0]:
+                break
+            completion = completion_fixed + completion_per_char * size
+            prompt = prompt_fixed + prompt_per_char * size
+            if completion > COMPLETION_HEADROOM * completion_limit or prompt + completion_limit > self.context_tokens:
+                break
+            best = size
+        return best
+
+    def tokens_per_char(self, size):
+        """
+        :return: Expected prompt + completion tokens per character of covered source at a chunk size (for reports)
+        """
+        fitted = self.model()
+        if fitted is None:
+            return None
+        (prompt_fixed, prompt_per_char), (completion_fixed, completion_per_char) = fitted
+        return (prompt_fixed + completion_fixed) / size + prompt_per_char + completion_per_char
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Token usage and cost of LLM analysis runs.")
+    parser.add_argument("--run", type=int, default=None, help="Per-repository usage of this run only")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(DB)
+    ledger = TokenLedger(connection, model=None)
+    print("Runs:")
+    for run_id, started_at, status, calls, prompt_tokens, completion_tokens, cost in ledger.run_usage():
+        print(f"  {run_id} {started_at} {status}: {calls} calls, {prompt_tokens} + {completion_tokens} tokens, ${cost:.4f}")
+    print("Repositories:")
+    for repo, chunks, analyzed, prompt_tokens, completion_tokens in ledger.repo_usage(args.run):
+        print(f"  {repo}: {chunks} chunks ({analyzed} analyzed), {prompt_tokens} + {completion_tokens} tokens")
+    connection.close()
@@ -0,0 +1,561 @@
+## SUMMARY ###########################################################################################################
+# Class: ChunkStore
+# - get_or_create: Hash-addressed blob for a chunk body, with its cached analysis if any file already had it analyzed
+# - get_or_create_many: Batched blob lookup/insert for bulk loads
+# - add_content: Insert a content row that references the chunk's blob
+# - text: Decompressed body of one blob
+# - save_analysis: Attach a summary and raw analysis to a blob, shared by every duplicate of the chunk
+# - train_dictionary: Train a compression dictionary on stored chunks so short chunks compress well
+# - recompress: Rewrite stored bodies with the current codec and dictionary
+# - migrate: Move chunk text stored in content rows (before chunk blobs existed) into blobs
+# - prune: Delete blobs no content row references
+# - stats: Rows, unique blobs and the bytes deduplication and compression save
+# Class: ChunkCodec
+# - compress / decompress: Per-row codecs ("zlib", "zstd", optionally with a dictionary, e.g. "zlib:3"; NULL is plain)
+# Functions:
+# - chunk_hash: SHA-256 digest addressing a chunk body
+# - register_functions: Register devatlas_decompress(body, codec) on a connection (used by views and FTS triggers)
+# - build_zlib_dictionary: Preset dictionary of the most shared lines in sample chunks
+# - benchmark: Database size and read/write throughput of each codec on real source code
+## LIBRARIES ###########################################################################################################
+import os
+import argparse
+import hashlib
+import random
+import sqlite3
+import tempfile
+import time
+import zlib
+from collections import Counter
+from dotenv import load_dotenv
+try:
+    import zstandard
+except ImportError:  # zlib is used instead
+    zstandard = None
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+DB = os.getenv("DATABASE")
+CHUNK_CODEC = os.getenv("CHUNK_CODEC") or ("zstd" if zstandard is not None else "zlib")  # "plain" disables compression
+COMPRESSION_LEVELS = {"zlib": 6, "zstd": 9}
+MIN_COMPRESS_BYTES = 64       # Shorter chunks are stored as plain text
+DICTIONARY_BYTES = {"zlib": 32 * 1024, "zstd": 64 * 1024}  # zlib can only reference its 32 KB window
+DICTIONARY_SAMPLES = 2000
+MIGRATE_BATCH_ROWS = 5000
+SQLITE_MAX_PARAMETERS = 900   # Stay below SQLite's default bound-parameter limit
+BENCHMARK_ROWS = 20000
+BENCHMARK_CHUNK_SIZE = 500    # Characters per chunk, as RepoScraper splits files
+
+## FUNCTIONS #########################################################################################################
+def chunk_hash(text):
+    """
+    :param text: Chunk body
+    :return: 32-byte SHA-256 digest of the UTF-8 text
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+def register_functions(connection):
+    """
+    Register devatlas_decompress(body, codec) on a connection. The chunk_text and content_text views and the
+    full-text index triggers call it, so every connection that reads chunk text or writes chunk_blobs needs it.
+
+    :param connection: sqlite3 connection
+    :return: The ChunkCodec backing the function
+    """
+    codec = ChunkCodec(connection)
+    connection.create_function("devatlas_decompress", 2, codec.decompress, deterministic=True)
+    return codec
+
+def build_zlib_dictionary(samples, size=DICTIONARY_BYTES["zlib"]):
+    """
+    Build a zlib preset dictionary from sample chunks: the lines shared by most samples (imports, decorators,
+    boilerplate), most common last because zlib encodes nearer matches more cheaply.
+
+    :param samples: Sample chunk bodies
+    :param size: Maximum dictionary size in bytes
+    :return: Dictionary bytes
+    """
+    counts = Counter(line for sample in samples for line in set(sample.splitlines(keepends=True)) if line.strip())
+    picked = []
+    total = 0
+    for line, count in counts.most_common():
+        if count < 2:
+            break
+        data = line.encode("utf-8")
+        if total + len(data) > size:
+            continue
+        picked.append(data)
+        total += len(data)
+    return b"".join(reversed(picked))
+
+def source_chunks(rows, chunk_size=BENCHMARK_CHUNK_SIZE, source_directory=None):
+    """
+    Cut Python source files into chunks the way RepoScraper splits files.
+
+    :param rows: Number of chunks
+    :param chunk_size: Characters per chunk
+    :param source_directory: Directory of .py files (defaults to the Python standard library)
+    :return: A list of up to `rows` chunks
+    """
+    source_directory = source_directory or os.path.dirname(os.__file__)
+    chunks = []
+    for root, dirs, files in os.walk(source_directory):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(root, name), encoding="utf-8") as file:
+                    text = file.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+            chunks.extend(text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+            if len(chunks) >= rows:
+                return chunks[:rows]
+    return chunks
+
+def benchmark(rows=BENCHMARK_ROWS, source_directory=None, random_reads=2000):
+    """
+    Store the same source-code chunks with each available codec and report database size, write throughput, full
+    scan read throughput and random single-chunk reads.
+
+    :param rows: Number of chunks
+    :param source_directory: Directory of .py files to chunk (defaults to the Python standard library)
+    :param random_reads: Number of random single-chunk reads
+    :return: A list of result dictionaries, one per codec
+    """
+    try:
+        from services.databaseController import Database
+    except ImportError:
+        from databaseController import Database
+
+    chunks = source_chunks(rows, source_directory=source_directory)
+    text_mb = sum(len(chunk.encode("utf-8")) for chunk in chunks) / 1e6
+    configurations = [("plain", False), ("zlib", False), ("zlib", True)]
+    if zstandard is not None:
+        configurations += [("zstd", False), ("zstd", True)]
+
+    results = []
+    for codec, use_dictionary in configurations:
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "benchmark.db"))
+            database.connect()
+            database.create_tables()
+            database.cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('benchmark', 'local', '')")
+            database.cursor.execute("INSERT INTO fileObjects (repo_id, type, name, url) VALUES (1, 'file', 'all.py', '')")
+            store = ChunkStore(database.connection, codec)
+            if use_dictionary:
+                store.train_dictionary(texts=random.Random(0).sample(chunks, min(DICTIONARY_SAMPLES, len(chunks))))
+
+            start = time.perf_counter()
+            for offset in range(0, len(chunks), 1000):
+                batch = chunks[offset:offset + 1000]
+                blob_ids = store.get_or_create_many(batch)
+                database.cursor.executemany("INSERT INTO content (fileObject_id, blob_id) VALUES (1, ?)",
+                                            [(blob_ids[chunk],) for chunk in batch])
+            database.connection.commit()
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            database.cursor.execute("SELECT description FROM content_text")
+            scanned = sum(len(row[0]) for row in database.cursor.fetchall())
+            scan_seconds = time.perf_counter() - start
+
+            ids = random.Random(1).choices(range(1, len(chunks) + 1), k=random_reads)
+            start = time.perf_counter()
+            for content_id in ids:
+                database.cursor.execute("SELECT description FROM content_text WHERE id = ?", (content_id,))
+                database.cursor.fetchone()
+            random_seconds = time.perf_counter() - start
+
+            stats = store.stats()
+            database.connection.execute("VACUUM")
+            database.disconnect()
+            results.append({
+                "codec": codec + (" + dictionary" if use_dictionary else ""),
+                "db_mb": os.path.getsize(os.path.join(directory, "benchmark.db")) / 1e6,
+                "body_mb": stats["stored_bytes"] / 1e6,
+                "write_mb_s": text_mb / write_seconds,
+                "scan_mb_s": scanned / 1e6 / scan_seconds,
+                "random_reads_s": random_reads / random_seconds
+            })
+
+    print(f"{len(chunks)} chunks, {text_mb:.1f} MB of source text")
+    print(f"{'codec':<18}{'DB MB':>8}{'bodies MB':>11}{'write MB/s':>12}{'scan MB/s':>11}{'reads/s':>10}")
+    for result in results:
+        print(f"{result['codec']:<18}{result['db_mb']:>8.1f}{result['body_mb']:>11.1f}{result['write_mb_s']:>12.1f}"
+              f"{result['scan_mb_s']:>11.1f}{result['random_reads_s']:>10.0f}")
+    return results
+
+## CLASSES ###########################################################################################################
+class ChunkCodec:
+    def __init__(self, connection):
+        """
+        Compression codecs for chunk bodies. A row's codec is NULL (plain text), "zlib" or "zstd", with ":<id>" when
+        it was compressed with a dictionary from chunk_dictionaries ("zlib:<id>" rows are raw deflate streams).
+
+        :param connection: sqlite3 connection holding the chunk_dictionaries table
+        """
+        self.connection = connection
+        self.dictionaries = {}   # dictionary id -> bytes
+        self.zlib_codecs = {}    # (dictionary id, compress) -> raw deflate object primed with the dictionary
+        self.zstd_codecs = {}    # (dictionary id, compress) -> zstandard compressor or decompressor
+
+    def dictionary(self, dictionary_id):
+        if dictionary_id not in self.dictionaries:
+            row = self.connection.execute("SELECT data FROM chunk_dictionaries WHERE id = ?", (dictionary_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown compression dictionary: {dictionary_id}")
+            self.dictionaries[dictionary_id] = row[0]
+        return self.dictionaries[dictionary_id]
+
+    def latest_dictionary(self, codec):
+        """:return: ID of the newest dictionary trained for a codec, or None"""
+        return self.connection.execute("SELECT MAX(id) FROM chunk_dictionaries WHERE codec = ?", (codec,)).fetchone()[0]
+
+    def zlib_dictionary(self, dictionary_id, compress):
+        """
+        A fresh raw-deflate (no zlib header) compressor or decompressor with a dictionary loaded. Raw streams load
+        the dictionary up front, so one primed object is kept and copied per chunk, which is much cheaper than
+        loading the dictionary for every chunk.
+        """
+        key = (dictionary_id, compress)
+        if key not in self.zlib_codecs:
+            dictionary = self.dictionary(dictionary_id)
+            if compress:
+                self.zlib_codecs[key] = zlib.compressobj(COMPRESSION_LEVELS["zlib"], zlib.DEFLATED, -15, zdict=dictionary)
+            else:
+                self.zlib_codecs[key] = zlib.decompressobj(-15, zdict=dictionary)
+        return self.zlib_codecs[key].copy()
+
+    def zstd(self, dictionary_id, compress):
+        if zstandard is None:
+            raise RuntimeError("zstd chunks need the zstandard package (pip install zstandard)")
+        key = (dictionary_id, compress)
+        if key not in self.zstd_codecs:
+            options = {}
+            if dictionary_id is not None:
+                options["dict_data"] = zstandard.ZstdCompressionDict(self.dictionary(dictionary_id))
+            if compress:
+                self.zstd_codecs[key] = zstandard.ZstdCompressor(level=COMPRESSION_LEVELS["zstd"], **options)
+            else:
+                self.zstd_codecs[key] = zstandard.ZstdDecompressor(**options)
+        return self.zstd_codecs[key]
+
+    def compress(self, text, codec, dictionary_id=None):
+        """
+        Compress a chunk body. Short bodies, and bodies that do not get smaller, are kept as plain text.
+
+        :param text: Chunk body
+        :param codec: "zlib", "zstd", or "plain"/None
+        :param dictionary_id: Optional dictionary to compress with
+        :return: (stored body, codec label for the row)
+        """
+        data = text.encode("utf-8")
+        if codec in (None, "plain") or len(data) < MIN_COMPRESS_BYTES:
+            return text, None
+        if codec == "zlib":
+            if dictionary_id is None:
+                body = zlib.compress(data, COMPRESSION_LEVELS["zlib"])
+            else:
+                compressor = self.zlib_dictionary(dictionary_id, compress=True)
+                body = compressor.compress(data) + compressor.flush()
+        elif codec == "zstd":
+            body = self.zstd(dictionary_id, compress=True).compress(data)
+        else:
+            raise ValueError(f"Unknown chunk codec: {codec}")
+        if len(body) >= len(data):
+            return text, None
+        return body, codec if dictionary_id is None else f"{codec}:{dictionary_id}"
+
+    def decompress(self, body, codec):
+        """
+        :param body: Stored body
+        :param codec: The row's codec label (None for plain text)
+        :return: The chunk text
+        """
+        if codec is None or body is None:
+            return body
+        name, _, dictionary_id = codec.partition(":")
+        dictionary_id = int(dictionary_id) if dictionary_id else None
+        if name == "zlib":
+            if dictionary_id is None:
+                data = zlib.decompress(body)
+            else:
+                decompressor = self.zlib_dictionary(dictionary_id, compress=False)
+                data = decompressor.decompress(body) + decompressor.flush()
+        elif name == "zstd":
+            data = self.zstd(dictionary_id, compress=False).decompress(body)
+        else:
+            raise ValueError(f"Unknown chunk codec: {codec}")
+        return data.decode("utf-8")
+
+class ChunkStore:
+    def __init__(self, connection, codec=CHUNK_CODEC):
+        """
+        Store of deduplicated, compressed chunk bodies. Identical chunks in forks, vendored dependencies and copied
+        files share one chunk_blobs row, and the analysis attached to it, however many content rows reference it.
+        Bodies are only decompressed when their text is read.
+
+        :param connection: An open sqlite3 connection to a DevAtlas database (tables already created)
+        :param codec: Codec for new bodies: "zlib", "zstd" or "plain"
+        """
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.codecs = register_functions(connection)
+        self.codec = codec
+        self.dictionary_id = self.codecs.latest_dictionary(codec) if codec not in (None, "plain") else None
+
+    def encode(self, text):
+        """:return: (stored body, codec label, uncompressed size) for a new blob"""
+        body, codec = self.codecs.compress(text, self.codec, self.dictionary_id)
+        return body, codec, len(text.encode("utf-8"))
+
+    def get_or_create(self, text):
+        """
+        Look up the blob for a chunk body, inserting it if this body has not been stored before.
+
+        :param text: Chunk body
+        :return: (blob id, cached analysis or None if the chunk has not been analyzed yet)
+        """
+        digest = chunk_hash(text)
+        self.cursor.execute("SELECT id, analysis FROM chunk_blobs WHERE hash = ?", (digest,))
+        row = self.cursor.fetchone()
+        if row is None:
+            self.cursor.execute(
+                "INSERT INTO chunk_blobs (hash, body, codec, size) VALUES (?, ?, ?, ?)", (digest, *self.encode(text))
+            )
+            row = (self.cursor.lastrowid, None)
+        return row
+
+    def get_or_create_many(self, texts, summaries=None):
+        """
+        Batched get_or_create for bulk loads: one lookup query per batch and one multi-row insert for new bodies.
+
+        :param texts: Chunk bodies (duplicates allowed)
+        :param summaries: Optional {body: summary} stored with newly inserted blobs
+        :return: Dictionary mapping each distinct body to its blob id
+        """
+        summaries = summaries or {}
+        digests = {chunk_hash(text): text for text in texts}
+        blob_ids = {}
+        digest_list = list(digests)
+        for start in range(0, len(digest_list), SQLITE_MAX_PARAMETERS):
+            batch = digest_list[start:start + SQLITE_MAX_PARAMETERS]
+            self.cursor.execute(
+                f"SELECT hash, id FROM chunk_blobs WHERE hash IN ({', '.join('?' * len(batch))})", batch
+            )
+            blob_ids.update(self.cursor.fetchall())
+
+        new = [digest for digest in digests if digest not in blob_ids]
+        self.cursor.executemany(
+            "INSERT INTO chunk_blobs (hash, body, codec, size, summary) VALUES (?, ?, ?, ?, ?)",
+            [(digest, *self.encode(digests[digest]), summaries.get(digests[digest])) for digest in new]
+        )
+        for start in range(0, len(new), SQLITE_MAX_PARAMETERS):
+            batch = new[start:start + SQLITE_MAX_PARAMETERS]
+            self.cursor.execute(
+                f"SELECT hash, id FROM chunk_blobs WHERE hash IN ({', '.join('?' * len(batch))})", batch
+            )
+            blob_ids.update(self.cursor.fetchall())
+        return {text: blob_ids[digest] for digest, text in digests.items()}
+
+    def add_content(self, file_object_id, text, domain_id=None):
+        """
+        Insert a content row for a chunk of a file. The body is stored once, in the chunk's blob.
+
+        :param file_object_id: ID of the file the chunk belongs to
+        :param text: Chunk body
+        :param domain_id: Optional primary domain of the chunk
+        :return: (content id, blob id, cached analysis or None)
+        """
+        blob_id, analysis = self.get_or_create(text)
+        self.cursor.execute(
+            "INSERT INTO content (fileObject_id, domain_id, blob_id) VALUES (?, ?, ?)",
+            (file_object_id, domain_id, blob_id)
+        )
+        return self.cursor.lastrowid, blob_id, analysis
+
+    def text(self, blob_id):
+        """:return: The decompressed body of a blob, or None if there is no such blob"""
+        self.cursor.execute("SELECT body, codec FROM chunk_blobs WHERE id = ?", (blob_id,))
+        row = self.cursor.fetchone()
+        return self.codecs.decompress(*row) if row else None
+
+    def save_analysis(self, blob_id, summary, analysis):
+        """
+        Attach the analysis of a chunk to its blob, so duplicates of the chunk reuse it instead of being analyzed again.
+
+        :param blob_id: Blob of the analyzed chunk
+        :param summary: Summary extracted from the analysis
+        :param analysis: The raw analysis text
+        """
+        self.cursor.execute("UPDATE chunk_blobs SET summary = ?, analysis = ? WHERE id = ?", (summary, analysis, blob_id))
+
+    def train_dictionary(self, texts=None, samples=DICTIONARY_SAMPLES):
+        """
+        Train a dictionary for the store's codec and use it for new bodies. Source code chunks are short and share
+        a lot of boilerplate, which a dictionary lets the codec reference instead of repeating in every row. Existing
+        rows keep their codec until recompress() is run.
+
+        :param texts: Sample chunk bodies (defaults to a random sample of stored chunks)
+        :param samples: Number of stored chunks sampled when texts is not given
+        :return: The new dictionary's ID, or None if there was nothing to train on
+        """
+        if texts is None:
+            self.cursor.execute(
+                "SELECT devatlas_decompress(body, codec) FROM chunk_blobs "
+                "WHERE id IN (SELECT id FROM chunk_blobs ORDER BY random() LIMIT ?)", (samples,)
+            )
+            texts = [row[0] for row in self.cursor.fetchall()]
+        if not texts:
+            return None
+
+        if self.codec == "zlib":
+            data = build_zlib_dictionary(texts, DICTIONARY_BYTES["zlib"])
+        elif self.codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstd dictionaries need the zstandard package (pip install zstandard)")
+            data = zstandard.train_dictionary(DICTIONARY_BYTES["zstd"], [text.encode("utf-8") for text in texts]).as_bytes()
+        else:
+            raise ValueError(f"Codec {self.codec} does not use a dictionary")
+
+        self.cursor.execute("INSERT INTO chunk_dictionaries (codec, data) VALUES (?, ?)", (self.codec, data))
+        self.connection.commit()
+        self.dictionary_id = self.cursor.lastrowid
+        return self.dictionary_id
+
+    def recompress(self, batch_rows=MIGRATE_BATCH_ROWS):
+        """
+        Rewrite bodies stored with another codec or dictionary (including plain text) with the current ones. The
+        text is unchanged, so the full-text index is not touched.
+
+        :param batch_rows: Blobs rewritten per transaction
+        :return: Number of blobs rewritten
+        """
+        target = None
+        if self.codec not in (None, "plain"):
+            target = self.codec if self.dictionary_id is None else f"{self.codec}:{self.dictionary_id}"
+        rewritten = 0
+        last_id = 0
+        while True:
+            self.cursor.execute(
+                "SELECT id, body, codec FROM chunk_blobs WHERE id > ? AND codec IS NOT ? "
+                "AND (size IS NULL OR size >= ? OR codec IS NOT NULL) ORDER BY id LIMIT ?",
+                (last_id, target, MIN_COMPRESS_BYTES, batch_rows)
+            )
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for blob_id, body, codec in rows:
+                new_body, new_codec, size = self.encode(self.codecs.decompress(body, codec))
+                if new_codec != codec or size is None:
+                    updates.append((new_body, new_codec, size, blob_id))
+            self.cursor.executemany("UPDATE chunk_blobs SET body = ?, codec = ?, size = ? WHERE id = ?", updates)
+            self.connection.commit()
+            rewritten += len(updates)
+            last_id = rows[-1][0]
+        return rewritten
+
+    def migrate(self, batch_rows=MIGRATE_BATCH_ROWS):
+        """
+        Move chunk text written before chunk blobs existed (content.description and content.summary) into blobs and
+        clear the columns. Run VACUUM afterwards to return the freed pages to the filesystem.
+
+        :param batch_rows: Content rows migrated per transaction
+        :return: Number of content rows migrated
+        """
+        migrated = 0
+        last_id = 0
+        while True:
+            self.cursor.execute(
+                "SELECT id, description, summary FROM content "
+                "WHERE id > ? AND blob_id IS NULL AND description IS NOT NULL ORDER BY id LIMIT ?", (last_id, batch_rows)
+            )
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            # Summaries written per content row become the blob's summary (the first one wins for duplicates)
+            summaries = {}
+            for _, description, summary in rows:
+                if summary:
+                    summaries.setdefault(description, summary)
+            blob_ids = self.get_or_create_many([description for _, description, _ in rows], summaries)
+            self.cursor.executemany(
+                "UPDATE chunk_blobs SET summary = ? WHERE id = ? AND summary IS NULL",
+                [(summary, blob_ids[description]) for description, summary in summaries.items()]
+            )
+            updates = [(blob_ids[description], content_id) for content_id, description, _ in rows]
+            self.cursor.executemany(
+                "UPDATE content SET blob_id = ?, description = NULL, summary = NULL WHERE id = ?", updates
+            )
+            self.connection.commit()
+            migrated += len(rows)
+            last_id = rows[-1][0]
+        return migrated
+
+    def prune(self):
+        """
+        Delete blobs that no content row references, e.g. after files or repositories were removed.
+
+        :return: Number of blobs deleted
+        """
+        self.cursor.execute("DELETE FROM chunk_blobs WHERE id NOT IN (SELECT blob_id FROM content WHERE blob_id IS NOT NULL)")
+        deleted = self.cursor.rowcount
+        self.connection.commit()
+        return deleted
+
+    def stats(self):
+        """
+        :return: Dictionary with content rows, unique blobs, analyzed blobs, and body bytes: as stored (compressed),
+                 as text (unique chunks) and logical (every content row)
+        """
+        size = "COALESCE(b.size, length(CAST(b.body AS BLOB)))"
+        self.cursor.execute(f"""
+            SELECT COUNT(*), COUNT(DISTINCT c.blob_id), COALESCE(SUM({size}), 0)
+            FROM content c JOIN chunk_blobs b ON b.id = c.blob_id
+        """)
+        rows, blobs, logical_bytes = self.cursor.fetchone()
+        self.cursor.execute(f"""
+            SELECT COUNT(*), COALESCE(SUM(length(CAST(b.body AS BLOB))), 0), COALESCE(SUM({size}), 0), COUNT(analysis)
+            FROM chunk_blobs b
+        """)
+        all_blobs, stored_bytes, text_bytes, analyzed = self.cursor.fetchone()
+        return {"content_rows": rows, "blobs": all_blobs, "referenced_blobs": blobs, "analyzed_blobs": analyzed,
+                "stored_bytes": stored_bytes, "text_bytes": text_bytes, "logical_bytes": logical_bytes}
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicated, compressed chunk storage.")
+    parser.add_argument("--codec", default=CHUNK_CODEC, choices=["plain", "zlib", "zstd"], help="Codec for new bodies")
+    parser.add_argument("--migrate", action="store_true", help="Move chunk text from content rows into blobs")
+    parser.add_argument("--train-dictionary", action="store_true", help="Train a dictionary on stored chunks")
+    parser.add_argument("--recompress", action="store_true", help="Rewrite stored bodies with the current codec")
+    parser.add_argument("--prune", action="store_true", help="Delete blobs no content row references")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards")
+    parser.add_argument("--benchmark", type=int, nargs="?", const=BENCHMARK_ROWS, default=None,
+                        help="Compare codecs on this many chunks of standard-library source instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        raise SystemExit
+
+    connection = sqlite3.connect(DB)
+    store = ChunkStore(connection, args.codec)
+    if args.migrate:
+        print(f"Migrated {store.migrate()} content rows into chunk blobs.")
+    if args.train_dictionary:
+        print(f"Trained dictionary {store.train_dictionary()} for {args.codec}.")
+    if args.recompress:
+        print(f"Recompressed {store.recompress()} blobs.")
+    if args.prune:
+        print(f"Pruned {store.prune()} unreferenced blobs.")
+    if args.vacuum:
+        connection.execute("VACUUM")
+
+    stats = store.stats()
+    print(f"{stats['content_rows']} chunks, {stats['blobs']} unique blobs ({stats['analyzed_blobs']} analyzed): "
+          f"{stats['logical_bytes']} bytes of chunk text, {stats['text_bytes']} after deduplication, "
+          f"{stats['stored_bytes']} stored after compression")
+    connection.close()
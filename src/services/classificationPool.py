@@ -0,0 +1,127 @@
+## SUMMARY ###########################################################################################################
+# Class: ClassificationWorkerPool
+# - start: Write a snapshot of the loaded model (to /dev/shm when available) and spawn the worker processes
+# - suggest: Generate a classification suggestion for each prompt across the workers
+# - close: Stop the workers and remove the snapshot
+# Worker functions:
+# - available_cpus: CPUs in this process's cpuset, which worker affinities are chosen from
+# - _init_worker: Pin thread count / CPU affinity and load the model snapshot (float weights memory-mapped)
+# - _suggest: Run GPT-2 on a single classification prompt
+## LIBRARIES ###########################################################################################################
+import os
+import shutil
+import tempfile
+import multiprocessing
+import torch
+## CLASS IMPORTS #####################################################################################################
+from localContentAnalyzer import GPT2TokenGenerator
+## CONFIGURATION #######################################################################################################
+SHARED_MEMORY_DIR = "/dev/shm"
+SUGGESTION_MAX_LENGTH = 50
+_worker_generator = None
+
+## WORKER FUNCTIONS ##################################################################################################
+def available_cpus():
+    """
+    :return: Sorted CPUs this process may run on (its cpuset), or range(os.cpu_count()) where affinity is unsupported
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _init_worker(snapshot_dir, threads_per_worker, worker_counter, quantize=True):
+    """
+    Initialize a worker process: pin its threads and load the model snapshot once.
+    """
+    global _worker_generator
+
+    torch.set_num_threads(threads_per_worker)
+    torch.set_num_interop_threads(1)
+
+    # Give each worker its own contiguous block of the allowed cores so workers don't contend for the same ones.
+    # Only CPUs in the inherited cpuset are used: any other CPU makes sched_setaffinity fail in every respawned worker
+    if hasattr(os, "sched_setaffinity"):
+        with worker_counter.get_lock():
+            worker_index = worker_counter.value
+            worker_counter.value += 1
+        cpus = available_cpus()
+        first_cpu = worker_index * threads_per_worker
+        os.sched_setaffinity(0, {cpus[(first_cpu + i) % len(cpus)] for i in range(threads_per_worker)})
+
+    _worker_generator = GPT2TokenGenerator(quantize=quantize)
+    _worker_generator.load_snapshot(snapshot_dir)
+
+def _suggest(prompt):
+    """
+    Generate a classification suggestion for a single prompt in a worker process.
+    """
+    return _worker_generator.generate_text(prompt, max_length=SUGGESTION_MAX_LENGTH)
+
+## CLASSES ###########################################################################################################
+class ClassificationWorkerPool:
+    def __init__(self, gpt2_generator, num_workers=None, threads_per_worker=1):
+        """
+        Initialize a pool of GPT-2 classification workers.
+
+        :param gpt2_generator: A loaded GPT2TokenGenerator whose model is shared with the workers
+        :param num_workers: Number of worker processes (defaults to one per threads_per_worker available cores)
+        :param threads_per_worker: torch intra-op threads pinned per worker
+        """
+        self.gpt2_generator = gpt2_generator
+        self.threads_per_worker = threads_per_worker
+        self.num_workers = num_workers or max(1, len(available_cpus()) // threads_per_worker)
+        self.snapshot_dir = None
+        self.pool = None
+
+    def start(self):
+        """
+        Snapshot the model and spawn the worker processes. The snapshot's float weights are memory-mapped by every
+        worker, so on /dev/shm they are one shared copy; quantized layers are rebuilt, and private, in each worker.
+        """
+        if self.pool:
+            return self
+
+        snapshot_root = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+        self.snapshot_dir = tempfile.mkdtemp(prefix="devatlas_gpt2_", dir=snapshot_root)
+        self.gpt2_generator.save_snapshot(self.snapshot_dir)
+
+        # spawn rather than fork: forking a process whose torch thread pools are already running can deadlock
+        context = multiprocessing.get_context("spawn")
+        worker_counter = context.Value("i", 0)
+        self.pool = context.Pool(
+            processes=self.num_workers,
+            initializer=_init_worker,
+            initargs=(self.snapshot_dir, self.threads_per_worker, worker_counter, self.gpt2_generator.quantize)
+        )
+        print(f"Started {self.num_workers} classification workers with {self.threads_per_worker} thread(s) each.")
+        return self
+
+    def suggest(self, prompts, chunksize=4):
+        """
+        Generate a classification suggestion for each prompt.
+
+        :param prompts: List of classification prompts
+        :param chunksize: Number of prompts sent to a worker per queue message
+        :return: List of suggestions in the same order as prompts
+        """
+        if not self.pool:
+            self.start()
+        return list(self.pool.imap(_suggest, prompts, chunksize=chunksize))
+
+    def close(self):
+        """
+        Stop the worker processes and remove the model snapshot.
+        """
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.snapshot_dir:
+            shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+            self.snapshot_dir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
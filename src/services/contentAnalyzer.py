@@ -1,20 +1,91 @@
 ## LIBRARIES ###########################################################################################################
 import sqlite3
-from openai import OpenAI
 import os
+import argparse
 import random
 import re
+import json
+import logging
+## DEV_ATLAS CLASSES #####################################################################################################
+try:  # Imported as services.contentAnalyzer (repoScraper) or run directly from src/services
+    from services.chunkStore import register_functions
+    from services.instrumentation import span, count, get_logger
+    from services.domainTaxonomy import DomainTaxonomy, canonical_domain_name
+    from services.analysisBackends import create_backend, add_backend_arguments
+except ImportError:
+    from chunkStore import register_functions
+    from instrumentation import span, count, get_logger
+    from domainTaxonomy import DomainTaxonomy, canonical_domain_name
+    from analysisBackends import create_backend, add_backend_arguments
 ## FUNCTIONS ############################################################################################################
 from dotenv import load_dotenv
 ## CONFIGURATION ########################################################################################################
 load_dotenv()
 DB = os.getenv("DATABASE")
-client = OpenAI(api_key=os.getenv("OPENAI_TOKEN"))
 MAX_TOKENS = 500
+SYSTEM_PROMPT = "You are an expert content analyzer."
+PACKED_ITEM_TOKENS = 150       # Completion tokens allowed per item of a packed request
+PACKED_MAX_TOKENS = 4096       # Completion limit of one packed request
+logger = get_logger("contentAnalyzer")
+## FUNCTIONS ##########################################################################################################
+def analysis_text(summary, domain_percentages, new_domain=None):
+    """
+    :param summary: Summary of a chunk
+    :param domain_percentages: Domain name -> relatedness percentage
+    :param new_domain: Suggested new domain, if any
+    :return: Analysis text in the layout parsed by process_analysis_result
+    """
+    lines = [f"Summarize the content:\n{summary.strip()}\n"]
+    lines += [f"{name}: {int(percentage)}%" for name, percentage in domain_percentages.items()]
+    if new_domain:
+        lines.append(f"suggest a new domain: {new_domain.strip()}")
+    return "\n".join(lines) + "\n"
+
+def parse_packed_response(response_text, item_ids):
+    """
+    Route the per-item results of a packed response back to their items.
+
+    :param response_text: Model output (JSON, possibly inside a code fence or surrounded by text)
+    :param item_ids: IDs sent in the request; results for other IDs are ignored
+    :return: A dictionary of item ID -> analysis text
+    """
+    start, end = response_text.find("{"), response_text.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        document = json.loads(response_text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    results = document.get("results", []) if isinstance(document, dict) else []
+    wanted = {str(item_id): item_id for item_id in item_ids}
+    routed = {}
+    for result in results:
+        if not isinstance(result, dict) or str(result.get("id")) not in wanted:
+            continue
+        domains = result.get("domains") or {}
+        if not isinstance(domains, dict):
+            domains = {}
+        percentages = {}
+        for name, percentage in domains.items():
+            try:
+                percentages[str(name)] = int(float(str(percentage).rstrip("%")))
+            except ValueError:
+                continue
+        new_domain = result.get("new_domain")
+        routed[wanted[str(result["id"])]] = analysis_text(str(result.get("summary") or ""), percentages,
+                                                          new_domain if isinstance(new_domain, str) else None)
+    return routed
 ## CLASSES ############################################################################################################
 class ContentAnalyzer:
-    def __init__(self, db_file, connection):
+    def __init__(self, db_file, connection, backend=None):
+        """
+        :param db_file: SQLite database file, opened when no connection is given
+        :param connection: An open sqlite3 connection, or None
+        :param backend: AnalysisBackend that runs the prompts (default: create_backend(), from ANALYSIS_BACKEND)
+        """
         self.db_file = db_file
+        self.backend = backend or create_backend()
+        self.last_usage = None  # (prompt tokens, completion tokens, truncated) of the latest API call
         if connection is not None:
             self.connection = connection
             self.cursor = self.connection.cursor()
@@ -28,6 +99,7 @@ class ContentAnalyzer:
         try:
             self.connection = sqlite3.connect(self.db_file)
             self.cursor = self.connection.cursor()
+            register_functions(self.connection)  # Chunk text is stored compressed
             print("Connected to the database successfully.")
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
@@ -47,7 +119,7 @@ class ContentAnalyzer:
             print("Database cursor is not available.")
             return None, None
         try:
-            self.cursor.execute("SELECT id, description FROM content")
+            self.cursor.execute("SELECT id, description FROM content_text")
             rows = self.cursor.fetchall()
             if not rows:
                 print("No content records found in the database.")
@@ -71,20 +143,40 @@ class ContentAnalyzer:
             print(f"Error fetching domains: {e}")
             return []
 
-    def insert_new_domain(self, domain_name):
-        """Insert a new domain into the domains table."""
+    def insert_new_domain(self, domain_name, taxonomy=None):
+        """
+        Insert a suggested domain into the domains table. The name is canonicalized first, and a suggestion that
+        duplicates an existing domain (same canonical key or a near-duplicate name) returns that domain instead.
+
+        :param domain_name: Domain name as suggested by the model
+        :param taxonomy: DomainTaxonomy of the current domains (default: loaded from the table); new domains are added
+        :return: The id of the new or existing domain, or None
+        """
         if not self.cursor:
             print("Database cursor is not available.")
-            return
+            return None
+        domain_name = canonical_domain_name(domain_name)
+        if not domain_name:
+            return None
+        if taxonomy is None:
+            taxonomy = DomainTaxonomy(self.fetch_domains())
+        existing_id = taxonomy.find(domain_name)
+        if existing_id is not None:
+            count("domains_deduplicated")
+            return existing_id
         try:
-            self.cursor.execute("INSERT INTO domains (name) VALUES (?)", (domain_name,))
-            self.connection.commit()
-            print(f"Inserted new domain: {domain_name}")
+            with span("db_write", table="domains"):
+                self.cursor.execute("INSERT INTO domains (name) VALUES (?)", (domain_name,))
+                self.connection.commit()
+            taxonomy.add(self.cursor.lastrowid, domain_name)
+            logger.info("Inserted new domain: %s", domain_name)
+            return self.cursor.lastrowid
         except sqlite3.Error as e:
             print(f"Error inserting new domain: {e}")
+            return None
 
     def create_prompt(self, content, domains):
-        """Create a prompt for GPT analysis."""
+        """Create a prompt for GPT analysis. domains are the candidates to offer (see DomainTaxonomy.shortlist)."""
         domain_list = "\n".join(f"- {domain[1]}" for domain in domains)
         prompt = f"""
         Analyze the following content and provide the following details:
@@ -100,62 +192,146 @@ class ContentAnalyzer:
         """
         return prompt
 
-    def analyze_content_with_gpt(self, content, domains):
-        """Use OpenAI GPT to analyze the content."""
-        prompt = self.create_prompt(content, domains)
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert content analyzer."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=MAX_TOKENS,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"Error with OpenAI API: {e}")
+    def create_packed_prompt(self, items, domains):
+        """
+        Create one prompt for several chunks. The instructions and the domain list are sent once; each chunk is
+        delimited by its ID, and the model answers with one JSON result per ID.
+
+        :param items: (item ID, content) pairs
+        :param domains: (id, name) domain rows
+        :return: The prompt
+        """
+        domain_list = "\n".join(f"- {domain[1]}" for domain in domains)
+        sections = "\n".join(f"<<<ITEM {item_id}>>>\n{content}\n<<<END {item_id}>>>" for item_id, content in items)
+        return f"""Analyze each of the following {len(items)} items separately. For every item:
+
+1. Summarize the content.
+2. Categorize it into the following existing domains if applicable:
+{domain_list}
+3. If it does not fit into any existing domains, suggest a new domain.
+4. Provide a relatedness percentage for each domain.
+
+Answer only with JSON of the form
+{{"results": [{{"id": <item id>, "summary": "<summary>", "domains": {{"<domain name>": <percentage>}}, "new_domain": "<name or null>"}}]}}
+with one result for every item ID.
+
+{sections}
+"""
+
+    def analyze_packed_with_gpt(self, items, domains, max_tokens=None):
+        """
+        Analyze several chunks with one request. Each item's JSON result is turned into the same analysis text a
+        single-chunk request produces, so it is parsed, stored and reused by the existing code.
+
+        :param items: (item ID, content) pairs
+        :param domains: (id, name) domain rows
+        :param max_tokens: Completion limit (default: PACKED_ITEM_TOKENS per item, at most PACKED_MAX_TOKENS)
+        :return: A dictionary of item ID -> analysis text; items missing from the response are left out
+        """
+        if max_tokens is None:
+            max_tokens = min(PACKED_MAX_TOKENS, PACKED_ITEM_TOKENS * len(items))
+        response_text = self.analyze_content_with_gpt(None, domains, max_tokens=max_tokens,
+                                                      prompt=self.create_packed_prompt(items, domains))
+        if not response_text:
+            return {}
+        return self.route_packed(response_text, items)
+
+    def analyze_content_with_gpt(self, content, domains, max_tokens=MAX_TOKENS, prompt=None):
+        """Analyze the content with the analysis backend. The call's token usage is kept in self.last_usage."""
+        prompt = prompt or self.create_prompt(content, domains)
+        self.last_usage = None
+        with span("llm_call", backend=self.backend.name, model=self.backend.model):
+            result = self.backend.complete_many(SYSTEM_PROMPT, [(prompt, max_tokens)])[0]
+        return self.read_completion(result)
+
+    def analyze_prompts(self, requests):
+        """
+        Run several prompts together: the backend sends them concurrently (HTTP) or generates them in batches
+        (local model).
+
+        :param requests: (prompt, max_tokens) pairs, from create_prompt or create_packed_prompt
+        :return: A list of (text, usage) in request order; text is None for a failed request, and usage is the
+                 (prompt tokens, completion tokens, truncated) of the call, or None
+        """
+        with span("llm_call", backend=self.backend.name, model=self.backend.model, mode="batch"):
+            results = self.backend.complete_many(SYSTEM_PROMPT, requests)
+        answers = []
+        for result in results:
+            self.last_usage = None
+            text = self.read_completion(result)
+            answers.append((text, self.last_usage))
+        return answers
+
+    def read_completion(self, result):
+        """
+        Count a backend result and keep its usage in self.last_usage.
+
+        :param result: Completion, or the exception the request raised
+        :return: The completion text, or None if the request failed
+        """
+        model = self.backend.model
+        if isinstance(result, Exception):
+            count("llm_calls", model=model, status="error")
+            print(f"Error with the {self.backend.name} analysis backend: {result}")
             return None
+        count("llm_calls", model=model, status="ok")
+        if result.prompt_tokens is not None:
+            self.last_usage = (result.prompt_tokens, result.completion_tokens, result.truncated)
+            count("llm_tokens", result.prompt_tokens, model=model, kind="prompt")
+            count("llm_tokens", result.completion_tokens, model=model, kind="completion")
+        return result.text
+
+    def route_packed(self, response_text, items):
+        """
+        :param response_text: Answer to a create_packed_prompt prompt
+        :param items: (item ID, content) pairs of the prompt
+        :return: A dictionary of item ID -> analysis text; items missing from the response are left out
+        """
+        with span("response_parsing", mode="packed"):
+            results = parse_packed_response(response_text, [item_id for item_id, _ in items])
+        if len(results) < len(items):
+            count("packed_items_missing", len(items) - len(results))
+            logger.warning("Packed response covered %s of %s items.", len(results), len(items))
+        return results
 
     def process_analysis_result(self, content_id, analysis_result, domains):
         """Process the analysis result to determine relatedness and insert new domains."""
         if not self.cursor:
             print("Database cursor is not available.")
             return []
-        print("Analysis Result:")
-        print(analysis_result)
+        logger.debug("Analysis Result:\n%s", analysis_result)
 
-        relatedness = {}
-        summary_match = re.search(r"Summarize the content:\n(.+?)\n\n", analysis_result, re.DOTALL)
-        summary = summary_match.group(1).strip() if summary_match else ""
+        taxonomy = DomainTaxonomy(domains)
+        with span("response_parsing"):
+            summary_match = re.search(r"Summarize the content:\n(.+?)\n\n", analysis_result, re.DOTALL)
+            summary = summary_match.group(1).strip() if summary_match else ""
+            relatedness = taxonomy.relatedness(analysis_result)
 
-        for domain_id, domain_name in domains:
-            match = re.search(fr"{domain_name}: ([0-9]+)%", analysis_result)
-            if match:
-                relatedness[domain_id] = int(match.group(1))
+            # Sort by relatedness and limit to top 3 domains with > 30% relatedness
+            top_related_domains = sorted(
+                [(domain_id, percentage) for domain_id, percentage in relatedness.items() if percentage > 30],
+                key=lambda x: x[1],
+                reverse=True
+            )[:3]
 
-        print("Relatedness percentages:")
-        for domain_id, percentage in relatedness.items():
-            print(f"Domain {domain_id}: {percentage}%")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Relatedness percentages: %s",
+                         ", ".join(f"Domain {domain_id}: {percentage}%" for domain_id, percentage in relatedness.items()))
 
-        # Sort by relatedness and limit to top 3 domains with > 30% relatedness
-        top_related_domains = sorted(
-            [(domain_id, percentage) for domain_id, percentage in relatedness.items() if percentage > 30],
-            key=lambda x: x[1],
-            reverse=True
-        )[:3]
-
-        return self.insert_summary_and_relationships(content_id, summary, top_related_domains, analysis_result)
-
-        # Insert summary into the database
+        # Insert summary into the database, on the chunk blob shared by every duplicate of this content
         try:
             self.cursor.execute(
-                "UPDATE content SET summary = ? WHERE id = ?",
-                (summary, content_id)
+                "UPDATE chunk_blobs SET summary = ?, analysis = ? WHERE id = (SELECT blob_id FROM content WHERE id = ?)",
+                (summary, analysis_result, content_id)
             )
+            if self.cursor.rowcount == 0:
+                # Content written before chunk blobs existed keeps its own summary
+                self.cursor.execute(
+                    "UPDATE content SET summary = ? WHERE id = ?",
+                    (summary, content_id)
+                )
             self.connection.commit()
-            print(f"Inserted summary for Content {content_id}.")
+            logger.debug("Inserted summary for Content %s.", content_id)
         except sqlite3.Error as e:
             print(f"Error inserting summary: {e}")
 
@@ -167,31 +343,29 @@ class ContentAnalyzer:
                     (content_id, domain_id, percentage)
                 )
                 self.connection.commit()
-                print(f"Inserted relationship: Content {content_id} -> Domain {domain_id} ({percentage}%)")
+                logger.debug("Inserted relationship: Content %s -> Domain %s (%s%%)", content_id, domain_id, percentage)
             except sqlite3.Error as e:
                 print(f"Error inserting relationship: {e}")
 
         # Check for new domain recommendations
         new_domains = []
-        new_domain_match = re.findall(r"suggest a new domain: (.+?)", analysis_result, re.IGNORECASE)
+        new_domain_match = re.findall(r"suggest a new domain: ([^\n]+)", analysis_result, re.IGNORECASE)
         for new_domain in new_domain_match:
-            new_domain = new_domain.strip()
-            self.insert_new_domain(new_domain)
-            self.cursor.execute("SELECT id FROM domains WHERE name = ?", (new_domain,))
-            new_domain_id = self.cursor.fetchone()
-            if new_domain_id:
-                new_domains.append(new_domain_id[0])
+            new_domain_id = self.insert_new_domain(new_domain, taxonomy)
+            if new_domain_id is not None and new_domain_id not in new_domains:
+                new_domains.append(new_domain_id)
 
         # Return domain IDs for further processing
         return [domain_id for domain_id, _ in top_related_domains] + new_domains
 ## MAIN ##############################################################################################################
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze one random content record.")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
 
-    # Initialize the analyzer
-    analyzer = GPTContentAnalyzer(DB)
-
-    # Connect to the database
-    analyzer.connect_db()
+    # Initialize the analyzer (it connects to the database) with the selected backend
+    analyzer = ContentAnalyzer(DB, None, create_backend(args.backend, args.model, args.base_url, args.concurrency,
+                                                        args.local_batch_size))
 
     try:
         # Fetch a random content record
@@ -0,0 +1,168 @@
+## SUMMARY ###########################################################################################################
+# Class: ContentSearch
+# - connect / close: SQLite connection
+# - search: Ranked full-text search over chunk bodies and summaries, with repo/file context and snippets
+# - search_domains: Ranked full-text search over domain names and descriptions
+# - rebuild: Rebuild the FTS5 indexes from the chunk_blobs and domains tables
+# Functions:
+# - to_match_query: Turn free text into a safe FTS5 MATCH expression
+## LIBRARIES ###########################################################################################################
+import os
+import re
+import argparse
+import sqlite3
+from dotenv import load_dotenv
+try:  # Imported as services.contentSearch (main.py, repoScraper) or flat with services/ on sys.path
+    from services.chunkStore import register_functions
+except ImportError:
+    from chunkStore import register_functions
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+DB = os.getenv("DATABASE")
+SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 16           # Tokens of context in each snippet
+SUMMARY_WEIGHT = 2.0          # bm25 weight of a summary match relative to a chunk body match
+HIGHLIGHT = ("[", "]")
+
+## FUNCTIONS #########################################################################################################
+def to_match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match, and a trailing * keeps prefix search.
+    Words are quoted so punctuation in the input (e.g. "user.id" or "C++") cannot produce a syntax error.
+
+    :param text: The search text
+    :return: A MATCH expression, or None if the text has no searchable words
+    """
+    terms = []
+    for word, prefix in re.findall(r"(\w+)(\*?)", text):
+        terms.append(f'"{word}"{prefix}')
+    return " ".join(terms) or None
+
+## CLASSES ###########################################################################################################
+class ContentSearch:
+    def __init__(self, db_file):
+        """
+        Initialize the search over a DevAtlas database.
+
+        :param db_file: Path to the SQLite database
+        """
+        self.db_file = db_file
+        self.connection = None
+        self.cursor = None
+
+    def connect(self):
+        """Connect to SQLite database"""
+        try:
+            self.connection = sqlite3.connect(self.db_file)
+            self.cursor = self.connection.cursor()
+            register_functions(self.connection)  # Snippets read decompressed chunk text
+        except sqlite3.Error as e:
+            print(f"Error connecting to database: {e}")
+        return self.connection, self.cursor
+
+    def close(self):
+        """Close the database connection"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+            self.cursor = None
+
+    def search(self, text, limit=SEARCH_LIMIT, repo=None, raw=False):
+        """
+        Full-text search over chunk bodies and summaries, best matches first. A chunk is indexed once however many
+        files contain it, and every content row (file occurrence) of a matching chunk is a hit.
+
+        :param text: Search text (or an FTS5 expression when raw is True)
+        :param limit: Maximum number of hits
+        :param repo: Optional repository name to restrict the search to
+        :param raw: Pass text to MATCH unchanged (phrase, NEAR, OR, column filters)
+        :return: A list of hit dictionaries with content_id, repo, file, path, url, domain, score and snippet
+        """
+        match = text if raw else to_match_query(text)
+        if not match:
+            return []
+
+        query = f"""
+            SELECT c.id, r.name, f.name, f.path, f.url, d.name,
+                   bm25(blobs_fts, 1.0, {SUMMARY_WEIGHT}) AS score,
+                   snippet(blobs_fts, -1, ?, ?, '...', {SNIPPET_TOKENS})
+            FROM blobs_fts
+            JOIN content c ON c.blob_id = blobs_fts.rowid
+            JOIN fileObjects f ON f.id = c.fileObject_id
+            JOIN repos r ON r.id = f.repo_id
+            LEFT JOIN domains d ON d.id = c.domain_id
+            WHERE blobs_fts MATCH ? {"AND r.name = ?" if repo is not None else ""}
+            ORDER BY score
+            LIMIT ?
+        """
+        params = [*HIGHLIGHT, match] + ([repo] if repo is not None else []) + [limit]
+        try:
+            self.cursor.execute(query, params)
+        except sqlite3.Error as e:
+            print(f"Error searching content: {e}")
+            return []
+
+        columns = ["content_id", "repo", "file", "path", "url", "domain", "score", "snippet"]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def search_domains(self, text, limit=SEARCH_LIMIT, raw=False):
+        """
+        Full-text search over domain names and descriptions.
+
+        :param text: Search text (or an FTS5 expression when raw is True)
+        :param limit: Maximum number of hits
+        :param raw: Pass text to MATCH unchanged
+        :return: A list of hit dictionaries with domain_id, name, chunks and score
+        """
+        match = text if raw else to_match_query(text)
+        if not match:
+            return []
+
+        query = """
+            SELECT d.id, d.name, (SELECT COUNT(*) FROM content c WHERE c.domain_id = d.id), bm25(domains_fts) AS score
+            FROM domains_fts JOIN domains d ON d.id = domains_fts.rowid
+            WHERE domains_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        """
+        try:
+            self.cursor.execute(query, (match, limit))
+        except sqlite3.Error as e:
+            print(f"Error searching domains: {e}")
+            return []
+        return [dict(zip(["domain_id", "name", "chunks", "score"], row)) for row in self.cursor.fetchall()]
+
+    def rebuild(self):
+        """Rebuild both FTS5 indexes from their tables, e.g. after a bulk load with the triggers disabled."""
+        try:
+            self.cursor.execute("INSERT INTO blobs_fts (blobs_fts) VALUES ('rebuild')")
+            self.cursor.execute("INSERT INTO domains_fts (domains_fts) VALUES ('rebuild')")
+            self.cursor.execute("INSERT INTO blobs_fts (blobs_fts) VALUES ('optimize')")
+            self.connection.commit()
+            print("Search index rebuilt.")
+        except sqlite3.Error as e:
+            print(f"Error rebuilding search index: {e}")
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over analyzed repository content.")
+    parser.add_argument("query", nargs="?", help="Words to search for (a trailing * matches prefixes)")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT, help="Maximum number of hits")
+    parser.add_argument("--repo", default=None, help="Only search this repository")
+    parser.add_argument("--raw", action="store_true", help="Treat the query as an FTS5 expression")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the search index first")
+    args = parser.parse_args()
+
+    search = ContentSearch(DB)
+    search.connect()
+    if args.rebuild:
+        search.rebuild()
+
+    if args.query:
+        for domain in search.search_domains(args.query, limit=5, raw=args.raw):
+            print(f"Domain: {domain['name']} ({domain['chunks']} chunks)")
+        for hit in search.search(args.query, limit=args.limit, repo=args.repo, raw=args.raw):
+            location = hit["path"] or hit["file"]
+            print(f"{hit['score']:8.2f}  {hit['repo']}/{location}  [{hit['domain'] or '-'}]  content {hit['content_id']}")
+            print(f"          {hit['snippet']}")
+    search.close()
@@ -7,6 +7,7 @@
 # - close: Close the database connection
 # - initialize_datebase():
     # - create_tables: Create tables with the specified schema
+    # - create_search_index: FTS5 indexes over chunk blobs and domains, kept in sync by triggers
     # - drop_db: Drop the database and all its tables
 # - load_test_data: Load test data into the database
 # - operations: Perform operations on the database
@@ -19,11 +20,50 @@ import random
 import sqlite3
 ## CLASS IMPORTS #####################################################################################################
 from sqlite3 import Error
+try:  # Imported as services.databaseController (main.py, repoScraper) or flat with services/ on sys.path
+    from services.chunkStore import register_functions
+except ImportError:
+    from chunkStore import register_functions
 ## FUNCTIONS #########################################################################################################
 from dotenv import load_dotenv
 ## CONFIGURATION #######################################################################################################
 load_dotenv()
 DB = os.getenv("DATABASE")
+# Every (content, domain) link: explicit relationships plus each chunk's primary domain, deduplicated
+CONTENT_DOMAIN_LINKS = """
+    SELECT content_id, domain_id, MAX(relatedness) AS relatedness FROM (
+        SELECT content_id, domain_id, relatedness_percentage AS relatedness FROM content_domain_relationships
+        UNION ALL
+        SELECT id, domain_id, 100 FROM content WHERE domain_id IS NOT NULL
+    ) GROUP BY content_id, domain_id
+"""
+# Chunk bodies are stored compressed (chunk_blobs.codec); devatlas_decompress is registered on each connection by
+# chunkStore.register_functions (Database.connect does it), and the views only decompress the rows a query reads.
+# Plain sqlite3 sessions, e.g. the sqlite3 shell, cannot read these views or write chunk_blobs
+CHUNK_TEXT_VIEW = """
+    CREATE VIEW chunk_text AS
+    SELECT id, devatlas_decompress(body, codec) AS body, summary FROM chunk_blobs
+"""
+# Chunk text with its analysis: deduplicated bodies from chunk_blobs, or the legacy content columns before migration
+CONTENT_TEXT_VIEW = """
+    CREATE VIEW content_text AS
+    SELECT c.id, c.fileObject_id, c.domain_id, c.blob_id,
+           COALESCE(devatlas_decompress(b.body, b.codec), c.description) AS description,
+           COALESCE(b.summary, c.summary) AS summary,
+           b.analysis
+    FROM content c LEFT JOIN chunk_blobs b ON b.id = c.blob_id
+"""
+# LLM tokens paid for each repository's content, per analysis run (chunks reusing a stored analysis cost nothing)
+REPO_TOKEN_USAGE_VIEW = """
+    CREATE VIEW repo_token_usage AS
+    SELECT r.id AS repo_id, r.name AS repo, c.run_id,
+           COUNT(*) AS chunks,
+           COUNT(c.prompt_tokens) AS analyzed_chunks,
+           COALESCE(SUM(c.prompt_tokens), 0) AS prompt_tokens,
+           COALESCE(SUM(c.completion_tokens), 0) AS completion_tokens
+    FROM content c JOIN fileObjects f ON f.id = c.fileObject_id JOIN repos r ON r.id = f.repo_id
+    GROUP BY r.id, c.run_id
+"""
 ## TESTING ###########################################################################################################
 RUN_STYLE = 'INIT' # 'PROD'
 ## CLASSES ###########################################################################################################
@@ -35,10 +75,11 @@ class Database:
         self.cursor = None
 
     def connect(self):
-        """Connect to the SQLite database"""
+        """Connect to the SQLite database and register devatlas_decompress for the chunk views and triggers"""
         try:
             self.connection = sqlite3.connect(self.db_file)
             self.cursor = self.connection.cursor()
+            register_functions(self.connection)
             print("Successfully connected to SQLite")
             return self.connection, self.cursor
         except Error as e:
@@ -135,6 +176,7 @@ class Database:
                 type TEXT NOT NULL,
                 name TEXT NOT NULL,
                 url TEXT NOT NULL,
+                path TEXT,
                 FOREIGN KEY (repo_id) REFERENCES repos (id)
             );
             """,
@@ -152,8 +194,28 @@ class Database:
                 description TEXT,
                 summary TEXT,
                 domain_id INTEGER,
+                blob_id INTEGER,
                 FOREIGN KEY (fileObject_id) REFERENCES fileObjects (id),
-                FOREIGN KEY (domain_id) REFERENCES domains (id)
+                FOREIGN KEY (domain_id) REFERENCES domains (id),
+                FOREIGN KEY (blob_id) REFERENCES chunk_blobs (id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS chunk_blobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash BLOB NOT NULL UNIQUE,
+                body BLOB NOT NULL,
+                codec TEXT,
+                size INTEGER,
+                summary TEXT,
+                analysis TEXT
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS chunk_dictionaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                codec TEXT NOT NULL,
+                data BLOB NOT NULL
             );
             """,
             """
@@ -165,23 +227,187 @@ class Database:
                 FOREIGN KEY (content_id) REFERENCES content (id),
                 FOREIGN KEY (domain_id) REFERENCES domains (id)
             );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS node_positions (
+                node_key TEXT PRIMARY KEY,
+                x REAL NOT NULL,
+                y REAL NOT NULL
+            );
+            """,
             """
+            CREATE TABLE IF NOT EXISTS analysis_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                model TEXT,
+                status TEXT NOT NULL,
+                token_budget INTEGER,
+                cost_budget REAL,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                cost REAL NOT NULL DEFAULT 0,
+                chunks_analyzed INTEGER NOT NULL DEFAULT 0,
+                chunks_cached INTEGER NOT NULL DEFAULT 0,
+                chunks_skipped INTEGER NOT NULL DEFAULT 0,
+                chunks_failed INTEGER NOT NULL DEFAULT 0
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS skipped_files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fileObject_id INTEGER NOT NULL,
+                run_id INTEGER,
+                action TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                size INTEGER,
+                FOREIGN KEY (fileObject_id) REFERENCES fileObjects (id),
+                FOREIGN KEY (run_id) REFERENCES analysis_runs (id)
+            );
+            """
+        ]
+        # Columns added after the first release; databases created earlier get them through ALTER TABLE
+        added_columns = [("fileObjects", "path", "TEXT"), ("content", "blob_id", "INTEGER REFERENCES chunk_blobs (id)"),
+                         ("chunk_blobs", "codec", "TEXT"), ("chunk_blobs", "size", "INTEGER"),
+                         ("content", "run_id", "INTEGER REFERENCES analysis_runs (id)"),
+                         ("content", "prompt_tokens", "INTEGER"), ("content", "completion_tokens", "INTEGER"),
+                         ("analysis_runs", "chunks_failed", "INTEGER NOT NULL DEFAULT 0")]
+        # Indexes for scoped graph queries (repo, path prefix, chunks of a file or domain, links of a chunk or domain)
+        indexes = [
+            "CREATE INDEX IF NOT EXISTS idx_fileObjects_repo_path ON fileObjects (repo_id, path);",
+            "CREATE INDEX IF NOT EXISTS idx_content_fileObject ON content (fileObject_id);",
+            "CREATE INDEX IF NOT EXISTS idx_content_domain ON content (domain_id);",
+            "CREATE INDEX IF NOT EXISTS idx_content_blob ON content (blob_id);",
+            "CREATE INDEX IF NOT EXISTS idx_content_run ON content (run_id);",
+            "CREATE INDEX IF NOT EXISTS idx_relationships_content ON content_domain_relationships (content_id);",
+            "CREATE INDEX IF NOT EXISTS idx_relationships_domain ON content_domain_relationships (domain_id);",
+            "CREATE INDEX IF NOT EXISTS idx_skipped_files_reason ON skipped_files (reason);"
         ]
 
         try:
             for query in queries:
                 self.cursor.execute(query)
+            for table, column, column_type in added_columns:
+                self.cursor.execute(f"PRAGMA table_info({table})")
+                if column not in [row[1] for row in self.cursor.fetchall()]:
+                    self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            for query in indexes:
+                self.cursor.execute(query)
+            for view, query in (("chunk_text", CHUNK_TEXT_VIEW), ("content_text", CONTENT_TEXT_VIEW),
+                                ("repo_token_usage", REPO_TOKEN_USAGE_VIEW)):
+                self.cursor.execute(f"DROP VIEW IF EXISTS {view}")
+                self.cursor.execute(query)
             self.connection.commit()
             print("Tables created successfully.")
         except Error as e:
             print(f"Error creating tables: {e}")
 
+        self.create_search_index()
+
+    def create_search_index(self):
+        """
+        Create the FTS5 full-text indexes over chunk bodies/summaries and domain names. Both are external-content
+        tables (the text is not stored twice) kept in sync by triggers. Chunks are indexed once per unique blob, so
+        duplicated chunks do not grow the index; searches join back to every content row using the blob. The chunk
+        index reads decompressed bodies through the chunk_text view.
+        """
+        self.cursor.execute("SELECT name, sql FROM sqlite_master WHERE name IN ('blobs_fts', 'domains_fts')")
+        existing = dict(self.cursor.fetchall())
+        if "blobs_fts" in existing and "chunk_text" not in existing["blobs_fts"]:
+            # Created before bodies were compressed, when it read chunk_blobs directly
+            for trigger in ("insert", "delete", "update"):
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS blobs_fts_{trigger}")
+            self.cursor.execute("DROP TABLE blobs_fts")
+            del existing["blobs_fts"]
+        queries = [
+            # The per-row content index predates chunk blobs
+            "DROP TRIGGER IF EXISTS content_fts_insert;",
+            "DROP TRIGGER IF EXISTS content_fts_delete;",
+            "DROP TRIGGER IF EXISTS content_fts_update;",
+            "DROP TABLE IF EXISTS content_fts;",
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS blobs_fts USING fts5(
+                body, summary, content='chunk_text', content_rowid='id', tokenize='porter unicode61'
+            );
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS blobs_fts_insert AFTER INSERT ON chunk_blobs BEGIN
+                INSERT INTO blobs_fts (rowid, body, summary)
+                VALUES (new.id, devatlas_decompress(new.body, new.codec), new.summary);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS blobs_fts_delete AFTER DELETE ON chunk_blobs BEGIN
+                INSERT INTO blobs_fts (blobs_fts, rowid, body, summary)
+                VALUES ('delete', old.id, devatlas_decompress(old.body, old.codec), old.summary);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS blobs_fts_update AFTER UPDATE OF hash, body, summary ON chunk_blobs
+            WHEN old.hash IS NOT new.hash OR old.summary IS NOT new.summary BEGIN
+                INSERT INTO blobs_fts (blobs_fts, rowid, body, summary)
+                VALUES ('delete', old.id, devatlas_decompress(old.body, old.codec), old.summary);
+                INSERT INTO blobs_fts (rowid, body, summary)
+                VALUES (new.id, devatlas_decompress(new.body, new.codec), new.summary);
+            END;
+            """,
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS domains_fts USING fts5(
+                name, description, content='domains', content_rowid='id', tokenize='porter unicode61'
+            );
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS domains_fts_insert AFTER INSERT ON domains BEGIN
+                INSERT INTO domains_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS domains_fts_delete AFTER DELETE ON domains BEGIN
+                INSERT INTO domains_fts (domains_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS domains_fts_update AFTER UPDATE OF name, description ON domains BEGIN
+                INSERT INTO domains_fts (domains_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO domains_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+            END;
+            """
+        ]
+
+        try:
+            for query in queries:
+                self.cursor.execute(query)
+            # Index rows written before the index existed. Those chunks are all uncompressed (compressed bodies are only
+            # written once this index exists), so they are read directly; ContentSearch.rebuild re-indexes everything.
+            if "blobs_fts" not in existing:
+                self.cursor.execute("INSERT INTO blobs_fts (rowid, body, summary) "
+                                    "SELECT id, body, summary FROM chunk_blobs WHERE codec IS NULL")
+            if "domains_fts" not in existing:
+                self.cursor.execute("INSERT INTO domains_fts (domains_fts) VALUES ('rebuild')")
+            self.connection.commit()
+        except Error as e:
+            print(f"Error creating search index (is SQLite built with FTS5?): {e}")
+
     def drop_db(self):
         """Drop the database and all its tables"""
         try:
-            # Drop tables in reverse order of dependency
+            # Drop tables in reverse order of dependency (triggers are dropped with their tables)
+            self.cursor.execute("DROP VIEW IF EXISTS repo_token_usage")
+            self.cursor.execute("DROP VIEW IF EXISTS content_text")
+            self.cursor.execute("DROP VIEW IF EXISTS chunk_text")
+            self.cursor.execute("DROP TABLE IF EXISTS content_fts")
+            self.cursor.execute("DROP TABLE IF EXISTS blobs_fts")
+            self.cursor.execute("DROP TABLE IF EXISTS domains_fts")
+            self.cursor.execute("DROP TABLE IF EXISTS node_positions")
+            self.cursor.execute("DROP TABLE IF EXISTS skipped_files")
             self.cursor.execute("DROP TABLE IF EXISTS content_domain_relationships")
             self.cursor.execute("DROP TABLE IF EXISTS content")
+            self.cursor.execute("DROP TABLE IF EXISTS chunk_blobs")
+            self.cursor.execute("DROP TABLE IF EXISTS chunk_dictionaries")
+            self.cursor.execute("DROP TABLE IF EXISTS analysis_runs")
             self.cursor.execute("DROP TABLE IF EXISTS domains")
             self.cursor.execute("DROP TABLE IF EXISTS fileObjects")
             self.cursor.execute("DROP TABLE IF EXISTS repos")
@@ -0,0 +1,140 @@
+## SUMMARY ###########################################################################################################
+# Class: InotifyWatcher (Linux only, no third-party dependencies)
+# - add_tree: Recursively watch a directory, skipping excluded directories
+# - read_events: Read and decode pending inotify events, watching newly created directories
+# - wait_for_changes: Block until paths change, then collect events until the tree is quiet
+# - close: Close the inotify file descriptor
+## LIBRARIES ###########################################################################################################
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+## CONFIGURATION #######################################################################################################
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+STRUCTURE_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_Q_OVERFLOW
+EVENT_HEADER = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len (followed by name)
+READ_SIZE = 64 * 1024
+
+## CLASSES ###########################################################################################################
+class InotifyWatcher:
+    def __init__(self, exclude_dirs=()):
+        """
+        Initialize an inotify instance.
+
+        :param exclude_dirs: Directory name fragments that should not be watched
+        """
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is only available on Linux.")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.exclude_dirs = exclude_dirs
+        self.watches = {}  # watch descriptor -> directory path
+
+    def add_watch(self, directory):
+        """Watch a single directory."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            print(f"Error watching {directory}: {os.strerror(ctypes.get_errno())}")
+            return
+        self.watches[wd] = directory
+
+    def add_tree(self, directory):
+        """
+        Recursively watch a directory, skipping excluded directories.
+
+        :param directory: Root of the tree to watch
+        """
+        for root, dirs, _ in os.walk(directory):
+            dirs[:] = [d for d in dirs if not any(excluded in d for excluded in self.exclude_dirs)]
+            self.add_watch(root)
+
+    def read_events(self):
+        """
+        Read and decode pending events. Newly created directories are watched as they appear.
+
+        :return: A list of (path, mask) tuples
+        """
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; report every watched directory so the whole tree is parsed again
+                events.extend((path, IN_Q_OVERFLOW | IN_ISDIR) for path in self.watches.values())
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                if not any(excluded in os.path.basename(path) for excluded in self.exclude_dirs):
+                    self.add_tree(path)
+            events.append((path, mask))
+        return events
+
+    def wait_for_changes(self, debounce=0.5, timeout=None):
+        """
+        Block until something changes, then keep collecting events until none arrive for `debounce` seconds,
+        so that an editor save or a git checkout is handled as one batch.
+
+        :param debounce: Quiet period in seconds that ends a batch
+        :param timeout: Maximum seconds to wait for the first event (None waits forever)
+        :return: A dictionary of changed path -> combined event mask
+        """
+        changes = {}
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changes
+
+        deadline = time.monotonic() + debounce
+        while True:
+            for path, mask in self.read_events():
+                changes[path] = changes.get(path, 0) | mask
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return changes
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if ready:
+                deadline = time.monotonic() + debounce
+
+    def close(self):
+        """Close the inotify file descriptor."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
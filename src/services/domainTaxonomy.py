@@ -0,0 +1,231 @@
+## SUMMARY ###########################################################################################################
+# Class: DomainTaxonomy
+# - find: Existing domain with the same canonical key, or a near-duplicate name (difflib), for a suggested domain
+# - add: Register a newly inserted domain
+# - shortlist: Top-K candidate domains for a chunk (identifier keyword overlap, optionally embedding similarity)
+# - relatedness: "<domain>: NN%" lines of an analysis mapped to domain IDs in one pass over the text
+# Functions:
+# - canonical_domain_name: Clean a suggested domain name (markdown, quotes, trailing explanations, casing)
+# - domain_key: Normalized key used to detect duplicates ("User Accounts" == "user account")
+# - identifier_tokens: Words of a chunk, with camelCase and snake_case identifiers split
+# - merge_duplicate_domains: Merge existing near-duplicate domains into the oldest one
+## LIBRARIES ###########################################################################################################
+import os
+import re
+import math
+import difflib
+import argparse
+import sqlite3
+from collections import defaultdict
+from dotenv import load_dotenv
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+DB = os.getenv("DATABASE")
+SHORTLIST_SIZE = int(os.getenv("DOMAIN_SHORTLIST", "12"))  # Candidate domains per prompt
+MERGE_CUTOFF = 0.88           # difflib ratio above which two domain keys are the same domain
+MAX_DOMAIN_NAME = 60
+NAME_MATCH_BONUS = 3.0        # Score added when a domain's full name appears in the chunk
+STOPWORDS = {"a", "an", "and", "the", "of", "for", "to", "in", "on", "with", "domain", "category"}
+NOT_A_DOMAIN = {"", "none", "n/a", "na", "null", "not applicable", "no new domain", "nothing"}
+IDENTIFIER_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+RELATEDNESS_PATTERN = re.compile(r"([A-Za-z][\w &/+.'-]{0,80}?)\s*\**\s*:\s*\**\s*([0-9]{1,3})\s*%")
+
+## FUNCTIONS #########################################################################################################
+def singular(word):
+    """Naive English singular, enough to match "Payments" with "Payment" and "Utilities" with "Utility"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def canonical_domain_name(name):
+    """
+    :param name: Domain name as written by the model, e.g. '**"payments"** (billing code).'
+    :return: The cleaned name, e.g. "Payments", or "" if nothing usable is left
+    """
+    name = re.sub(r"[*_`\"\[\]]", "", name)
+    name = re.split(r"[\n;:(]|\.(?:\s|$)| - ", name)[0]
+    name = re.sub(r"\s+", " ", name).strip(" -,.'")
+    if name.lower() in NOT_A_DOMAIN:
+        return ""
+    # Lowercase words are capitalized; acronyms and mixed case ("API", "DevOps") are kept
+    words = [word[:1].upper() + word[1:] if word.islower() else word for word in name.split(" ")]
+    return " ".join(words)[:MAX_DOMAIN_NAME]
+
+def domain_key(name):
+    """
+    :param name: Domain name
+    :return: Lowercase singular words without stopwords, e.g. "user account" for "User Accounts"
+    """
+    words = re.findall(r"[a-z0-9]+", name.lower())
+    return " ".join(singular(word) for word in words if word not in STOPWORDS)
+
+def identifier_tokens(text):
+    """
+    :param text: Chunk text
+    :return: Set of lowercase singular words; getUserAccount and get_user_account both give {get, user, account}
+    """
+    return {singular(word.lower()) for word in IDENTIFIER_PATTERN.findall(text) if len(word) > 2}
+
+def merge_duplicate_domains(connection, cutoff=MERGE_CUTOFF):
+    """
+    Merge domains whose names are the same after canonicalization, or near-duplicates, into the oldest of them.
+    Relationships and primary domains of content rows are moved to the kept domain.
+
+    :param connection: An open sqlite3 connection
+    :param cutoff: difflib similarity ratio for near-duplicates
+    :return: A list of (merged domain id, kept domain id)
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT id, name FROM domains ORDER BY id")
+    taxonomy = DomainTaxonomy([], cutoff=cutoff)
+    merged = []
+    for domain_id, name in cursor.fetchall():
+        kept_id = taxonomy.find(name)
+        if kept_id is None:
+            taxonomy.add(domain_id, name)
+        else:
+            merged.append((domain_id, kept_id))
+    for duplicate_id, kept_id in merged:
+        cursor.execute("UPDATE content_domain_relationships SET domain_id = ? WHERE domain_id = ?", (kept_id, duplicate_id))
+        cursor.execute("UPDATE content SET domain_id = ? WHERE domain_id = ?", (kept_id, duplicate_id))
+        cursor.execute("DELETE FROM domains WHERE id = ?", (duplicate_id,))
+    connection.commit()
+    return merged
+
+## CLASSES ###########################################################################################################
+class DomainTaxonomy:
+    def __init__(self, domains, cutoff=MERGE_CUTOFF, semantic_index=None):
+        """
+        In-memory view of the domains table for building prompts and parsing answers without per-domain work.
+
+        :param domains: (id, name) rows, most used first (the order fills shortlists without keyword matches)
+        :param cutoff: difflib similarity ratio for near-duplicate names
+        :param semantic_index: Optional embeddingIndex.SemanticIndex whose nearest_domains adds embedding similarity
+        """
+        self.cutoff = cutoff
+        self.semantic_index = semantic_index
+        self.domains = []         # (id, name) in the given order, then in insertion order
+        self.names = {}           # id -> name
+        self.by_key = {}          # canonical key -> id
+        self.postings = defaultdict(set)  # word -> ids of domains whose name contains it
+        for domain_id, name in domains:
+            self.add(domain_id, name)
+
+    def __len__(self):
+        return len(self.domains)
+
+    def add(self, domain_id, name):
+        """
+        :param domain_id: Domain row id
+        :param name: Domain name
+        """
+        key = domain_key(name)
+        self.domains.append((domain_id, name))
+        self.names[domain_id] = name
+        self.by_key.setdefault(key, domain_id)
+        for word in key.split(" "):
+            if word:
+                self.postings[word].add(domain_id)
+
+    def find(self, name):
+        """
+        :param name: A domain name, possibly as suggested by the model
+        :return: The id of the domain it duplicates, or None if it is new
+        """
+        key = domain_key(canonical_domain_name(name) or name)
+        if not key:
+            return None
+        if key in self.by_key:
+            return self.by_key[key]
+        close = difflib.get_close_matches(key, self.by_key.keys(), n=1, cutoff=self.cutoff)
+        return self.by_key[close[0]] if close else None
+
+    def shortlist(self, text, k=SHORTLIST_SIZE):
+        """
+        Candidate domains for a chunk. Domain name words found among the chunk's identifiers score their inverse
+        document frequency (rare words count more), a full name in the text scores a bonus, and with a semantic
+        index the embedding similarity is added. Remaining places go to the first (most used) domains.
+
+        :param text: Chunk text
+        :param k: Number of candidates
+        :return: Up to k (id, name) rows
+        """
+        if len(self.domains) <= k:
+            return list(self.domains)
+        scores = defaultdict(float)
+        lowered = text.lower()
+        total = len(self.domains)
+        for word in identifier_tokens(text):
+            matches = self.postings.get(word)
+            if matches:
+                weight = math.log(1 + total / len(matches))
+                for domain_id in matches:
+                    scores[domain_id] += weight
+        for domain_id in list(scores):
+            if self.names[domain_id].lower() in lowered:
+                scores[domain_id] += NAME_MATCH_BONUS
+        if self.semantic_index is not None:
+            for domain_id, _, similarity in self.semantic_index.nearest_domains(text=text, k=k):
+                if domain_id in self.names:
+                    scores[domain_id] += max(0.0, similarity) * NAME_MATCH_BONUS
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+        chosen = set(ranked)
+        for domain_id, _ in self.domains:
+            if len(ranked) >= k:
+                break
+            if domain_id not in chosen:
+                ranked.append(domain_id)
+                chosen.add(domain_id)
+        return [(domain_id, self.names[domain_id]) for domain_id in ranked]
+
+    def shortlist_many(self, texts, k=SHORTLIST_SIZE):
+        """
+        :param texts: Chunk texts sent in one packed request
+        :return: The union of their shortlists, in first-seen order
+        """
+        seen = {}
+        for text in texts:
+            for domain_id, name in self.shortlist(text, k):
+                seen.setdefault(domain_id, name)
+        return list(seen.items())
+
+    def relatedness(self, analysis_text):
+        """
+        Read every "<domain>: NN%" in an analysis with one scan of the text; names are matched by canonical key, so
+        the cost does not grow with the number of domains.
+
+        :param analysis_text: Analysis returned by the model
+        :return: A dictionary of domain id -> percentage (the first mention of a domain wins)
+        """
+        relatedness = {}
+        for name, percentage in RELATEDNESS_PATTERN.findall(analysis_text):
+            # The capture can start with prose ("Categorize it into Billing"); the longest matching word suffix wins
+            words = domain_key(name).split(" ")
+            for start in range(len(words)):
+                domain_id = self.by_key.get(" ".join(words[start:]))
+                if domain_id is not None:
+                    relatedness.setdefault(domain_id, int(percentage))
+                    break
+        return relatedness
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Domain taxonomy maintenance.")
+    parser.add_argument("--merge", action="store_true", help="Merge near-duplicate domains into the oldest one")
+    parser.add_argument("--cutoff", type=float, default=MERGE_CUTOFF, help="Similarity ratio for near-duplicates")
+    parser.add_argument("--shortlist", default=None, help="Show the candidate domains for this text")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(DB)
+    if args.merge:
+        for duplicate_id, kept_id in merge_duplicate_domains(connection, args.cutoff):
+            print(f"Merged domain {duplicate_id} into {kept_id}")
+    if args.shortlist:
+        cursor = connection.cursor()
+        cursor.execute("SELECT id, name FROM domains ORDER BY id")
+        for domain_id, name in DomainTaxonomy(cursor.fetchall()).shortlist(args.shortlist):
+            print(f"{domain_id}: {name}")
+    connection.close()
@@ -0,0 +1,437 @@
+## SUMMARY ###########################################################################################################
+# Class: EmbeddingIndex
+# - add: Append (id, vector, text version) rows to the float16 matrix file next to the database
+# - load: Memory-map the matrix and map IDs to rows and text versions (the latest row of an ID wins)
+# - search: Exact top-k inner-product search, streamed over the matrix in blocks
+# - train_quantizer / search_quantized: Product-quantized candidate search with exact re-ranking
+# - compact: Rewrite the files without superseded rows
+# Class: ProductQuantizer
+# - fit: k-means codebooks per subspace
+# - encode: Vectors to one uint8 code per subspace
+# - scores: Asymmetric inner-product scores of a query against codes (lookup tables)
+# Class: SemanticIndex
+# - build: Embed content chunks and domains that are new or whose text changed since they were embedded
+# - related_content: Chunks most similar to a chunk
+# - nearest_domains: Domains most similar to a text, a chunk or a vector
+# Functions:
+# - top_k: Indices and values of the k largest scores, best first
+# - text_version: 64-bit hash of an embedded text, stored per row to detect changed text
+## LIBRARIES ###########################################################################################################
+import os
+import argparse
+import hashlib
+import sqlite3
+import numpy as np
+from dotenv import load_dotenv
+try:  # Imported as services.embeddingIndex (main.py, repoScraper) or flat with services/ on sys.path
+    from services.chunkStore import register_functions
+except ImportError:
+    from chunkStore import register_functions
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+DB = os.getenv("DATABASE")
+BLOCK_ROWS = 65536            # Rows converted to float32 at a time during search
+PQ_SUBSPACES = 8              # Subvectors per vector (must divide the dimension)
+PQ_CENTROIDS = 256            # Centroids per subspace (one uint8 code)
+PQ_ITERATIONS = 20
+PQ_TRAINING_SAMPLE = 20000
+RERANK_FACTOR = 10            # Quantized candidates per requested result that are re-ranked exactly
+EMBED_BATCH_ROWS = 256        # Rows read from SQLite and embedded per batch
+
+## FUNCTIONS #########################################################################################################
+def top_k(scores, k):
+    """
+    Indices and values of the k largest scores, best first, without sorting the whole array.
+
+    :param scores: 1-D array of scores
+    :param k: Number of results
+    :return: (indices, values)
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=scores.dtype)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order], scores[candidates[order]]
+
+def text_version(text):
+    """
+    :param text: The text a vector was computed from
+    :return: A signed 64-bit hash of it (0 is reserved for rows whose text version is unknown)
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True) or 1
+
+## CLASSES ###########################################################################################################
+class ProductQuantizer:
+    def __init__(self, subspaces=PQ_SUBSPACES, centroids=PQ_CENTROIDS):
+        """
+        Initialize a product quantizer: each vector is split into `subspaces` parts, and each part is replaced
+        by the index of its nearest centroid, so a vector is stored in `subspaces` bytes.
+
+        :param subspaces: Number of subvectors
+        :param centroids: Centroids per subspace (at most 256)
+        """
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.codebooks = None  # (subspaces, centroids, subspace dimension)
+
+    def fit(self, vectors, iterations=PQ_ITERATIONS, seed=0):
+        """
+        Train one k-means codebook per subspace.
+
+        :param vectors: (n, dim) training vectors; dim must be divisible by the number of subspaces
+        """
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        parts = np.split(vectors, self.subspaces, axis=1)
+        count = min(self.centroids, len(vectors))
+        codebooks = []
+        for part in parts:
+            centroids = part[rng.choice(len(part), count, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self.assign(part, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, part)
+                sizes = np.bincount(labels, minlength=count)
+                empty = sizes == 0
+                centroids[~empty] = sums[~empty] / sizes[~empty, None]
+                # Restart empty clusters from random points
+                centroids[empty] = part[rng.choice(len(part), int(empty.sum()))]
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks)
+        return self
+
+    @staticmethod
+    def assign(part, centroids):
+        """Nearest centroid of each subvector (squared Euclidean distance)."""
+        distances = (centroids * centroids).sum(axis=1)[None, :] - 2.0 * part @ centroids.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors):
+        """
+        Encode vectors as codes.
+
+        :param vectors: (n, dim) vectors
+        :return: (n, subspaces) uint8 codes
+        """
+        parts = np.split(np.asarray(vectors, dtype=np.float32), self.subspaces, axis=1)
+        return np.stack([self.assign(part, codebook) for part, codebook in zip(parts, self.codebooks)],
+                        axis=1).astype(np.uint8)
+
+    def scores(self, query, codes):
+        """
+        Approximate inner products of one query with every encoded vector: a (subspaces, centroids) table of
+        partial dot products is computed once, then each score is a sum of table lookups.
+
+        :param query: (dim,) query vector
+        :param codes: (n, subspaces) codes
+        :return: (n,) float32 scores
+        """
+        parts = np.split(np.asarray(query, dtype=np.float32), self.subspaces)
+        tables = np.stack([codebook @ part for part, codebook in zip(parts, self.codebooks)])
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for subspace in range(self.subspaces):
+            scores += tables[subspace, codes[:, subspace]]
+        return scores
+
+class EmbeddingIndex:
+    def __init__(self, path_prefix, dim):
+        """
+        Initialize an append-only vector index stored as raw files: <path_prefix>.vec (float16 rows),
+        <path_prefix>.ids (int64 IDs), <path_prefix>.versions (int64 text versions) and <path_prefix>.pq.npz
+        (codebooks).
+
+        :param path_prefix: Path without extension, e.g. "devatlas.content"
+        :param dim: Vector dimension
+        """
+        self.path_prefix = path_prefix
+        self.dim = dim
+        self.vectors_file = f"{path_prefix}.vec"
+        self.ids_file = f"{path_prefix}.ids"
+        self.versions_file = f"{path_prefix}.versions"
+        self.quantizer_file = f"{path_prefix}.pq.npz"
+        self.matrix = None
+        self.ids = None
+        self.versions = None   # Text version of each row
+        self.rows = None       # Row of the latest vector per ID (rows of superseded vectors are skipped)
+        self.row_of = {}
+        self.version_of = {}   # ID -> text version of its latest vector
+        self.quantizer = None
+        self.codes = None
+
+    def add(self, ids, vectors, versions=None):
+        """
+        Append vectors. Adding an ID again supersedes its earlier vector.
+
+        :param ids: Integer IDs
+        :param vectors: (len(ids), dim) vectors, stored as float16
+        :param versions: text_version of the text behind each vector (default 0: unknown)
+        """
+        vectors = np.asarray(vectors, dtype=np.float16).reshape(-1, self.dim)
+        ids = np.asarray(ids, dtype=np.int64)
+        versions = np.zeros(len(ids), dtype=np.int64) if versions is None else np.asarray(versions, dtype=np.int64)
+        if not len(ids) == len(vectors) == len(versions):
+            raise ValueError("ids, vectors and versions must have the same length")
+        with open(self.vectors_file, "ab") as file:
+            file.write(vectors.tobytes())
+        with open(self.ids_file, "ab") as file:
+            file.write(ids.tobytes())
+        with open(self.versions_file, "ab") as file:
+            file.write(versions.tobytes())
+        self.matrix = None
+
+    def load(self):
+        """
+        Memory-map the matrix (read-only) and index the latest row of each ID. Rows written before text versions
+        were recorded get version 0, so build embeds them again.
+        """
+        if not os.path.exists(self.vectors_file):
+            self.matrix = np.zeros((0, self.dim), dtype=np.float16)
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.versions = np.zeros(0, dtype=np.int64)
+        else:
+            row_count = os.path.getsize(self.vectors_file) // (2 * self.dim)
+            self.matrix = np.memmap(self.vectors_file, dtype=np.float16, mode="r", shape=(row_count, self.dim)) \
+                if row_count else np.zeros((0, self.dim), dtype=np.float16)
+            self.ids = np.fromfile(self.ids_file, dtype=np.int64, count=row_count)
+            versions = np.fromfile(self.versions_file, dtype=np.int64, count=row_count) \
+                if os.path.exists(self.versions_file) else np.zeros(0, dtype=np.int64)
+            # The versions file starts at the first row written with versions; earlier rows are unknown
+            self.versions = np.concatenate([np.zeros(row_count - len(versions), dtype=np.int64), versions])
+
+        # Keep the last occurrence of every ID
+        reversed_ids = self.ids[::-1]
+        _, first = np.unique(reversed_ids, return_index=True)
+        self.rows = np.sort(len(self.ids) - 1 - first)
+        self.row_of = dict(zip(self.ids[self.rows].tolist(), self.rows.tolist()))
+        self.version_of = dict(zip(self.ids[self.rows].tolist(), self.versions[self.rows].tolist()))
+
+        self.quantizer = None
+        self.codes = None
+        if os.path.exists(self.quantizer_file):
+            saved = np.load(self.quantizer_file)
+            codebooks, codes = saved["codebooks"], saved["codes"]
+            self.quantizer = ProductQuantizer(codebooks.shape[0], codebooks.shape[1])
+            self.quantizer.codebooks = codebooks
+            # Rows appended since training are encoded with the existing codebooks
+            self.codes = np.concatenate([codes, self.quantizer.encode(self.matrix[len(codes):])]) \
+                if len(codes) < len(self.ids) else codes
+        return self
+
+    def __len__(self):
+        if self.matrix is None:
+            self.load()
+        return len(self.rows)
+
+    def __contains__(self, item_id):
+        if self.matrix is None:
+            self.load()
+        return item_id in self.row_of
+
+    def vector(self, item_id):
+        """The stored vector of an ID as float32."""
+        if self.matrix is None:
+            self.load()
+        return self.matrix[self.row_of[item_id]].astype(np.float32)
+
+    def search(self, query, k=10, exclude_ids=()):
+        """
+        Exact top-k by inner product (cosine similarity for normalized vectors). The matrix is scanned in
+        blocks of BLOCK_ROWS rows, so memory stays bounded however large the index is.
+
+        :param query: (dim,) query vector
+        :param k: Number of results
+        :param exclude_ids: IDs to leave out (e.g. the query's own ID)
+        :return: (ids, scores), best first
+        """
+        if self.matrix is None:
+            self.load()
+        query = np.asarray(query, dtype=np.float32)
+        excluded = np.asarray(list(exclude_ids), dtype=np.int64)
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, len(self.rows), BLOCK_ROWS):
+            rows = self.rows[start:start + BLOCK_ROWS]
+            # Rows are sorted, so a block of them is one contiguous slice of the memory map
+            block = np.asarray(self.matrix[rows[0]:rows[-1] + 1], dtype=np.float32)[rows - rows[0]]
+            scores = block @ query
+            if len(excluded):
+                scores[np.isin(self.ids[rows], excluded)] = -np.inf
+            indices, values = top_k(np.concatenate([best_scores, scores]), k + len(excluded))
+            best_rows = np.concatenate([best_rows, rows])[indices]
+            best_scores = values
+        keep = np.isfinite(best_scores)
+        return self.ids[best_rows[keep]][:k], best_scores[keep][:k]
+
+    def train_quantizer(self, subspaces=PQ_SUBSPACES, sample_size=PQ_TRAINING_SAMPLE, seed=0):
+        """
+        Train a product quantizer on a sample of the index, encode every row, and save codebooks and codes.
+        """
+        if self.matrix is None:
+            self.load()
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(self.rows), min(sample_size, len(self.rows)), replace=False))
+        self.quantizer = ProductQuantizer(subspaces).fit(np.asarray(self.matrix[self.rows[sample]], dtype=np.float32),
+                                                          seed=seed)
+        codes = np.zeros((len(self.ids), subspaces), dtype=np.uint8)
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            codes[start:start + BLOCK_ROWS] = self.quantizer.encode(self.matrix[start:start + BLOCK_ROWS])
+        self.codes = codes
+        np.savez(self.quantizer_file, codebooks=self.quantizer.codebooks, codes=codes, ids=self.ids)
+
+    def search_quantized(self, query, k=10, exclude_ids=(), rerank_factor=RERANK_FACTOR):
+        """
+        Approximate top-k: score every row from its codes (a few bytes per row), then re-rank the best
+        k * rerank_factor candidates exactly against the float16 matrix. Falls back to exact search when no
+        quantizer has been trained for the current rows.
+
+        :return: (ids, scores), best first
+        """
+        if self.matrix is None:
+            self.load()
+        if self.quantizer is None:
+            return self.search(query, k, exclude_ids)
+        query = np.asarray(query, dtype=np.float32)
+        scores = self.quantizer.scores(query, self.codes[self.rows])
+        if len(exclude_ids):
+            scores[np.isin(self.ids[self.rows], list(exclude_ids))] = -np.inf
+        candidates, values = top_k(scores, k * rerank_factor)
+        rows = np.sort(self.rows[candidates[np.isfinite(values)]])
+        indices, values = top_k(np.asarray(self.matrix[rows], dtype=np.float32) @ query, k)
+        return self.ids[rows[indices]], values
+
+    def compact(self):
+        """Rewrite the files keeping only the latest vector of each ID."""
+        if self.matrix is None:
+            self.load()
+        vectors = np.asarray(self.matrix[self.rows])
+        ids = self.ids[self.rows]
+        versions = self.versions[self.rows]
+        self.matrix = None
+        for path in (self.vectors_file, self.ids_file, self.versions_file, self.quantizer_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self.add(ids, vectors, versions)
+        self.load()
+
+class SemanticIndex:
+    def __init__(self, db_file, gpt2_generator, dim=None):
+        """
+        Initialize content and domain embedding indexes stored next to the SQLite database.
+
+        :param db_file: Path to the SQLite database
+        :param gpt2_generator: A loaded GPT2TokenGenerator used to embed text
+        :param dim: Vector dimension (defaults to the model's hidden size)
+        """
+        self.db_file = db_file
+        self.gpt2_generator = gpt2_generator
+        dim = dim or gpt2_generator.model.config.n_embd
+        prefix = os.path.splitext(db_file)[0]
+        self.content = EmbeddingIndex(f"{prefix}.content", dim)
+        self.domains = EmbeddingIndex(f"{prefix}.domains", dim)
+        self.connection = sqlite3.connect(db_file)
+        self.cursor = self.connection.cursor()
+        register_functions(self.connection)  # Chunk text is stored compressed
+
+    def build(self, batch_rows=EMBED_BATCH_ROWS, content=True):
+        """
+        Embed content chunks (summary and description) and domains (name and description) that are not in the
+        index yet, or whose text changed since they were embedded: a summary written after the chunk was first
+        indexed (e.g. a chunk stored unanalyzed and analyzed by a later run) or an edited domain description. Every
+        row's text is compared with the text version stored next to its vector, so only new and changed rows are
+        embedded; rows are read in batches so the whole table is never held in memory.
+
+        :param content: False embeds only the domains (all nearest_domains needs, e.g. for domain shortlists)
+        :return: (content rows embedded, domains embedded)
+        """
+        embedded = []
+        for index, query in (
+            (self.content, "SELECT id, COALESCE(summary, '') || ' ' || COALESCE(description, '') FROM content_text "
+                           "ORDER BY id"),
+            (self.domains, "SELECT id, name || ' ' || COALESCE(description, '') FROM domains ORDER BY id")
+        ):
+            if index is self.content and not content:
+                embedded.append(0)
+                continue
+            index.load()
+            version_of = index.version_of
+            cursor = self.connection.cursor()
+            cursor.execute(query)
+            count = 0
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                changed = [(item_id, text, text_version(text)) for item_id, text in rows]
+                changed = [row for row in changed if version_of.get(row[0]) != row[2]]
+                if not changed:
+                    continue
+                ids, texts, versions = zip(*changed)
+                index.add(ids, self.gpt2_generator.embed(list(texts)), versions)
+                count += len(changed)
+            index.load()
+            embedded.append(count)
+        return tuple(embedded)
+
+    def related_content(self, content_id, k=10, quantized=False):
+        """
+        Chunks most similar to a chunk.
+
+        :return: A list of (content_id, similarity)
+        """
+        query = self.content.vector(content_id)
+        search = self.content.search_quantized if quantized else self.content.search
+        ids, scores = search(query, k, exclude_ids=[content_id])
+        return list(zip(ids.tolist(), scores.tolist()))
+
+    def nearest_domains(self, text=None, content_id=None, vector=None, k=5):
+        """
+        Domains most similar to a text, a stored chunk, or a vector. Useful as a cheap local pre-classification.
+
+        :return: A list of (domain_id, domain name, similarity)
+        """
+        if vector is None:
+            vector = self.content.vector(content_id) if content_id is not None else self.gpt2_generator.embed([text])[0]
+        ids, scores = self.domains.search(vector, k)
+        names = {}
+        if len(ids):
+            self.cursor.execute(f"SELECT id, name FROM domains WHERE id IN ({', '.join('?' * len(ids))})", ids.tolist())
+            names = dict(self.cursor.fetchall())
+        return [(domain_id, names.get(domain_id), score) for domain_id, score in zip(ids.tolist(), scores.tolist())]
+
+    def close(self):
+        self.connection.close()
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    try:
+        from services.localContentAnalyzer import GPT2TokenGenerator
+    except ImportError:
+        from localContentAnalyzer import GPT2TokenGenerator
+
+    parser = argparse.ArgumentParser(description="Local embedding index over content chunks and domains.")
+    parser.add_argument("--model", default="gpt2", help="Model name or local path")
+    parser.add_argument("--build", action="store_true",
+                        help="Embed chunks and domains that are new or whose text changed since they were embedded")
+    parser.add_argument("--train-pq", action="store_true", help="Train the product quantizer for content search")
+    parser.add_argument("--related", type=int, default=None, help="Show chunks related to this content ID")
+    parser.add_argument("--domains", default=None, help="Show the domains nearest to this text")
+    parser.add_argument("-k", type=int, default=10, help="Number of results")
+    args = parser.parse_args()
+
+    generator = GPT2TokenGenerator(args.model)
+    generator.load_model_and_tokenizer()
+    semantic_index = SemanticIndex(DB, generator)
+    if args.build:
+        content_count, domain_count = semantic_index.build()
+        print(f"Embedded {content_count} chunks and {domain_count} domains.")
+    if args.train_pq:
+        semantic_index.content.train_quantizer()
+        print("Product quantizer trained.")
+    if args.related is not None:
+        for content_id, score in semantic_index.related_content(args.related, args.k, quantized=args.train_pq):
+            print(f"{score:6.3f}  content {content_id}")
+    if args.domains:
+        for domain_id, name, score in semantic_index.nearest_domains(text=args.domains, k=args.k):
+            print(f"{score:6.3f}  {name} (domain {domain_id})")
+    semantic_index.close()
@@ -0,0 +1,159 @@
+## SUMMARY ###########################################################################################################
+# Class: FileFilter
+# - before_download: Skip a file from its listing metadata alone (size, extension, lockfile and minified names)
+# - after_download: Sniff the first bytes (binary, "generated" markers, minified code) and truncate long files
+# - report: Files skipped or truncated per reason
+# Functions:
+# - is_binary: NUL bytes or a high share of control bytes in a sample
+# - is_generated: A code-generator marker in the head of a file
+# - is_minified: Very long lines with little whitespace
+## LIBRARIES ###########################################################################################################
+import os
+import re
+import posixpath
+from collections import Counter
+from dotenv import load_dotenv
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+MAX_FILE_BYTES = int(os.getenv("FILTER_MAX_BYTES", "1000000"))     # Larger files are skipped before download
+TRUNCATE_CHARS = int(os.getenv("FILTER_TRUNCATE_CHARS", "20000"))  # Longer files keep only their head
+SNIFF_BYTES = 8192            # Bytes inspected for binary content and minification
+HEAD_CHARS = 2048             # Characters searched for generated-code markers
+MAX_CONTROL_SHARE = 0.1       # Share of control bytes above which a sample is binary
+MINIFIED_LINE_CHARS = 1000    # Mean line length above which text is minified
+MINIFIED_WHITESPACE = 0.05    # ... when less than this share of it is whitespace
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".tif", ".tiff", ".psd", ".pdf", ".mp3", ".mp4",
+    ".wav", ".ogg", ".mov", ".avi", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".tar", ".jar", ".war",
+    ".whl", ".egg", ".exe", ".dll", ".so", ".dylib", ".o", ".a", ".class", ".pyc", ".pyo", ".woff", ".woff2",
+    ".ttf", ".otf", ".eot", ".db", ".sqlite", ".sqlite3", ".pkl", ".pickle", ".npy", ".npz", ".pt", ".pth", ".onnx",
+    ".h5", ".parquet", ".avro", ".bin",
+}
+DATA_EXTENSIONS = {".csv", ".tsv", ".jsonl", ".ndjson", ".log", ".dat", ".svg"}
+LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "pipfile.lock",
+    "pdm.lock", "uv.lock", "cargo.lock", "composer.lock", "gemfile.lock", "go.sum", "podfile.lock", "mix.lock",
+    "packages.lock.json", "flake.lock",
+}
+MINIFIED_SUFFIXES = (".min.js", ".min.css", ".min.mjs", ".bundle.js", ".chunk.js", ".map")
+GENERATED_PATTERN = re.compile(
+    r"@generated|do not edit|auto-?generated|generated by (?:the )?(?:protoc|protocol buffer|thrift|swagger|openapi)"
+    r"|code generated by|this file (?:was|is) (?:automatically )?generated",
+    re.IGNORECASE,
+)
+# Reasons recorded in skipped_files
+TOO_LARGE = "too_large"
+BINARY_EXTENSION = "binary_extension"
+DATA_FILE = "data_file"
+LOCKFILE = "lockfile"
+MINIFIED = "minified"
+BINARY = "binary"
+GENERATED = "generated"
+EMPTY = "empty"
+TRUNCATED = "truncated"
+
+## FUNCTIONS #########################################################################################################
+def is_binary(sample):
+    """
+    :param sample: First bytes of a file
+    :return: True if the sample holds a NUL byte or too many other control bytes to be text
+    """
+    if not sample:
+        return False
+    if b"\x00" in sample:
+        return True
+    control = sum(1 for byte in sample if byte < 32 and byte not in (9, 10, 12, 13))
+    return control / len(sample) > MAX_CONTROL_SHARE
+
+def is_generated(text):
+    """
+    :param text: Head of a file
+    :return: True if it carries a code-generator marker ("@generated", "DO NOT EDIT", "Code generated by ...")
+    """
+    return GENERATED_PATTERN.search(text[:HEAD_CHARS]) is not None
+
+def is_minified(text):
+    """
+    :param text: A sample of a file
+    :return: True if its lines are very long on average and almost free of whitespace
+    """
+    if len(text) < MINIFIED_LINE_CHARS:
+        return False
+    lines = text.count("\n") + 1
+    whitespace = sum(text.count(character) for character in " \t\n")
+    return len(text) / lines > MINIFIED_LINE_CHARS and whitespace / len(text) < MINIFIED_WHITESPACE
+
+## CLASSES ###########################################################################################################
+class FileFilter:
+    def __init__(self, max_bytes=MAX_FILE_BYTES, truncate_chars=TRUNCATE_CHARS, enabled=True):
+        """
+        Decides which repository files are downloaded and analyzed. Metadata checks run on the directory listing,
+        before any download; content checks sniff the downloaded bytes before they are chunked and sent for analysis.
+
+        :param max_bytes: Files larger than this are skipped without download
+        :param truncate_chars: Text longer than this keeps only its first truncate_chars characters (None: no limit)
+        :param enabled: False lets every file through unchanged
+        """
+        self.max_bytes = max_bytes
+        self.truncate_chars = truncate_chars
+        self.enabled = enabled
+        self.counts = Counter()   # reason -> files
+
+    def before_download(self, path, size=None):
+        """
+        :param path: Repository path of the file
+        :param size: Size in bytes from the listing, if known
+        :return: The reason to skip the file, or None to download it
+        """
+        if not self.enabled:
+            return None
+        name = posixpath.basename(path).lower()
+        extension = posixpath.splitext(name)[1]
+        if name in LOCKFILES:
+            reason = LOCKFILE
+        elif extension in BINARY_EXTENSIONS:
+            reason = BINARY_EXTENSION
+        elif name.endswith(MINIFIED_SUFFIXES):
+            reason = MINIFIED
+        elif extension in DATA_EXTENSIONS:
+            reason = DATA_FILE
+        elif size is not None and self.max_bytes is not None and size > self.max_bytes:
+            reason = TOO_LARGE
+        elif size == 0:
+            reason = EMPTY
+        else:
+            return None
+        self.counts[reason] += 1
+        return reason
+
+    def after_download(self, path, data):
+        """
+        :param path: Repository path of the file
+        :param data: Downloaded bytes
+        :return: (text, reason): text is None when the file is skipped for reason, and reason is TRUNCATED when only
+                 the head of the text is kept
+        """
+        if not self.enabled:
+            return data.decode("utf-8", errors="ignore"), None
+        sample = data[:SNIFF_BYTES]
+        if not data.strip():
+            reason = EMPTY
+        elif is_binary(sample):
+            reason = BINARY
+        else:
+            text = data.decode("utf-8", errors="ignore")
+            if is_generated(text):
+                reason = GENERATED
+            elif is_minified(text[:SNIFF_BYTES]):
+                reason = MINIFIED
+            elif self.truncate_chars is not None and len(text) > self.truncate_chars:
+                self.counts[TRUNCATED] += 1
+                return text[:self.truncate_chars], TRUNCATED
+            else:
+                return text, None
+        self.counts[reason] += 1
+        return None, reason
+
+    def report(self):
+        """:return: (reason, files) pairs, most frequent first"""
+        return self.counts.most_common()
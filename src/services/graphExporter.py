@@ -0,0 +1,221 @@
+## SUMMARY ###########################################################################################################
+# Class: GraphExporter
+# - connect / close: SQLite connection
+# - iter_batches: Stream node or edge rows from SQLite in fixed-size batches
+# - export_graphml: Write the repo/file/content/domain graph as GraphML, one batch at a time
+# - export_parquet: Write node and edge tables as Parquet (one row group per batch)
+# - export_arrow: Write node and edge tables as uncompressed Arrow IPC files, which can be memory-mapped
+# Functions:
+# - load_arrow: Memory-map an Arrow IPC file and return its table without copying the buffers
+## LIBRARIES ###########################################################################################################
+import os
+import argparse
+import sqlite3
+from xml.sax.saxutils import escape, quoteattr
+from dotenv import load_dotenv
+## DEV_ATLAS CLASSES ###################################################################################################
+from services.databaseController import CONTENT_DOMAIN_LINKS
+## OPTIONAL LIBRARIES ##################################################################################################
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+## CONFIGURATION #######################################################################################################
+load_dotenv()
+DB = os.getenv("DATABASE")
+EXPORT_BATCH_SIZE = 100000  # Rows held in memory at a time
+# Node keys match the visualizer's ("repo_1", "file_12", ...)
+NODE_COLUMNS = ["key", "kind", "entity_id", "label", "url", "path"]
+NODE_QUERIES = [
+    "SELECT 'repo_' || id, 'repo', id, name, url, NULL FROM repos",
+    "SELECT 'file_' || id, 'file', id, name, url, path FROM fileObjects",
+    "SELECT 'domain_' || id, 'domain', id, name, NULL, NULL FROM domains",
+    "SELECT 'content_' || id, 'content', id, 'Content ' || id, NULL, NULL FROM content"
+]
+EDGE_COLUMNS = ["source", "target", "relation", "relatedness"]
+EDGE_QUERIES = [
+    "SELECT 'repo_' || repo_id, 'file_' || id, 'contains', NULL FROM fileObjects",
+    "SELECT 'file_' || fileObject_id, 'content_' || id, 'contains', NULL FROM content",
+    f"SELECT 'domain_' || domain_id, 'content_' || content_id, 'domain', relatedness FROM ({CONTENT_DOMAIN_LINKS})"
+]
+GRAPHML_NODE_ATTRIBUTES = [("kind", "string"), ("entity_id", "long"), ("label", "string"), ("url", "string"),
+                           ("path", "string")]
+GRAPHML_EDGE_ATTRIBUTES = [("relation", "string"), ("relatedness", "int")]
+
+## FUNCTIONS #########################################################################################################
+def arrow_schemas():
+    """Arrow schemas of the node and edge tables."""
+    node_types = [pa.string(), pa.string(), pa.int64(), pa.string(), pa.string(), pa.string()]
+    edge_types = [pa.string(), pa.string(), pa.string(), pa.int32()]
+    return pa.schema(list(zip(NODE_COLUMNS, node_types))), pa.schema(list(zip(EDGE_COLUMNS, edge_types)))
+
+def load_arrow(arrow_file):
+    """
+    Memory-map an Arrow IPC file written by export_arrow. The returned table references the mapped file, so
+    millions of edges load without reading them into memory up front.
+
+    :param arrow_file: Path to a .arrow file
+    :return: A pyarrow Table
+    """
+    if pa is None:
+        print("Error: pyarrow is required to load Arrow files.")
+        return None
+    with pa.memory_map(arrow_file, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+## CLASSES ###########################################################################################################
+class GraphExporter:
+    def __init__(self, db_file, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Initialize the exporter.
+
+        :param db_file: Path to the SQLite database
+        :param batch_size: Rows fetched and written per batch
+        """
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.connection = None
+
+    def connect(self):
+        """Connect to SQLite database"""
+        try:
+            self.connection = sqlite3.connect(self.db_file)
+            print("Successfully connected to SQLite")
+        except sqlite3.Error as e:
+            print(f"Error connecting to database: {e}")
+        return self.connection
+
+    def close(self):
+        """Close the database connection"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def iter_batches(self, queries):
+        """
+        Stream the rows of each query in batches of at most batch_size rows.
+
+        :param queries: NODE_QUERIES or EDGE_QUERIES
+        :return: A generator of lists of row tuples
+        """
+        for query in queries:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(query)
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def export_graphml(self, output_file):
+        """
+        Write the graph as GraphML. Nodes and edges are written as they are read, so memory stays bounded by
+        the batch size.
+
+        :param output_file: Path to the .graphml file
+        :return: (node count, edge count)
+        """
+        node_count = edge_count = 0
+        with open(output_file, "w", encoding="utf-8") as graphml:
+            graphml.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            graphml.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+            for name, attribute_type in GRAPHML_NODE_ATTRIBUTES:
+                graphml.write(f'  <key id="{name}" for="node" attr.name="{name}" attr.type="{attribute_type}"/>\n')
+            for name, attribute_type in GRAPHML_EDGE_ATTRIBUTES:
+                graphml.write(f'  <key id="{name}" for="edge" attr.name="{name}" attr.type="{attribute_type}"/>\n')
+            graphml.write('  <graph id="DevAtlas" edgedefault="undirected">\n')
+
+            for rows in self.iter_batches(NODE_QUERIES):
+                lines = []
+                for key, *attributes in rows:
+                    lines.append(f"    <node id={quoteattr(key)}>")
+                    lines.extend(f'<data key="{name}">{escape(str(value))}</data>'
+                                 for (name, _), value in zip(GRAPHML_NODE_ATTRIBUTES, attributes) if value is not None)
+                    lines.append("</node>\n")
+                graphml.write("".join(lines))
+                node_count += len(rows)
+
+            for rows in self.iter_batches(EDGE_QUERIES):
+                lines = []
+                for source, target, *attributes in rows:
+                    lines.append(f"    <edge source={quoteattr(source)} target={quoteattr(target)}>")
+                    lines.extend(f'<data key="{name}">{escape(str(value))}</data>'
+                                 for (name, _), value in zip(GRAPHML_EDGE_ATTRIBUTES, attributes) if value is not None)
+                    lines.append("</edge>\n")
+                graphml.write("".join(lines))
+                edge_count += len(rows)
+
+            graphml.write("  </graph>\n</graphml>\n")
+        print(f"Wrote {node_count} nodes and {edge_count} edges to {output_file}")
+        return node_count, edge_count
+
+    def write_columnar(self, queries, schema, writer):
+        """Convert each batch of rows to an Arrow record batch and hand it to the writer."""
+        row_count = 0
+        for rows in self.iter_batches(queries):
+            columns = list(zip(*rows))
+            arrays = [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            row_count += len(rows)
+        return row_count
+
+    def export_parquet(self, output_dir):
+        """
+        Write nodes.parquet and edges.parquet, one row group per batch.
+
+        :param output_dir: Directory for the files
+        :return: (node count, edge count), or None without pyarrow
+        """
+        if pq is None:
+            print("Error: pyarrow is required for Parquet export.")
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        counts = []
+        for name, queries, schema in zip(("nodes", "edges"), (NODE_QUERIES, EDGE_QUERIES), arrow_schemas()):
+            with pq.ParquetWriter(os.path.join(output_dir, f"{name}.parquet"), schema) as writer:
+                counts.append(self.write_columnar(queries, schema, writer))
+        print(f"Wrote {counts[0]} nodes and {counts[1]} edges to {output_dir}")
+        return tuple(counts)
+
+    def export_arrow(self, output_dir):
+        """
+        Write nodes.arrow and edges.arrow as uncompressed Arrow IPC files, which load_arrow can memory-map.
+
+        :param output_dir: Directory for the files
+        :return: (node count, edge count), or None without pyarrow
+        """
+        if pa is None:
+            print("Error: pyarrow is required for Arrow export.")
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        counts = []
+        for name, queries, schema in zip(("nodes", "edges"), (NODE_QUERIES, EDGE_QUERIES), arrow_schemas()):
+            with pa.OSFile(os.path.join(output_dir, f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    counts.append(self.write_columnar(queries, schema, writer))
+        print(f"Wrote {counts[0]} nodes and {counts[1]} edges to {output_dir}")
+        return tuple(counts)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the repository graph from SQLite.")
+    parser.add_argument("--format", choices=["graphml", "parquet", "arrow", "all"], default="all")
+    parser.add_argument("--output-dir", default="graph_export", help="Directory for the exported files")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows per batch")
+    args = parser.parse_args()
+
+    exporter = GraphExporter(DB, batch_size=args.batch_size)
+    exporter.connect()
+    if args.format in ("graphml", "all"):
+        os.makedirs(args.output_dir, exist_ok=True)
+        exporter.export_graphml(os.path.join(args.output_dir, "graph.graphml"))
+    if args.format in ("parquet", "all"):
+        exporter.export_parquet(args.output_dir)
+    if args.format in ("arrow", "all"):
+        exporter.export_arrow(args.output_dir)
+    exporter.close()
@@ -0,0 +1,316 @@
+## SUMMARY ###########################################################################################################
+# Functions:
+# - force_directed_layout: Multilevel force-directed layout of an edge list with NumPy-vectorized forces
+# - layout_networkx: Lay out a networkx graph and return a {node: (x, y)} dictionary like nx.spring_layout
+# - coarsen: Collapse each node with a random neighbour to build the next (coarser) level
+# - refine: Run force iterations on one level (or only on movable nodes) with grid-approximated repulsion
+# - incremental_layout: Keep existing positions, place new nodes near their neighbours and refine them locally
+# - benchmark: Time the layout on a synthetic code-shaped graph
+## LIBRARIES ###########################################################################################################
+import argparse
+import time
+import numpy as np
+## CONFIGURATION #######################################################################################################
+ITERATIONS = 50              # Iterations on the coarsest level
+REFINE_ITERATIONS = 15       # Iterations on every finer level
+COARSEST_SIZE = 500          # Stop coarsening below this many nodes
+MIN_COARSENING_RATIO = 0.9   # Stop coarsening when a level shrinks by less than 10%
+NODES_PER_CELL = 8           # Target occupancy of a repulsion grid cell
+MAX_GRID_SIZE = 40           # Grid is at most MAX_GRID_SIZE x MAX_GRID_SIZE cells
+CELL_SAMPLES = 4             # Sampled same-cell neighbours per node for near-field repulsion
+LOCAL_ITERATIONS = 10        # Refinement iterations for nodes added to an existing layout
+PLACEMENT_PASSES = 10        # Passes spreading new nodes outward from already-placed neighbours
+EPSILON = 1e-9
+
+## FUNCTIONS #########################################################################################################
+def coarsen(node_count, sources, targets, weights, rng):
+    """
+    Collapse each node with a randomly chosen neighbour.
+
+    :param node_count: Number of nodes on the current level
+    :param sources: Edge source indices
+    :param targets: Edge target indices
+    :param weights: Edge weights
+    :param rng: numpy Generator
+    :return: (labels mapping each node to its coarse node, coarse node count, coarse sources, targets, weights)
+    """
+    # Treat edges as undirected and give every node one random neighbour (itself if isolated)
+    both_sources = np.concatenate([sources, targets])
+    both_targets = np.concatenate([targets, sources])
+    shuffled = rng.permutation(len(both_sources))
+    nodes, first = np.unique(both_sources[shuffled], return_index=True)
+    partner = np.arange(node_count)
+    partner[nodes] = both_targets[shuffled][first]
+
+    # Each node joins the cluster of the smaller of itself and its partner
+    _, labels = np.unique(np.minimum(np.arange(node_count), partner), return_inverse=True)
+    coarse_count = int(labels.max()) + 1 if node_count else 0
+
+    coarse_sources, coarse_targets = labels[sources], labels[targets]
+    keep = coarse_sources != coarse_targets
+    keys = coarse_sources[keep].astype(np.int64) * coarse_count + coarse_targets[keep]
+    keys, inverse = np.unique(keys, return_inverse=True)
+    coarse_weights = np.bincount(inverse, weights=weights[keep], minlength=len(keys))
+    return labels, coarse_count, keys // coarse_count, keys % coarse_count, coarse_weights
+
+def repulsion(positions, k, rng, nodes=None, far_field=True):
+    """
+    Grid-approximated repulsive displacement (Fruchterman-Reingold k^2 / d).
+    Far field: every node feels the other cells as point masses at their centroids.
+    Near field: every node feels a few randomly sampled nodes from its own cell, scaled by the cell size.
+
+    :param positions: (n, 2) positions
+    :param k: Ideal edge length
+    :param rng: numpy Generator
+    :param nodes: Optional indices of the nodes to compute forces for (all nodes still repel them)
+    :param far_field: Include the cell-centroid far field; without it only nearby nodes repel
+    :return: (len(nodes), 2) displacement, or (n, 2) when nodes is None
+    """
+    node_count = len(positions)
+    grid_size = int(np.clip(np.sqrt(node_count / NODES_PER_CELL), 1, MAX_GRID_SIZE))
+    low = positions.min(axis=0)
+    span = np.maximum(positions.max(axis=0) - low, EPSILON)
+    cell_xy = np.minimum((positions - low) / span * grid_size, grid_size - 1).astype(np.int64)
+    cells = cell_xy[:, 0] * grid_size + cell_xy[:, 1]
+
+    # Far field between occupied cells
+    _, cell_index, mass = np.unique(cells, return_inverse=True, return_counts=True)
+    centroids = np.stack([
+        np.bincount(cell_index, weights=positions[:, 0]),
+        np.bincount(cell_index, weights=positions[:, 1])
+    ], axis=1) / mass[:, None]
+    nodes = np.arange(node_count) if nodes is None else nodes
+    if far_field:
+        delta = centroids[:, None, :] - centroids[None, :, :]
+        distance2 = np.einsum("ijk,ijk->ij", delta, delta) + EPSILON
+        cell_force = np.einsum("ijk,ij->ik", delta, (k * k) * mass[None, :] / distance2)
+        displacement = cell_force[cell_index[nodes]]
+    else:
+        displacement = np.zeros((len(nodes), 2))
+
+    # Near field: sample same-cell neighbours
+    members = np.argsort(cell_index, kind="stable")
+    cell_start = np.concatenate([[0], np.cumsum(mass)[:-1]])
+    node_cells = cell_index[nodes]
+    sizes = mass[node_cells]
+    scale = (k * k) * (sizes - 1) / CELL_SAMPLES
+    for _ in range(CELL_SAMPLES):
+        partners = members[cell_start[node_cells] + (rng.random(len(nodes)) * sizes).astype(np.int64)]
+        delta = positions[nodes] - positions[partners]
+        distance2 = np.einsum("ij,ij->i", delta, delta)
+        force = np.where(partners == nodes, 0.0, scale / (distance2 + EPSILON * k))
+        displacement += delta * force[:, None]
+    return displacement
+
+def attraction(positions, sources, targets, weights, k):
+    """
+    Attractive displacement along edges (Fruchterman-Reingold d^2 / k).
+
+    :return: (n, 2) displacement
+    """
+    delta = positions[sources] - positions[targets]
+    distance = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+    pull = delta * (weights * distance / k)[:, None]
+    node_count = len(positions)
+    displacement = np.empty_like(positions)
+    for axis in range(2):
+        displacement[:, axis] = (np.bincount(targets, weights=pull[:, axis], minlength=node_count)
+                                 - np.bincount(sources, weights=pull[:, axis], minlength=node_count))
+    return displacement
+
+def refine(positions, sources, targets, weights, iterations, temperature, rng, movable=None, k=None):
+    """
+    Run force-directed iterations on one level, cooling the maximum step linearly.
+
+    :param positions: (n, 2) positions, updated in place
+    :param iterations: Number of iterations
+    :param temperature: Maximum displacement in the first iteration
+    :param movable: Optional boolean mask; only these nodes move, forces are only computed for them and only
+                    nearby nodes repel them (the fixed nodes are already balanced against the far field)
+    :param k: Ideal edge length (defaults to that of a unit square)
+    :return: positions
+    """
+    node_count = len(positions)
+    if node_count < 2:
+        return positions
+    k = k or 1.0 / np.sqrt(node_count)
+    nodes = None
+    if movable is not None:
+        nodes = np.flatnonzero(movable)
+        touching = movable[sources] | movable[targets]
+        sources, targets, weights = sources[touching], targets[touching], weights[touching]
+
+    for iteration in range(iterations):
+        step = temperature * (1.0 - iteration / iterations)
+        displacement = repulsion(positions, k, rng, nodes, far_field=nodes is None)
+        pull = attraction(positions, sources, targets, weights, k)
+        displacement += pull if nodes is None else pull[nodes]
+        length = np.sqrt(np.einsum("ij,ij->i", displacement, displacement)) + EPSILON
+        displacement *= (np.minimum(length, step) / length)[:, None]
+        if nodes is None:
+            positions += displacement
+        else:
+            positions[nodes] += displacement
+    return positions
+
+def incremental_layout(node_count, sources, targets, positions, iterations=LOCAL_ITERATIONS, seed=0):
+    """
+    Extend an existing layout to new nodes. Nodes with known positions keep them; each new node is placed at the
+    mean of its already-placed neighbours (spreading outward over a few passes) and only new nodes are refined.
+
+    :param node_count: Number of nodes (IDs 0..node_count-1)
+    :param sources: Edge source IDs
+    :param targets: Edge target IDs
+    :param positions: (node_count, 2) known positions, NaN for new nodes
+    :param iterations: Local refinement iterations
+    :param seed: Random seed
+    :return: (node_count, 2) positions in the same coordinate frame as the known ones
+    """
+    positions = np.array(positions, dtype=float).reshape(node_count, 2)
+    placed = np.isfinite(positions).all(axis=1)
+    if not placed.any():
+        return force_directed_layout(node_count, sources, targets, seed=seed)
+    new = ~placed
+    if not new.any():
+        return positions
+
+    rng = np.random.default_rng(seed)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    # Ideal edge length: taken from the existing layout's edges so new nodes match its scale
+    existing = placed[sources] & placed[targets] & (sources != targets)
+    if existing.any():
+        k = float(np.median(np.linalg.norm(positions[sources[existing]] - positions[targets[existing]], axis=1)))
+    else:
+        k = float(np.ptp(positions[placed], axis=0).max()) / np.sqrt(node_count)
+    k = k or 1.0 / np.sqrt(node_count)
+
+    both_sources = np.concatenate([sources, targets])
+    both_targets = np.concatenate([targets, sources])
+    for _ in range(PLACEMENT_PASSES):
+        usable = placed[both_targets] & ~placed[both_sources]
+        if not usable.any():
+            break
+        counts = np.bincount(both_sources[usable], minlength=node_count)
+        ready = counts > 0
+        for axis in range(2):
+            sums = np.bincount(both_sources[usable], weights=positions[both_targets[usable], axis], minlength=node_count)
+            positions[ready, axis] = sums[ready] / counts[ready]
+        positions[ready] += (rng.random((int(ready.sum()), 2)) - 0.5) * k
+        placed |= ready
+
+    # Nodes with no path to the existing layout go somewhere inside its bounding box
+    unplaced = ~placed
+    if unplaced.any():
+        low = positions[placed].min(axis=0)
+        high = positions[placed].max(axis=0)
+        positions[unplaced] = low + rng.random((int(unplaced.sum()), 2)) * (high - low)
+
+    keep = sources != targets
+    refine(positions, sources[keep], targets[keep], np.ones(int(keep.sum())), iterations, 0.5 * k, rng,
+           movable=new, k=k)
+    return positions
+
+def force_directed_layout(node_count, sources, targets, iterations=ITERATIONS, refine_iterations=REFINE_ITERATIONS,
+                          seed=0):
+    """
+    Multilevel force-directed layout. The graph is repeatedly coarsened, the coarsest level is laid out from
+    random positions, and each finer level starts from its parent's position and is refined briefly.
+
+    :param node_count: Number of nodes (IDs 0..node_count-1)
+    :param sources: Edge source IDs
+    :param targets: Edge target IDs
+    :param iterations: Iterations on the coarsest level
+    :param refine_iterations: Iterations on every finer level
+    :param seed: Random seed; the same inputs and seed give the same layout
+    :return: (node_count, 2) positions scaled to [-1, 1]
+    """
+    rng = np.random.default_rng(seed)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    keep = sources != targets
+    levels = [(node_count, sources[keep], targets[keep], np.ones(int(keep.sum())))]
+    labels_per_level = []
+
+    while levels[-1][0] > COARSEST_SIZE:
+        labels, coarse_count, coarse_sources, coarse_targets, coarse_weights = coarsen(*levels[-1], rng)
+        if coarse_count > MIN_COARSENING_RATIO * levels[-1][0]:
+            break
+        labels_per_level.append(labels)
+        levels.append((coarse_count, coarse_sources, coarse_targets, coarse_weights))
+
+    count, level_sources, level_targets, level_weights = levels[-1]
+    positions = rng.random((count, 2))
+    refine(positions, level_sources, level_targets, level_weights, iterations, 0.1, rng)
+
+    for level in range(len(levels) - 2, -1, -1):
+        count, level_sources, level_targets, level_weights = levels[level]
+        k = 1.0 / np.sqrt(count)
+        positions = positions[labels_per_level[level]] + (rng.random((count, 2)) - 0.5) * k
+        refine(positions, level_sources, level_targets, level_weights, refine_iterations, 2 * k, rng)
+
+    return normalize(positions)
+
+def normalize(positions):
+    """Center positions on the origin and scale them into [-1, 1]."""
+    if len(positions) == 0:
+        return positions
+    positions = positions - positions.mean(axis=0)
+    extent = np.abs(positions).max()
+    return positions / extent if extent > 0 else positions
+
+def layout_networkx(G, iterations=ITERATIONS, seed=0, initial_positions=None):
+    """
+    Lay out a networkx graph; a drop-in replacement for nx.spring_layout.
+
+    :param G: A networkx graph
+    :param initial_positions: Optional {node: (x, y)} from an earlier layout; those nodes keep their position
+                              and only the others are placed (see incremental_layout)
+    :return: A dictionary of node -> numpy (x, y)
+    """
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges], dtype=np.int64).reshape(-1, 2)
+    if initial_positions:
+        known = np.full((len(nodes), 2), np.nan)
+        for node, position in initial_positions.items():
+            if node in index:
+                known[index[node]] = position
+        positions = incremental_layout(len(nodes), edges[:, 0], edges[:, 1], known, seed=seed)
+    else:
+        positions = force_directed_layout(len(nodes), edges[:, 0], edges[:, 1], iterations=iterations, seed=seed)
+    return dict(zip(nodes, positions))
+
+def synthetic_code_graph(node_count, seed=0):
+    """
+    A repo-shaped test graph: a random tree (directories -> files -> classes -> functions) plus 10% cross edges.
+    """
+    rng = np.random.default_rng(seed)
+    children = np.arange(1, node_count)
+    parents = (rng.random(node_count - 1) * children).astype(np.int64)
+    extra = node_count // 10
+    sources = np.concatenate([parents, rng.integers(0, node_count, extra)])
+    targets = np.concatenate([children, rng.integers(0, node_count, extra)])
+    return sources, targets
+
+def benchmark(node_counts=(1000, 10000, 100000), seed=0):
+    """
+    Time the layout on synthetic graphs and print nodes, edges and seconds.
+    """
+    results = []
+    for node_count in node_counts:
+        sources, targets = synthetic_code_graph(node_count, seed)
+        start_time = time.perf_counter()
+        force_directed_layout(node_count, sources, targets, seed=seed)
+        elapsed = time.perf_counter() - start_time
+        results.append((node_count, len(sources), elapsed))
+        print(f"{node_count} nodes, {len(sources)} edges: {elapsed:.2f} seconds")
+    return results
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the force-directed layout.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.nodes, args.seed)
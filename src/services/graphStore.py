@@ -0,0 +1,178 @@
+## SUMMARY ###########################################################################################################
+# Class: GraphStore
+# - add_node: Intern a fully qualified name to an integer ID with its kind, parent and color
+# - add_edge: Record a directed edge between two node IDs
+# - remove_nodes: Drop nodes and their edges, renumbering the remaining nodes in order
+# - set_classification / get_classification: Architecture and business classification columns
+# - csr: Deduplicated compressed sparse row adjacency (indptr, indices)
+# - successors: Children of a node from the CSR adjacency
+# - to_networkx: Convert the whole store, or a subset of nodes, to an nx.DiGraph
+## LIBRARIES ###########################################################################################################
+from array import array
+import numpy as np
+import networkx as nx
+## CONFIGURATION #######################################################################################################
+NODE_KINDS = ["directory", "file", "class", "function"]
+KIND_COLORS = {"directory": "blue", "file": "green", "class": "purple", "function": "orange"}
+COLORS = ["blue", "green", "purple", "orange"]
+ARCHITECTURE_CLASSIFICATION = ["Front-end", "Back-end", "Database", "Infrastructure", "Other"]
+BUSINESS_FRAMEWORK = ["Sales", "Operations", "Product"]
+NO_VALUE = -1
+
+## CLASSES ###########################################################################################################
+class GraphStore:
+    def __init__(self):
+        """
+        Initialize an empty graph. Nodes are fully qualified names interned to consecutive integer IDs;
+        their attributes live in typed arrays (a few bytes per node) instead of per-node dictionaries.
+        """
+        self.ids = {}                     # qualified name -> node ID
+        self.names = []                   # node ID -> qualified name
+        self.kinds = array("b")           # index into NODE_KINDS
+        self.colors = array("b")          # index into COLORS
+        self.parents = array("i")         # parent node ID or NO_VALUE
+        self.architecture = array("b")    # index into ARCHITECTURE_CLASSIFICATION or NO_VALUE
+        self.business = array("b")        # index into BUSINESS_FRAMEWORK or NO_VALUE
+        self.edge_sources = array("i")
+        self.edge_targets = array("i")
+        self._csr = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def add_node(self, name, kind, parent=None):
+        """
+        Add a node, or return the existing ID if the qualified name is already interned.
+
+        :param name: Fully qualified name (e.g. "services/parseAST.py::DirectoryVisualizer.parse_directory")
+        :param kind: One of NODE_KINDS
+        :param parent: Parent node ID; an edge parent -> node is added as well
+        :return: The node ID
+        """
+        node_id = self.ids.get(name)
+        if node_id is not None:
+            return node_id
+
+        node_id = len(self.names)
+        self.ids[name] = node_id
+        self.names.append(name)
+        self.kinds.append(NODE_KINDS.index(kind))
+        self.colors.append(COLORS.index(KIND_COLORS[kind]))
+        self.parents.append(NO_VALUE if parent is None else parent)
+        self.architecture.append(NO_VALUE)
+        self.business.append(NO_VALUE)
+        if parent is not None:
+            self.add_edge(parent, node_id)
+        return node_id
+
+    def add_edge(self, source, target):
+        """Record a directed edge. Duplicates are removed when the CSR adjacency is built."""
+        self.edge_sources.append(source)
+        self.edge_targets.append(target)
+        self._csr = None
+
+    def remove_nodes(self, node_ids):
+        """
+        Remove nodes and every edge touching them. The remaining nodes keep their order and are renumbered
+        consecutively, so node IDs held before the call are stale; qualified names stay valid.
+
+        :param node_ids: IDs of the nodes to remove
+        """
+        removed = np.zeros(len(self.names), dtype=bool)
+        removed[list(node_ids)] = True
+        if not removed.any():
+            return
+        kept = np.flatnonzero(~removed)
+        new_ids = (np.cumsum(~removed) - 1).astype(np.int32)  # Old ID -> new ID, for kept nodes
+
+        self.names = [self.names[node_id] for node_id in kept.tolist()]
+        self.ids = {name: node_id for node_id, name in enumerate(self.names)}
+        for column in ("kinds", "colors", "architecture", "business"):
+            values = np.frombuffer(getattr(self, column), dtype=np.int8)[kept]
+            setattr(self, column, array("b", values.tobytes()))
+        parents = np.frombuffer(self.parents, dtype=np.int32)[kept]
+        orphaned = (parents == NO_VALUE) | removed[np.maximum(parents, 0)]
+        parents = np.where(orphaned, NO_VALUE, new_ids[np.maximum(parents, 0)]).astype(np.int32)
+        self.parents = array("i", parents.tobytes())
+        sources = np.frombuffer(self.edge_sources, dtype=np.int32)
+        targets = np.frombuffer(self.edge_targets, dtype=np.int32)
+        live = ~(removed[sources] | removed[targets])
+        self.edge_sources = array("i", new_ids[sources[live]].tobytes())
+        self.edge_targets = array("i", new_ids[targets[live]].tobytes())
+        self._csr = None
+
+    def kind(self, node_id):
+        return NODE_KINDS[self.kinds[node_id]]
+
+    def color(self, node_id):
+        return COLORS[self.colors[node_id]]
+
+    def label(self, node_id):
+        """Short display name: the last path or scope component of the qualified name."""
+        name = self.names[node_id]
+        short = name.rsplit("::", 1)[-1].rsplit(".", 1)[-1] if "::" in name else name.rstrip("/").rsplit("/", 1)[-1]
+        return short or name
+
+    def set_classification(self, node_id, classification):
+        """Store a {"architecture": ..., "business": ...} classification in the columns."""
+        self.architecture[node_id] = ARCHITECTURE_CLASSIFICATION.index(classification.get("architecture", "Other"))
+        self.business[node_id] = BUSINESS_FRAMEWORK.index(classification.get("business", "Product"))
+
+    def get_classification(self, node_id):
+        """Return the classification dictionary for a node, or None if it was never classified."""
+        if self.architecture[node_id] == NO_VALUE:
+            return None
+        return {
+            "architecture": ARCHITECTURE_CLASSIFICATION[self.architecture[node_id]],
+            "business": BUSINESS_FRAMEWORK[self.business[node_id]]
+        }
+
+    def csr(self):
+        """
+        Build (and cache) the deduplicated compressed sparse row adjacency.
+
+        :return: (indptr, indices) int32 arrays; the successors of node i are indices[indptr[i]:indptr[i + 1]]
+        """
+        if self._csr is None:
+            node_count = len(self.names)
+            sources = np.frombuffer(self.edge_sources, dtype=np.int32)
+            targets = np.frombuffer(self.edge_targets, dtype=np.int32)
+            keys = np.unique(sources.astype(np.int64) * max(node_count, 1) + targets)
+            unique_sources = (keys // max(node_count, 1)).astype(np.int32)
+            indices = (keys % max(node_count, 1)).astype(np.int32)
+            indptr = np.zeros(node_count + 1, dtype=np.int32)
+            np.cumsum(np.bincount(unique_sources, minlength=node_count), out=indptr[1:])
+            self._csr = (indptr, indices)
+        return self._csr
+
+    def number_of_edges(self):
+        return len(self.csr()[1])
+
+    def successors(self, node_id):
+        indptr, indices = self.csr()
+        return indices[indptr[node_id]:indptr[node_id + 1]]
+
+    def to_networkx(self, node_ids=None):
+        """
+        Convert the store (or the subgraph induced by node_ids) to an nx.DiGraph keyed by node ID,
+        with name, label, kind and color attributes.
+
+        :param node_ids: Optional iterable of node IDs to include
+        :return: An nx.DiGraph
+        """
+        indptr, indices = self.csr()
+        selected = range(len(self.names)) if node_ids is None else sorted(set(node_ids))
+        included = None if node_ids is None else set(selected)
+
+        graph = nx.DiGraph()
+        for node_id in selected:
+            graph.add_node(node_id, name=self.names[node_id], label=self.label(node_id),
+                           kind=self.kind(node_id), color=self.color(node_id))
+        for node_id in selected:
+            for target in indices[indptr[node_id]:indptr[node_id + 1]].tolist():
+                if included is None or target in included:
+                    graph.add_edge(node_id, target)
+        return graph
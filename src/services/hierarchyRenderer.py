@@ -0,0 +1,248 @@
+## SUMMARY ###########################################################################################################
+# Functions:
+# - walk_hierarchy: Iterative (explicit stack) traversal of the parsed hierarchy, yielding enter/item/exit events
+# - render_hierarchy: Feed one traversal to several output sinks in a single pass
+# - definition_lines: Write the markdown lines for one function/method entry (name, docstring, classification)
+# Classes:
+# - BufferedSink: Base output sink that batches lines and writes them in large chunks
+# - HierarchyMarkdownSink: directory_hierarchy.md
+# - ReadmeSink: README with the project structure
+# - JsonSink: The hierarchy as JSON, streamed without building the document in memory
+## LIBRARIES ###########################################################################################################
+import json
+## CONFIGURATION #######################################################################################################
+INDENT = "    "
+FLUSH_EVENTS = 4096              # Traversal events between writes of the batched lines
+BUFFER_BYTES = 1 << 20           # File buffer size
+NO_DESCRIPTION = "No description available."
+
+## FUNCTIONS #########################################################################################################
+def walk_hierarchy(hierarchy):
+    """
+    Walk a nested hierarchy dictionary depth-first in insertion order without recursion, so the stack depth stays
+    constant however deep the directory tree is.
+
+    Events are tuples:
+    - ("enter", depth, key, value): A key is reached; dictionary values are walked next at depth + 1
+    - ("item", depth, key, item): One element of a list value, after the "enter" event of its key
+    - ("exit", depth, None, None): A dictionary at this depth has been fully walked (the last one is the root)
+
+    :param hierarchy: The hierarchy dictionary (DirectoryVisualizer.hierarchy)
+    :return: A generator of events
+    """
+    stack = [(iter(hierarchy.items()), 0)]
+    while stack:
+        entries, depth = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            yield ("exit", depth, None, None)
+            continue
+
+        key, value = entry
+        yield ("enter", depth, key, value)
+        if isinstance(value, dict):
+            stack.append((iter(value.items()), depth + 1))
+        elif isinstance(value, list):
+            for item in value:
+                yield ("item", depth + 1, key, item)
+
+def render_hierarchy(hierarchy, sinks):
+    """
+    Render the hierarchy to every sink with one traversal.
+
+    :param hierarchy: The hierarchy dictionary
+    :param sinks: Output sinks (BufferedSink instances)
+    """
+    for sink in sinks:
+        sink.begin()
+    # Bound handlers per event type, looked up once instead of per event and sink
+    handlers = {"enter": [sink.enter for sink in sinks], "item": [sink.item for sink in sinks],
+                "exit": [sink.exit for sink in sinks]}
+    try:
+        for count, (event, depth, key, value) in enumerate(walk_hierarchy(hierarchy), 1):
+            for handler in handlers[event]:
+                handler(depth, key, value)
+            if count % FLUSH_EVENTS == 0:
+                for sink in sinks:
+                    sink.flush()
+    finally:
+        for sink in sinks:
+            sink.end()
+
+def classification_line(classification, indent):
+    """
+    :param classification: A {"architecture", "business"} dictionary
+    :param indent: Indentation level
+    :return: The "> Architecture: ..., Business: ..." line
+    """
+    arch = classification.get("architecture", "Other")
+    bus = classification.get("business", "Product")
+    return INDENT * indent + f"> Architecture: {arch}, Business: {bus}\n"
+
+def definition_lines(definition, indent, write):
+    """
+    Write the lines for one function/method entry: its name, then its docstring and classification one level deeper.
+
+    :param definition: {"name", "docstring", "classification"} dictionary
+    :param indent: Indentation level of the name
+    :param write: Callable taking one line
+    """
+    write(INDENT * indent + f"- {definition['name']}\n")
+    if definition.get("docstring"):
+        write(INDENT * (indent + 1) + f"> {definition['docstring'].strip()}\n")
+    if definition.get("classification"):
+        write(classification_line(definition["classification"], indent + 1))
+
+## CLASSES ###########################################################################################################
+class BufferedSink:
+    def __init__(self, output_file):
+        """
+        Base output sink. Lines are collected and written in large chunks (render_hierarchy flushes every
+        FLUSH_EVENTS events) through a large file buffer, instead of one small write per line.
+
+        :param output_file: Path of the file to write
+        """
+        self.output_file = output_file
+        self.file = None
+        self.lines = []
+        self.write = self.lines.append
+
+    def flush(self):
+        if self.lines:
+            self.file.write("".join(self.lines))
+            self.lines.clear()
+
+    def begin(self):
+        """Open the output file and write the header."""
+        self.file = open(self.output_file, "w", buffering=BUFFER_BYTES)
+        self.header()
+
+    def end(self):
+        """Write the footer and close the output file."""
+        if self.file is None:
+            return
+        try:
+            self.footer()
+            self.flush()
+        finally:
+            self.file.close()
+            self.file = None
+
+    def header(self):
+        pass
+
+    def footer(self):
+        pass
+
+    def enter(self, depth, key, value):
+        pass
+
+    def item(self, depth, key, item):
+        pass
+
+    def exit(self, depth, key=None, value=None):
+        pass
+
+class HierarchyMarkdownSink(BufferedSink):
+    """Markdown outline of every directory, file, class and function, with docstrings and classifications."""
+
+    def header(self):
+        self.write("# Application Summary\n\n")
+        self.write("This document provides an overview of the application's structure, including directories, Python files, classes, and functions.\n\n")
+
+    def enter(self, depth, key, value):
+        self.write(INDENT * depth + f"- {key}\n")
+        if isinstance(value, dict):
+            if "docstring" in value:
+                doc = value["docstring"] or NO_DESCRIPTION
+                self.write(INDENT * (depth + 1) + f"> {doc.strip()}\n")
+            if "classification" in value:
+                self.write(classification_line(value["classification"], depth + 1))
+            if "functions" in value:
+                for func in value["functions"]:
+                    definition_lines(func, depth + 1, self.write)
+
+    def item(self, depth, key, item):
+        if isinstance(item, dict):
+            definition_lines(item, depth, self.write)
+        else:
+            self.write(INDENT * depth + f"- {item}\n")
+
+class ReadmeSink(BufferedSink):
+    """README with an overview, the project structure (functions grouped under each class) and usage notes."""
+
+    def header(self):
+        self.write("# Project README\n\n")
+        self.write("## Overview\n")
+        self.write("This project provides a hierarchical overview of directories, Python files, classes, and their functions. "
+                   "It includes classifications based on architectural and business logic to aid developers in navigating the codebase.\n\n")
+        self.write("## Structure\n")
+        self.write("Below is a high-level view of the project structure:\n\n")
+
+    def enter(self, depth, key, value):
+        # Functions are listed under their owner when it is entered, not as a key of their own
+        if key == "functions":
+            return
+        self.write(INDENT * depth + f"- **{key}**\n")
+        if isinstance(value, dict):
+            if "docstring" in value:
+                doc = value["docstring"] or NO_DESCRIPTION
+                self.write(INDENT * (depth + 1) + f"> {doc.strip()}\n")
+            if "classification" in value:
+                self.write(classification_line(value["classification"], depth + 1))
+            if "functions" in value:
+                self.write(INDENT * (depth + 1) + "Functions:\n")
+                for func in value["functions"]:
+                    definition_lines(func, depth + 2, self.write)
+
+    def item(self, depth, key, item):
+        if key == "functions":
+            return
+        if isinstance(item, dict):
+            definition_lines(item, depth, self.write)
+        else:
+            self.write(INDENT * depth + f"- {item}\n")
+
+    def footer(self):
+        self.write("\n## Usage\n")
+        self.write("### CLI Example\n")
+        self.write("Run the following command to execute the visualization:\n")
+        self.write("```bash\n")
+        self.write("python visualize.py\n")
+        self.write("```\n")
+        self.write("\n### Output\n")
+        self.write("This program generates:\n")
+        self.write("- An interactive graph visualizing the directory structure.\n")
+        self.write("- A detailed markdown hierarchy (`directory_hierarchy.md`).\n")
+        self.write("- A comprehensive README file summarizing the application (`README.md`).\n\n")
+        self.write("## Contributing\n")
+        self.write("Contributions are welcome! Submit pull requests or report issues.\n\n")
+        self.write("## License\n")
+        self.write("This project is licensed under the MIT License. See the LICENSE file for details.\n")
+
+class JsonSink(BufferedSink):
+    """The hierarchy as a JSON object. Lists (functions) are small and are encoded whole; dictionaries are streamed."""
+
+    def __init__(self, output_file):
+        super().__init__(output_file)
+        self.first = []  # Per open dictionary: no member written yet
+
+    def header(self):
+        self.write("{")
+        self.first = [True]
+
+    def enter(self, depth, key, value):
+        if not self.first[-1]:
+            self.write(", ")
+        self.first[-1] = False
+        self.write(json.dumps(str(key)) + ": ")
+        if isinstance(value, dict):
+            self.write("{")
+            self.first.append(True)
+        else:
+            self.write(json.dumps(value))
+
+    def exit(self, depth, key=None, value=None):
+        self.write("}")
+        self.first.pop()
@@ -0,0 +1,268 @@
+## SUMMARY ###########################################################################################################
+# Class: InferenceBenchmark
+# - load_generator: Load (and cache) a quantized or float GPT2TokenGenerator
+# - benchmark_config: Measure one configuration, in a fresh child process unless isolation is off
+# - measure_config: Time repeated generations for a single configuration in this process, excluding warm-up runs
+# - run: Sweep prompt length, output length, batch size, thread count and quantization
+# - write_report: Write the machine-readable JSON report
+# Functions:
+# - to_mb: Bytes, or the difference of two byte counts, in megabytes
+# - _measure_in_child: Entry point of the child process that measures one configuration
+## LIBRARIES ###########################################################################################################
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import time
+import torch
+import transformers
+## CLASS IMPORTS #####################################################################################################
+from localContentAnalyzer import GPT2TokenGenerator
+from profiling import peak_rss_bytes, current_rss_bytes, percentile
+## CONFIGURATION #######################################################################################################
+PROMPT_LENGTHS = [16, 128]
+OUTPUT_LENGTHS = [16, 64]
+BATCH_SIZES = [1, 4]
+THREAD_COUNTS = sorted({1, torch.get_num_threads()})
+QUANTIZED = [True, False]
+WARMUP_RUNS = 2
+MEASURED_RUNS = 10
+SEED_TEXT = "Classify this function by architecture and business domain based on its name and docstring. "
+REPORT_FILE = "inference_benchmark.json"
+
+## FUNCTIONS #########################################################################################################
+def to_mb(after, before=0):
+    """
+    Bytes, or the difference of two byte counts, in megabytes.
+
+    Parameters:
+    - after (int): Byte count, or None when it could not be read
+    - before (int): Byte count subtracted from after, or None
+
+    Returns:
+    - megabytes (float): The value in megabytes, or None when either count is missing
+    """
+    if after is None or before is None:
+        return None
+    return (after - before) / (1024 * 1024)
+
+def _measure_in_child(settings, config):
+    """
+    Measure one configuration in a freshly spawned process, so its peak RSS covers only this configuration.
+    """
+    result = InferenceBenchmark(**settings, isolate=False).measure_config(*config)
+    result["memory_mb"]["isolated"] = True
+    return result
+
+## CLASSES ###########################################################################################################
+class InferenceBenchmark:
+    def __init__(self, model_name="gpt2", prompt_lengths=PROMPT_LENGTHS, output_lengths=OUTPUT_LENGTHS,
+                 batch_sizes=BATCH_SIZES, thread_counts=THREAD_COUNTS, quantized=QUANTIZED,
+                 warmup_runs=WARMUP_RUNS, measured_runs=MEASURED_RUNS, isolate=True):
+        """
+        Initialize the benchmark sweep.
+
+        Parameters:
+        - model_name (str): Model passed to GPT2TokenGenerator
+        - prompt_lengths (list[int]): Prompt lengths in tokens
+        - output_lengths (list[int]): Generated tokens per sequence
+        - batch_sizes (list[int]): Sequences generated per call
+        - thread_counts (list[int]): Values for torch.set_num_threads
+        - quantized (list[bool]): Whether to benchmark the int8 model, the float model, or both
+        - warmup_runs (int): Untimed runs before each configuration
+        - measured_runs (int): Timed runs per configuration
+        - isolate (bool): Measure each configuration in its own child process. ru_maxrss is a lifetime high-water
+          mark of the whole process, so without isolation process_peak only says "the largest so far"
+        """
+        self.model_name = model_name
+        self.prompt_lengths = prompt_lengths
+        self.output_lengths = output_lengths
+        self.batch_sizes = batch_sizes
+        self.thread_counts = thread_counts
+        self.quantized = quantized
+        self.warmup_runs = warmup_runs
+        self.measured_runs = measured_runs
+        self.isolate = isolate
+        self.generators = {}
+        self.results = []
+
+    def load_generator(self, quantize):
+        """
+        Load (and cache) a GPT2TokenGenerator with or without quantization.
+        """
+        if quantize not in self.generators:
+            generator = GPT2TokenGenerator(self.model_name, quantize=quantize)
+            generator.load_model_and_tokenizer()
+            self.generators[quantize] = generator
+        return self.generators[quantize]
+
+    def build_input_ids(self, generator, prompt_length, batch_size):
+        """
+        Build a (batch_size, prompt_length) tensor of prompt tokens by repeating SEED_TEXT.
+        """
+        seed_ids = generator.tokenizer.encode(SEED_TEXT)
+        repeats = prompt_length // len(seed_ids) + 1
+        prompt_ids = (seed_ids * repeats)[:prompt_length]
+        return torch.tensor([prompt_ids] * batch_size, dtype=torch.long)
+
+    def generate(self, generator, input_ids, output_length):
+        """
+        Greedily generate exactly output_length new tokens per sequence.
+        """
+        with torch.inference_mode():
+            return generator.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=output_length,
+                min_new_tokens=output_length,
+                do_sample=False,
+                pad_token_id=generator.tokenizer.eos_token_id
+            )
+
+    def benchmark_config(self, quantize, threads, prompt_length, output_length, batch_size):
+        """
+        Measure a single configuration. With isolation on, a spawned child process loads the model and runs
+        measure_config, and is discarded afterwards; otherwise measure_config runs here.
+
+        Returns:
+        - result (dict): See measure_config
+        """
+        config = (quantize, threads, prompt_length, output_length, batch_size)
+        if not self.isolate:
+            return self.measure_config(*config)
+        settings = {"model_name": self.model_name, "warmup_runs": self.warmup_runs,
+                    "measured_runs": self.measured_runs}
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            return pool.apply(_measure_in_child, (settings, config))
+
+    def measure_config(self, quantize, threads, prompt_length, output_length, batch_size):
+        """
+        Time repeated generations for a single configuration in this process.
+
+        Returns:
+        - result (dict): Configuration, latency percentiles (ms), throughput and memory_mb:
+          - load_delta: RSS growth from loading the model (0 when it was already loaded by an earlier configuration)
+          - run_delta: RSS growth from the warm-up and measured generations
+          - process_peak: ru_maxrss of the measuring process, which is this configuration's own peak only when
+            isolated is True
+        """
+        rss_before_load = current_rss_bytes()
+        generator = self.load_generator(quantize)
+        rss_after_load = current_rss_bytes()
+        torch.set_num_threads(threads)
+        input_ids = self.build_input_ids(generator, prompt_length, batch_size)
+
+        for _ in range(self.warmup_runs):
+            self.generate(generator, input_ids, output_length)
+
+        latencies = []
+        generated_tokens = 0
+        for _ in range(self.measured_runs):
+            start_time = time.perf_counter()
+            output = self.generate(generator, input_ids, output_length)
+            latencies.append(time.perf_counter() - start_time)
+            generated_tokens += (output.shape[1] - input_ids.shape[1]) * output.shape[0]
+
+        total_time = sum(latencies)
+        return {
+            "quantized": quantize,
+            "threads": threads,
+            "prompt_length": prompt_length,
+            "output_length": output_length,
+            "batch_size": batch_size,
+            "runs": self.measured_runs,
+            "latency_ms": {
+                "p50": percentile(latencies, 50) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "mean": total_time / len(latencies) * 1000
+            },
+            "tokens_per_second": generated_tokens / total_time if total_time else 0.0,
+            "sequences_per_second": self.measured_runs * batch_size / total_time if total_time else 0.0,
+            "memory_mb": {
+                "load_delta": to_mb(rss_after_load, rss_before_load),
+                "run_delta": to_mb(current_rss_bytes(), rss_after_load),
+                "process_peak": to_mb(peak_rss_bytes()),
+                "isolated": False
+            }
+        }
+
+    def run(self):
+        """
+        Run the full sweep. Without isolation, quantized models run first so that the smaller int8 rows are
+        not measured after the float model has raised the process-wide peak.
+
+        Returns:
+        - results (list[dict]): One entry per configuration
+        """
+        original_threads = torch.get_num_threads()
+        self.results = []
+        try:
+            for quantize in sorted(self.quantized, reverse=True):
+                for threads, prompt_length, output_length, batch_size in itertools.product(
+                        self.thread_counts, self.prompt_lengths, self.output_lengths, self.batch_sizes):
+                    result = self.benchmark_config(quantize, threads, prompt_length, output_length, batch_size)
+                    self.results.append(result)
+                    print(f"quantized={quantize} threads={threads} prompt={prompt_length} output={output_length} "
+                          f"batch={batch_size}: p50={result['latency_ms']['p50']:.1f}ms "
+                          f"p99={result['latency_ms']['p99']:.1f}ms {result['tokens_per_second']:.1f} tokens/s")
+        finally:
+            torch.set_num_threads(original_threads)
+        return self.results
+
+    def write_report(self, output_file=REPORT_FILE):
+        """
+        Write the environment, sweep settings and results to a JSON report.
+        """
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "cpu_count": os.cpu_count(),
+                "torch": torch.__version__,
+                "transformers": transformers.__version__,
+                "quantized_engine": torch.backends.quantized.engine
+            },
+            "settings": {
+                "model_name": self.model_name,
+                "warmup_runs": self.warmup_runs,
+                "measured_runs": self.measured_runs,
+                "isolated": self.isolate
+            },
+            "results": self.results
+        }
+        with open(output_file, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"Benchmark report written to {output_file}")
+        return report
+
+## MAIN ##############################################################################################################
+def main():
+    """
+    Run the benchmark sweep from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark GPT2TokenGenerator inference.")
+    parser.add_argument("--model", default="gpt2")
+    parser.add_argument("--prompt-lengths", type=int, nargs="+", default=PROMPT_LENGTHS)
+    parser.add_argument("--output-lengths", type=int, nargs="+", default=OUTPUT_LENGTHS)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--threads", type=int, nargs="+", default=THREAD_COUNTS)
+    parser.add_argument("--quantized", choices=["int8", "float", "both"], default="both")
+    parser.add_argument("--warmup-runs", type=int, default=WARMUP_RUNS)
+    parser.add_argument("--runs", type=int, default=MEASURED_RUNS)
+    parser.add_argument("--output", default=REPORT_FILE)
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="Measure every configuration in this process (faster; process_peak is then cumulative)")
+    args = parser.parse_args()
+
+    quantized = {"int8": [True], "float": [False], "both": QUANTIZED}[args.quantized]
+    benchmark = InferenceBenchmark(args.model, args.prompt_lengths, args.output_lengths, args.batch_sizes,
+                                   args.threads, quantized, args.warmup_runs, args.runs, not args.no_isolate)
+    benchmark.run()
+    benchmark.write_report(args.output)
+
+if __name__ == "__main__":
+    main()
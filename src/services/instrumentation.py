@@ -0,0 +1,300 @@
+## SUMMARY ###########################################################################################################
+# Class: Metrics
+# - span: Context manager timing one occurrence of a pipeline stage (GitHub fetch, chunking, LLM call, ...)
+# - count: Add to a labelled counter (files scraped, chunks, LLM errors, ...)
+# - report: Run report with counters and per-stage count/total/mean/max/histogram
+# - write_json / write_prometheus: Export the report as JSON or as a Prometheus textfile (node_exporter collector)
+# Functions:
+# - span / timed / count: Shortcuts bound to the process-wide METRICS
+# - write_reports: Write the report files named by METRICS_JSON / METRICS_PROM, if set
+# - get_logger: Leveled "devatlas.<name>" logger for per-row messages
+# - configure_logging / stop_logging: Send log records through a queue to a background writer thread
+## LIBRARIES ###########################################################################################################
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from functools import wraps
+## CONFIGURATION #######################################################################################################
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# METRICS_JSON, METRICS_PROM (report paths) and LOG_LEVEL are read when used, after the callers' load_dotenv
+DEFAULT_LOG_LEVEL = "INFO"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+METRIC_PREFIX = "devatlas"
+# Histogram bucket upper bounds in seconds, from fast DB writes to slow LLM calls
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+## CLASSES ###########################################################################################################
+class Span:
+    """Times one occurrence of a stage. Created by Metrics.span; records itself when the block exits."""
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe(self.key, time.perf_counter() - self.start)
+        return False
+
+class NullSpan:
+    """Span used when metrics are disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Metrics:
+    def __init__(self, enabled=True):
+        """
+        Thread-safe store of counters and stage timings. Series are keyed by name and sorted label pairs.
+
+        :param enabled: When False, span returns a shared no-op span and count does nothing
+        """
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}  # (name, labels) -> value
+        self.stages = {}    # (stage, labels) -> [count, total seconds, max seconds, bucket counts...]
+
+    def reset(self):
+        """Drop every recorded counter and timing and restart the run clock."""
+        with self.lock:
+            self.counters.clear()
+            self.stages.clear()
+            self.started = time.time()
+
+    def span(self, stage, **labels):
+        """
+        :param stage: Stage name, e.g. "llm_call"
+        :param labels: Extra labels, e.g. model="gpt-3.5-turbo"
+        :return: A context manager that records the time spent in its block
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, (stage, tuple(sorted(labels.items()))))
+
+    def observe(self, key, seconds):
+        """
+        Record one timing.
+
+        :param key: (stage, labels) series key
+        :param seconds: Duration
+        """
+        with self.lock:
+            stats = self.stages.get(key)
+            if stats is None:
+                stats = self.stages[key] = [0, 0.0, 0.0] + [0] * len(BUCKETS)
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    stats[3 + i] += 1
+                    break
+
+    def count(self, name, value=1, **labels):
+        """
+        :param name: Counter name, e.g. "chunks"
+        :param value: Amount to add
+        :param labels: Extra labels, e.g. status="error"
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self):
+        """
+        :return: The run report: start time, duration, counters and per-stage timing statistics. Histogram buckets
+            are cumulative, as in Prometheus.
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            stages = sorted((key, list(stats)) for key, stats in self.stages.items())
+        report = {
+            "started": self.started,
+            "duration_seconds": time.time() - self.started,
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in counters],
+            "stages": [],
+        }
+        for (stage, labels), stats in stages:
+            count, total, maximum = stats[:3]
+            cumulative, buckets = 0, {}
+            for bound, bucket_count in zip(BUCKETS, stats[3:]):
+                cumulative += bucket_count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = count
+            report["stages"].append({
+                "stage": stage, "labels": dict(labels), "count": count, "total_seconds": total,
+                "mean_seconds": total / count, "max_seconds": maximum, "buckets": buckets,
+            })
+        return report
+
+    def prometheus(self):
+        """
+        :return: The report in the Prometheus text exposition format. Counters become <prefix>_<name>_total and
+            stage timings one <prefix>_stage_seconds histogram with a stage label.
+        """
+        report = self.report()
+        lines = []
+        seen = set()
+        for counter in report["counters"]:
+            metric = f"{METRIC_PREFIX}_{counter['name']}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{format_labels(counter['labels'])} {counter['value']}")
+
+        metric = f"{METRIC_PREFIX}_stage_seconds"
+        if report["stages"]:
+            lines.append(f"# HELP {metric} Time spent in each pipeline stage")
+            lines.append(f"# TYPE {metric} histogram")
+        for stage in report["stages"]:
+            labels = {"stage": stage["stage"], **stage["labels"]}
+            for bound, value in stage["buckets"].items():
+                lines.append(f"{metric}_bucket{format_labels({**labels, 'le': bound})} {value}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {stage['total_seconds']:.6f}")
+            lines.append(f"{metric}_count{format_labels(labels)} {stage['count']}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_duration_seconds {report['duration_seconds']:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, output_file):
+        """
+        :param output_file: Path of the JSON run report
+        """
+        write_atomically(output_file, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, output_file):
+        """
+        :param output_file: Path of the textfile (node_exporter reads *.prom files from its textfile directory)
+        """
+        write_atomically(output_file, self.prometheus())
+
+METRICS = Metrics(enabled=METRICS_ENABLED)
+
+## FUNCTIONS #########################################################################################################
+def format_labels(labels):
+    """
+    :param labels: Label dictionary
+    :return: '{key="value",...}' with escaped values, or "" when there are no labels
+    """
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+def write_atomically(output_file, text):
+    """
+    Write to a temporary file and rename it over the target, so a scraper never reads a half-written file.
+
+    :param output_file: Target path
+    :param text: File contents
+    """
+    temporary_file = f"{output_file}.tmp"
+    with open(temporary_file, "w") as file:
+        file.write(text)
+    os.replace(temporary_file, output_file)
+
+def span(stage, **labels):
+    """Time a block as one occurrence of a stage in the process-wide metrics (see Metrics.span)."""
+    return METRICS.span(stage, **labels)
+
+def count(name, value=1, **labels):
+    """Add to a counter in the process-wide metrics (see Metrics.count)."""
+    METRICS.count(name, value, **labels)
+
+def timed(stage, **labels):
+    """
+    Decorator timing every call of a function as one occurrence of a stage.
+
+    :param stage: Stage name
+    :param labels: Extra labels
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with METRICS.span(stage, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_reports(json_file=None, prometheus_file=None):
+    """
+    Write the run report files.
+
+    :param json_file: JSON report path (default: $METRICS_JSON)
+    :param prometheus_file: Prometheus textfile path (default: $METRICS_PROM)
+    """
+    json_file = json_file or os.getenv("METRICS_JSON")
+    prometheus_file = prometheus_file or os.getenv("METRICS_PROM")
+    if json_file:
+        METRICS.write_json(json_file)
+    if prometheus_file:
+        METRICS.write_prometheus(prometheus_file)
+
+def get_logger(name):
+    """
+    Per-row messages use the returned logger with lazy %-style arguments, so a disabled level costs one cached level
+    check and no formatting.
+
+    :param name: Component name, e.g. "repoScraper"
+    :return: The "devatlas.<name>" logger
+    """
+    return logging.getLogger(f"{METRIC_PREFIX}.{name}")
+
+_listener = None
+
+def configure_logging(level=None, stream=None):
+    """
+    Route every devatlas logger through a queue: callers only enqueue the record, and a background thread formats
+    and writes it, so slow terminals do not stall the pipeline.
+
+    :param level: Level name or number (default: $LOG_LEVEL, else INFO)
+    :param stream: Output stream of the writer thread (default: stderr)
+    :return: The QueueListener (stopped by stop_logging, also at exit)
+    """
+    global _listener
+    stop_logging()
+    logger = logging.getLogger(METRIC_PREFIX)
+    level = level or os.getenv("LOG_LEVEL") or DEFAULT_LOG_LEVEL
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Write the queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
@@ -0,0 +1,600 @@
+## SUMMARY ###########################################################################################################
+# Class: RepoShape
+# - files_for: Deterministic synthetic repository (directory depth and fan-out, file sizes, duplicated files,
+#   .gitignore, and optionally binary, lockfile, minified, generated, data and oversized files)
+# Class: FakeServer
+# - Local HTTP stand-in with injected latency, rate-limit responses and server errors; records every request
+# Class: FakeGitHub
+# - GitHub REST stand-in: repository, contents (directories and files), git trees and blobs
+# Class: FakeChatCompletions
+# - Chat-completions stand-in answering single and packed analysis prompts in the layout the analyzer parses
+# Class: LoadTest
+# - run: Scrape -> analyze -> store with RepoScraper.run against the stand-ins; throughput and tail latency per pass
+# Functions:
+# - latency_summary: Count, statuses and p50/p95/p99/max of recorded requests
+## LIBRARIES ###########################################################################################################
+import os
+import re
+import json
+import math
+import time
+import zlib
+import base64
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+import posixpath
+from urllib.parse import urlsplit, parse_qs, unquote, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+## DEV_ATLAS CLASSES #####################################################################################################
+from services.databaseController import Database
+from services.repoScraper import RepoScraper
+from services.analysisBackends import OpenAIBackend
+from services.fileFilter import FileFilter
+from services.instrumentation import METRICS
+from services.profiling import percentile
+## CONFIGURATION #######################################################################################################
+REPORT_FILE = "load_test.json"
+LLM_MODEL = "gpt-3.5-turbo"   # Priced like the real default, so cost budgets behave as in production
+CHARS_PER_TOKEN = 4
+REPORTED_COUNTERS = ("repo_errors", "llm_calls", "packed_requests", "packed_items_missing", "domains_deduplicated",
+                     "files_ignored", "files_filtered")
+DOMAINS = ["Billing", "Authentication", "User Accounts", "Reporting", "Notifications", "Search", "Data Export",
+           "Scheduling", "Inventory", "Payments"]
+NEW_DOMAINS = ["Auditing", "audit log", "**Auditing**", "Caching", "Feature Flags", "feature flag"]
+WORDS = ["billing", "invoice", "auth", "token", "user", "account", "report", "notify", "email", "search", "index",
+         "export", "schedule", "job", "inventory", "stock", "payment", "card", "cache", "audit", "flag", "session"]
+
+## FUNCTIONS #########################################################################################################
+def latency_summary(records):
+    """
+    :param records: (kind, status, seconds) requests recorded by a FakeServer
+    :return: Per kind, and for "all" kinds: request count, count per status, and p50/p95/p99/max latency in
+             milliseconds
+    """
+    summary = {}
+    kinds = sorted({record[0] for record in records})
+    if len(kinds) > 1:
+        records = records + [("all",) + tuple(record[1:]) for record in records]
+        kinds.append("all")
+    for kind in kinds:
+        seconds = [record[2] for record in records if record[0] == kind]
+        statuses = {}
+        for record in records:
+            if record[0] == kind:
+                statuses[str(record[1])] = statuses.get(str(record[1]), 0) + 1
+        summary[kind] = {"requests": len(seconds), "statuses": statuses}
+        for name, pct in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99), ("max_ms", 100)):
+            summary[kind][name] = round(percentile(seconds, pct) * 1000, 2)
+    return summary
+
+## CLASSES ###########################################################################################################
+class RepoShape:
+    def __init__(self, files=20, depth=2, fan_out=2, file_chars=1500, duplicate_share=0.1, ignored_files=2,
+                 noise=False):
+        """
+        Shape of a synthetic repository.
+
+        :param files: Number of source files
+        :param depth: Directory levels below the root
+        :param fan_out: Subdirectories per directory
+        :param file_chars: Mean file size in characters (sizes vary between half and one and a half times this)
+        :param duplicate_share: Share of files that copy an earlier file (vendored or copied code hits the chunk cache)
+        :param ignored_files: Files under build/, which the generated .gitignore excludes
+        :param noise: Add files a real repository carries but analysis should not: an image, a lockfile, a minified
+                      bundle, generated code, a data file, a file over the size limit and one long enough to truncate
+        """
+        self.files = files
+        self.depth = depth
+        self.fan_out = fan_out
+        self.file_chars = file_chars
+        self.duplicate_share = duplicate_share
+        self.ignored_files = ignored_files
+        self.noise = noise
+
+    def directories(self):
+        """:return: Directory paths, the root ("") first"""
+        paths, level = [""], [""]
+        for _ in range(self.depth):
+            level = [posixpath.join(parent, f"pkg{index}") for parent in level for index in range(self.fan_out)]
+            paths += level
+        return paths
+
+    def files_for(self, seed):
+        """
+        :param seed: Seed of the repository; the same seed gives the same files
+        :return: A dictionary of path -> text (bytes for binary files)
+        """
+        rng = random.Random(seed)
+        directories = self.directories()
+        files = {".gitignore": "build/\n*.log\n"}
+        written = []
+        for index in range(self.files):
+            path = posixpath.join(directories[index % len(directories)], f"module_{index}.py")
+            if written and rng.random() < self.duplicate_share:
+                files[path] = files[rng.choice(written)]
+            else:
+                files[path] = self.source(rng, rng.randint(self.file_chars // 2, self.file_chars * 3 // 2))
+            written.append(path)
+        for index in range(self.ignored_files):
+            files[f"build/generated_{index}.py"] = self.source(rng, self.file_chars)
+        if self.noise:
+            files["assets/logo.png"] = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + rng.randbytes(4000)
+            files["package-lock.json"] = '{"lockfileVersion": 3, "packages": {}}\n' * 200
+            files["static/app.min.js"] = "var a=function(b){return b+1};" * 400
+            files["proto/service_pb2.py"] = "# Generated by the protocol buffer compiler.  DO NOT EDIT!\n" + \
+                self.source(rng, self.file_chars)
+            files["fixtures/records.csv"] = "id,name,amount\n" + "".join(f"{n},user{n},{n * 3}\n" for n in range(500))
+            files["fixtures/dump.sql"] = "INSERT INTO t VALUES (1);\n" * 50000
+            files["vendor/long_module.py"] = self.source(rng, 60000)
+        return files
+
+    def source(self, rng, size):
+        """:return: Python-like text of about size characters, with identifiers from WORDS"""
+        parts = []
+        length = 0
+        while length < size:
+            first, second = rng.choice(WORDS), rng.choice(WORDS)
+            function = (f"def {first}_{second}(value):\n"
+                        f"    \"\"\"Handle the {first} {second} of a request ({rng.randint(0, 10 ** 6)}).\"\"\"\n"
+                        f"    {second}Result = process_{first}(value)\n"
+                        f"    return {second}Result\n\n")
+            parts.append(function)
+            length += len(function)
+        return "".join(parts)[:size]
+
+SHAPES = {
+    "small": RepoShape(files=20, depth=2, fan_out=2, file_chars=1500),
+    "wide": RepoShape(files=200, depth=1, fan_out=20, file_chars=1000),
+    "deep": RepoShape(files=60, depth=6, fan_out=2, file_chars=1000),
+    "large-files": RepoShape(files=20, depth=1, fan_out=2, file_chars=20000),
+    "duplicated": RepoShape(files=100, depth=2, fan_out=3, file_chars=1500, duplicate_share=0.6),
+    "noisy": RepoShape(files=30, depth=2, fan_out=2, file_chars=1500, noise=True),
+}
+
+class FakeServer:
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=0.0, error_rate=0.0, retry_after=0.0, seed=0):
+        """
+        Local HTTP server with injected faults. Each request waits a log-normal latency (median latency, shape
+        jitter), then fails with a rate-limit response (probability rate_limit) or a 500 (probability error_rate).
+
+        :param latency: Median added latency in seconds
+        :param jitter: Log-normal shape of the latency (0: always the median; 1: long tail)
+        :param rate_limit: Share of requests answered with a rate-limit response
+        :param error_rate: Share of requests answered with a 500 error
+        :param retry_after: Seconds the rate-limit responses ask clients to wait
+        :param seed: Seed of the latency and fault draws
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.records = []   # (kind, status, seconds)
+        self.server = None
+        self.url = None
+
+    def start(self):
+        """Serve on a free local port in a background thread."""
+        handler = type("Handler", (FakeRequestHandler,), {"fake": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def draw(self):
+        """:return: (latency in seconds, None or "rate_limit" or "error") for the next request"""
+        with self.lock:
+            latency = self.rng.lognormvariate(math.log(self.latency), self.jitter) if self.latency > 0 else 0.0
+            roll = self.rng.random()
+        if roll < self.rate_limit:
+            return latency, "rate_limit"
+        if roll < self.rate_limit + self.error_rate:
+            return latency, "error"
+        return latency, None
+
+    def record(self, kind, status, seconds):
+        with self.lock:
+            self.records.append((kind, status, seconds))
+
+    def reset(self):
+        with self.lock:
+            self.records = []
+
+    def rate_limited(self):
+        """:return: (status, document, headers) of a rate-limit response"""
+        return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, \
+            {"Retry-After": str(round(self.retry_after)), "retry-after-ms": str(round(self.retry_after * 1000))}
+
+    def handle(self, method, path, query, body):
+        """:return: (kind, status, JSON document, headers) for a request"""
+        raise NotImplementedError
+
+    def extra_latency(self, kind, status, document):
+        """:return: Seconds added to the drawn latency for a response (e.g. per generated token)"""
+        return 0.0
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"   # Keep-alive, as with the real services
+    disable_nagle_algorithm = True  # Headers and body are separate writes; Nagle would hold the body for an ACK
+
+    def do_GET(self):
+        self.serve("GET")
+
+    def do_POST(self):
+        self.serve("POST")
+
+    def serve(self, method):
+        started = time.perf_counter()
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        latency, fault = self.fake.draw()
+        if fault == "rate_limit":
+            kind, (status, document, headers) = "rate_limited", self.fake.rate_limited()
+        elif fault == "error":
+            kind, status, document, headers = "error", 500, {"message": "Injected server error"}, {}
+        else:
+            kind, status, document, headers = self.fake.handle(method, unquote(parts.path), parse_qs(parts.query), body)
+            latency += self.fake.extra_latency(kind, status, document)
+        time.sleep(latency)
+        data = json.dumps(document).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.fake.record(kind, status, time.perf_counter() - started)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGitHub(FakeServer):
+    def __init__(self, repos, **faults):
+        """
+        GitHub REST stand-in for the endpoints PyGithub calls while scraping.
+
+        :param repos: A dictionary of "owner/name" -> {path: text}
+        :param faults: FakeServer latency and fault options
+        """
+        super().__init__(**faults)
+        self.repos = repos
+        self.children = {}   # (repo, directory) -> sorted child paths
+        for full_name, files in repos.items():
+            for path in files:
+                parent, child = posixpath.dirname(path), path
+                while True:
+                    self.children.setdefault((full_name, parent), set()).add(child)
+                    if not parent:
+                        break
+                    parent, child = posixpath.dirname(parent), parent
+        self.children = {key: sorted(paths) for key, paths in self.children.items()}
+
+    def rate_limited(self):
+        # GitHub signals secondary rate limits with a 403 and Retry-After (whole seconds)
+        return 403, {"message": "You have exceeded a secondary rate limit."}, \
+            {"Retry-After": str(round(self.retry_after))}
+
+    def raw(self, full_name, path):
+        """:return: The bytes of a file"""
+        data = self.repos[full_name][path]
+        return data if isinstance(data, bytes) else data.encode("utf-8")
+
+    def repo_document(self, full_name):
+        owner, name = full_name.split("/")
+        return {"id": zlib.crc32(full_name.encode()), "name": name, "full_name": full_name,
+                "owner": {"login": owner}, "url": f"{self.url}/repos/{full_name}",
+                "html_url": f"https://github.com/{full_name}", "default_branch": "main", "private": False}
+
+    def entry(self, full_name, path):
+        files = self.repos[full_name]
+        is_file = path in files
+        entry = {"type": "file" if is_file else "dir", "name": posixpath.basename(path), "path": path,
+                 "sha": f"{zlib.crc32(f'{full_name}:{path}'.encode()):040x}",
+                 "size": len(self.raw(full_name, path)) if is_file else 0,
+                 "url": f"{self.url}/repos/{full_name}/contents/{quote(path)}?ref=main",
+                 "html_url": f"https://github.com/{full_name}/{'blob' if is_file else 'tree'}/main/{path}",
+                 "git_url": f"{self.url}/repos/{full_name}/git/{'blobs' if is_file else 'trees'}/main",
+                 "download_url": None}
+        return entry
+
+    def handle(self, method, path, query, body):
+        match = re.match(r"^/repos/([^/]+/[^/]+)(?:/(contents|git/trees|git/blobs)(?:/(.*))?)?$", path)
+        if method != "GET" or not match or match.group(1) not in self.repos:
+            return "not_found", 404, {"message": "Not Found"}, {}
+        full_name, endpoint, rest = match.group(1), match.group(2), (match.group(3) or "").strip("/")
+        files = self.repos[full_name]
+        if endpoint is None:
+            return "repo", 200, self.repo_document(full_name), {}
+        if endpoint == "contents":
+            if rest in files:
+                document = self.entry(full_name, rest)
+                document["content"] = base64.b64encode(self.raw(full_name, rest)).decode("ascii")
+                document["encoding"] = "base64"
+                return "file", 200, document, {}
+            if (full_name, rest) in self.children:
+                return "directory", 200, [self.entry(full_name, child) for child in self.children[(full_name, rest)]], {}
+            return "not_found", 404, {"message": "Not Found"}, {}
+        if endpoint == "git/trees":
+            recursive = "recursive" in query
+            paths = sorted(files) if recursive else self.children.get((full_name, ""), [])
+            tree = []
+            for child in (sorted({posixpath.dirname(p) for p in files} - {""} | set(paths)) if recursive else paths):
+                entry = self.entry(full_name, child)
+                tree.append({"path": child, "mode": "100644" if entry["type"] == "file" else "040000",
+                             "type": "blob" if entry["type"] == "file" else "tree", "sha": entry["sha"],
+                             "size": entry["size"] if entry["type"] == "file" else None,
+                             "url": f"{self.url}/repos/{full_name}/git/blobs/{quote(child)}"})
+            return "tree", 200, {"sha": "main", "url": f"{self.url}/repos/{full_name}/git/trees/main",
+                                 "tree": tree, "truncated": False}, {}
+        if rest in files:
+            data = self.raw(full_name, rest)
+            return "blob", 200, {"sha": rest, "size": len(data), "encoding": "base64",
+                                 "content": base64.b64encode(data).decode("ascii")}, {}
+        return "not_found", 404, {"message": "Not Found"}, {}
+
+
+class FakeChatCompletions(FakeServer):
+    def __init__(self, token_latency=0.0, new_domain_rate=0.1, **faults):
+        """
+        Chat-completions stand-in. Answers are deterministic for a given content: up to three of the offered domains
+        (preferring those named in the content) with percentages, and sometimes a suggested new domain.
+
+        :param token_latency: Seconds added per completion token, as generation time grows with the answer
+        :param new_domain_rate: Share of answers that suggest a new domain (near-duplicate spellings included)
+        :param faults: FakeServer latency and fault options
+        """
+        super().__init__(**faults)
+        self.token_latency = token_latency
+        self.new_domain_rate = new_domain_rate
+
+    def extra_latency(self, kind, status, document):
+        if status != 200:
+            return 0.0
+        return self.token_latency * document["usage"]["completion_tokens"]
+
+    def judge(self, content, domains):
+        """:return: (summary, {domain name: percentage}, new domain or None) for a content"""
+        rng = random.Random(zlib.crc32(content.encode("utf-8")))
+        lowered = content.lower()
+        named = [domain for domain in domains if domain.split()[0].lower().rstrip("s") in lowered]
+        chosen = (named + [domain for domain in domains if domain not in named])[:rng.randint(1, 3)]
+        percentages = {domain: max(10, 90 - 25 * rank + rng.randint(-5, 5)) for rank, domain in enumerate(chosen)}
+        new_domain = rng.choice(NEW_DOMAINS) if rng.random() < self.new_domain_rate else None
+        summary = f"Defines {content.count('def ')} functions over {len(content)} characters."
+        return summary, percentages, new_domain
+
+    def handle(self, method, path, query, body):
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return "not_found", 404, {"error": {"message": "Not Found"}}, {}
+        prompt = body["messages"][-1]["content"]
+        section = re.search(r"existing domains if applicable:\n(.*?)\n\s*3\.", prompt, re.DOTALL)
+        domains = re.findall(r"^\s*- (.+?)\s*$", section.group(1), re.MULTILINE) if section else []
+        items = re.findall(r"<<<ITEM (\S+)>>>\n(.*?)\n<<<END \1>>>", prompt, re.DOTALL)
+        if items:
+            kind, results = "completion_packed", []
+            for item_id, content in items:
+                summary, percentages, new_domain = self.judge(content, domains)
+                results.append({"id": item_id, "summary": summary, "domains": percentages, "new_domain": new_domain})
+            text = json.dumps({"results": results})
+        else:
+            kind = "completion"
+            content = prompt.split("Content:", 1)[-1].strip()
+            summary, percentages, new_domain = self.judge(content, domains)
+            text = f"Summarize the content:\n{summary}\n\n" + "".join(
+                f"{domain}: {percentage}%\n" for domain, percentage in percentages.items())
+            if new_domain:
+                text += f"suggest a new domain: {new_domain}\n"
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // CHARS_PER_TOKEN
+        completion_tokens = len(text) // CHARS_PER_TOKEN
+        finish_reason = "stop"
+        max_tokens = body.get("max_tokens")
+        if max_tokens and completion_tokens > max_tokens:
+            text, completion_tokens, finish_reason = text[:max_tokens * CHARS_PER_TOKEN], max_tokens, "length"
+        return kind, 200, {
+            "id": f"chatcmpl-{zlib.crc32(prompt.encode('utf-8')):08x}", "object": "chat.completion",
+            "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": finish_reason,
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }, {}
+
+
+class LoadTest:
+    def __init__(self, shape, repos=1, github=None, llm=None, concurrency=1, batch_size=1, pack_items=1,
+                 token_budget=None, budget_policy="stop", github_throttle=0.0, seed=0, db_file=None, filter_files=True):
+        """
+        End-to-end run of RepoScraper against local stand-ins, with nothing sent to GitHub or OpenAI.
+
+        :param shape: RepoShape of every repository
+        :param repos: Number of repositories
+        :param github: FakeGitHub latency and fault options
+        :param llm: FakeChatCompletions options
+        :param concurrency: Analysis requests in flight
+        :param batch_size: Analysis requests dispatched together
+        :param pack_items: Chunks per analysis request
+        :param token_budget: Token budget of each pass
+        :param budget_policy: "stop" or "degrade"
+        :param github_throttle: PyGithub's pause between requests in seconds (its default is 0.25)
+        :param seed: Seed of the repositories and of the injected faults
+        :param db_file: Database to write (default: a temporary file); passes share it, so later passes hit the cache
+        :param filter_files: False analyzes every file, to measure what the file filter saves
+        """
+        self.shape = shape
+        self.repo_files = {f"loadtest/repo{index}": shape.files_for(seed + index) for index in range(repos)}
+        self.github = FakeGitHub(self.repo_files, seed=seed, **(github or {}))
+        self.llm = FakeChatCompletions(seed=seed, **(llm or {}))
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.pack_items = pack_items
+        self.token_budget = token_budget
+        self.budget_policy = budget_policy
+        self.github_throttle = github_throttle
+        self.filter_files = filter_files
+        self.directory = None
+        if db_file is None:
+            self.directory = tempfile.TemporaryDirectory()
+            db_file = os.path.join(self.directory.name, "load_test.db")
+        self.db_file = db_file
+
+    def prepare_database(self):
+        """Create the tables and the starting domains."""
+        database = Database(self.db_file)
+        database.connect()
+        database.create_tables()
+        database.cursor.executemany("INSERT OR IGNORE INTO domains (name) VALUES (?)", [(name,) for name in DOMAINS])
+        database.connection.commit()
+        database.disconnect()
+
+    def scrape(self):
+        """:return: (seconds, run ID, files stored) of one RepoScraper.run"""
+        from github import Auth, Github
+        backend = OpenAIBackend(LLM_MODEL, api_key="load-test", base_url=f"{self.llm.url}/v1",
+                                concurrency=self.concurrency)
+        scraper = RepoScraper(self.db_file, "load-test", token_budget=self.token_budget,
+                              budget_policy=self.budget_policy, pack_items=self.pack_items, backend=backend,
+                              batch_size=self.batch_size, github_url=self.github.url,
+                              file_filter=FileFilter(enabled=self.filter_files))
+        scraper.github = Github(auth=Auth.Token("load-test"), base_url=self.github.url,
+                                seconds_between_requests=self.github_throttle)
+        scraper.repo_list = list(self.repo_files)
+        connection = sqlite3.connect(self.db_file)
+        files_before = connection.execute("SELECT COUNT(*) FROM fileObjects").fetchone()[0]
+        started = time.perf_counter()
+        try:
+            scraper.run()
+        finally:
+            backend.close()
+        seconds = time.perf_counter() - started
+        files = connection.execute("SELECT COUNT(*) FROM fileObjects").fetchone()[0] - files_before
+        connection.close()
+        return seconds, scraper.ledger.run_id if scraper.ledger else None, files
+
+    def run(self, passes=1):
+        """
+        :param passes: Scrapes of the same repositories; the second and later ones reuse the analyses stored by the
+                       first (chunk cache)
+        :return: The report: configuration and, per pass, throughput, chunk outcomes, tokens, and request latencies
+                 seen by each stand-in
+        """
+        self.prepare_database()
+        self.github.start()
+        self.llm.start()
+        report = {"configuration": {
+            "shape": vars(self.shape), "repos": len(self.repo_files), "concurrency": self.concurrency,
+            "batch_size": self.batch_size, "pack_items": self.pack_items, "token_budget": self.token_budget,
+            "github": {name: getattr(self.github, name) for name in ("latency", "jitter", "rate_limit", "error_rate")},
+            "llm": {name: getattr(self.llm, name) for name in ("latency", "jitter", "rate_limit", "error_rate",
+                                                              "token_latency")},
+            "github_throttle": self.github_throttle, "filter_files": self.filter_files}, "passes": []}
+        try:
+            for number in range(1, passes + 1):
+                self.github.reset()
+                self.llm.reset()
+                METRICS.reset()
+                seconds, run_id, files = self.scrape()
+                report["passes"].append(self.pass_report(number, seconds, run_id, files))
+        finally:
+            self.github.stop()
+            self.llm.stop()
+        return report
+
+    def pass_report(self, number, seconds, run_id, files):
+        """:return: The report of one pass"""
+        connection = sqlite3.connect(self.db_file)
+        row = connection.execute(
+            "SELECT status, llm_calls, prompt_tokens, completion_tokens, cost, chunks_analyzed, chunks_cached, "
+            "chunks_skipped, chunks_failed FROM analysis_runs WHERE id = ?", (run_id,)
+        ).fetchone() or (None, 0, 0, 0, 0.0, 0, 0, 0, 0)
+        connection.close()
+        status, calls, prompt_tokens, completion_tokens, cost, analyzed, cached, skipped, failed = row
+        chunks = analyzed + cached + skipped + failed
+        counters = {}
+        for counter in METRICS.report()["counters"]:
+            if counter["name"] in REPORTED_COUNTERS:
+                labels = ",".join(f"{name}={value}" for name, value in sorted(counter["labels"].items()) if name != "model")
+                key = f"{counter['name']}{{{labels}}}" if labels else counter["name"]
+                counters[key] = counters.get(key, 0) + counter["value"]
+        return {
+            "pass": number, "run_status": status, "seconds": round(seconds, 3), "files": files, "chunks": chunks,
+            "files_per_second": round(files / seconds, 2) if seconds else None,
+            "chunks_per_second": round(chunks / seconds, 2) if seconds else None,
+            "chunks_analyzed": analyzed, "chunks_cached": cached, "chunks_skipped": skipped, "chunks_failed": failed,
+            "llm_calls": calls, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "cost": cost, "counters": counters,
+            "github": latency_summary(self.github.records), "llm": latency_summary(self.llm.records),
+        }
+
+    def close(self):
+        if self.directory is not None:
+            self.directory.cleanup()
+            self.directory = None
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape and analyze synthetic repositories against local GitHub "
+                                                 "and chat-completions stand-ins, and report throughput and latency.")
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="small", help="Repository shape")
+    parser.add_argument("--files", type=int, default=None, help="Override the number of files per repository")
+    parser.add_argument("--repos", type=int, default=1, help="Number of repositories")
+    parser.add_argument("--passes", type=int, default=1, help="Scrapes of the same repositories (later ones hit the cache)")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="Median GitHub latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Median chat-completions latency in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Added seconds per completion token")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Log-normal shape of both latencies")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Share of requests answered with a rate limit")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Seconds rate-limit responses ask to wait")
+    parser.add_argument("--concurrency", type=int, default=1, help="Analysis requests in flight")
+    parser.add_argument("--batch-size", type=int, default=1, help="Analysis requests dispatched together")
+    parser.add_argument("--pack", type=int, default=1, help="Chunks per analysis request")
+    parser.add_argument("--token-budget", type=int, default=None, help="Token budget of each pass")
+    parser.add_argument("--github-throttle", type=float, default=0.0,
+                        help="PyGithub's pause between requests in seconds (0.25 in production)")
+    parser.add_argument("--no-filter", action="store_true", help="Analyze every file, bypassing the file filter")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the repositories and faults")
+    parser.add_argument("--output", default=REPORT_FILE, help="JSON report file")
+    args = parser.parse_args()
+
+    shape = SHAPES[args.shape]
+    if args.files is not None:
+        shape = RepoShape(args.files, shape.depth, shape.fan_out, shape.file_chars, shape.duplicate_share,
+                          shape.ignored_files, shape.noise)
+    faults = {"jitter": args.jitter, "rate_limit": args.rate_limit, "error_rate": args.error_rate,
+              "retry_after": args.retry_after}
+    load_test = LoadTest(shape, args.repos, github=dict(latency=args.github_latency, **faults),
+                         llm=dict(latency=args.llm_latency, token_latency=args.token_latency, **faults),
+                         concurrency=args.concurrency, batch_size=args.batch_size, pack_items=args.pack,
+                         token_budget=args.token_budget, github_throttle=args.github_throttle, seed=args.seed,
+                         filter_files=not args.no_filter)
+    try:
+        report = load_test.run(args.passes)
+    finally:
+        load_test.close()
+    with open(args.output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    for result in report["passes"]:
+        llm = result["llm"].get("all") or next(iter(result["llm"].values()), {})
+        print(f"Pass {result['pass']}: {result['files']} files, {result['chunks']} chunks in {result['seconds']}s "
+              f"({result['chunks_per_second']} chunks/s); {result['chunks_analyzed']} analyzed, "
+              f"{result['chunks_cached']} cached, {result['chunks_skipped']} skipped, {result['chunks_failed']} failed; "
+              f"{result['llm_calls']} LLM calls, "
+              f"p50/p95/p99 {llm.get('p50_ms')}/{llm.get('p95_ms')}/{llm.get('p99_ms')} ms")
+    print(f"Report written to {args.output}")
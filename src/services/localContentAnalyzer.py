@@ -4,20 +4,30 @@
 # - warm_up: Perform a warm-up run for optimized performance
 # - generate_text: Generate text using GPT-2
 # - measure_performance: Measure token generation performance
+# - save_snapshot: Save the config, tokenizer and float weights of the loaded model for worker processes
+# - load_snapshot: Memory-map a saved snapshot's float weights and re-apply the quantization
+# - embed: Mean-pooled, normalized hidden-state embeddings for a batch of texts
 ## LIBRARIES ###########################################################################################################
+import os
+import numpy as np
 import torch
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from transformers import GPT2Config, GPT2LMHeadModel, GPT2Tokenizer
 import time
 ## CONFIGURATION #######################################################################################################
 torch.backends.quantized.engine = 'qnnpack'
 
 ## CLASSES ###########################################################################################################
 class GPT2TokenGenerator:
-    def __init__(self, model_name="gpt2"):
+    def __init__(self, model_name="gpt2", quantize=True):
         """
         Initialize GPT-2 Token Generator with specified model.
+
+        Parameters:
+        - model_name (str): Hugging Face model name or local path
+        - quantize (bool): Apply dynamic int8 quantization to the Linear layers on load
         """
         self.model_name = model_name
+        self.quantize = quantize
         self.tokenizer = None
         self.model = None
         self.initialized = False
@@ -29,11 +39,85 @@ class GPT2TokenGenerator:
         print("Loading model and tokenizer...")
         self.tokenizer = GPT2Tokenizer.from_pretrained(self.model_name)
         self.model = GPT2LMHeadModel.from_pretrained(self.model_name)
-        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.quantize:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
         self.model.eval()
         self.model.to("cpu")
         self.initialized = True
-        print("Model loaded and optimized for speed.")
+        print("Model loaded and optimized for speed." if self.quantize else "Model loaded.")
+
+    def save_snapshot(self, snapshot_dir):
+        """
+        Save the config, tokenizer and plain float weights of the loaded model so other processes can load them
+        without reading the original checkpoint. Dynamically quantized layers are left out: their packed weights
+        cannot be memory-mapped, so load_snapshot quantizes them again. For GPT-2 that is only lm_head, which is
+        tied to the token embeddings; the Conv1D blocks are not nn.Linear and stay float.
+
+        Parameters:
+        - snapshot_dir (str): Directory to write to (use /dev/shm to keep it in shared memory)
+        """
+        if not self.initialized:
+            raise RuntimeError("Model and tokenizer must be loaded first.")
+
+        self.tokenizer.save_pretrained(snapshot_dir)
+        self.model.config.save_pretrained(snapshot_dir)
+        weights = {name: tensor.detach() for name, tensor in self.model.named_parameters()}
+        weights.update(self.model.named_buffers())
+        torch.save(weights, os.path.join(snapshot_dir, "weights.pt"))
+
+    def load_snapshot(self, snapshot_dir):
+        """
+        Load a snapshot written by save_snapshot. The float weights are memory-mapped and used in place, so
+        processes loading the same snapshot share those pages. Layers quantized by self.quantize are rebuilt
+        from them and are private to each process.
+
+        Parameters:
+        - snapshot_dir (str): Directory written by save_snapshot
+        """
+        self.tokenizer = GPT2Tokenizer.from_pretrained(snapshot_dir)
+        weights = torch.load(os.path.join(snapshot_dir, "weights.pt"), mmap=True, weights_only=True)
+        with torch.device("meta"):
+            model = GPT2LMHeadModel(GPT2Config.from_pretrained(snapshot_dir))
+        model.load_state_dict(weights, strict=False, assign=True)
+        model.tie_weights()
+        missing = [name for name, tensor in model.state_dict().items() if tensor.is_meta]
+        if missing:
+            raise RuntimeError(f"Snapshot {snapshot_dir} is missing weights: {missing}")
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.eval()
+        self.initialized = True
+
+    def embed(self, texts, batch_size=16, max_tokens=256):
+        """
+        Compute one embedding per text: the mean of GPT-2's last hidden states over the text's tokens,
+        L2-normalized so that a dot product is a cosine similarity.
+
+        Parameters:
+        - texts (list of str): Texts to embed
+        - batch_size (int): Texts per forward pass
+        - max_tokens (int): Texts are truncated to this many tokens
+
+        Returns:
+        - embeddings (numpy.ndarray): float32 array of shape (len(texts), hidden size)
+        """
+        if not self.initialized:
+            raise RuntimeError("Model and tokenizer must be loaded first.")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        batches = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                encoded = self.tokenizer(list(texts[start:start + batch_size]), return_tensors="pt", padding=True,
+                                         truncation=True, max_length=max_tokens)
+                hidden = self.model.transformer(**encoded).last_hidden_state
+                mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                batches.append(torch.nn.functional.normalize(pooled, dim=-1).float().numpy())
+        if not batches:
+            return np.zeros((0, self.model.config.n_embd), dtype=np.float32)
+        return np.concatenate(batches)
 
     def warm_up(self, input_text):
         """
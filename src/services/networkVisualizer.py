@@ -1,13 +1,39 @@
 ## IMPORTS ##############################################################################################################
 import os
+import argparse
 import sqlite3
+import numpy as np
 import networkx as nx
 import plotly.graph_objects as go
+## DEV_ATLAS CLASSES #####################################################################################################
+try:  # Imported as services.networkVisualizer (main.py) or run directly from src/services
+    from services.graphLayout import layout_networkx
+    from services.databaseController import CONTENT_DOMAIN_LINKS
+    from services.chunkStore import register_functions, SQLITE_MAX_PARAMETERS
+    from services.instrumentation import span, configure_logging, write_reports
+    from services.profiling import profile_stage, start_profiling, add_profile_arguments
+except ImportError:
+    from graphLayout import layout_networkx
+    from databaseController import CONTENT_DOMAIN_LINKS
+    from chunkStore import register_functions, SQLITE_MAX_PARAMETERS
+    from instrumentation import span, configure_logging, write_reports
+    from profiling import profile_stage, start_profiling, add_profile_arguments
 ## FUNCTIONS ############################################################################################################
 from dotenv import load_dotenv
 ## CONFIGURATION ########################################################################################################
 load_dotenv()
 DB = os.getenv("DATABASE") 
+WEBGL_THRESHOLD = 5000  # Use Scattergl traces above this many nodes
+FETCH_BATCH_SIZE = 10000     # Rows per fetchmany round trip
+TOOLTIP_LENGTH = 300         # Characters of a content description shown in its tooltip
+MAX_AGGREGATED_NODES = 3000  # Size bound of the default (aggregated) view
+MAX_DOMAINS_PER_FILE = 5     # Strongest file-domain edges kept per file in the aggregated view
+NODE_COLORS = {
+    "repo": 'rgb(0, 0, 255)',   # Blue for repos
+    "file": 'rgb(0, 255, 0)',   # Green for file objects
+    "domain": 'rgb(255, 0, 0)', # Red for domains
+    "content": 'rgb(255, 255, 0)' # Yellow for content
+}
 ## CLASSES ############################################################################################################
 class InteractiveNetworkGraphVisualizer:
     def __init__(self, db_file):
@@ -21,6 +47,7 @@ class InteractiveNetworkGraphVisualizer:
         try:
             self.connection = sqlite3.connect(self.db_file)
             self.cursor = self.connection.cursor()
+            register_functions(self.connection)  # Chunk text is stored compressed
             print("Successfully connected to SQLite")
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
@@ -28,27 +55,145 @@ class InteractiveNetworkGraphVisualizer:
         
         return self.connection, self.cursor
 
-    def fetch_data(self):
-        """Fetch data from all tables and prepare the graph"""
-        query_repos = "SELECT id, name FROM repos"
-        query_file_objects = "SELECT id, repo_id, name, url, type FROM fileObjects"
-        query_domains = "SELECT id, name FROM domains"
-        query_content = "SELECT id, fileObject_id, domain_id, description FROM content"
-        
-        # Fetch all data
-        self.cursor.execute(query_repos)
-        repos = self.cursor.fetchall()
-        
-        self.cursor.execute(query_file_objects)
-        file_objects = self.cursor.fetchall()
-        
-        self.cursor.execute(query_domains)
-        domains = self.cursor.fetchall()
-        
-        self.cursor.execute(query_content)
-        content = self.cursor.fetchall()
-        
-        return repos, file_objects, domains, content
+    def fetch_data(self, repo=None, path_prefix=None, domains=None, min_relatedness=None, batch_size=FETCH_BATCH_SIZE):
+        """
+        Fetch the graph data, optionally scoped to part of the database. Rows are streamed from the cursor in
+        batches and only the columns the graph needs are selected; content descriptions are loaded later, for
+        tooltips only (see fetch_descriptions).
+
+        Parameters:
+        - repo: Repository name or ID
+        - path_prefix: Only files whose path starts with this prefix (e.g. "src/services/")
+        - domains: Domain names or IDs; only content linked to one of them is included
+        - min_relatedness: Only content-domain links at or above this percentage (a primary domain counts as 100)
+        - batch_size: Rows fetched per round trip
+
+        Returns: (repos, file_objects, domains, content) iterators of tuples
+        """
+        scope, params = self.scope_query(repo, path_prefix, domains, min_relatedness)
+        content_filtered = domains is not None or min_relatedness is not None
+
+        repo_condition, repo_params = ("WHERE r.name = ? OR r.id = ?", [repo, repo]) if repo is not None else ("", [])
+        query_repos = f"SELECT r.id, r.name FROM repos r {repo_condition}"
+        query_file_objects = f"{scope} SELECT id, repo_id, name, url, type FROM scoped_files"
+        if content_filtered:
+            query_file_objects += " WHERE id IN (SELECT fileObject_id FROM scoped_content)"
+        if content_filtered or repo is not None or path_prefix is not None:
+            query_domains = (f"{scope} SELECT d.id, d.name FROM domains d "
+                             "WHERE d.id IN (SELECT domain_id FROM scoped_content)")
+            domain_params = params
+        else:
+            query_domains, domain_params = "SELECT id, name FROM domains", []
+        query_content = f"{scope} SELECT id, fileObject_id, domain_id, relatedness FROM scoped_content"
+
+        return (
+            self.stream(query_repos, repo_params, batch_size),
+            self.stream(query_file_objects, params, batch_size),
+            self.stream(query_domains, domain_params, batch_size),
+            self.stream(query_content, params, batch_size)
+        )
+
+    def scope_query(self, repo=None, path_prefix=None, domains=None, min_relatedness=None):
+        """
+        Build the WITH clause shared by the fetch_data queries: scoped_files, and scoped_content with one row per
+        (chunk, domain) link. Relationship rows are only joined for chunks inside the scope.
+
+        Returns: (with_clause, params)
+        """
+        file_conditions, file_params = [], []
+        if repo is not None:
+            file_conditions.append("(r.name = ? OR r.id = ?)")
+            file_params += [repo, repo]
+        if path_prefix is not None:
+            file_conditions.append("substr(f.path, 1, ?) = ?")
+            file_params += [len(path_prefix), path_prefix]
+
+        # The domain filter is applied inside both link branches so only the selected domains' links are grouped
+        relationship_filter, primary_filter = "", ""
+        if domains is not None:
+            domain_ids = ", ".join(str(domain_id) for domain_id in self.resolve_domain_ids(domains)) or "NULL"
+            relationship_filter = f"WHERE cdr.domain_id IN ({domain_ids})"
+            primary_filter = f"AND c.domain_id IN ({domain_ids})"
+
+        # Without content filters, chunks with no domain are kept too
+        content_join = "JOIN" if domains is not None or min_relatedness is not None else "LEFT JOIN"
+        content_conditions, content_params = [], []
+        if min_relatedness is not None:
+            content_conditions.append("l.relatedness >= ?")
+            content_params.append(min_relatedness)
+
+        file_where = f"WHERE {' AND '.join(file_conditions)}" if file_conditions else ""
+        content_where = f"WHERE {' AND '.join(content_conditions)}" if content_conditions else ""
+        if content_join == "JOIN":
+            # Filtered: drive from the (few) matching links
+            content_source = "scoped_links l JOIN content c ON c.id = l.content_id"
+        else:
+            content_source = ("content c JOIN scoped_files sf ON sf.id = c.fileObject_id "
+                              "LEFT JOIN scoped_links l ON l.content_id = c.id")
+        with_clause = f"""
+            WITH scoped_files AS (
+                SELECT f.id, f.repo_id, f.name, f.url, f.type
+                FROM fileObjects f JOIN repos r ON r.id = f.repo_id
+                {file_where}
+            ),
+            scoped_links AS (
+                SELECT content_id, domain_id, MAX(relatedness) AS relatedness FROM (
+                    SELECT cdr.content_id, cdr.domain_id, cdr.relatedness_percentage AS relatedness
+                    FROM content_domain_relationships cdr
+                    JOIN content c ON c.id = cdr.content_id
+                    JOIN scoped_files sf ON sf.id = c.fileObject_id
+                    {relationship_filter}
+                    UNION ALL
+                    SELECT c.id, c.domain_id, 100
+                    FROM content c JOIN scoped_files sf ON sf.id = c.fileObject_id
+                    WHERE c.domain_id IS NOT NULL {primary_filter}
+                ) GROUP BY content_id, domain_id
+            ),
+            scoped_content AS (
+                SELECT c.id, c.fileObject_id, l.domain_id, l.relatedness
+                FROM {content_source}
+                {content_where}
+            )
+        """
+        return with_clause, file_params + content_params
+
+    def resolve_domain_ids(self, domains):
+        """Map domain names or IDs to domain IDs"""
+        domains = [str(domain) for domain in domains]
+        placeholders = ", ".join("?" * len(domains))
+        self.cursor.execute(
+            f"SELECT id FROM domains WHERE name IN ({placeholders}) OR CAST(id AS TEXT) IN ({placeholders})",
+            domains + domains
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def stream(self, query, params=(), batch_size=FETCH_BATCH_SIZE):
+        """Yield the rows of a query in batches of batch_size, on a cursor of its own"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except sqlite3.Error as e:
+            print(f"Error fetching graph data: {e}")
+        finally:
+            cursor.close()
+
+    def fetch_descriptions(self, content_ids, length=TOOLTIP_LENGTH):
+        """Fetch the first `length` characters of the given content descriptions, for tooltips"""
+        descriptions = {}
+        content_ids = list(content_ids)
+        for start in range(0, len(content_ids), SQLITE_MAX_PARAMETERS):
+            batch = content_ids[start:start + SQLITE_MAX_PARAMETERS]
+            self.cursor.execute(
+                f"SELECT id, substr(description, 1, ?) FROM content_text WHERE id IN ({', '.join('?' * len(batch))})",
+                [length] + batch
+            )
+            descriptions.update(self.cursor.fetchall())
+        return descriptions
 
     def create_network_graph(self, repos, file_objects, domains, content):
         """Create a network graph from the fetched data"""
@@ -67,103 +212,311 @@ class InteractiveNetworkGraphVisualizer:
         for domain_id, domain_name in domains:
             G.add_node(f"domain_{domain_id}", label=domain_name, type="domain")
 
-        # Add nodes for content and edges to file objects and domains
-        for content_id, file_id, domain_id, description in content:
-            G.add_node(f"content_{content_id}", label=f"Content {content_id}", type="content", description=description)
-            G.add_edge(f"file_{file_id}", f"content_{content_id}")
-            G.add_edge(f"domain_{domain_id}", f"content_{content_id}")
+        # Add nodes for content and edges to file objects and domains (one content row per domain link)
+        for content_id, file_id, domain_id, relatedness in content:
+            content_key = f"content_{content_id}"
+            if content_key not in G:
+                G.add_node(content_key, label=f"Content {content_id}", type="content", content_id=content_id)
+                G.add_edge(f"file_{file_id}", content_key)
+            if domain_id is not None:
+                G.add_edge(f"domain_{domain_id}", content_key, relatedness=relatedness)
 
         return G
 
-    def plot_graph(self, G):
-        """Plot the graph using Plotly"""
-        pos = nx.spring_layout(G)  # Layout for the graph
-        node_x = []
-        node_y = []
-        node_labels = []
-        node_tooltips = []  # Tooltips for the nodes
-        node_types = []
-        
-        # Collect node data
-        for node, data in G.nodes(data=True):
-            x, y = pos[node]
-            node_x.append(x)
-            node_y.append(y)
-            node_labels.append(data['label'])
-            node_tooltips.append(self.get_tooltip(data))
-            node_types.append(data['type'])
-        
-        # Collect edge data
-        edge_x = []
-        edge_y = []
-        for edge in G.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_x.append(x0)
-            edge_y.append(y0)
-            edge_x.append(x1)
-            edge_y.append(y1)
-
-        # Create the Plotly graph
-        edge_trace = go.Scatter(
+    ## LEVEL OF DETAIL ####
+    # Content chunks are collapsed into per-file and per-domain supernodes in SQL; drill-down queries expand
+    # one supernode at a time, so the default view stays bounded however many chunks the database holds.
+
+    def fetch_aggregated_data(self):
+        """Fetch repos, files and domains with chunk counts, and each file's strongest weighted domain edges"""
+        self.cursor.execute("SELECT id, name FROM repos")
+        repos = self.cursor.fetchall()
+
+        self.cursor.execute(
+            """
+            SELECT f.id, f.repo_id, f.name, f.url, f.type, COUNT(c.id)
+            FROM fileObjects f LEFT JOIN content c ON c.fileObject_id = f.id
+            GROUP BY f.id
+            """
+        )
+        file_objects = self.cursor.fetchall()
+
+        self.cursor.execute(
+            f"""
+            SELECT d.id, d.name, COUNT(links.content_id)
+            FROM domains d LEFT JOIN ({CONTENT_DOMAIN_LINKS}) links ON links.domain_id = d.id
+            GROUP BY d.id
+            """
+        )
+        domains = self.cursor.fetchall()
+
+        # Keep only each file's strongest domain edges so the edge count stays proportional to the file count
+        self.cursor.execute(
+            f"""
+            SELECT fileObject_id, domain_id, chunks, relatedness FROM (
+                SELECT c.fileObject_id, links.domain_id, COUNT(*) AS chunks, AVG(links.relatedness) AS relatedness,
+                       ROW_NUMBER() OVER (PARTITION BY c.fileObject_id ORDER BY COUNT(*) DESC) AS rank
+                FROM ({CONTENT_DOMAIN_LINKS}) links JOIN content c ON c.id = links.content_id
+                GROUP BY c.fileObject_id, links.domain_id
+            ) WHERE rank <= ?
+            """,
+            (MAX_DOMAINS_PER_FILE,)
+        )
+        file_domain_edges = self.cursor.fetchall()
+        return repos, file_objects, domains, file_domain_edges
+
+    def fetch_repo_domain_data(self, max_domains):
+        """Fetch repos, the max_domains largest domains, and repo-domain edges weighted by chunk count"""
+        self.cursor.execute("SELECT id, name FROM repos")
+        repos = self.cursor.fetchall()
+
+        self.cursor.execute(
+            f"""
+            SELECT d.id, d.name, COUNT(links.content_id) AS chunks
+            FROM domains d LEFT JOIN ({CONTENT_DOMAIN_LINKS}) links ON links.domain_id = d.id
+            GROUP BY d.id ORDER BY chunks DESC LIMIT ?
+            """,
+            (max_domains,)
+        )
+        domains = self.cursor.fetchall()
+
+        self.cursor.execute(
+            f"""
+            SELECT f.repo_id, links.domain_id, COUNT(*), AVG(links.relatedness)
+            FROM ({CONTENT_DOMAIN_LINKS}) links
+            JOIN content c ON c.id = links.content_id
+            JOIN fileObjects f ON f.id = c.fileObject_id
+            GROUP BY f.repo_id, links.domain_id
+            """
+        )
+        repo_domain_edges = self.cursor.fetchall()
+        return repos, domains, repo_domain_edges
+
+    def create_aggregated_graph(self, max_nodes=MAX_AGGREGATED_NODES):
+        """
+        Create the default overview graph. Files become supernodes carrying their chunk count; when even the
+        files exceed max_nodes, the view drops to repos and the largest domains.
+        """
+        self.cursor.execute("SELECT (SELECT COUNT(*) FROM repos), (SELECT COUNT(*) FROM fileObjects), "
+                            "(SELECT COUNT(*) FROM domains)")
+        repo_count, file_count, domain_count = self.cursor.fetchone()
+        if repo_count + file_count + domain_count <= max_nodes:
+            return self.create_file_level_graph(*self.fetch_aggregated_data())
+
+        repos, domains, repo_domain_edges = self.fetch_repo_domain_data(max(max_nodes - repo_count, 1))
+        G = nx.Graph()
+        for repo_id, repo_name in repos:
+            G.add_node(f"repo_{repo_id}", label=repo_name, type="repo")
+        for domain_id, domain_name, chunks in domains:
+            G.add_node(f"domain_{domain_id}", label=domain_name, type="domain", count=chunks)
+        for repo_id, domain_id, chunks, relatedness in repo_domain_edges:
+            if f"domain_{domain_id}" in G:
+                G.add_edge(f"repo_{repo_id}", f"domain_{domain_id}", weight=chunks, relatedness=relatedness)
+        return G
+
+    def create_file_level_graph(self, repos, file_objects, domains, file_domain_edges):
+        """Create a graph of repos, file supernodes and domain supernodes with weighted file-domain edges"""
+        G = nx.Graph()
+        for repo_id, repo_name in repos:
+            G.add_node(f"repo_{repo_id}", label=repo_name, type="repo")
+        for file_id, repo_id, file_name, file_url, file_type, chunks in file_objects:
+            G.add_node(f"file_{file_id}", label=file_name, type="file", url=file_url, file_type=file_type, count=chunks)
+            G.add_edge(f"repo_{repo_id}", f"file_{file_id}")
+        for domain_id, domain_name, chunks in domains:
+            G.add_node(f"domain_{domain_id}", label=domain_name, type="domain", count=chunks)
+        for file_id, domain_id, chunks, relatedness in file_domain_edges:
+            G.add_edge(f"file_{file_id}", f"domain_{domain_id}", weight=chunks, relatedness=relatedness)
+        return G
+
+    def expand_supernode(self, G, node_key):
+        """
+        Drill down into one supernode, adding its members to G in place.
+        - file_<id>: the file's content chunks, linked to their domains
+        - domain_<id>: the files with chunks in the domain, linked to their repos
+        - repo_<id>: the repo's files
+
+        :return: The list of node keys that were added
+        """
+        kind, _, key = node_key.partition("_")
+        added = []
+        if kind == "file":
+            self.cursor.execute(
+                f"""
+                SELECT c.id, links.domain_id, links.relatedness, d.name
+                FROM content c
+                LEFT JOIN ({CONTENT_DOMAIN_LINKS}) links ON links.content_id = c.id
+                LEFT JOIN domains d ON d.id = links.domain_id
+                WHERE c.fileObject_id = ?
+                """,
+                (int(key),)
+            )
+            for content_id, domain_id, relatedness, domain_name in self.cursor.fetchall():
+                content_key = f"content_{content_id}"
+                if content_key not in G:
+                    G.add_node(content_key, label=f"Content {content_id}", type="content", content_id=content_id)
+                    G.add_edge(node_key, content_key)
+                    added.append(content_key)
+                if domain_id is not None:
+                    if f"domain_{domain_id}" not in G:
+                        G.add_node(f"domain_{domain_id}", label=domain_name, type="domain")
+                        added.append(f"domain_{domain_id}")
+                    G.add_edge(content_key, f"domain_{domain_id}", relatedness=relatedness)
+        elif kind in ("domain", "repo"):
+            if kind == "domain":
+                query = f"""
+                    SELECT f.id, f.repo_id, f.name, f.url, f.type, COUNT(*), r.name
+                    FROM ({CONTENT_DOMAIN_LINKS}) links
+                    JOIN content c ON c.id = links.content_id
+                    JOIN fileObjects f ON f.id = c.fileObject_id
+                    JOIN repos r ON r.id = f.repo_id
+                    WHERE links.domain_id = ?
+                    GROUP BY f.id
+                    """
+            else:
+                query = """
+                    SELECT f.id, f.repo_id, f.name, f.url, f.type, COUNT(c.id), r.name
+                    FROM fileObjects f
+                    LEFT JOIN content c ON c.fileObject_id = f.id
+                    JOIN repos r ON r.id = f.repo_id
+                    WHERE f.repo_id = ?
+                    GROUP BY f.id
+                    """
+            self.cursor.execute(query, (int(key),))
+            for file_id, repo_id, file_name, file_url, file_type, chunks, repo_name in self.cursor.fetchall():
+                file_key = f"file_{file_id}"
+                if file_key not in G:
+                    G.add_node(file_key, label=file_name, type="file", url=file_url, file_type=file_type, count=chunks)
+                    added.append(file_key)
+                if f"repo_{repo_id}" not in G:
+                    G.add_node(f"repo_{repo_id}", label=repo_name, type="repo")
+                    added.append(f"repo_{repo_id}")
+                G.add_edge(f"repo_{repo_id}", file_key)
+                if kind == "domain":
+                    G.add_edge(file_key, node_key, weight=chunks)
+        else:
+            print(f"Error expanding node: {node_key} is not a supernode")
+        return added
+
+    def load_positions(self):
+        """Load node positions saved by earlier renders"""
+        try:
+            self.cursor.execute("SELECT node_key, x, y FROM node_positions")
+            return {node_key: (x, y) for node_key, x, y in self.cursor.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error loading node positions: {e}")
+            return {}
+
+    def save_positions(self, pos):
+        """Save node positions so the next render keeps them"""
+        try:
+            self.cursor.executemany(
+                "INSERT OR REPLACE INTO node_positions (node_key, x, y) VALUES (?, ?, ?)",
+                ((node, float(x), float(y)) for node, (x, y) in pos.items())
+            )
+            self.connection.commit()
+        except sqlite3.Error as e:
+            print(f"Error saving node positions: {e}")
+
+    def plot_graph(self, G, seed=0, persist_positions=True, output_file=None):
+        """Plot the graph using Plotly, or write it to an HTML/JSON file when output_file is given"""
+        # Nodes placed by earlier renders keep their coordinates; only new nodes are placed and refined
+        known_positions = self.load_positions() if persist_positions else None
+        with span("layout", algorithm="force_directed"), profile_stage("layout"):
+            pos = layout_networkx(G, seed=seed, initial_positions=known_positions)
+        if persist_positions:
+            self.save_positions({node: pos[node] for node in G.nodes if node not in known_positions})
+
+        # Descriptions are only needed for tooltips, so they are loaded (truncated) just before drawing
+        missing = {data['content_id']: node for node, data in G.nodes(data=True)
+                   if 'content_id' in data and 'description' not in data}
+        if missing:
+            for content_id, description in self.fetch_descriptions(missing).items():
+                G.nodes[missing[content_id]]['description'] = description
+
+        with span("rendering", output="figure"), profile_stage("rendering"):
+            fig = self.build_figure(G, pos)
+        if output_file:
+            with span("rendering", output=os.path.splitext(output_file)[1].lstrip(".").lower()), profile_stage("rendering"):
+                self.write_figure(fig, output_file)
+        else:
+            fig.show()
+        return fig
+
+    def build_figure(self, G, pos):
+        """Build the Plotly figure from preallocated arrays, one trace per node type"""
+        nodes = list(G.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        coordinates = np.array([pos[node] for node in nodes], dtype=float).reshape(len(nodes), 2)
+        types = np.array([data['type'] for _, data in G.nodes(data=True)], dtype=object)
+        tooltips = [self.get_tooltip(data) for _, data in G.nodes(data=True)]
+        counts = np.array([data.get('count', 0) for _, data in G.nodes(data=True)], dtype=float)
+
+        # WebGL traces keep large graphs interactive; SVG traces look better for small ones
+        scatter = go.Scattergl if len(nodes) > WEBGL_THRESHOLD else go.Scatter
+        base_size = 15 if scatter is go.Scatter else 5
+
+        # Edges as one line trace: x0, x1, NaN per edge so segments are not joined
+        edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+        edge_x = np.full(3 * len(edges), np.nan)
+        edge_y = np.full(3 * len(edges), np.nan)
+        edge_x[0::3], edge_x[1::3] = coordinates[edges[:, 0], 0], coordinates[edges[:, 1], 0]
+        edge_y[0::3], edge_y[1::3] = coordinates[edges[:, 0], 1], coordinates[edges[:, 1], 1]
+        edge_trace = scatter(
             x=edge_x, y=edge_y,
             line=dict(width=0.5, color='#888'),
             hoverinfo='none',
-            mode='lines')
-
-        # Group nodes by type for interactive legend
-        node_traces = {}
-        node_colors = {
-            "repo": 'rgb(0, 0, 255)',   # Blue for repos
-            "file": 'rgb(0, 255, 0)',   # Green for file objects
-            "domain": 'rgb(255, 0, 0)', # Red for domains
-            "content": 'rgb(255, 255, 0)' # Yellow for content
-        }
-        
-        for node_type, color in node_colors.items():
-            node_traces[node_type] = go.Scatter(
-                x=[],
-                y=[],
+            mode='lines',
+            showlegend=False)
+
+        # Group nodes by type for interactive legend; supernodes grow with their chunk count
+        node_traces = []
+        for node_type, color in NODE_COLORS.items():
+            members = np.flatnonzero(types == node_type)
+            node_traces.append(scatter(
+                x=coordinates[members, 0],
+                y=coordinates[members, 1],
                 mode='markers',
                 hoverinfo='text',
-                text=[],
-                marker=dict(size=15, color=color),
+                text=[tooltips[i] for i in members],
+                marker=dict(size=base_size + 2 * np.log2(1 + counts[members]), color=color),
                 name=node_type.capitalize()  # Add to legend
-            )
-        
-        for i, node_type in enumerate(node_types):
-            node_traces[node_type].x += (node_x[i],)
-            node_traces[node_type].y += (node_y[i],)
-            node_traces[node_type].text += (node_tooltips[i],)
+            ))
 
-        # Combine edge trace and node traces
-        fig_data = [edge_trace] + list(node_traces.values())
-        
         # Create the figure
-        fig = go.Figure(data=fig_data,
-                        layout=go.Layout(
-                            title="Interactive Network Graph",
-                            titlefont_size=16,
-                            showlegend=True,
-                            hovermode='closest',
-                            margin=dict(b=0, l=0, r=0, t=40),
-                            xaxis=dict(showgrid=False, zeroline=False),
-                            yaxis=dict(showgrid=False, zeroline=False),
-                            plot_bgcolor='black',  # Set background color to black
-                            paper_bgcolor='black',  # Set paper background to black
-                            font=dict(color='white')  # Set font color for legend and title
-                        ))
-        
-        fig.show()
+        return go.Figure(data=[edge_trace] + node_traces,
+                         layout=go.Layout(
+                             title=dict(text="Interactive Network Graph", font=dict(size=16)),
+                             showlegend=True,
+                             hovermode='closest',
+                             margin=dict(b=0, l=0, r=0, t=40),
+                             xaxis=dict(showgrid=False, zeroline=False),
+                             yaxis=dict(showgrid=False, zeroline=False),
+                             plot_bgcolor='black',  # Set background color to black
+                             paper_bgcolor='black',  # Set paper background to black
+                             font=dict(color='white')  # Set font color for legend and title
+                         ))
+
+    def write_figure(self, fig, output_file):
+        """Write the figure to a self-contained HTML file or a Plotly JSON file"""
+        extension = os.path.splitext(output_file)[1].lower()
+        if extension in (".html", ".htm"):
+            fig.write_html(output_file, include_plotlyjs=True, full_html=True)
+        elif extension == ".json":
+            fig.write_json(output_file)
+        else:
+            print(f"Error writing figure: unsupported output format '{extension}' (use .html or .json)")
+            return
+        print(f"Graph written to {output_file}")
 
     def get_tooltip(self, data):
         """Generate a tooltip string based on node type"""
+        chunks = f"<br>Chunks: {data['count']}" if 'count' in data else ""
         if data['type'] == 'file':
-            return f"File Name: {data['label']}<br>URL: {data.get('url', 'N/A')}<br>Type: {data.get('file_type', 'N/A')}"
+            return f"File Name: {data['label']}<br>URL: {data.get('url', 'N/A')}<br>Type: {data.get('file_type', 'N/A')}{chunks}"
         elif data['type'] == 'repo':
             return f"Repository: {data['label']}"
         elif data['type'] == 'domain':
-            return f"Domain: {data['label']}"
+            return f"Domain: {data['label']}{chunks}"
         elif data['type'] == 'content':
             return f"Content ID: {data['label']}<br>Description: {data.get('description', 'N/A')}"
         else:
@@ -176,20 +529,45 @@ class InteractiveNetworkGraphVisualizer:
             print("Connection closed.")
 ## MAIN  ##############################################################################################################
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the repository network graph.")
+    parser.add_argument("--output", default=None,
+                        help="Write the graph to this .html or .json file instead of opening a browser")
+    parser.add_argument("--full", action="store_true",
+                        help="Draw one node per content chunk instead of the aggregated overview")
+    parser.add_argument("--expand", action="append", default=[],
+                        help="Supernode to drill into, e.g. file_12 or domain_3 (repeatable)")
+    parser.add_argument("--repo", default=None, help="Only draw this repository (name or ID)")
+    parser.add_argument("--path", default=None, help="Only draw files whose path starts with this prefix")
+    parser.add_argument("--domain", action="append", default=None, help="Only draw content in this domain (repeatable)")
+    parser.add_argument("--min-relatedness", type=int, default=None,
+                        help="Only draw content-domain links at or above this percentage")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+    profiler = start_profiling(args.profile, args.profile_dir)
+    scoped = any(value is not None for value in (args.repo, args.path, args.domain, args.min_relatedness))
 
     visualizer = InteractiveNetworkGraphVisualizer(DB)
     
     # Connect to the database
     connection, cursor = visualizer.connect()
     
-    # Fetch data from the database
-    repos, file_objects, domains, content = visualizer.fetch_data()
-    
     # Create the network graph
-    G = visualizer.create_network_graph(repos, file_objects, domains, content)
+    with profile_stage("build_graph"):
+        if args.full or scoped:
+            repos, file_objects, domains, content = visualizer.fetch_data(
+                repo=args.repo, path_prefix=args.path, domains=args.domain, min_relatedness=args.min_relatedness
+            )
+            G = visualizer.create_network_graph(repos, file_objects, domains, content)
+        else:
+            G = visualizer.create_aggregated_graph()
+            for node_key in args.expand:
+                visualizer.expand_supernode(G, node_key)
     
     # Plot the graph
-    visualizer.plot_graph(G)
+    visualizer.plot_graph(G, output_file=args.output)
     
     # Close the database connection
     visualizer.close()
+    profiler.close()
+    write_reports()
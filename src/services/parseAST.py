@@ -1,9 +1,23 @@
 ## IMPORT #################################################################################################################
 import os
 import ast
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 from localContentAnalyzer import GPT2TokenGenerator
+from classificationPool import ClassificationWorkerPool
+from parseCache import ParseCache, PARSE_CACHE_FILE
+from directoryWatcher import (InotifyWatcher, STRUCTURE_MASK, IN_ISDIR, IN_DELETE, IN_DELETE_SELF, IN_MOVED_FROM,
+                              IN_MOVED_TO, IN_Q_OVERFLOW)
+from graphStore import GraphStore
+from graphLayout import incremental_layout
+from hierarchyRenderer import render_hierarchy, HierarchyMarkdownSink, ReadmeSink, JsonSink
+from instrumentation import span, timed, count, get_logger, configure_logging, write_reports
+from profiling import profile_stage, start_profiling, add_profile_arguments
 
 # Modular - State of Graph should remain persistant (locations are remembered) and the dots should be able to be interacted with - specifically click and drag for moving
 
@@ -14,12 +28,76 @@ SENSITIVE_DIRECTORIES = [".git/", ".git", ".env"]
 CACHE = ["__pycache__"]
 REQUIREMENTS = [".toml"]
 DATABASES = ["db-journal"]
+POSITIONS_FILE = "devatlas_positions.json"
 EXCLUSIONS=SENSITIVE_FILES+SENSITIVE_DIRECTORIES+CACHE+REQUIREMENTS+DATABASES
-ARCHITECTURE_CLASSIFICATION=["Front-end","Back-end", "Database", "Infrastructure", "Other"]
-BUSINESS_FRAMEWORK=["Sales","Operations","Product"]
+logger = get_logger("parseAST")
+## FUNCTIONS ##############################################################################################################
+class DefinitionExtractor(ast.NodeVisitor):
+    """
+    Single-pass extractor that visits every class, function and async function exactly once while tracking scope.
+    """
+    def __init__(self):
+        self.scope = []  # Stack of (kind, qualified name) for the enclosing definitions
+        self.definitions = []
+
+    def qualify(self, name):
+        """Qualified name of a definition in the current scope."""
+        return f"{self.scope[-1][1]}.{name}" if self.scope else name
+
+    def enclosing_class(self):
+        """Qualified name of the immediately enclosing class, or None."""
+        if self.scope and self.scope[-1][0] == "class":
+            return self.scope[-1][1]
+        return None
+
+    def visit_ClassDef(self, node):
+        qualname = self.qualify(node.name)
+        self.definitions.append(("class", qualname, ast.get_docstring(node), self.enclosing_class()))
+        self.scope.append(("class", qualname))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        qualname = self.qualify(node.name)
+        owner = self.enclosing_class()
+        # Methods are listed by name under their class; other functions by qualified name under the file
+        self.definitions.append(("function", node.name if owner else qualname, ast.get_docstring(node), owner))
+        self.scope.append(("function", qualname))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+def extract_definitions(file_path):
+    """
+    Read and parse a Python file into a compact, picklable list of definitions.
+    This runs inside parser worker processes, so it must not touch any DirectoryVisualizer state.
+
+    :param file_path: Path to the Python file
+    :return: (kind, name, docstring, enclosing class) tuples in source order, where kind is "class" or "function"
+    """
+    with open(file_path, "r") as file:
+        tree = ast.parse(file.read(), filename=file_path)
+
+    extractor = DefinitionExtractor()
+    extractor.visit(tree)
+    return extractor.definitions
+
+def _extract_definitions_safely(file_path):
+    """
+    Run extract_definitions, returning the error message instead of raising so one bad file doesn't stop a pool.
+
+    :return: A (definitions, error message) tuple
+    """
+    try:
+        return extract_definitions(file_path), None
+    except Exception as e:
+        return None, str(e)
+
 ## CLASS DEFINITION #######################################################################################################
 class DirectoryVisualizer:
-    def __init__(self, directory, exclusions_files, exclusions_dirs, gpt2_generator=None):
+    def __init__(self, directory, exclusions_files, exclusions_dirs, gpt2_generator=None, classification_pool=None,
+                 parse_cache=None):
         """
         Initialize the DirectoryVisualizer with the target directory.
 
@@ -27,20 +105,26 @@ class DirectoryVisualizer:
         :param exclusions_files: List of files to exclude from the visualization
         :param exclusions_dirs: List of directories to exclude from the visualization
         :param gpt2_generator: An instance of GPT2TokenGenerator for inference
+        :param classification_pool: A ClassificationWorkerPool to run GPT-2 inference across processes
+        :param parse_cache: A connected ParseCache so unchanged files are not parsed and classified again
         """
         self.directory = directory
         self.exclude_files = exclusions_files
         self.exclude_dirs = exclusions_dirs
-        self.graph = nx.DiGraph()
-        self.node_colors = {}
-        self.processed_functions = set()
+        self.store = GraphStore()  # Integer-indexed graph of directories, files, classes and functions
+        self.classified_nodes = []  # (node ID, classification) pairs copied into the store after parsing
         self.hierarchy = {}
         self.gpt2_generator = gpt2_generator  # GPT-2 for inferencing classifications
+        self.classification_pool = classification_pool
+        self.pending_classifications = []  # (classification, prompt) pairs awaiting the pool
+        self.parse_cache = parse_cache
 
+    @timed("classification")
     def classify_node(self, name, context=""):
         """
         Classify a node based on predefined architecture or business classifications.
-        If no match is found, use GPT-2 for inference.
+        If no match is found, use GPT-2 for inference. When a classification pool is attached the
+        GPT-2 call is deferred and resolved in bulk by resolve_pending_classifications.
 
         :param name: The name of the node (file, class, or function)
         :param context: Additional context (docstring, file path, etc.)
@@ -68,24 +152,48 @@ class DirectoryVisualizer:
 
         # Use GPT-2 if classification remains ambiguous
         if classification["architecture"] == "Other" or classification["business"] == "Product":
-            if self.gpt2_generator:
-                prompt = f"Classify this: '{name}' with context: '{context}'."
+            prompt = f"Classify this: '{name}' with context: '{context}'."
+            if self.classification_pool:
+                self.pending_classifications.append((classification, prompt))
+            elif self.gpt2_generator:
                 suggestion = self.gpt2_generator.generate_text(prompt, max_length=50)
-                if "Front-end" in suggestion:
-                    classification["architecture"] = "Front-end"
-                elif "Back-end" in suggestion:
-                    classification["architecture"] = "Back-end"
-                elif "Database" in suggestion:
-                    classification["architecture"] = "Database"
-                elif "Infrastructure" in suggestion:
-                    classification["architecture"] = "Infrastructure"
-                if "Sales" in suggestion:
-                    classification["business"] = "Sales"
-                elif "Operations" in suggestion:
-                    classification["business"] = "Operations"
+                self.apply_suggestion(classification, suggestion)
 
         return classification
 
+    def apply_suggestion(self, classification, suggestion):
+        """
+        Update a classification in place from a GPT-2 suggestion.
+
+        :param classification: The classification dictionary to update
+        :param suggestion: Text generated by GPT-2
+        """
+        if "Front-end" in suggestion:
+            classification["architecture"] = "Front-end"
+        elif "Back-end" in suggestion:
+            classification["architecture"] = "Back-end"
+        elif "Database" in suggestion:
+            classification["architecture"] = "Database"
+        elif "Infrastructure" in suggestion:
+            classification["architecture"] = "Infrastructure"
+        if "Sales" in suggestion:
+            classification["business"] = "Sales"
+        elif "Operations" in suggestion:
+            classification["business"] = "Operations"
+
+    def resolve_pending_classifications(self):
+        """
+        Send all deferred GPT-2 classifications to the worker pool and apply the results.
+        The classification dictionaries are already referenced from self.hierarchy, so they are updated in place.
+        """
+        if not self.pending_classifications:
+            return
+        pending, self.pending_classifications = self.pending_classifications, []
+        with span("classification", mode="pool"):
+            suggestions = self.classification_pool.suggest([prompt for _, prompt in pending])
+        for (classification, _), suggestion in zip(pending, suggestions):
+            self.apply_suggestion(classification, suggestion)
+
     def parse_python_file(self, file_path):
         """
         Parse a Python file to extract classes and functions.
@@ -93,165 +201,460 @@ class DirectoryVisualizer:
         :param file_path: Path to the Python file
         """
         try:
-            with open(file_path, "r") as file:
-                tree = ast.parse(file.read(), filename=file_path)
-                file_key = os.path.basename(file_path)
-                self.hierarchy[file_key] = {"classes": {}, "functions": []}
-
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.ClassDef):
-                        class_name = node.name
-                        class_docstring = ast.get_docstring(node)
-                        classification = self.classify_node(class_name, class_docstring or "")
-                        self.hierarchy[file_key]["classes"][class_name] = {
-                            "docstring": class_docstring,
-                            "functions": [],
-                            "classification": classification
-                        }
-                        class_node = class_name
-                        self.graph.add_node(class_node)
-                        self.node_colors[class_node] = "purple"  # Class node
-                        self.graph.add_edge(file_key, class_node)
-
-                        # Add functions within the class
-                        for child in node.body:
-                            if isinstance(child, ast.FunctionDef):
-                                function_name = child.name
-                                function_docstring = ast.get_docstring(child)
-                                func_classification = self.classify_node(function_name, function_docstring or "")
-                                self.hierarchy[file_key]["classes"][class_name]["functions"].append(
-                                    {"name": function_name, "docstring": function_docstring, "classification": func_classification}
-                                )
-                                if function_name not in self.processed_functions:
-                                    function_node = function_name
-                                    self.graph.add_node(function_node)
-                                    self.node_colors[function_node] = "orange"  # Function node
-                                    self.graph.add_edge(class_node, function_node)
-                                    self.processed_functions.add(function_name)
-                    elif isinstance(node, ast.FunctionDef):
-                        function_name = node.name
-                        function_docstring = ast.get_docstring(node)
-                        func_classification = self.classify_node(function_name, function_docstring or "")
-                        if function_name not in self.processed_functions:
-                            self.hierarchy[file_key]["functions"].append(
-                                {"name": function_name, "docstring": function_docstring, "classification": func_classification}
-                            )
-                            function_node = function_name
-                            self.graph.add_node(function_node)
-                            self.node_colors[function_node] = "orange"  # Function node
-                            self.graph.add_edge(file_key, function_node)
-                            self.processed_functions.add(function_name)
+            definitions = extract_definitions(file_path)
         except Exception as e:
-            print(f"Error parsing {file_path}: {e}")
+            logger.warning("Error parsing %s: %s", file_path, e)
+            count("parse_errors")
+            return
+        self.merge_definitions(os.path.relpath(file_path, self.directory), definitions)
 
-    def parse_directory(self):
+    def merge_definitions(self, file_key, definitions, cached_classifications=None):
+        """
+        Classify the definitions extracted from a file and add them to the hierarchy and graph.
+
+        :param file_key: The file node (path relative to the directory) the definitions belong to
+        :param definitions: The list returned by extract_definitions
+        :param cached_classifications: Classifications from the parse cache, aligned with definitions
+        :return: The classification used for each definition
+        """
+        self.hierarchy[file_key] = {"classes": {}, "functions": []}
+        classes = self.hierarchy[file_key]["classes"]
+        cached_classifications = cached_classifications or [None] * len(definitions)
+        classifications = []
+
+        def classify(name, docstring, cached):
+            classification = dict(cached) if cached else self.classify_node(name, docstring or "")
+            classifications.append(classification)
+            return classification
+
+        file_id = self.store.add_node(file_key, "file")
+
+        for (kind, name, docstring, owner), cached in zip(definitions, cached_classifications):
+            # Nodes are keyed by fully qualified name, so same-named definitions in different scopes stay distinct
+            short_name = name.rsplit(".", 1)[-1]
+            parent_id = self.store.ids[f"{file_key}::{owner}"] if owner else file_id
+
+            if kind == "class":
+                node_id = self.store.add_node(f"{file_key}::{name}", "class", parent_id)
+                classification = classify(short_name, docstring, cached)
+                classes[name] = {
+                    "docstring": docstring,
+                    "functions": [],
+                    "classification": classification
+                }
+            else:
+                qualified_name = f"{owner}.{name}" if owner else name
+                node_id = self.store.add_node(f"{file_key}::{qualified_name}", "function", parent_id)
+                classification = classify(short_name, docstring, cached)
+                functions = classes[owner]["functions"] if owner else self.hierarchy[file_key]["functions"]
+                functions.append({"name": name, "docstring": docstring, "classification": classification})
+            self.classified_nodes.append((node_id, classification))
+
+        return classifications
+
+    def parse_python_files(self, file_paths, workers=1):
+        """
+        Read and parse Python files, in a process pool when workers > 1.
+
+        :param file_paths: Paths of the Python files to parse
+        :param workers: Number of parser processes (1 parses in this process)
+        :return: A dictionary of file path -> (definitions, error message)
+        """
+        if workers <= 1 or len(file_paths) < 2:
+            return dict(zip(file_paths, map(_extract_definitions_safely, file_paths)))
+
+        # Fork when available: workers only parse source, and spawning would re-import torch in every worker
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        chunksize = max(1, len(file_paths) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            # map yields results in submission order, so merging stays deterministic
+            return dict(zip(file_paths, executor.map(_extract_definitions_safely, file_paths, chunksize=chunksize)))
+
+    def parse_directory(self, workers=1):
         """
         Parse the directory and create a graph representation with a singular root node.
+        The tree is walked first, the Python files are parsed (in parallel when workers > 1),
+        and the results are merged in walk order so the output does not depend on workers.
+
+        :param workers: Number of processes used to parse Python files
         """
         root_node = os.path.basename(self.directory)
-        self.graph.add_node(root_node)
-        self.node_colors[root_node] = "blue"  # Root node is a directory
+        root_id = self.store.add_node(".", "directory")  # Root node is a directory
         self.hierarchy[root_node] = {}
 
+        walk = []
         for root, dirs, files in os.walk(self.directory):
+            # Filter out excluded directories
+            dirs[:] = [d for d in dirs if not any(excluded in d for excluded in self.exclude_dirs)]
+            files = [f for f in files if not any(excluded in f for excluded in self.exclude_files)]
+            walk.append((root, list(dirs), files))
+
+        python_files = [os.path.join(root, f) for root, _, files in walk for f in files if f.endswith(".py")]
+        cached_files, parsed_files = self.load_python_files(python_files, workers)
+        cache_updates = []
+
+        for root, dirs, files in walk:
             relative_root = os.path.relpath(root, self.directory)
 
-            # Ensure correct parent-child relationships
+            # Nodes and hierarchy entries are keyed by path relative to the directory, so same-named
+            # directories and files in different places are not merged
             if relative_root == ".":
-                current_node = root_node
+                current_node, current_id = root_node, root_id
             else:
-                current_node = os.path.basename(relative_root)
-                self.graph.add_edge(root_node, current_node)
-                self.node_colors[current_node] = "blue"  # Directory
+                current_node, current_id = relative_root, self.store.ids[relative_root]
                 self.hierarchy[current_node] = {}
 
-            # Filter out excluded directories
-            dirs[:] = [d for d in dirs if not any(excluded in d for excluded in self.exclude_dirs)]
-
             for d in dirs:
-                dir_node = d
-                self.graph.add_edge(current_node, dir_node)
-                self.node_colors[dir_node] = "blue"  # Directory
-                self.hierarchy[current_node][dir_node] = {}
+                dir_node = os.path.normpath(os.path.join(relative_root, d))
+                self.store.add_node(dir_node, "directory", current_id)
+                self.hierarchy[current_node][d] = {}
 
             for f in files:
-                if not any(excluded in f for excluded in self.exclude_files):
-                    file_node = f
-                    self.graph.add_edge(current_node, file_node)
-                    self.node_colors[file_node] = "green"  # File
-                    if file_node.endswith(".py"):
-                        self.parse_python_file(os.path.join(root, f))
+                file_node = os.path.normpath(os.path.join(relative_root, f))
+                self.store.add_node(file_node, "file", current_id)
+                if file_node.endswith(".py"):
+                    self.merge_python_file(file_node, os.path.join(root, f), cached_files, parsed_files, cache_updates)
+
+        self.finish_parse(cached_files, cache_updates)
+        if self.parse_cache:
+            self.parse_cache.prune(self.directory, python_files)
+            print(f"Parsed {len(parsed_files)} changed file(s); {len(python_files) - len(parsed_files)} loaded from cache.")
+
+    def load_python_files(self, python_files, workers=1):
+        """
+        Look Python files up in the parse cache and parse the ones missing from it (or changed since).
+
+        :param python_files: Paths of the Python files
+        :param workers: Number of processes used to parse the changed files
+        :return: A (cache lookups, parsed files) tuple of dictionaries keyed by file path
+        """
+        cached_files = {}
+        if self.parse_cache:
+            classifier = self.classifier_name()
+            for file_path in python_files:
+                cached_files[file_path] = self.parse_cache.lookup(file_path, classifier)
+        changed_files = [path for path in python_files if cached_files.get(path, (None,))[0] is None]
+        with span("ast_parsing"), profile_stage("ast_parsing"):
+            parsed_files = self.parse_python_files(changed_files, workers)
+        count("files_parsed", len(changed_files))
+        count("files_cached", len(python_files) - len(changed_files))
+        return cached_files, parsed_files
+
+    def merge_python_file(self, file_key, file_path, cached_files, parsed_files, cache_updates):
+        """
+        Merge one file from load_python_files into the hierarchy and graph.
 
-    def visualize_directory(self, title="Directory Structure"):
+        :param file_key: The file node (path relative to the directory)
+        :param file_path: Path to the Python file
+        :param cached_files: Cache lookups from load_python_files
+        :param parsed_files: Parsed files from load_python_files
+        :param cache_updates: List that (file path, definitions, classifications) to store in the cache are appended to
+        :return: False if the file could not be parsed
+        """
+        if file_path in parsed_files:
+            (definitions, error), cached, fresh = parsed_files[file_path], None, False
+        else:
+            definitions, cached, _, fresh = cached_files[file_path]
+            error = None
+        if error:
+            logger.warning("Error parsing %s: %s", file_path, error)
+            count("parse_errors")
+            return False
+        classifications = self.merge_definitions(file_key, definitions, cached)
+        if self.parse_cache and (not fresh or classifications != cached):
+            cache_updates.append((file_path, definitions, classifications))
+        return True
+
+    def finish_parse(self, cached_files, cache_updates):
+        """
+        Resolve deferred classifications, copy them into the store and save the cache updates.
+
+        :param cached_files: Cache lookups from load_python_files
+        :param cache_updates: (file path, definitions, classifications) tuples from merge_python_file
+        """
+        if self.classification_pool:
+            self.resolve_pending_classifications()
+        for node_id, classification in self.classified_nodes:
+            self.store.set_classification(node_id, classification)
+        self.classified_nodes = []
+
+        # Store after the pool has resolved deferred classifications, which are updated in place
+        if self.parse_cache:
+            classifier = self.classifier_name()
+            for file_path, definitions, classifications in cache_updates:
+                fingerprint = cached_files[file_path][2]
+                self.parse_cache.store(file_path, fingerprint, classifier, definitions, classifications)
+
+    def is_excluded(self, relative_path, is_directory):
+        """
+        Apply the same exclusions as parse_directory to a path relative to the directory.
+
+        :param relative_path: Path relative to the directory
+        :param is_directory: Whether the path is a directory
+        :return: True if parse_directory would skip the path
+        """
+        parts = relative_path.split(os.sep)
+        directories = parts if is_directory else parts[:-1]
+        if any(excluded in part for part in directories for excluded in self.exclude_dirs):
+            return True
+        return not is_directory and any(excluded in parts[-1] for excluded in self.exclude_files)
+
+    def reserve_hierarchy_entry(self, file_key):
+        """
+        Reserve the hierarchy entry of a file that appeared after the directory was parsed. It is placed after the
+        last file of its directory, so the documentation keeps the layout parse_directory gives it.
+
+        :param file_key: The file node (path relative to the directory)
+        """
+        if file_key in self.hierarchy:
+            return
+        directory = os.path.dirname(file_key)
+        directory_key = directory or os.path.basename(self.directory)
+        entries = list(self.hierarchy.items())
+        position = len(entries)
+        for index, (key, value) in enumerate(entries):
+            if key == directory_key or (os.path.dirname(key) == directory and "classes" in value):
+                position = index + 1
+        self.hierarchy = dict(entries[:position] + [(file_key, {"classes": {}, "functions": []})] + entries[position:])
+
+    def add_directory(self, relative_dir):
+        """
+        Add a directory that appeared after the directory was parsed, along with any missing parents.
+
+        :param relative_dir: Path relative to the directory
+        :return: The directory's node ID
+        """
+        if relative_dir in self.store:
+            return self.store.ids[relative_dir]
+        parent = os.path.dirname(relative_dir) or "."
+        parent_id = self.add_directory(parent)
+        parent_key = os.path.basename(self.directory) if parent == "." else parent
+        self.hierarchy.setdefault(parent_key, {})[os.path.basename(relative_dir)] = {}
+        self.hierarchy[relative_dir] = {}
+        return self.store.add_node(relative_dir, "directory", parent_id)
+
+    def needs_rebuild(self, changes):
+        """
+        Whether a batch of changes can only be applied by parsing the whole directory again: dropped events, and
+        directories that were deleted or renamed (their subtrees would otherwise have to be re-keyed).
+
+        :param changes: A dictionary of changed path -> combined inotify mask
+        """
+        for mask in changes.values():
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF):
+                return True
+            if mask & IN_ISDIR and mask & (IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+                return True
+        return False
+
+    def update_paths(self, changes, workers=1):
+        """
+        Apply a batch of changes in place: only the changed files are re-parsed, and their nodes and hierarchy
+        entries are replaced. New directories are walked for their files. Falls back to reset and parse_directory
+        when needs_rebuild says so.
+
+        :param changes: A dictionary of changed path -> combined inotify mask (from InotifyWatcher)
+        :param workers: Number of processes used to parse the changed Python files
+        :return: True if the whole directory was parsed again
+        """
+        if self.needs_rebuild(changes):
+            self.reset()
+            self.parse_directory(workers=workers)
+            return True
+
+        changed_files = {}  # Path -> None, keeping the order changes were reported in
+        for path, mask in changes.items():
+            relative_path = os.path.relpath(path, self.directory)
+            if relative_path in (".", os.pardir) or relative_path.startswith(os.pardir + os.sep):
+                continue
+            if not os.path.isdir(path):
+                if not self.is_excluded(relative_path, False):
+                    changed_files[path] = None
+                continue
+            if self.is_excluded(relative_path, True):
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if not any(excluded in d for excluded in self.exclude_dirs)]
+                self.add_directory(os.path.relpath(root, self.directory))
+                for f in files:
+                    if not any(excluded in f for excluded in self.exclude_files):
+                        changed_files[os.path.join(root, f)] = None
+
+        # Drop the stale nodes of every changed file in one pass; files that still exist keep their file node
+        stale = {os.path.relpath(path, self.directory): os.path.isfile(path) for path in changed_files}
+        self.store.remove_nodes(
+            node_id for node_id, name in enumerate(self.store.names)
+            if (name in stale and not stale[name]) or ("::" in name and name.split("::", 1)[0] in stale)
+        )
+
+        python_files = []
+        for path in changed_files:
+            file_key = os.path.relpath(path, self.directory)
+            if not stale[file_key]:
+                self.hierarchy.pop(file_key, None)
+                if self.parse_cache and file_key.endswith(".py"):
+                    self.parse_cache.evict(path)
+                continue
+            self.store.add_node(file_key, "file", self.add_directory(os.path.dirname(file_key) or "."))
+            if file_key.endswith(".py"):
+                self.reserve_hierarchy_entry(file_key)
+                python_files.append(path)
+
+        cached_files, parsed_files = self.load_python_files(python_files, workers)
+        cache_updates, vanished = [], []
+        for path in python_files:
+            file_key = os.path.relpath(path, self.directory)
+            if not self.merge_python_file(file_key, path, cached_files, parsed_files, cache_updates):
+                self.hierarchy.pop(file_key, None)
+                if not os.path.exists(path):  # Deleted since it was listed
+                    vanished.append(self.store.ids[file_key])
+        self.finish_parse(cached_files, cache_updates)
+        # Removed last: removal renumbers nodes, and finish_parse applies classifications by node ID
+        self.store.remove_nodes(vanished)
+        return False
+
+    def classifier_name(self):
+        """
+        Identify the classifier so cached classifications from a different one are not reused.
+        """
+        if self.gpt2_generator:
+            return f"gpt2:{self.gpt2_generator.model_name}"
+        return "rules"
+
+    def reset(self):
+        """
+        Clear the parsed graph and hierarchy before parsing the directory again.
+        """
+        self.store = GraphStore()
+        self.classified_nodes = []
+        self.hierarchy = {}
+        self.pending_classifications = []
+
+    def watch(self, on_update, workers=1, debounce=0.5):
+        """
+        Watch the directory with inotify and update the graph and hierarchy whenever Python files or the tree
+        structure change. Only the changed files are re-parsed (see update_paths); the whole directory is parsed
+        again only when events were dropped or a directory was deleted or renamed.
+
+        :param on_update: Called with this visualizer after each update (e.g. to rewrite the markdown outputs)
+        :param workers: Number of processes used to parse changed Python files
+        :param debounce: Quiet period in seconds before a batch of changes is processed
+        """
+        with InotifyWatcher(self.exclude_dirs) as watcher:
+            watcher.add_tree(self.directory)
+            print(f"Watching {self.directory} for changes. Press Ctrl+C to stop.")
+            try:
+                while True:
+                    changes = watcher.wait_for_changes(debounce)
+                    relevant = [
+                        path for path, mask in changes.items()
+                        if (path.endswith(".py") or mask & STRUCTURE_MASK)
+                        and not any(excluded in os.path.basename(path) for excluded in self.exclude_files)
+                    ]
+                    if not relevant:
+                        continue
+                    print(f"Detected {len(relevant)} change(s), updating...")
+                    self.update_paths({path: changes[path] for path in relevant}, workers=workers)
+                    on_update(self)
+            except KeyboardInterrupt:
+                print("Stopped watching.")
+
+    def load_positions(self, positions_file):
+        """
+        Load node positions saved by an earlier render, keyed by qualified node name.
+
+        :param positions_file: Path to the positions JSON file
+        :return: A (number of nodes, 2) array with NaN for nodes without a saved position
+        """
+        positions = np.full((len(self.store), 2), np.nan)
+        if positions_file and os.path.exists(positions_file):
+            with open(positions_file, "r") as file:
+                for name, position in json.load(file).items():
+                    node_id = self.store.ids.get(name)
+                    if node_id is not None:
+                        positions[node_id] = position
+        return positions
+
+    def save_positions(self, positions, positions_file):
+        """
+        Save node positions keyed by qualified node name, keeping entries for nodes not in this graph.
+
+        :param positions: A (number of nodes, 2) array of positions
+        :param positions_file: Path to the positions JSON file
+        """
+        saved = {}
+        if os.path.exists(positions_file):
+            with open(positions_file, "r") as file:
+                saved = json.load(file)
+        saved.update((name, positions[node_id].tolist()) for node_id, name in enumerate(self.store.names))
+        with open(positions_file, "w") as file:
+            json.dump(saved, file)
+
+    def visualize_directory(self, title="Directory Structure", seed=0, positions_file=POSITIONS_FILE):
         """
         Visualize the directory structure as a left-to-right graph.
 
         :param title: Title of the graph
+        :param seed: Seed for the force-directed fallback layout
+        :param positions_file: Sidecar file that keeps force-directed node positions between renders (None disables it)
         """
+        graph = self.store.to_networkx()
         plt.figure(figsize=(12, 8))
 
         # Set the layout to display left-to-right
         try:
-            pos = nx.nx_agraph.graphviz_layout(self.graph, prog="dot", args="-Grankdir=LR")
+            with span("layout", algorithm="graphviz"):
+                pos = nx.nx_agraph.graphviz_layout(graph, prog="dot", args="-Grankdir=LR")
         except ImportError:
-            print("Error: PyGraphviz or pydot is required for graph layout. Falling back to spring layout.")
-            pos = nx.spring_layout(self.graph)
+            print("Error: PyGraphviz or pydot is required for graph layout. Falling back to force-directed layout.")
+            known = self.load_positions(positions_file)
+            with span("layout", algorithm="incremental"):
+                positions = incremental_layout(len(self.store), self.store.edge_sources, self.store.edge_targets, known,
+                                               seed=seed)
+            if positions_file:
+                self.save_positions(positions, positions_file)
+            pos = dict(enumerate(positions))
 
         # Extract node colors
-        node_colors = [self.node_colors[node] for node in self.graph.nodes]
+        node_colors = [self.store.color(node) for node in graph.nodes]
+        labels = {node: self.store.label(node) for node in graph.nodes}
 
         # Draw the graph
-        nx.draw(self.graph, pos, with_labels=True, node_size=2000, font_size=6, font_color="black",
-                node_color=node_colors, edge_color="gray", font_weight="bold", alpha=0.8)
+        with span("rendering", output="figure"):
+            nx.draw(graph, pos, labels=labels, with_labels=True, node_size=2000, font_size=6, font_color="black",
+                    node_color=node_colors, edge_color="gray", font_weight="bold", alpha=0.8)
 
         plt.title(title)
         plt.show()
 
+    def write_documentation(self, markdown_file="directory_hierarchy.md", readme_file="README_test.md", json_file=None):
+        """
+        Write the hierarchy markdown, the README and optionally a JSON copy of the hierarchy with a single
+        iterative traversal of self.hierarchy.
+
+        :param markdown_file: Hierarchy markdown path, or None to skip it
+        :param readme_file: README path, or None to skip it
+        :param json_file: Hierarchy JSON path, or None to skip it
+        """
+        sinks = []
+        if markdown_file:
+            sinks.append(HierarchyMarkdownSink(markdown_file))
+        if readme_file:
+            sinks.append(ReadmeSink(readme_file))
+        if json_file:
+            sinks.append(JsonSink(json_file))
+        with span("rendering", output="documentation"):
+            render_hierarchy(self.hierarchy, sinks)
+
     def save_hierarchy_to_markdown(self, output_file="directory_hierarchy.md"):
         """
         Save the parsed hierarchy to a markdown file.
 
         :param output_file: The name of the output markdown file
         """
-        with open(output_file, "w") as md_file:
-            md_file.write("# Application Summary\n\n")
-            md_file.write("This document provides an overview of the application's structure, including directories, Python files, classes, and functions.\n\n")
-
-            def write_dict_to_md(d, indent=0):
-                for key, value in d.items():
-                    md_file.write("    " * indent + f"- {key}\n")
-                    if isinstance(value, dict):
-                        if "docstring" in value:
-                            doc = value["docstring"] or "No description available."
-                            md_file.write("    " * (indent + 1) + f"> {doc.strip()}\n")
-                        if "classification" in value:
-                            arch = value["classification"].get("architecture", "Other")
-                            bus = value["classification"].get("business", "Product")
-                            md_file.write("    " * (indent + 1) + f"> Architecture: {arch}, Business: {bus}\n")
-                        if "functions" in value:
-                            for func in value["functions"]:
-                                md_file.write("    " * (indent + 1) + f"- {func['name']}\n")
-                                if func.get("docstring"):
-                                    md_file.write("    " * (indent + 2) + f"> {func['docstring'].strip()}\n")
-                                if func.get("classification"):
-                                    f_arch = func["classification"].get("architecture", "Other")
-                                    f_bus = func["classification"].get("business", "Product")
-                                    md_file.write("    " * (indent + 2) + f"> Architecture: {f_arch}, Business: {f_bus}\n")
-                        write_dict_to_md(value, indent + 1)
-                    elif isinstance(value, list):
-                        for item in value:
-                            if isinstance(item, dict):
-                                md_file.write("    " * (indent + 1) + f"- {item['name']}\n")
-                                if item.get("docstring"):
-                                    md_file.write("    " * (indent + 2) + f"> {item['docstring'].strip()}\n")
-                                if item.get("classification"):
-                                    f_arch = item["classification"].get("architecture", "Other")
-                                    f_bus = item["classification"].get("business", "Product")
-                                    md_file.write("    " * (indent + 2) + f"> Architecture: {f_arch}, Business: {f_bus}\n")
-                            else:
-                                md_file.write("    " * (indent + 1) + f"- {item}\n")
-
-            write_dict_to_md(self.hierarchy)
+        with span("rendering", output="documentation"):
+            render_hierarchy(self.hierarchy, [HierarchyMarkdownSink(output_file)])
 
     def generate_readme(self, output_file="README_test.md"):
         """
@@ -259,96 +662,75 @@ class DirectoryVisualizer:
 
         :param output_file: The name of the README file
         """
-        with open(output_file, "w") as readme_file:
-            readme_file.write("# Project README\n\n")
-            readme_file.write("## Overview\n")
-            readme_file.write("This project provides a hierarchical overview of directories, Python files, classes, and their functions. "
-                              "It includes classifications based on architectural and business logic to aid developers in navigating the codebase.\n\n")
-            readme_file.write("## Structure\n")
-            readme_file.write("Below is a high-level view of the project structure:\n\n")
-
-            def write_readme_structure(d, indent=0):
-                for key, value in d.items():
-                    if key == "functions":
-                        continue
-                    readme_file.write("    " * indent + f"- **{key}**\n")
-                    if isinstance(value, dict):
-                        if "docstring" in value:
-                            doc = value["docstring"] or "No description available."
-                            readme_file.write("    " * (indent + 1) + f"> {doc.strip()}\n")
-                        if "classification" in value:
-                            arch = value["classification"].get("architecture", "Other")
-                            bus = value["classification"].get("business", "Product")
-                            readme_file.write("    " * (indent + 1) + f"> Architecture: {arch}, Business: {bus}\n")
-                        if "functions" in value:
-                            readme_file.write("    " * (indent + 1) + "Functions:\n")
-                            for func in value["functions"]:
-                                readme_file.write("    " * (indent + 2) + f"- {func['name']}\n")
-                                if func.get("docstring"):
-                                    readme_file.write("    " * (indent + 3) + f"> {func['docstring'].strip()}\n")
-                                if func.get("classification"):
-                                    f_arch = func["classification"].get("architecture", "Other")
-                                    f_bus = func["classification"].get("business", "Product")
-                                    readme_file.write("    " * (indent + 3) + f"> Architecture: {f_arch}, Business: {f_bus}\n")
-                        write_readme_structure(value, indent + 1)
-                    elif isinstance(value, list):
-                        for item in value:
-                            if isinstance(item, dict):
-                                readme_file.write("    " * (indent + 1) + f"- {item['name']}\n")
-                                if item.get("docstring"):
-                                    readme_file.write("    " * (indent + 2) + f"> {item['docstring'].strip()}\n")
-                                if item.get("classification"):
-                                    f_arch = item["classification"].get("architecture", "Other")
-                                    f_bus = item["classification"].get("business", "Product")
-                                    readme_file.write("    " * (indent + 2) + f"> Architecture: {f_arch}, Business: {f_bus}\n")
-                            else:
-                                readme_file.write("    " * (indent + 1) + f"- {item}\n")
-
-            write_readme_structure(self.hierarchy)
-
-            readme_file.write("\n## Usage\n")
-            readme_file.write("### CLI Example\n")
-            readme_file.write("Run the following command to execute the visualization:\n")
-            readme_file.write("```bash\n")
-            readme_file.write("python visualize.py\n")
-            readme_file.write("```\n")
-            readme_file.write("\n### Output\n")
-            readme_file.write("This program generates:\n")
-            readme_file.write("- An interactive graph visualizing the directory structure.\n")
-            readme_file.write("- A detailed markdown hierarchy (`directory_hierarchy.md`).\n")
-            readme_file.write("- A comprehensive README file summarizing the application (`README.md`).\n\n")
-
-            readme_file.write("## Contributing\n")
-            readme_file.write("Contributions are welcome! Submit pull requests or report issues.\n\n")
-            readme_file.write("## License\n")
-            readme_file.write("This project is licensed under the MIT License. See the LICENSE file for details.\n")
+        with span("rendering", output="documentation"):
+            render_hierarchy(self.hierarchy, [ReadmeSink(output_file)])
 
 ## MAIN ###################################################################################################################
 def main():
     """
     Main function to analyze the directory and generate classifications.
     """
+    parser = argparse.ArgumentParser(description="Parse and classify a directory.")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of GPT-2 classification worker processes (0 classifies in-process)")
+    parser.add_argument("--threads-per-worker", type=int, default=1,
+                        help="torch threads pinned to each classification worker")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes used to read and parse Python files")
+    parser.add_argument("--cache-file", default=PARSE_CACHE_FILE,
+                        help="Per-file parse cache so only changed files are parsed again")
+    parser.add_argument("--no-cache", action="store_true", help="Parse and classify every file")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and update the markdown outputs as files change (Linux only)")
+    parser.add_argument("--json", default=None, help="Also write the hierarchy as JSON to this file")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+    profiler = start_profiling(args.profile, args.profile_dir)
+
     # Initialize GPT-2
     gpt2_generator = GPT2TokenGenerator()
     gpt2_generator.load_model_and_tokenizer()
     gpt2_generator.warm_up("Classify the following: Example")
 
+    classification_pool = None
+    if args.workers > 0:
+        classification_pool = ClassificationWorkerPool(gpt2_generator, args.workers, args.threads_per_worker).start()
+
     # Initialize DirectoryVisualizer with GPT-2
     visualizer = DirectoryVisualizer(
         directory=TARGET_DIRECTORY,
         exclusions_files=EXCLUSIONS,
         exclusions_dirs=EXCLUSIONS,
-        gpt2_generator=gpt2_generator
+        gpt2_generator=gpt2_generator,
+        classification_pool=classification_pool,
+        parse_cache=None if args.no_cache else ParseCache(args.cache_file).connect()
     )
 
+    def write_outputs(visualizer):
+        print("Saving hierarchy to markdown...")
+        with profile_stage("rendering"):
+            visualizer.write_documentation(json_file=args.json)
+
     # Parse and classify
-    print("Parsing directory...")
-    visualizer.parse_directory()
-    print("Saving hierarchy to markdown...")
-    visualizer.save_hierarchy_to_markdown()
-    print("Visualizing directory structure...")
-    visualizer.visualize_directory()
-    visualizer.generate_readme()
+    try:
+        print("Parsing directory...")
+        with profile_stage("parse_directory"):
+            visualizer.parse_directory(workers=args.parse_workers)
+        write_outputs(visualizer)
+        if args.watch:
+            visualizer.watch(write_outputs, workers=args.parse_workers)
+        else:
+            print("Visualizing directory structure...")
+            with profile_stage("visualize"):
+                visualizer.visualize_directory()
+    finally:
+        if classification_pool:
+            classification_pool.close()
+        if visualizer.parse_cache:
+            visualizer.parse_cache.close()
+        profiler.close()
+        write_reports()
     
 if __name__ == "__main__":
     main()
@@ -0,0 +1,152 @@
+## SUMMARY ###########################################################################################################
+# Class: ParseCache
+# - connect: Connect to the cache database and create the cache table
+# - close: Commit and close the cache database
+# - lookup: Return the cached definitions and classifications for a file if it is unchanged
+# - store: Save a file's definitions, classifications and fingerprint
+# - evict: Remove the entry for one file
+# - prune: Remove entries for files under a directory that no longer exist
+# Functions:
+# - hash_file: SHA-256 of a file's contents
+## LIBRARIES ###########################################################################################################
+import os
+import json
+import hashlib
+import sqlite3
+## CONFIGURATION #######################################################################################################
+PARSE_CACHE_FILE = "devatlas_parse_cache.db"
+PARSE_CACHE_VERSION = 1  # Bump when the shape of extracted definitions changes
+
+## FUNCTIONS #########################################################################################################
+def hash_file(file_path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+## CLASSES ###########################################################################################################
+class ParseCache:
+    def __init__(self, cache_file=PARSE_CACHE_FILE):
+        """
+        Initialize a persistent per-file cache of extracted definitions and classifications.
+
+        :param cache_file: Path to the SQLite cache file
+        """
+        self.cache_file = cache_file
+        self.connection = None
+        self.cursor = None
+
+    def connect(self):
+        """Connect to the cache database and create the cache table."""
+        self.connection = sqlite3.connect(self.cache_file)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                classifier TEXT NOT NULL,
+                definitions TEXT NOT NULL,
+                classifications TEXT NOT NULL
+            );
+            """
+        )
+        self.connection.commit()
+        return self
+
+    def close(self):
+        """Commit and close the cache database."""
+        if self.connection:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+            self.cursor = None
+
+    def lookup(self, file_path, classifier):
+        """
+        Look up a file. The file is only read and hashed when its mtime or size changed, so a touched but
+        otherwise unchanged file is still a hit.
+
+        :param file_path: Path to the Python file
+        :param classifier: Identifies the classifier; cached classifications from another classifier are discarded
+        :return: (definitions, classifications, fingerprint, fresh). definitions is None on a miss, classifications
+                 is None when they must be recomputed, and fresh is True when the stored entry needs no update.
+                 fingerprint is None when the file could not be read, e.g. it was deleted or renamed after it was
+                 listed (an editor saving through a temporary file); its entry is then evicted.
+        """
+        self.cursor.execute(
+            "SELECT mtime_ns, size, content_hash, version, classifier, definitions, classifications "
+            "FROM parse_cache WHERE path = ?",
+            (file_path,)
+        )
+        row = self.cursor.fetchone()
+
+        try:
+            stat = os.stat(file_path)
+            if row and row[3] == PARSE_CACHE_VERSION and (row[0], row[1]) == (stat.st_mtime_ns, stat.st_size):
+                content_hash, fresh = row[2], True
+            else:
+                content_hash, fresh = hash_file(file_path), False
+        except OSError:
+            self.evict(file_path)
+            return None, None, None, False
+        fingerprint = (stat.st_mtime_ns, stat.st_size, content_hash)
+
+        if not row or row[3] != PARSE_CACHE_VERSION or row[2] != content_hash:
+            return None, None, fingerprint, False
+
+        definitions = [tuple(definition) for definition in json.loads(row[5])]
+        if row[4] != classifier:
+            return definitions, None, fingerprint, False
+        return definitions, json.loads(row[6]), fingerprint, fresh
+
+    def store(self, file_path, fingerprint, classifier, definitions, classifications):
+        """
+        Save a file's definitions and classifications.
+
+        :param file_path: Path to the Python file
+        :param fingerprint: The (mtime_ns, size, content_hash) returned by lookup; None stores nothing
+        :param classifier: Identifies the classifier that produced the classifications
+        :param definitions: The list returned by extract_definitions
+        :param classifications: Classification per definition (None for definitions that were skipped)
+        """
+        if fingerprint is None:
+            return
+        mtime_ns, size, content_hash = fingerprint
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO parse_cache "
+            "(path, mtime_ns, size, content_hash, version, classifier, definitions, classifications) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_path, mtime_ns, size, content_hash, PARSE_CACHE_VERSION, classifier,
+             json.dumps(definitions), json.dumps(classifications))
+        )
+
+    def evict(self, file_path):
+        """
+        Remove the entry for one file, e.g. after it was deleted.
+
+        :param file_path: Path to the Python file
+        """
+        self.cursor.execute("DELETE FROM parse_cache WHERE path = ?", (file_path,))
+
+    def prune(self, directory, file_paths):
+        """
+        Remove cache entries under a directory for files that are no longer part of its parse.
+
+        :param directory: The directory that was parsed
+        :param file_paths: Paths of all Python files in the current parse
+        """
+        prefix = os.path.join(directory, "")
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS live_paths (path TEXT PRIMARY KEY)")
+        self.cursor.execute("DELETE FROM live_paths")
+        self.cursor.executemany("INSERT OR IGNORE INTO live_paths (path) VALUES (?)", ((path,) for path in file_paths))
+        self.cursor.execute(
+            "DELETE FROM parse_cache WHERE substr(path, 1, ?) = ? AND path NOT IN (SELECT path FROM live_paths)",
+            (len(prefix), prefix)
+        )
+        self.connection.commit()
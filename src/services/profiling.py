@@ -0,0 +1,260 @@
+## SUMMARY ###########################################################################################################
+# Class: StageProfiler
+# - stage: Context manager around one pipeline stage (scrape a repo, parse, layout, render, ...)
+#   - "cpu": Each stage has its own cProfile profiler, dumped to <stage>.pstats; nested stages are timed exclusively
+#   - "mem": tracemalloc snapshots, traced and peak memory and peak RSS at stage entry and exit, diffed per stage
+# - close: Write the .pstats files and the text report
+# Functions:
+# - start_profiling: Configure the process-wide profiler from --profile / --profile-dir
+# - profile_stage: Stage of the process-wide profiler (a shared no-op context when profiling is off)
+# - add_profile_arguments: Add --profile and --profile-dir to an argparse parser
+# - percentile: Linear-interpolated percentile of a list of samples (shared by the benchmark and load-test reports)
+## LIBRARIES ###########################################################################################################
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import nullcontext
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is left out of the report
+    resource = None
+## CONFIGURATION #######################################################################################################
+PROFILE_MODES = ("cpu", "mem")
+PROFILE_DIR = "profiles"
+TRACEMALLOC_FRAMES = 1      # Frames kept per allocation; 1 groups by allocating line at the lowest overhead
+REPORT_FUNCTIONS = 20       # Functions per stage in the CPU report
+REPORT_ALLOCATIONS = 15     # Allocation sites per stage in the memory report
+NULL_STAGE = nullcontext()
+
+## FUNCTIONS #########################################################################################################
+def peak_rss_bytes():
+    """
+    :return: Peak resident set size of this process so far, or None when it cannot be read
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Bytes on macOS, kilobytes on Linux
+
+def current_rss_bytes():
+    """
+    :return: Current resident set size (Linux), or None
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def format_bytes(value):
+    """
+    :param value: Byte count (may be negative) or None
+    :return: Human readable size
+    """
+    if value is None:
+        return "n/a"
+    sign, value = ("-" if value < 0 else ""), abs(value)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{sign}{value:.1f} {unit}" if unit != "B" else f"{sign}{value} B"
+        value /= 1024
+
+def safe_name(name):
+    """
+    :param name: Stage name
+    :return: The name with characters that are unsafe in file names replaced
+    """
+    return "".join(character if character.isalnum() or character in "-_." else "_" for character in name)
+
+def percentile(samples, pct):
+    """
+    :param samples: List of numbers
+    :param pct: Percentile between 0 and 100
+    :return: The linear-interpolated percentile, or 0.0 for no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+## CLASSES ###########################################################################################################
+class StageProfiler:
+    def __init__(self, mode=None, output_dir=PROFILE_DIR):
+        """
+        Opt-in profiler for pipeline stages. Only the calling process is profiled (not parse or classification
+        worker processes).
+
+        :param mode: "cpu", "mem" or None (disabled)
+        :param output_dir: Directory for the .pstats files and the report
+        """
+        if mode not in PROFILE_MODES + (None,):
+            raise ValueError(f"Unknown profile mode {mode!r} (use one of {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.profiles = {}   # CPU: stage -> cProfile.Profile, accumulated over every entry of the stage
+        self.active = []     # CPU: profilers of the open stages, innermost last
+        self.open = []       # Memory: records of the open stages, innermost last
+        self.records = []    # Memory: finished stage records in exit order
+        if mode == "mem" and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    def stage(self, name):
+        """
+        :param name: Stage name, used for the .pstats file name
+        :return: A context manager profiling its block
+        """
+        if self.mode == "cpu":
+            return CpuStage(self, name)
+        if self.mode == "mem":
+            return MemoryStage(self, name)
+        return NULL_STAGE
+
+    def update_peaks(self):
+        """Fold the tracemalloc peak into every open stage before the peak is reset for a new stage."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for record in self.open:
+            record["traced_peak"] = max(record["traced_peak"], peak)
+
+    def close(self):
+        """
+        Write the per-stage .pstats files (CPU) and the text report.
+
+        :return: Path of the report, or None when profiling is disabled
+        """
+        if not self.enabled:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        report = io.StringIO()
+        if self.mode == "cpu":
+            for name, profile in self.profiles.items():
+                stats_file = os.path.join(self.output_dir, f"{safe_name(name)}.pstats")
+                profile.dump_stats(stats_file)
+                report.write(f"=== Stage {name} ({stats_file}) ===\n")
+                pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(REPORT_FUNCTIONS)
+            report_file = os.path.join(self.output_dir, "cpu_report.txt")
+        else:
+            self.write_memory_report(report)
+            report_file = os.path.join(self.output_dir, "memory_report.txt")
+            tracemalloc.stop()
+        with open(report_file, "w") as file:
+            file.write(report.getvalue())
+        print(f"Profile report written to {report_file}")
+        return report_file
+
+    def write_memory_report(self, report):
+        """
+        :param report: Stream the per-stage memory records are written to
+        """
+        for record in self.records:
+            report.write(f"=== Stage {record['name']} ({record['seconds']:.2f}s) ===\n")
+            report.write(f"Traced memory: {format_bytes(record['traced_before'])} -> {format_bytes(record['traced_after'])}"
+                         f" ({format_bytes(record['traced_after'] - record['traced_before'])}),"
+                         f" peak {format_bytes(record['traced_peak'])}\n")
+            report.write(f"RSS: {format_bytes(record['rss_before'])} -> {format_bytes(record['rss_after'])},"
+                         f" peak RSS so far {format_bytes(record['peak_rss'])}\n")
+            report.write("Largest allocation changes:\n")
+            for difference in record["top"]:
+                report.write(f"  {difference}\n")
+            report.write("\n")
+
+class CpuStage:
+    """cProfile around one stage. An inner stage pauses the outer stage's profiler, so time is counted once."""
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        active = self.profiler.active
+        if active:
+            active[-1].disable()
+        profile = self.profiler.profiles.get(self.name)
+        if profile is None:
+            profile = self.profiler.profiles[self.name] = cProfile.Profile()
+        active.append(profile)
+        profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        active = self.profiler.active
+        active.pop().disable()
+        if active:
+            active[-1].enable()
+        return False
+
+class MemoryStage:
+    """tracemalloc snapshot and RSS at the entry and exit of one stage."""
+    __slots__ = ("profiler", "name", "record", "snapshot")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.update_peaks()
+        tracemalloc.reset_peak()
+        self.snapshot = tracemalloc.take_snapshot()
+        traced = tracemalloc.get_traced_memory()[0]
+        self.record = {"name": self.name, "start": time.perf_counter(), "traced_before": traced, "traced_peak": traced,
+                       "rss_before": current_rss_bytes()}
+        self.profiler.open.append(self.record)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.profiler.update_peaks()
+        record = self.profiler.open.pop()
+        # Allocations made by tracemalloc itself are left out of the diff
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        record.update({
+            "seconds": time.perf_counter() - record.pop("start"),
+            "traced_after": tracemalloc.get_traced_memory()[0],
+            "rss_after": current_rss_bytes(),
+            "peak_rss": peak_rss_bytes(),
+            "top": after.compare_to(self.snapshot.filter_traces(ignore), "lineno")[:REPORT_ALLOCATIONS],
+        })
+        self.snapshot = None
+        self.profiler.records.append(record)
+        return False
+
+## PROCESS-WIDE PROFILER #############################################################################################
+PROFILER = StageProfiler()
+
+def start_profiling(mode, output_dir=PROFILE_DIR):
+    """
+    Replace the process-wide profiler.
+
+    :param mode: "cpu", "mem" or None
+    :param output_dir: Directory for the profile files
+    :return: The new profiler (call close() at the end of the run)
+    """
+    global PROFILER
+    PROFILER = StageProfiler(mode, output_dir)
+    return PROFILER
+
+def profile_stage(name):
+    """
+    :param name: Stage name
+    :return: A stage of the process-wide profiler, or a shared no-op context when profiling is off
+    """
+    return PROFILER.stage(name)
+
+def add_profile_arguments(parser):
+    """
+    :param parser: argparse parser of an entry point
+    """
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="Profile each pipeline stage: cpu writes per-stage .pstats, mem diffs tracemalloc snapshots")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="Directory for profile files and the report")
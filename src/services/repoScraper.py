@@ -2,40 +2,117 @@
 import re
 import os
 import sqlite3
+import argparse
 ## IMPORT CLASSES ########################################################################################################
-from github import Github
+from github import Auth, Github
 from github.GithubException import UnknownObjectException
 ## DEV_ATLAS CLASSES #####################################################################################################
-from services.contentAnalyzer import GPTContentAnalyzer
+from services.contentAnalyzer import ContentAnalyzer, MAX_TOKENS as COMPLETION_TOKENS, PACKED_ITEM_TOKENS, \
+    PACKED_MAX_TOKENS
+from services.analysisBackends import create_backend, add_backend_arguments, BATCH_SIZE
+from services.chunkStore import ChunkStore
+from services.domainTaxonomy import DomainTaxonomy, SHORTLIST_SIZE
+from services.embeddingIndex import SemanticIndex
+from services.fileFilter import FileFilter, MAX_FILE_BYTES, TRUNCATE_CHARS
+from services.analysisBudget import TokenLedger, AdaptiveChunker, TOKEN_BUDGET, COST_BUDGET, BUDGET_POLICIES
+from services.instrumentation import span, count, get_logger, configure_logging, write_reports
+from services.profiling import profile_stage, start_profiling, add_profile_arguments
 ## FUNCTIONS ############################################################################################################
 from dotenv import load_dotenv
 ## CONFIGURATION ########################################################################################################
 load_dotenv()
 DB = os.getenv("DATABASE")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")  # GitHub Enterprise or a local stand-in
 ## TESTING ##############################################################################################################
 RUN_STYLE = 'SINGLE' # 'MULTI'
 MAX_TOKENS = 500
+PACK_ITEMS = int(os.getenv("PACK_ITEMS", "1"))   # Chunks per LLM request (1 sends each chunk on its own)
+PACK_CHARS = 8000                                # Chunk characters per packed request
+logger = get_logger("repoScraper")
 ## CLASSES ############################################################################################################
 class RepoScraper:
     IGNORE_REPOS = ["src/data/", "env/", ".env", ".venv"]  # List of files or directories to ignore
 
-    def __init__(self, db_file, github_token):
+    def __init__(self, db_file, github_token, token_budget=TOKEN_BUDGET, cost_budget=COST_BUDGET, budget_policy="stop",
+                 adaptive_chunks=False, pack_items=PACK_ITEMS, shortlist_size=SHORTLIST_SIZE, backend=None,
+                 batch_size=BATCH_SIZE, github_url=GITHUB_API_URL, file_filter=None, semantic_index=None):
         self.db_file = db_file
-        self.github = Github(github_token)
+        self.github = Github(auth=Auth.Token(github_token) if github_token else None, base_url=github_url)
         self.connection = None
         self.cursor = None
+        self.chunk_store = None
         self.repo_list = []  # List of repositories to scrape
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.budget_policy = budget_policy
+        self.adaptive_chunks = adaptive_chunks  # Pick chunk sizes from observed token usage instead of MAX_TOKENS
+        self.ledger = None   # Token accounting of the current run
+        self.chunker = AdaptiveChunker(MAX_TOKENS)
+        self.pack_items = pack_items
+        self.shortlist_size = shortlist_size
+        self.taxonomy = None # DomainTaxonomy of the domains table, kept current as domains are added
+        self.pending = []    # (file ID, blob ID, chunk) waiting for a packed or batched request
+        self.backend = backend  # AnalysisBackend of the run (default: create_backend())
+        self.batch_size = batch_size  # Requests (single or packed) dispatched to the backend together
+        self.analyzer = None
+        self.file_filter = file_filter or FileFilter()  # Skips binary, generated and oversized files before analysis
+        self.semantic_index = semantic_index  # Optional SemanticIndex adding embedding similarity to domain shortlists
+        self.run_open = False   # start_run was called and finish_run was not
 
     def connect_db(self):
         """Connect to the SQLite database."""
         self.connection = sqlite3.connect(self.db_file)
         self.cursor = self.connection.cursor()
+        self.chunk_store = ChunkStore(self.connection)
 
     def close_db(self):
         """Close the SQLite database connection."""
         if self.connection:
             self.connection.commit()
             self.connection.close()
+            self.connection = None
+            self.cursor = None
+
+    def start_run(self):
+        """
+        Open an analysis run: connect, move chunk text stored before chunk blobs existed, and set up the analyzer,
+        the domain taxonomy (with the semantic index, if any, after embedding new and changed domains) and a started
+        token ledger. run() calls it, and so does scrape_repo(), so a repository
+        can also be scraped on its own (finish_run() and close_db() then end the run). Does nothing while a run is
+        open.
+        """
+        if self.run_open:
+            return
+        if not self.connection:
+            self.connect_db()
+        self.analyzer = ContentAnalyzer(self.db_file, self.connection, self.backend or create_backend())
+        self.chunker.context_tokens = self.analyzer.backend.context_tokens
+        if self.semantic_index is not None:
+            with profile_stage("embed_domains"):
+                self.semantic_index.build(content=False)
+        self.taxonomy = DomainTaxonomy(self.fetch_domains(), semantic_index=self.semantic_index)
+        with profile_stage("migrate"):
+            migrated = self.chunk_store.migrate()
+        if migrated:
+            print(f"Moved {migrated} content rows into chunk blobs.")
+        self.ledger = TokenLedger(self.connection, self.analyzer.backend.model, self.token_budget, self.cost_budget,
+                                  self.budget_policy, max_tokens=COMPLETION_TOKENS).start()
+        self.run_open = True
+
+    def finish_run(self, status=None):
+        """
+        Close the run opened by start_run and print its token usage per repository.
+
+        :param status: Final status of the run (default: completed, or budget_exhausted)
+        """
+        if not self.run_open:
+            return
+        self.run_open = False
+        self.ledger.finish(status)
+        for repo, chunks, analyzed, prompt_tokens, completion_tokens in self.ledger.repo_usage(self.ledger.run_id):
+            print(f"{repo}: {chunks} chunks ({analyzed} analyzed), {prompt_tokens} + {completion_tokens} tokens")
+        if self.file_filter.counts:
+            print("Files filtered: " + ", ".join(f"{reason} {files}" for reason, files in self.file_filter.report()))
 
     def insert_repo(self, name, platform, url):
         """Insert a repository into the repos table."""
@@ -45,24 +122,29 @@ class RepoScraper:
         )
         return self.cursor.lastrowid
 
-    def insert_file_object(self, repo_id, file_type, name, url):
+    def insert_file_object(self, repo_id, file_type, name, url, path=None):
         """Insert a file object into the fileObjects table."""
         self.cursor.execute(
-            "INSERT INTO fileObjects (repo_id, type, name, url) VALUES (?, ?, ?, ?)",
-            (repo_id, file_type, name, url),
+            "INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (?, ?, ?, ?, ?)",
+            (repo_id, file_type, name, url, path),
         )
         return self.cursor.lastrowid
 
     def insert_content(self, file_object_id, description, domain_id):
-        """Insert content into the content table."""
-        self.cursor.execute(
-            "INSERT INTO content (fileObject_id, description, domain_id) VALUES (?, ?, ?)",
-            (file_object_id, description, domain_id),
-        )
+        """Insert content into the content table (the text is stored once per unique chunk, in chunk_blobs)."""
+        content_id, _, _ = self.chunk_store.add_content(file_object_id, description, domain_id)
+        return content_id
 
     def fetch_domains(self):
-        """Fetch all domains from the domains table."""
-        self.cursor.execute("SELECT id, name FROM domains")
+        """Fetch all domains from the domains table, most linked first."""
+        self.cursor.execute(
+            """
+            SELECT d.id, d.name FROM domains d
+            LEFT JOIN (SELECT domain_id, COUNT(*) AS links FROM content_domain_relationships GROUP BY domain_id) u
+                ON u.domain_id = d.id
+            ORDER BY COALESCE(u.links, 0) DESC, d.id
+            """
+        )
         return self.cursor.fetchall()
 
     def map_to_domain(self, content, domains):
@@ -75,11 +157,12 @@ class RepoScraper:
     def parse_gitignore(self, repo):
         """Parse the .gitignore file in the repository, if it exists."""
         try:
-            gitignore_file = repo.get_contents(".gitignore")
+            with span("github_fetch", call="get_contents"):
+                gitignore_file = repo.get_contents(".gitignore")
             gitignore_path = gitignore_file.decoded_content.decode("utf-8", errors="ignore").splitlines()
             print(f".gitignore found and parsed for {repo.full_name}")
             return gitignore_path
-        except self.github.UnknownObjectException:
+        except UnknownObjectException:
             print(f"No .gitignore found in {repo.full_name}. Proceeding without ignoring files.")
             return []
         except Exception as e:
@@ -97,128 +180,372 @@ class RepoScraper:
         return False
 
     def scrape_repo(self, repo_full_name):
-        """Scrape a GitHub repository and insert data into the database."""
-        repo = self.github.get_repo(repo_full_name)
+        """Scrape a GitHub repository and insert data into the database (within the open run, or a new one)."""
+        self.start_run()
+        with span("github_fetch", call="get_repo"):
+            repo = self.github.get_repo(repo_full_name)
         repo_id = self.insert_repo(repo.name, "GitHub", repo.html_url)
 
         # Parse the .gitignore file
         gitignore_patterns = self.parse_gitignore(repo)
 
         # Recursively scrape the repository contents
-        self.scrape_directory(repo_id, repo.get_contents(""), gitignore_patterns)
+        with span("github_fetch", call="get_contents"):
+            contents = repo.get_contents("")
+        self.scrape_directory(repo_id, contents, gitignore_patterns)
+        self.flush_pending()
 
         # Print results after scraping the repository
         self.print_repo_results(repo_full_name)
 
     def scrape_directory(self, repo_id, contents, gitignore_patterns):
         """Recursively scrape a directory in the repository."""
-        domains = self.fetch_domains()
-        analyzer = GPTContentAnalyzer(DB, self.connection)
 
         for content_file in contents:
             if self.should_ignore(content_file.path, gitignore_patterns):
-                print(f"Ignoring {content_file.path}")
+                logger.debug("Ignoring %s", content_file.path)
+                count("files_ignored")
                 continue
 
             if content_file.type == "dir":
                 try:
-                    dir_contents = self.github.get_repo(content_file.repository.full_name).get_contents(content_file.path)
+                    with span("github_fetch", call="get_contents"):
+                        dir_contents = self.github.get_repo(content_file.repository.full_name).get_contents(content_file.path)
                     self.scrape_directory(repo_id, dir_contents, gitignore_patterns)
                 except Exception as e:
                     print(f"Error accessing directory {content_file.path}: {e}")
             elif content_file.type == "file":
                 file_id = self.insert_file_object(
-                    repo_id, "file", content_file.name, content_file.html_url
+                    repo_id, "file", content_file.name, content_file.html_url, content_file.path
                 )
 
+                # The listing's size and the file name decide whether the file is worth downloading at all
+                reason = self.file_filter.before_download(content_file.path, content_file.size)
+                if reason:
+                    self.record_skipped_file(file_id, "skipped", reason, content_file.size)
+                    continue
+
                 # Fetch file content and analyze it
                 try:
-                    file_content = content_file.decoded_content.decode("utf-8", errors="ignore")
+                    with span("github_fetch", call="decoded_content"):
+                        data = content_file.decoded_content
                 except Exception as e:
                     print(f"Failed to decode content for {content_file.name}: {e}")
-                    file_content = ""
+                    self.record_skipped_file(file_id, "skipped", "download_failed", content_file.size)
+                    continue
+                count("files_scraped")
+
+                # Binary, generated and minified content is not analyzed; long files keep their head
+                file_content, reason = self.file_filter.after_download(content_file.path, data)
+                if reason:
+                    self.record_skipped_file(file_id, "truncated" if file_content else "skipped", reason, len(data))
+                if not file_content:
+                    continue
 
                 # Split content into chunks for pagination
-                chunks = self.split_into_chunks(file_content, MAX_TOKENS)
+                chunk_size = (self.chunker.chunk_chars(self.ledger.completion_limit()) if self.adaptive_chunks
+                              else MAX_TOKENS)
+                with span("chunking"):
+                    chunks = self.split_into_chunks(file_content, chunk_size)
 
                 for chunk in chunks:
-                    analysis_result = analyzer.analyze_content_with_gpt(chunk, domains)
-                    if analysis_result:
-                        # Process analysis result and insert summary and relationships
-                        self.process_analysis_result(file_id, chunk, analysis_result, domains)
+                    # Identical chunks (forks, vendored or copied files) reuse the analysis stored with their blob
+                    with span("db_write", table="chunk_blobs"):
+                        blob_id, analysis_result = self.chunk_store.get_or_create(chunk)
+                    cached = analysis_result is not None
+                    count("chunks", cached=str(cached).lower())
+                    if cached:
+                        self.ledger.count_chunk("cached")
+                        self.process_analysis_result(file_id, blob_id, analysis_result, cached)
+                    elif self.pack_items > 1 or self.batch_size > 1:
+                        self.pending.append((file_id, blob_id, chunk))
+                        if len(self.pending) >= self.pack_items * self.batch_size or \
+                                sum(len(item[2]) for item in self.pending) >= PACK_CHARS * self.batch_size:
+                            self.flush_pending()
+                    else:
+                        self.analyze_chunk(file_id, blob_id, chunk)
+
+    def analyze_chunk(self, file_id, blob_id, chunk, content_id=None):
+        """
+        Analyze one chunk with its own request and store the result, within the run's budget. The prompt offers the
+        chunk's top candidate domains rather than the whole taxonomy. A chunk whose call fails is stored without
+        analysis, like one the budget refuses, so the next run retries it. content_id is an existing row stored
+        without analysis by an earlier run (see resume_unanalyzed); the analysis is attached to it instead of a new row.
+        """
+        domains = self.taxonomy.shortlist(chunk, self.shortlist_size)
+        prompt = self.analyzer.create_prompt(chunk, domains)
+        if not self.ledger.allows(self.chunker.estimate_prompt_tokens(len(prompt), len(chunk))):
+            # Budget reached: keep the chunk so a later run can analyze it (resume_unanalyzed)
+            if content_id is None:
+                self.store_unanalyzed(file_id, blob_id)
+            return
+        analysis_result = self.analyzer.analyze_content_with_gpt(
+            chunk, domains, max_tokens=self.ledger.completion_limit(), prompt=prompt
+        )
+        usage = self.analyzer.last_usage
+        if usage:
+            self.ledger.charge(usage[0], usage[1])
+            self.chunker.observe(len(chunk), *usage)
+        if analysis_result:
+            self.ledger.count_chunk("analyzed")
+            # Process analysis result and insert summary and relationships
+            self.process_analysis_result(file_id, blob_id, analysis_result, False, usage, content_id)
+        elif content_id is None:
+            self.store_unanalyzed(file_id, blob_id, "error")
+        else:
+            self.ledger.count_chunk("failed")
+
+    def resume_unanalyzed(self):
+        """
+        Analyze the chunks earlier runs stored without analysis because their budget was reached or their call failed,
+        within this run's budget, oldest first. Each chunk is analyzed once, for the oldest content row of its blob, and
+        process_analysis_result attaches the analysis to the blob's other rows.
+
+        :return: Number of chunks analyzed
+        """
+        self.cursor.execute(
+            """
+            SELECT MIN(c.id), c.fileObject_id, c.blob_id FROM content c JOIN chunk_blobs b ON b.id = c.blob_id
+            WHERE b.analysis IS NULL GROUP BY c.blob_id ORDER BY MIN(c.id)
+            """
+        )
+        analyzed = self.ledger.chunks["analyzed"]
+        for content_id, file_id, blob_id in self.cursor.fetchall():
+            if self.ledger.exhausted:
+                break
+            self.analyze_chunk(file_id, blob_id, self.chunk_store.text(blob_id), content_id)
+        resumed = self.ledger.chunks["analyzed"] - analyzed
+        if resumed:
+            count("chunks_resumed", resumed)
+            print(f"Analyzed {resumed} chunks stored without analysis by earlier runs.")
+        return resumed
+
+    def analyze_or_reuse(self, file_id, blob_id, chunk):
+        """Analyze a chunk on its own unless a duplicate of it was analyzed since it was queued."""
+        _, analysis_result = self.chunk_store.get_or_create(chunk)
+        if analysis_result:
+            self.ledger.count_chunk("cached")
+            self.process_analysis_result(file_id, blob_id, analysis_result, cached=True)
+        else:
+            self.analyze_chunk(file_id, blob_id, chunk)
+
+    def pack_requests(self, items):
+        """
+        Group queued chunks into requests of up to pack_items chunks and PACK_CHARS characters.
+
+        :param items: (blob ID, chunk) pairs
+        :return: A list of (items, domains, prompt, max_tokens, estimated prompt tokens), one per request
+        """
+        groups, group = [], []
+        for item in items:
+            if group and (len(group) >= self.pack_items or sum(len(chunk) for _, chunk in group) >= PACK_CHARS):
+                groups.append(group)
+                group = []
+            group.append(item)
+        if group:
+            groups.append(group)
+
+        requests = []
+        for group in groups:
+            chunks = [chunk for _, chunk in group]
+            if len(group) == 1:
+                domains = self.taxonomy.shortlist(chunks[0], self.shortlist_size)
+                prompt = self.analyzer.create_prompt(chunks[0], domains)
+                max_tokens = self.ledger.completion_limit()
+                estimated_prompt_tokens = self.chunker.estimate_prompt_tokens(len(prompt), len(chunks[0]))
+            else:
+                domains = self.taxonomy.shortlist_many(chunks, self.shortlist_size)
+                prompt = self.analyzer.create_packed_prompt(group, domains)
+                max_tokens = min(PACKED_MAX_TOKENS,
+                                 len(group) * min(PACKED_ITEM_TOKENS, self.ledger.completion_limit()))
+                # Instructions and domains once, every chunk, and the item delimiters
+                estimated_prompt_tokens = self.chunker.estimate_prompt_tokens(len(prompt), sum(map(len, chunks))) \
+                    + 16 * len(group)
+            requests.append((group, domains, prompt, max_tokens, estimated_prompt_tokens))
+        return requests
+
+    def flush_pending(self):
+        """
+        Analyze the queued chunks (possibly from several files). Duplicate chunks are sent once; the rest are packed
+        pack_items to a request, and the requests are sent to the backend together, which runs them concurrently or
+        in batches. Each result is routed back to every content row of its blob, and a packed call's tokens are split
+        between its items by length. Items a packed response leaves out are analyzed on their own; the chunks of a
+        failed request are stored without analysis and counted as failed, so the next run retries them.
+        """
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        bodies = {}
+        for _, blob_id, chunk in pending:
+            bodies.setdefault(blob_id, chunk)
+
+        # Requests that fit the budget together, in queue order; the rest are stored without analysis
+        requests, skipped = [], set()
+        reserved_prompt = reserved_completion = 0
+        for request in self.pack_requests(list(bodies.items())):
+            group, _, _, max_tokens, estimated_prompt_tokens = request
+            if self.ledger.allows(reserved_prompt + estimated_prompt_tokens, reserved_completion + max_tokens):
+                reserved_prompt += estimated_prompt_tokens
+                reserved_completion += max_tokens
+                requests.append(request)
+            else:
+                skipped.update(blob_id for blob_id, _ in group)
+
+        answers = self.analyzer.analyze_prompts([(prompt, max_tokens) for _, _, prompt, max_tokens, _ in requests])
+        results, missing, failed = {}, set(), set()
+        for (group, _, _, _, _), (text, usage) in zip(requests, answers):
+            if usage:
+                self.ledger.charge(usage[0], usage[1])
+            if text is None:
+                failed.update(blob_id for blob_id, _ in group)
+                continue
+            if len(group) == 1:
+                if usage:
+                    self.chunker.observe(len(group[0][1]), *usage)
+                results[group[0][0]] = (text, usage)
+                continue
+            count("packed_requests")
+            count("packed_items", len(group))
+            routed = self.analyzer.route_packed(text, group)
+            total_chars = sum(len(chunk) for _, chunk in group)
+            for blob_id, chunk in group:
+                if blob_id not in routed:
+                    missing.add(blob_id)
+                    continue
+                share = len(chunk) / total_chars
+                results[blob_id] = (routed[blob_id], (round(usage[0] * share), round(usage[1] * share), usage[2])
+                                    if usage else None)
+
+        stored = set()
+        for file_id, blob_id, chunk in pending:
+            if blob_id in skipped:
+                self.store_unanalyzed(file_id, blob_id)
+            elif blob_id in failed:
+                self.store_unanalyzed(file_id, blob_id, "error")
+            elif blob_id in missing:
+                self.analyze_or_reuse(file_id, blob_id, chunk)
+            elif blob_id in results:
+                analysis_result, usage = results[blob_id]
+                self.ledger.count_chunk("cached" if blob_id in stored else "analyzed")
+                self.process_analysis_result(file_id, blob_id, analysis_result, blob_id in stored,
+                                             None if blob_id in stored else usage)
+                stored.add(blob_id)
 
     def split_into_chunks(self, text, chunk_size):
         """Split text into chunks of a specified size."""
         return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
 
-    def process_analysis_result(self, file_object_id, description, analysis_result, domains):
-        """Insert content and analysis results into the database."""
-        analyzer = GPTContentAnalyzer(DB, self.connection)
-
-        # Step 1: Insert the content record
-        try:
+    def record_skipped_file(self, file_object_id, action, reason, size=None):
+        """Record a file the filter skipped or truncated, and why (see fileFilter for the reasons)."""
+        logger.debug("File %s %s: %s", file_object_id, action, reason)
+        count("files_filtered", action=action, reason=reason)
+        with span("db_write", table="skipped_files"):
             self.cursor.execute(
-                "INSERT INTO content (fileObject_id, description) VALUES (?, ?)",
-                (file_object_id, description)
+                "INSERT INTO skipped_files (fileObject_id, run_id, action, reason, size) VALUES (?, ?, ?, ?, ?)",
+                (file_object_id, self.ledger.run_id if self.ledger else None, action, reason, size)
             )
             self.connection.commit()
-            content_id = self.cursor.lastrowid
-            print(f"Inserted content: ID {content_id}, FileObject {file_object_id}")
+
+    def store_unanalyzed(self, file_object_id, blob_id, reason="budget"):
+        """
+        Insert a content row for a chunk that was not analyzed. The next run's resume_unanalyzed analyzes it, and a
+        fresh analysis of the same chunk in the meantime is attached to it.
+
+        :param reason: "budget" (the run's budget was reached; counted as skipped) or "error" (the call failed)
+        """
+        with span("db_write", table="content"):
+            self.cursor.execute("INSERT INTO content (fileObject_id, blob_id) VALUES (?, ?)", (file_object_id, blob_id))
+            self.ledger.record_content(self.cursor.lastrowid)
+            self.connection.commit()
+        self.ledger.count_chunk("skipped" if reason == "budget" else "failed")
+        count("chunks_skipped", reason=reason)
+
+    def process_analysis_result(self, file_object_id, blob_id, analysis_result, cached=False, usage=None,
+                                content_id=None):
+        """
+        Insert content and analysis results into the database. The chunk text and summary belong to the blob; the
+        domain relationships belong to this content row. A cached analysis was already stored with the blob.
+        usage is the (prompt tokens, completion tokens, truncated) of the call that produced a fresh analysis.
+        content_id is an existing row stored without analysis to use instead of inserting one. A fresh analysis is
+        also linked to the blob's other rows that were stored without analysis.
+        """
+        # Step 1: Insert the content record (or take over a row stored without analysis)
+        try:
+            with span("db_write", table="content"):
+                if content_id is None:
+                    self.cursor.execute(
+                        "INSERT INTO content (fileObject_id, blob_id) VALUES (?, ?)",
+                        (file_object_id, blob_id)
+                    )
+                    content_id = self.cursor.lastrowid
+                if self.ledger:
+                    self.ledger.record_content(content_id, *(usage[:2] if usage else (None, None)))
+                self.connection.commit()
+            logger.debug("Inserted content: ID %s, FileObject %s", content_id, file_object_id)
         except sqlite3.Error as e:
             print(f"Error inserting content: {e}")
             return []
 
-        # Step 2: Extract summary from analysis result
-        relatedness = {}
-        summary_match = re.search(r"Summarize the content:\n(.+?)\n\n", analysis_result, re.DOTALL)
-        summary = summary_match.group(1).strip() if summary_match else ""
-
-        # Step 3: Determine relatedness percentages
-        for domain_id, domain_name in domains:
-            match = re.search(fr"{domain_name}: ([0-9]+)%", analysis_result)
-            if match:
-                relatedness[domain_id] = int(match.group(1))
-
-        # Step 4: Sort and filter top related domains
-        top_related_domains = sorted(
-            [(domain_id, percentage) for domain_id, percentage in relatedness.items() if percentage > 30],
-            key=lambda x: x[1],
-            reverse=True
-        )[:3]
-
-        # Step 5: Update summary for the content record
-        try:
+        with span("response_parsing"):
+            # Step 2: Extract summary from analysis result
+            summary_match = re.search(r"Summarize the content:\n(.+?)\n\n", analysis_result, re.DOTALL)
+            summary = summary_match.group(1).strip() if summary_match else ""
+
+            # Step 3: Determine relatedness percentages (one scan of the answer, whatever the number of domains)
+            relatedness = self.taxonomy.relatedness(analysis_result)
+
+            # Step 4: Sort and filter top related domains
+            top_related_domains = sorted(
+                [(domain_id, percentage) for domain_id, percentage in relatedness.items() if percentage > 30],
+                key=lambda x: x[1],
+                reverse=True
+            )[:3]
+
+        # Step 5: Store summary and analysis with the chunk's blob. Until now the blob had no analysis, so its other
+        # content rows were stored without one (budget reached) and get this analysis's relationships too
+        content_ids = [content_id]
+        if not cached:
             self.cursor.execute(
-                "UPDATE content SET summary = ? WHERE id = ?",
-                (summary, content_id)
+                "SELECT c.id FROM content c JOIN chunk_blobs b ON b.id = c.blob_id "
+                "WHERE c.blob_id = ? AND c.id != ? AND b.analysis IS NULL",
+                (blob_id, content_id)
             )
-            self.connection.commit()
-            print(f"Inserted summary for Content {content_id}.")
-        except sqlite3.Error as e:
-            print(f"Error inserting summary: {e}")
-
-        # Step 6: Insert domain relationships
-        for domain_id, percentage in top_related_domains:
+            content_ids += [row[0] for row in self.cursor.fetchall()]
             try:
-                self.cursor.execute(
-                    "INSERT INTO content_domain_relationships (content_id, domain_id, relatedness_percentage) VALUES (?, ?, ?)",
-                    (content_id, domain_id, percentage)
-                )
-                self.connection.commit()
-                print(f"Inserted relationship: Content {content_id} -> Domain {domain_id} ({percentage}%)")
+                with span("db_write", table="chunk_blobs"):
+                    self.chunk_store.save_analysis(blob_id, summary, analysis_result)
+                    self.connection.commit()
+                logger.debug("Inserted summary for Content %s.", content_id)
             except sqlite3.Error as e:
-                print(f"Error inserting relationship: {e}")
+                print(f"Error inserting summary: {e}")
+
+        # Step 6: Insert domain relationships
+        for linked_id in content_ids:
+            for domain_id, percentage in top_related_domains:
+                try:
+                    with span("db_write", table="content_domain_relationships"):
+                        self.cursor.execute(
+                            "INSERT INTO content_domain_relationships (content_id, domain_id, relatedness_percentage) "
+                            "VALUES (?, ?, ?)",
+                            (linked_id, domain_id, percentage)
+                        )
+                        self.connection.commit()
+                    logger.debug("Inserted relationship: Content %s -> Domain %s (%s%%)",
+                                 linked_id, domain_id, percentage)
+                except sqlite3.Error as e:
+                    print(f"Error inserting relationship: {e}")
 
         # Step 7: Handle new domain recommendations
+        # Suggestions are canonicalized and merged with near-duplicate domains instead of always being inserted
         new_domains = []
-        new_domain_match = re.findall(r"suggest a new domain: (.+?)", analysis_result, re.IGNORECASE)
+        new_domain_match = re.findall(r"suggest a new domain: ([^\n]+)", analysis_result, re.IGNORECASE)
         for new_domain in new_domain_match:
-            new_domain = new_domain.strip()
-            analyzer.insert_new_domain(new_domain)
-            self.cursor.execute("SELECT id FROM domains WHERE name = ?", (new_domain,))
-            new_domain_id = self.cursor.fetchone()
-            if new_domain_id:
-                new_domains.append(new_domain_id[0])
+            if cached:
+                new_domain_id = self.taxonomy.find(new_domain)
+            else:
+                new_domain_id = self.analyzer.insert_new_domain(new_domain, self.taxonomy)
+            if new_domain_id is not None and new_domain_id not in new_domains:
+                new_domains.append(new_domain_id)
 
         # Step 8: Return the combined domain IDs
         return [domain_id for domain_id, _ in top_related_domains] + new_domains
@@ -246,18 +573,51 @@ class RepoScraper:
         print(f"Content Entries Added: {content_count}")
 
     def run(self):
-        """Run the scraper for all repositories in the list."""
-        self.connect_db()
+        """
+        Run the scraper for all repositories in the list, after analyzing the chunks earlier runs left unanalyzed.
+        """
+        self.ledger = None
         try:
+            self.start_run()
+            with profile_stage("resume_unanalyzed"):
+                self.resume_unanalyzed()
             for repo_full_name in self.repo_list:
                 try:
-                    self.scrape_repo(repo_full_name)
+                    with profile_stage("scrape_repo"):
+                        self.scrape_repo(repo_full_name)
                 except Exception as e:
+                    count("repo_errors")
                     print(f"Error scraping repo {repo_full_name}: {e}")
+            self.finish_run()
+        except BaseException:
+            self.finish_run("failed")
+            raise
         finally:
             self.close_db()
 ## MAIN ##############################################################################################################
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the repositories in MAIN_REPO and analyze their content.")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET, help="Stop analysis after this many tokens")
+    parser.add_argument("--cost-budget", type=float, default=COST_BUDGET, help="Stop analysis after this many USD")
+    parser.add_argument("--budget-policy", choices=BUDGET_POLICIES, default="stop",
+                        help="degrade: shorten completions once the budget runs low, before stopping at the cap")
+    parser.add_argument("--adaptive-chunks", action="store_true",
+                        help="Choose chunk sizes from observed prompt/completion token usage")
+    parser.add_argument("--pack", type=int, default=PACK_ITEMS,
+                        help="Analyze up to this many chunks (from any files) in one LLM request")
+    parser.add_argument("--max-file-bytes", type=int, default=MAX_FILE_BYTES,
+                        help="Skip files larger than this without downloading them")
+    parser.add_argument("--truncate-chars", type=int, default=TRUNCATE_CHARS,
+                        help="Analyze only the first characters of longer files")
+    parser.add_argument("--no-filter", action="store_true",
+                        help="Analyze every file, including binary, generated and minified ones")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Analysis requests (single or packed) dispatched to the backend together")
+    parser.add_argument("--semantic-model", default=None,
+                        help="GPT-2 model whose embeddings add domain similarity to the per-chunk domain shortlist")
+    add_backend_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
 
     load_dotenv()
     GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -267,8 +627,26 @@ if __name__ == "__main__":
     if not GITHUB_TOKEN or not REPO:
         raise ValueError("Environment variables GITHUB_TOKEN and REPOS must be set.")
     
-    scraper = RepoScraper(DB, GITHUB_TOKEN)
+    semantic_index = None
+    if args.semantic_model:
+        from services.localContentAnalyzer import GPT2TokenGenerator
+        embedder = GPT2TokenGenerator(args.semantic_model)
+        embedder.load_model_and_tokenizer()
+        semantic_index = SemanticIndex(DB, embedder)
+    backend = create_backend(args.backend, args.model, args.base_url, args.concurrency, args.local_batch_size)
+    scraper = RepoScraper(DB, GITHUB_TOKEN, args.token_budget, args.cost_budget, args.budget_policy,
+                          args.adaptive_chunks, args.pack, backend=backend, batch_size=args.batch_size,
+                          file_filter=FileFilter(args.max_file_bytes, args.truncate_chars, not args.no_filter),
+                          semantic_index=semantic_index)
     
     scraper.repo_list = [repo.strip() for repo in REPO.split(",")]
     
-    scraper.run()
\ No newline at end of file
+    configure_logging()
+    profiler = start_profiling(args.profile, args.profile_dir)
+    try:
+        scraper.run()
+    finally:
+        if semantic_index is not None:
+            semantic_index.close()
+        profiler.close()
+        write_reports()
\ No newline at end of file
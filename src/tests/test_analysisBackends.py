@@ -0,0 +1,209 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the analysis backends (no requests leave the machine)
+# - Test the OpenAI-compatible backend against a local chat-completions server, with concurrent requests
+# - Test failed requests are returned in place, and backends are selected by name
+# - Test the local backend with a stub tokenizer and model: request order, left padding, prompt truncation that keeps
+#   the answer cue, the truncated flag, and a failed batch returned in place
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import json
+import threading
+import torch
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from services.analysisBackends import OpenAIBackend, LocalModelBackend, Completion, create_backend, ANSWER_CUE
+
+## TEST SERVER #######################################################################################################
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """
+    Echoes the prompt's first word; a prompt starting with "fail" gets a 400 error. Requests are held until
+    expected requests are in flight together (or two seconds pass).
+    """
+    expected = 1
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            if cls.in_flight >= cls.expected:
+                cls.release.set()
+        cls.release.wait(2)
+        with cls.lock:
+            cls.in_flight -= 1
+        if prompt.startswith("fail"):
+            self.respond(400, {"error": {"message": "bad request", "type": "invalid_request_error"}})
+            return
+        self.respond(200, {
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "length" if body["max_tokens"] < 5 else "stop",
+                         "message": {"role": "assistant", "content": f"echo {prompt.split()[0]}"}}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 2, "total_tokens": len(prompt.split()) + 2}
+        })
+
+    def respond(self, status, document):
+        data = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+## STUB MODEL ########################################################################################################
+class StubTokenizer:
+    """One token per character (its code point); token 0 is the end of sequence."""
+    eos_token = "\0"
+    eos_token_id = 0
+
+    def __init__(self):
+        self.pad_token = None
+        self.padding_side = "right"
+
+    @property
+    def pad_token_id(self):
+        return None if self.pad_token is None else ord(self.pad_token)
+
+    def encode(self, text):
+        return [ord(char) for char in text]
+
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(chr(token) for token in ids if not (skip_special_tokens and token == self.eos_token_id))
+
+class StubModel:
+    """
+    Answers "ok" and stops for prompts containing "short", otherwise fills max_new_tokens with "x"; a batch holding
+    a prompt with "boom" fails. Records the input of every generate call.
+    """
+    def __init__(self, n_positions):
+        self.config = type("Config", (), {"n_positions": n_positions})()
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, pad_token_id, **sampling):
+        self.calls.append((input_ids.tolist(), attention_mask.tolist()))
+        rows = []
+        for ids in input_ids.tolist():
+            prompt = "".join(chr(token) for token in ids)
+            if "boom" in prompt:
+                raise RuntimeError("generation failed")
+            answer = [ord("o"), ord("k"), 0] if "short" in prompt else [ord("x")] * max_new_tokens
+            rows.append(answer + [pad_token_id] * (max_new_tokens - len(answer)))
+        return torch.cat([input_ids, torch.tensor(rows)], dim=1)
+
+class StubGenerator:
+    initialized = True
+
+    def __init__(self, n_positions=64):
+        self.tokenizer = StubTokenizer()
+        self.model = StubModel(n_positions)
+
+## TEST CLASS ########################################################################################################
+class TestAnalysisBackends(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionsHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_compatible_server(self):
+        """
+        Test that requests reach the local server concurrently, results keep request order, and usage is read.
+        """
+        ChatCompletionsHandler.release.clear()
+        ChatCompletionsHandler.expected = 3
+        ChatCompletionsHandler.max_in_flight = 0
+        backend = OpenAIBackend("local-model", base_url=self.base_url, concurrency=3)
+        self.assertEqual(backend.name, "openai-compatible")
+        results = backend.complete_many("system", [("alpha one", 100), ("beta", 2), ("gamma two three", 100)])
+        backend.close()
+
+        self.assertEqual(ChatCompletionsHandler.max_in_flight, 3)
+        self.assertEqual(results[0], Completion("echo alpha", 2, 2, False))
+        self.assertEqual(results[1], Completion("echo beta", 1, 2, True))
+        self.assertEqual(results[2].text, "echo gamma")
+
+    def test_errors_and_selection(self):
+        """
+        Test that a failed request is returned as its exception without failing the others, and that create_backend
+        picks the backend by name.
+        """
+        ChatCompletionsHandler.expected = 1
+        backend = create_backend("openai-compatible", "local-model", self.base_url, concurrency=2)
+        results = backend.complete_many("system", [("fail now", 50), ("ok", 50)])
+        backend.close()
+        self.assertIsInstance(results[0], Exception)
+        self.assertEqual(results[1].text, "echo ok")
+
+        local = create_backend("local", concurrency=4, batch_size=8)
+        self.assertIsInstance(local, LocalModelBackend)
+        self.assertEqual((local.model, local.batch_size, local.threads, local.context_tokens), ("gpt2", 8, 4, 1024))
+        self.assertEqual(create_backend("openai").model, "gpt-3.5-turbo")
+        with self.assertRaises(ValueError):
+            create_backend("openai-compatible", base_url="")
+        with self.assertRaises(ValueError):
+            create_backend("cloud")
+
+class TestLocalModelBackend(unittest.TestCase):
+    def setUp(self):
+        self.generator = StubGenerator()
+        self.backend = LocalModelBackend("stub", batch_size=2, generator=self.generator)
+
+    def test_encode(self):
+        """
+        Test that a prompt is cut to leave room for max_tokens in the context window, keeping the answer cue.
+        """
+        self.backend.load()
+        self.assertEqual(self.backend.context_tokens, 64)
+        self.assertEqual(self.generator.tokenizer.padding_side, "left")
+        short = self.backend.encode("sys", "short", 8)
+        self.assertEqual(self.generator.tokenizer.decode(short), f"sys\n\nshort{ANSWER_CUE}")
+        long = self.backend.encode("sys", "y" * 200, 8)
+        self.assertEqual(len(long), 64 - 8)
+        self.assertTrue(self.generator.tokenizer.decode(long).endswith("y" + ANSWER_CUE))
+
+    def test_complete_many(self):
+        """
+        Test that prompts are batched by max_tokens and batch_size with left padding, results keep request order with
+        the truncated flag, and a failed batch is returned as its exception without failing the others.
+        """
+        results = self.backend.complete_many("sys", [("short one", 4), ("a much longer prompt", 4), ("short", 6),
+                                                     ("boom", 4), ("short two", 4)])
+        encode = lambda prompt, max_tokens: self.backend.encode("sys", prompt, max_tokens)
+        self.assertEqual(results[0], Completion("ok", len(encode("short one", 4)), 2, False))
+        self.assertEqual(results[1], Completion("xxxx", len(encode("a much longer prompt", 4)), 4, True))
+        self.assertEqual(results[2], Completion("ok", len(encode("short", 6)), 2, False))
+        self.assertIsInstance(results[3], RuntimeError)
+        self.assertIsInstance(results[4], RuntimeError)  # Batched with the failing prompt
+
+        # Batches of max_tokens 4: requests 0 and 1, then 3 and 4; max_tokens 6: request 2
+        calls = self.generator.model.calls
+        self.assertEqual(len(calls), 3)
+        input_ids, attention_mask = calls[0]
+        padding = len(encode("a much longer prompt", 4)) - len(encode("short one", 4))
+        self.assertEqual(input_ids[0][:padding], [0] * padding)
+        self.assertEqual(attention_mask[0], [0] * padding + [1] * len(encode("short one", 4)))
+        self.assertEqual(attention_mask[1], [1] * len(input_ids[1]))
+
+        with self.assertRaises(RuntimeError):
+            self.backend.complete("sys", "boom", 4)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for token accounting, the analysis budget and adaptive chunk sizing
+# - Test usage is recorded per content row and rolled up per repository and run
+# - Test the hard cap refuses calls that could exceed it, and "degrade" lowers the completion limit first
+# - Test the adaptive chunker grows chunks while completions fit and backs off after truncation
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import tempfile
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from databaseController import Database
+from analysisBudget import TokenLedger, AdaptiveChunker, DEGRADED_MAX_TOKENS, MIN_OBSERVATIONS, call_cost
+
+## TEST CLASS ########################################################################################################
+class TestAnalysisBudget(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = Database(os.path.join(self.directory.name, "budget.db"))
+        self.database.connect()
+        self.database.create_tables()
+        cursor = self.database.cursor
+        cursor.executemany("INSERT INTO repos (name, platform, url) VALUES (?, 'GitHub', 'u')", [("app",), ("docs",)])
+        cursor.executemany("INSERT INTO fileObjects (repo_id, type, name, url) VALUES (?, 'file', 'f', 'u')",
+                           [(1,), (2,)])
+        self.database.connection.commit()
+
+    def tearDown(self):
+        self.database.disconnect()
+        self.directory.cleanup()
+
+    def add_content(self, ledger, file_id, usage=None):
+        self.database.cursor.execute("INSERT INTO content (fileObject_id) VALUES (?)", (file_id,))
+        ledger.record_content(self.database.cursor.lastrowid, *(usage or (None, None)))
+
+    def test_usage_rollups(self):
+        """
+        Test that tokens are stored per content row, summed per repository, and totalled on the run row.
+        """
+        ledger = TokenLedger(self.database.connection, "gpt-3.5-turbo").start()
+        for file_id, usage in ((1, (900, 100)), (1, (800, 120)), (2, (300, 50))):
+            ledger.charge(*usage)
+            ledger.count_chunk("analyzed")
+            self.add_content(ledger, file_id, usage)
+        self.add_content(ledger, 2)
+        ledger.count_chunk("cached")
+        ledger.finish()
+
+        self.assertEqual(ledger.repo_usage(ledger.run_id), [("app", 2, 2, 1700, 220), ("docs", 2, 1, 300, 50)])
+        run_id, _, status, calls, prompt_tokens, completion_tokens, cost = ledger.run_usage()[0]
+        self.assertEqual((run_id, status, calls, prompt_tokens, completion_tokens), (ledger.run_id, "completed", 3, 2000, 270))
+        self.assertAlmostEqual(cost, call_cost("gpt-3.5-turbo", 2000, 270))
+        self.database.cursor.execute("SELECT chunks_analyzed, chunks_cached, finished_at IS NOT NULL FROM analysis_runs")
+        self.assertEqual(self.database.cursor.fetchone(), (3, 1, 1))
+
+    def test_hard_cap_and_degrade(self):
+        """
+        Test that a call is refused when its worst case would pass the cap, and that "degrade" shortens completions
+        once the remaining budget is low.
+        """
+        ledger = TokenLedger(self.database.connection, "gpt-3.5-turbo", token_budget=3000, max_tokens=500).start()
+        self.assertTrue(ledger.allows(1000))
+        ledger.charge(1000, 500)
+        self.assertFalse(ledger.allows(1001))  # 1500 + 1001 + 500 > 3000
+        self.assertFalse(ledger.allows(10))    # Exhausted runs stay exhausted
+        ledger.finish()
+        self.database.cursor.execute("SELECT status FROM analysis_runs WHERE id = ?", (ledger.run_id,))
+        self.assertEqual(self.database.cursor.fetchone()[0], "budget_exhausted")
+
+        degrading = TokenLedger(self.database.connection, "gpt-3.5-turbo", token_budget=3000, policy="degrade",
+                                max_tokens=500).start()
+        degrading.charge(2000, 300)
+        self.assertEqual(degrading.completion_limit(), 500)
+        degrading.charge(200, 50)
+        self.assertEqual(degrading.completion_limit(), DEGRADED_MAX_TOKENS)
+        self.assertTrue(degrading.allows(300))  # 2550 + 300 + 150 fits; at the full 500-token limit it would not
+        with self.assertRaises(ValueError):
+            TokenLedger(self.database.connection, "gpt-3.5-turbo", policy="pause")
+
+    def test_adaptive_chunk_size(self):
+        """
+        Test that the chunker keeps the default size until it has observations, picks the largest size whose
+        completion fits, and stays below a size that truncated.
+        """
+        chunker = AdaptiveChunker(default_chars=500, sizes=(500, 1000, 2000, 4000, 8000))
+        self.assertEqual(chunker.chunk_chars(500), 500)
+        # 600 prompt tokens of instructions and domains + 1 token per 4 characters; completions 120 + 1 per 50 chars
+        for chars in [500, 320, 500, 80, 500, 410, 500, 230][:MIN_OBSERVATIONS]:
+            chunker.observe(chars, 600 + chars // 4, 120 + chars // 50)
+        (prompt_fixed, prompt_per_char), (completion_fixed, completion_per_char) = chunker.model()
+        self.assertAlmostEqual(prompt_fixed, 600, delta=2)
+        self.assertAlmostEqual(prompt_per_char, 0.25, delta=0.01)
+        # Completion of 8000 chars ~ 280 tokens fits under 0.8 * 500, but not under 0.8 * 150
+        self.assertEqual(chunker.chunk_chars(500), 8000)
+        self.assertEqual(chunker.chunk_chars(150), 500)
+        self.assertLess(chunker.tokens_per_char(8000), chunker.tokens_per_char(500))
+
+        chunker.observe(4000, 1600, 500, truncated=True)
+        self.assertEqual(chunker.chunk_chars(500), 2000)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the deduplicated chunk store
+# - Test identical chunks in different repos share one blob and its analysis
+# - Test content written before chunk blobs existed is upgraded and migrated
+# - Test unreferenced blobs are pruned
+# - Test compressed bodies round-trip, stay searchable, and can be recompressed with a trained dictionary
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import sqlite3
+import tempfile
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from databaseController import Database
+from chunkStore import ChunkStore, build_zlib_dictionary, source_chunks
+
+VENDORED_CHUNK = "def retry(call, attempts=3):\n    for _ in range(attempts):\n        return call()\n"
+
+## TEST CLASS ########################################################################################################
+class TestChunkStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "chunks.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_database(self):
+        database = Database(self.db_file)
+        database.connect()
+        database.create_tables()
+        cursor = database.cursor
+        cursor.executemany("INSERT INTO repos (name, platform, url) VALUES (?, 'GitHub', 'u')", [("app",), ("fork",)])
+        cursor.executemany("INSERT INTO fileObjects (repo_id, type, name, url) VALUES (?, 'file', 'util.py', 'u')",
+                           [(1,), (2,)])
+        database.connection.commit()
+        return database
+
+    def test_duplicates_share_blob_and_analysis(self):
+        """
+        Test that the same chunk in two repos is stored once and the second copy gets the first one's analysis.
+        """
+        database = self.create_database()
+        store = ChunkStore(database.connection)
+
+        content_id, blob_id, analysis = store.add_content(1, VENDORED_CHUNK)
+        self.assertIsNone(analysis)
+        store.save_analysis(blob_id, "Retries a call", "Summarize the content:\nRetries a call\n\n")
+        fork_id, fork_blob_id, fork_analysis = store.add_content(2, VENDORED_CHUNK)
+        store.add_content(2, "print('only in the fork')")
+        database.connection.commit()
+
+        self.assertEqual(fork_blob_id, blob_id)
+        self.assertIn("Retries a call", fork_analysis)
+        database.cursor.execute("SELECT description, summary FROM content_text WHERE id IN (?, ?)", (content_id, fork_id))
+        self.assertEqual(database.cursor.fetchall(), [(VENDORED_CHUNK, "Retries a call")] * 2)
+
+        stats = store.stats()
+        self.assertEqual((stats["content_rows"], stats["blobs"], stats["analyzed_blobs"]), (3, 2, 1))
+        self.assertEqual(stats["logical_bytes"] - stats["text_bytes"], len(VENDORED_CHUNK))
+        database.disconnect()
+
+    def test_legacy_content_is_migrated(self):
+        """
+        Test that a database from before chunk blobs gains the new schema, and migration moves its text into blobs.
+        """
+        connection = sqlite3.connect(self.db_file)
+        connection.execute("CREATE TABLE content (id INTEGER PRIMARY KEY AUTOINCREMENT, fileObject_id INTEGER NOT NULL, "
+                           "description TEXT, summary TEXT, domain_id INTEGER)")
+        connection.executemany("INSERT INTO content (fileObject_id, description, summary) VALUES (?, ?, ?)",
+                               [(1, VENDORED_CHUNK, "Retries a call"), (2, VENDORED_CHUNK, None), (2, "x = 1", None)])
+        connection.commit()
+        connection.close()
+
+        database = self.create_database()
+        store = ChunkStore(database.connection)
+        self.assertEqual(store.migrate(batch_rows=2), 3)
+        self.assertEqual(store.migrate(), 0)
+
+        database.cursor.execute("SELECT COUNT(*) FROM content WHERE description IS NOT NULL OR blob_id IS NULL")
+        self.assertEqual(database.cursor.fetchone()[0], 0)
+        database.cursor.execute("SELECT blob_id, description, summary FROM content_text ORDER BY id")
+        rows = database.cursor.fetchall()
+        self.assertEqual(rows[0], rows[1])
+        self.assertEqual(rows[0][1:], (VENDORED_CHUNK, "Retries a call"))
+        database.cursor.execute("SELECT rowid FROM blobs_fts WHERE blobs_fts MATCH 'retries'")
+        self.assertEqual(database.cursor.fetchall(), [(rows[0][0],)])
+        database.disconnect()
+
+    def test_prune_unreferenced_blobs(self):
+        """
+        Test that blobs left without content rows are deleted, and shared blobs are kept.
+        """
+        database = self.create_database()
+        store = ChunkStore(database.connection)
+        store.add_content(1, VENDORED_CHUNK)
+        store.add_content(2, VENDORED_CHUNK)
+        store.get_or_create("analyzed but never stored")
+        database.cursor.execute("DELETE FROM content WHERE fileObject_id = 2")
+        database.connection.commit()
+
+        self.assertEqual(store.prune(), 1)
+        self.assertEqual(store.stats()["blobs"], 1)
+        database.disconnect()
+
+    def test_compression_round_trip_and_search(self):
+        """
+        Test that bodies are stored compressed with their codec, read back lazily through the views, and that
+        recompressing with a trained dictionary shrinks them without changing text or search results.
+        """
+        database = self.create_database()
+        store = ChunkStore(database.connection, codec="plain")
+        chunks = source_chunks(300) + ["short"]
+        for chunk in chunks:
+            store.add_content(1, chunk)
+        database.connection.commit()
+        plain = store.stats()
+        self.assertEqual(plain["stored_bytes"], plain["text_bytes"])
+        hits_before = self.match_count(database, "import")
+
+        store = ChunkStore(database.connection, codec="zlib")
+        self.assertEqual(store.recompress(), 300)
+        compressed = store.stats()["stored_bytes"]
+        self.assertLess(compressed, plain["stored_bytes"] * 0.6)
+
+        store.train_dictionary()
+        self.assertEqual(store.recompress(), 300)
+        self.assertLess(store.stats()["stored_bytes"], compressed)
+        self.assertEqual(store.recompress(), 0)
+
+        database.cursor.execute("SELECT codec, COUNT(*) FROM chunk_blobs GROUP BY codec ORDER BY codec")
+        self.assertEqual(database.cursor.fetchall(), [(None, 1), (f"zlib:{store.dictionary_id}", 300)])
+        database.cursor.execute("SELECT description FROM content_text ORDER BY id")
+        self.assertEqual([row[0] for row in database.cursor.fetchall()], chunks)
+        self.assertEqual(store.text(1), chunks[0])
+        self.assertEqual(self.match_count(database, "import"), hits_before)
+
+        # New chunks use the dictionary and are indexed from their decompressed text
+        content_id, blob_id, _ = store.add_content(2, "def frobnicate_widgets():\n    return 'frobnicated widgets'\n" * 3)
+        database.connection.commit()
+        self.assertEqual(self.match_count(database, "frobnicated"), 1)
+        database.cursor.execute("SELECT snippet(blobs_fts, 0, '[', ']', '...', 4) FROM blobs_fts "
+                                "WHERE blobs_fts MATCH 'frobnicate'")
+        self.assertIn("def [frobnicate]_widgets", database.cursor.fetchone()[0])
+        database.disconnect()
+
+    def match_count(self, database, term):
+        database.cursor.execute("SELECT COUNT(*) FROM blobs_fts WHERE blobs_fts MATCH ?", (term,))
+        return database.cursor.fetchone()[0]
+
+    def test_zlib_dictionary_keeps_shared_lines(self):
+        """
+        Test that the preset dictionary holds lines shared between samples, most common last, within its size.
+        """
+        samples = ["import os\nimport sys\nx = 1\n", "import os\nimport sys\ny = 2\n", "import os\nz = 3\n"]
+        dictionary = build_zlib_dictionary(samples, size=21)
+        self.assertEqual(dictionary, b"import sys\nimport os\n")
+        self.assertEqual(build_zlib_dictionary(samples, size=20), b"import os\n")
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
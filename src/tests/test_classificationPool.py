@@ -0,0 +1,99 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for ClassificationWorkerPool, on a tiny GPT-2 built in a temporary directory (no download)
+# - Test a snapshot loads to the same logits, with and without quantization
+# - Test a two-worker pool keeps prompt order, pins workers inside the allowed cpuset and cleans up on close
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel, GPT2Tokenizer
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from localContentAnalyzer import GPT2TokenGenerator
+from classificationPool import ClassificationWorkerPool, available_cpus
+
+def write_tiny_model(model_dir):
+    """
+    Write a one-layer GPT-2 with a character-level vocabulary, loadable by GPT2TokenGenerator(model_dir).
+    """
+    vocab = {chr(code): index for index, code in enumerate(range(33, 127))}
+    vocab["Ġ"] = len(vocab)  # Byte-level BPE's space
+    vocab["<|endoftext|>"] = len(vocab)
+    with open(os.path.join(model_dir, "vocab.json"), "w") as file:
+        json.dump(vocab, file)
+    with open(os.path.join(model_dir, "merges.txt"), "w") as file:
+        file.write("#version: 0.2\n")
+    tokenizer = GPT2Tokenizer(os.path.join(model_dir, "vocab.json"), os.path.join(model_dir, "merges.txt"))
+    tokenizer.save_pretrained(model_dir)
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=len(vocab), n_positions=64, n_embd=16, n_layer=1, n_head=2,
+                        bos_token_id=len(vocab) - 1, eos_token_id=len(vocab) - 1)
+    GPT2LMHeadModel(config).save_pretrained(model_dir)
+
+## TEST CLASS ########################################################################################################
+class TestClassificationPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.mkdtemp()
+        write_tiny_model(cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+
+    def test_snapshot(self):
+        """
+        Test that a loaded snapshot gives the parent's logits, and that its float weights are tied and not copied.
+        """
+        for quantize in (False, True):
+            generator = GPT2TokenGenerator(self.model_dir, quantize=quantize)
+            generator.load_model_and_tokenizer()
+            snapshot_dir = tempfile.mkdtemp()
+            try:
+                generator.save_snapshot(snapshot_dir)
+                loaded = GPT2TokenGenerator(quantize=quantize)
+                loaded.load_snapshot(snapshot_dir)
+            finally:
+                shutil.rmtree(snapshot_dir)
+            input_ids = generator.tokenizer.encode("class Parser", return_tensors="pt")
+            with torch.inference_mode():
+                self.assertTrue(torch.allclose(generator.model(input_ids).logits, loaded.model(input_ids).logits,
+                                               atol=1e-5))
+            if not quantize:
+                self.assertIs(loaded.model.lm_head.weight, loaded.model.transformer.wte.weight)
+
+    def test_pool(self):
+        """
+        Test that suggestions come back in prompt order, workers only run on allowed CPUs, and close stops the
+        workers and removes the snapshot.
+        """
+        generator = GPT2TokenGenerator(self.model_dir)
+        generator.load_model_and_tokenizer()
+        prompts = [f"Classify{index}" for index in range(6)]
+        pool = ClassificationWorkerPool(generator, num_workers=2).start()
+        try:
+            snapshot_dir = pool.snapshot_dir
+            workers = list(pool.pool._pool)
+            affinities = [pool.pool.apply_async(os.sched_getaffinity, (0,)).get(timeout=120) for _ in range(2)]
+            suggestions = pool.suggest(prompts, chunksize=1)
+        finally:
+            pool.close()
+
+        self.assertEqual(len(suggestions), len(prompts))
+        for prompt, suggestion in zip(prompts, suggestions):
+            self.assertTrue(suggestion.startswith(prompt))
+        for affinity in affinities:
+            self.assertLessEqual(affinity, set(available_cpus()))
+        self.assertEqual(len(workers), 2)
+        self.assertFalse(any(worker.is_alive() for worker in workers))
+        self.assertIsNone(pool.pool)
+        self.assertFalse(os.path.exists(snapshot_dir))
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
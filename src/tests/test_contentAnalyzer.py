@@ -0,0 +1,113 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the content analyzer's packed prompts and backend calls (no API calls)
+# - Test a packed prompt sends the instructions and domains once and delimits every item
+# - Test per-item JSON results are routed back by ID and rendered as single-request analysis text
+# - Test suggested domains are canonicalized and near-duplicates reuse the existing domain
+# - Test batched prompts return each text with its usage, and a failed request as None
+# - Test the module still runs directly from src/services, outside the services package
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import re
+import sys
+import sqlite3
+import subprocess
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from services.contentAnalyzer import ContentAnalyzer, parse_packed_response
+from services.domainTaxonomy import DomainTaxonomy
+from services.analysisBackends import AnalysisBackend, Completion
+
+DOMAINS = [(1, "Billing"), (2, "Authentication")]
+
+class EchoBackend(AnalysisBackend):
+    """Answers with the prompt reversed; prompts containing "error" fail."""
+    name = "echo"
+
+    def complete(self, system_prompt, prompt, max_tokens):
+        if "error" in prompt:
+            raise RuntimeError("backend failed")
+        return Completion(prompt[::-1], len(prompt), max_tokens, False)
+
+## TEST CLASS ########################################################################################################
+class TestContentAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = ContentAnalyzer(":memory:", None, EchoBackend("echo-model", concurrency=2))
+
+    def tearDown(self):
+        self.analyzer.close_db()
+
+    def test_packed_prompt(self):
+        """
+        Test that the domain list appears once however many items are packed, and every item is delimited by its ID.
+        """
+        prompt = self.analyzer.create_packed_prompt([(7, "def charge(card): ..."), (9, "def login(user): ...")], DOMAINS)
+        self.assertEqual(prompt.count("- Billing"), 1)
+        self.assertIn("<<<ITEM 7>>>\ndef charge(card): ...\n<<<END 7>>>", prompt)
+        self.assertIn("<<<ITEM 9>>>\ndef login(user): ...\n<<<END 9>>>", prompt)
+
+    def test_route_packed_results(self):
+        """
+        Test that results are routed by ID (ignoring unknown IDs), and each becomes analysis text that the
+        single-request parsing reads: summary, domain percentages and a suggested domain.
+        """
+        response = """```json
+        {"results": [
+            {"id": 9, "summary": "Logs a user in.", "domains": {"Authentication": 90, "Billing": "10%"}, "new_domain": null},
+            {"id": "7", "summary": "Charges a card.", "domains": {"Billing": 85}, "new_domain": "Payments"},
+            {"id": 12, "summary": "Not requested.", "domains": {}}
+        ]}
+        ```"""
+        results = parse_packed_response(response, [7, 9])
+        self.assertEqual(sorted(results), [7, 9])
+
+        summary = re.search(r"Summarize the content:\n(.+?)\n\n", results[7], re.DOTALL).group(1)
+        self.assertEqual(summary, "Charges a card.")
+        self.assertEqual(re.search(r"Billing: ([0-9]+)%", results[7]).group(1), "85")
+        self.assertIn("suggest a new domain: Payments", results[7])
+        self.assertEqual(re.search(r"Billing: ([0-9]+)%", results[9]).group(1), "10")
+        self.assertNotIn("suggest a new domain", results[9])
+
+        self.assertEqual(parse_packed_response("The model refused.", [7]), {})
+        self.assertEqual(parse_packed_response('{"results": [{"id": 7, "summary": "trunc', [7]), {})
+
+    def test_insert_new_domain(self):
+        """
+        Test that a suggestion is stored under its canonical name once, and a near-duplicate returns the same ID.
+        """
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE domains (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)")
+        connection.executemany("INSERT INTO domains (name) VALUES (?)", [("Billing",), ("Authentication",)])
+        analyzer = ContentAnalyzer(":memory:", connection, EchoBackend("echo-model"))
+        taxonomy = DomainTaxonomy(DOMAINS)
+
+        payments_id = analyzer.insert_new_domain('**"payments"** (card processing)', taxonomy)
+        self.assertEqual(analyzer.insert_new_domain("Payment.", taxonomy), payments_id)
+        self.assertEqual(analyzer.insert_new_domain("billing", taxonomy), 1)
+        self.assertIsNone(analyzer.insert_new_domain("None", taxonomy))
+        self.assertEqual(connection.execute("SELECT name FROM domains ORDER BY id").fetchall(),
+                         [("Billing",), ("Authentication",), ("Payments",)])
+        connection.close()
+
+    def test_analyze_prompts(self):
+        """
+        Test that batched prompts keep their order, carry their own usage, and that a failure does not stop the rest.
+        """
+        answers = self.analyzer.analyze_prompts([("abc", 10), ("an error", 20), ("xy", 30)])
+        self.assertEqual(answers, [("cba", (3, 10, False)), (None, None), ("yx", (2, 30, False))])
+        self.assertEqual(self.analyzer.analyze_content_with_gpt(None, DOMAINS, max_tokens=5, prompt="hello"), "olleh")
+        self.assertEqual(self.analyzer.last_usage, (5, 5, False))
+
+    def test_direct_run(self):
+        """
+        Test that python contentAnalyzer.py starts from src/services, where the services package is not importable.
+        """
+        services = os.path.join(os.path.dirname(__file__), '..', 'services')
+        result = subprocess.run([sys.executable, "contentAnalyzer.py", "--help"], cwd=services, capture_output=True,
+                                text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the full-text content search
+# - Test triggers keep the FTS5 index in sync with inserts, updates and deletes
+# - Test a chunk stored once is found in every file that contains it
+# - Test ranked hits carry repo/file context and snippets
+# - Test free-text queries are made safe for MATCH
+# - Test the search and the embedding index import through the services package as well as flat
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import tempfile
+import subprocess
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from databaseController import Database
+from contentSearch import ContentSearch, to_match_query
+from chunkStore import ChunkStore
+
+## TEST CLASS ########################################################################################################
+class TestContentSearch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "search.db")
+        self.database = Database(self.db_file)
+        self.database.connect()
+        self.database.create_tables()
+        cursor = self.database.cursor
+        cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('shop', 'GitHub', 'u')")
+        cursor.execute("INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (1, 'file', 'pay.py', 'u', "
+                       "'src/pay.py')")
+        cursor.executemany("INSERT INTO domains (name, description) VALUES (?, ?)",
+                           [("Billing", "Invoices and payments"), ("Authentication", "Login and sessions")])
+        self.store = ChunkStore(self.database.connection)
+        for text, summary, domain_id in [
+            ("def charge(card): send the invoice to the payment gateway", "Charges a card", 1),
+            ("def login(user): check the password and open a session", "Logs users in", 2),
+            ("invoice invoice invoice totals and payment reminders", None, 1)
+        ]:
+            _, blob_id, _ = self.store.add_content(1, text, domain_id)
+            if summary:
+                self.store.save_analysis(blob_id, summary, f"Summarize the content:\n{summary}\n\n")
+        self.database.connection.commit()
+
+        self.search = ContentSearch(self.db_file)
+        self.search.connect()
+
+    def tearDown(self):
+        self.search.close()
+        self.database.disconnect()
+        self.directory.cleanup()
+
+    def test_ranked_hits_with_context(self):
+        """
+        Test that hits are ranked, stemmed, and carry repo, file, domain and a highlighted snippet.
+        """
+        hits = self.search.search("invoices")
+        self.assertEqual([hit["content_id"] for hit in hits], [3, 1])
+        self.assertEqual((hits[0]["repo"], hits[0]["path"], hits[0]["domain"]), ("shop", "src/pay.py", "Billing"))
+        self.assertIn("[invoice]", hits[0]["snippet"])
+        self.assertEqual(self.search.search("sess*")[0]["content_id"], 2)
+        self.assertEqual(self.search.search("invoice", repo="other"), [])
+
+    def test_triggers_keep_index_in_sync(self):
+        """
+        Test that updates and deletes on chunks, content and domains are reflected in the index.
+        """
+        cursor = self.database.cursor
+        cursor.execute("UPDATE chunk_blobs SET summary = 'Refund handling' WHERE id = 2")
+        cursor.execute("DELETE FROM content WHERE id = 3")
+        cursor.execute("UPDATE domains SET name = 'Identity' WHERE id = 2")
+        self.database.connection.commit()
+
+        self.assertEqual([hit["content_id"] for hit in self.search.search("refund")], [2])
+        self.assertEqual([hit["content_id"] for hit in self.search.search("invoice")], [1])
+        self.assertEqual(self.search.search("logs"), [])
+        self.assertEqual([domain["name"] for domain in self.search.search_domains("identity")], ["Identity"])
+        self.assertEqual(self.search.search_domains("authentication"), [])
+
+    def test_duplicate_chunk_hits_every_file(self):
+        """
+        Test that a chunk copied into another file is indexed once and found in both files.
+        """
+        self.database.cursor.execute("INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (1, 'file', "
+                                     "'vendor.py', 'u', 'vendor/pay.py')")
+        self.store.add_content(2, "def login(user): check the password and open a session")
+        self.database.connection.commit()
+
+        hits = self.search.search("password")
+        self.assertEqual(sorted((hit["content_id"], hit["path"]) for hit in hits), [(2, "src/pay.py"), (4, "vendor/pay.py")])
+        self.database.cursor.execute("SELECT COUNT(*) FROM blobs_fts WHERE blobs_fts MATCH 'password'")
+        self.assertEqual(self.database.cursor.fetchone()[0], 1)
+
+    def test_match_query_is_safe(self):
+        """
+        Test that punctuation in free text does not reach MATCH unquoted.
+        """
+        self.assertEqual(to_match_query('user.id "AND" pay*'), '"user" "id" "AND" "pay"*')
+        self.assertIsNone(to_match_query("++ --"))
+        self.assertEqual(self.search.search("C++ (payment"), [])
+        self.assertEqual(len(self.search.search("payment card")), 1)
+
+    def test_package_import(self):
+        """
+        Test that the modules import as services.* from src/ (main.py, repoScraper), without services/ on sys.path.
+        """
+        source = os.path.join(os.path.dirname(__file__), '..')
+        result = subprocess.run([sys.executable, "-c", "import services.contentSearch, services.embeddingIndex"],
+                                cwd=source, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
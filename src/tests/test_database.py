@@ -1,11 +1,13 @@
 import unittest
 import os
 import sys
+import tempfile
 
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
 
 from databaseController import Database
+from chunkStore import ChunkStore
 
 class TestDatabase(unittest.TestCase):
     @classmethod
@@ -80,6 +82,35 @@ class TestDatabase(unittest.TestCase):
         self.assertIsNone(self.cursor.fetchone())
         self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='content';")
         self.assertIsNone(self.cursor.fetchone())
-        
+
+class TestDatabaseChunkViews(unittest.TestCase):
+    def test_content_text_through_database(self):
+        """Test reading compressed chunk text and deleting blobs on a connection opened only by Database"""
+        with tempfile.TemporaryDirectory() as directory:
+            db_file = os.path.join(directory, "views.db")
+            writer = Database(db_file)
+            writer.connect()
+            writer.create_tables()
+            writer.cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('shop', 'GitHub', 'u')")
+            writer.cursor.execute("INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (1, 'file', "
+                                  "'pay.py', 'u', 'pay.py')")
+            text = "def charge(card):\n    return gateway.charge(card)\n" * 20
+            ChunkStore(writer.connection).add_content(1, text)
+            writer.connection.commit()
+            writer.disconnect()
+
+            database = Database(db_file)
+            database.connect()
+            database.cursor.execute("SELECT codec IS NOT NULL FROM chunk_blobs")
+            self.assertEqual(database.cursor.fetchone()[0], 1)  # Stored compressed
+            database.cursor.execute("SELECT description FROM content_text")
+            self.assertEqual(database.cursor.fetchone()[0], text)
+            database.cursor.execute("DELETE FROM content")
+            database.cursor.execute("DELETE FROM chunk_blobs")  # The full-text trigger decompresses the old body
+            database.connection.commit()
+            database.cursor.execute("SELECT COUNT(*) FROM chunk_text")
+            self.assertEqual(database.cursor.fetchone()[0], 0)
+            database.disconnect()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
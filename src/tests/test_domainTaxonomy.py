@@ -0,0 +1,85 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the domain taxonomy
+# - Test suggested domain names are canonicalized and near-duplicates resolve to the existing domain
+# - Test the shortlist picks the relevant domains of a large taxonomy and keeps a constant size
+# - Test relatedness lines are read in one pass, whatever the formatting
+# - Test existing near-duplicate domains are merged and their relationships moved
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import tempfile
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from databaseController import Database
+from domainTaxonomy import DomainTaxonomy, canonical_domain_name, domain_key, merge_duplicate_domains
+
+DOMAINS = [(1, "Billing"), (2, "User Accounts"), (3, "Authentication"), (4, "Data Visualization")]
+
+## TEST CLASS ########################################################################################################
+class TestDomainTaxonomy(unittest.TestCase):
+    def test_canonical_names(self):
+        """
+        Test that markdown, quotes and explanations are stripped, and that duplicates resolve to existing domains.
+        """
+        self.assertEqual(canonical_domain_name('**"payments"** (card processing).'), "Payments")
+        self.assertEqual(canonical_domain_name("API Gateway - routes requests"), "API Gateway")
+        self.assertEqual(canonical_domain_name("None"), "")
+        self.assertEqual(domain_key("The User Accounts"), "user account")
+
+        taxonomy = DomainTaxonomy(DOMAINS)
+        self.assertEqual(taxonomy.find("user account"), 2)
+        self.assertEqual(taxonomy.find("Data Visualisation"), 4)
+        self.assertEqual(taxonomy.find("**Authentication**"), 3)
+        self.assertIsNone(taxonomy.find("Payments"))
+
+    def test_shortlist(self):
+        """
+        Test that a chunk gets the domains its identifiers name, out of hundreds, and the shortlist size is fixed.
+        """
+        domains = [(domain_id, f"Area {domain_id}") for domain_id in range(1, 301)] + [(301, "Billing"),
+                                                                                     (302, "Authentication")]
+        taxonomy = DomainTaxonomy(domains)
+        shortlist = taxonomy.shortlist("def charge_billing_account(card):\n    authenticationToken = None", k=5)
+        self.assertEqual(len(shortlist), 5)
+        self.assertEqual({domain_id for domain_id, _ in shortlist[:2]}, {301, 302})
+        self.assertEqual(len(taxonomy.shortlist("x = 1", k=5)), 5)
+        self.assertEqual(len(DomainTaxonomy(DOMAINS).shortlist("anything", k=12)), 4)
+
+    def test_relatedness(self):
+        """
+        Test that percentages are read for known domains only, in any of the formats the model uses.
+        """
+        taxonomy = DomainTaxonomy(DOMAINS)
+        answer = ("Summarize the content:\nCharges a card.\n\nCategorize it into Billing: 80%\n"
+                  "- **User Account**: 40 %\n3. Authentication: 35%\nUnknown Domain: 90%\nBilling: 10%")
+        self.assertEqual(taxonomy.relatedness(answer), {1: 80, 2: 40, 3: 35})
+
+    def test_merge_duplicates(self):
+        """
+        Test that near-duplicate domains are merged into the oldest one and their relationships repointed.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "taxonomy.db"))
+            database.connect()
+            database.create_tables()
+            cursor = database.cursor
+            cursor.executemany("INSERT INTO domains (name) VALUES (?)",
+                               [("Billing",), ("User Accounts",), ("user account",), ("billing.",)])
+            cursor.execute("INSERT INTO content (fileObject_id) VALUES (1)")
+            cursor.executemany(
+                "INSERT INTO content_domain_relationships (content_id, domain_id, relatedness_percentage) VALUES (1, ?, 50)",
+                [(3,), (4,)])
+            database.connection.commit()
+
+            self.assertEqual(merge_duplicate_domains(database.connection), [(3, 2), (4, 1)])
+            cursor.execute("SELECT id FROM domains ORDER BY id")
+            self.assertEqual(cursor.fetchall(), [(1,), (2,)])
+            cursor.execute("SELECT domain_id FROM content_domain_relationships ORDER BY domain_id")
+            self.assertEqual(cursor.fetchall(), [(1,), (2,)])
+            database.disconnect()
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
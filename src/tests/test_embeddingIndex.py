@@ -0,0 +1,141 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the embedding index (synthetic vectors, no model needed)
+# - Test exact top-k matches a brute-force search
+# - Test re-adding an ID supersedes its vector, and compaction keeps the latest rows
+# - Test product-quantized search recall, including rows added after training
+# - Test SemanticIndex.build embeds new rows and re-embeds rows whose summary or description changed
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+import embeddingIndex
+from embeddingIndex import EmbeddingIndex, SemanticIndex, top_k
+from databaseController import Database
+from chunkStore import ChunkStore
+
+class StubGenerator:
+    """Embeds a text as a pseudo-random unit vector seeded by the text, and records what it embedded."""
+    def __init__(self, dim):
+        self.dim = dim
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        vectors = [np.random.default_rng(abs(hash(text))).normal(size=self.dim) for text in texts]
+        return np.array([vector / np.linalg.norm(vector) for vector in vectors], dtype=np.float32)
+
+## TEST CLASS ########################################################################################################
+class TestEmbeddingIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.dim = 32
+        rng = np.random.default_rng(0)
+        # Clustered, normalized vectors so nearest neighbours are well defined
+        centers = rng.normal(size=(40, self.dim))
+        vectors = centers[rng.integers(0, 40, 5000)] + 0.3 * rng.normal(size=(5000, self.dim))
+        self.vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+        self.ids = np.arange(1, 5001) * 3
+        self.index = EmbeddingIndex(os.path.join(self.directory.name, "test.content"), self.dim)
+        self.index.add(self.ids, self.vectors)
+        self.index.load()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def brute_force(self, query, k):
+        scores = self.vectors.astype(np.float16).astype(np.float32) @ query
+        return self.ids[np.argsort(-scores, kind="stable")[:k]]
+
+    def test_exact_search_matches_brute_force(self):
+        """
+        Test that blockwise top-k search returns the brute-force ranking and honours exclusions.
+        """
+        block_rows = embeddingIndex.BLOCK_ROWS
+        try:
+            embeddingIndex.BLOCK_ROWS = 700  # Several blocks
+            ids, scores = self.index.search(self.vectors[10], k=8, exclude_ids=[self.ids[10]])
+        finally:
+            embeddingIndex.BLOCK_ROWS = block_rows
+        expected = [item for item in self.brute_force(self.vectors[10], 9) if item != self.ids[10]][:8]
+        self.assertEqual(ids.tolist(), expected)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+        self.assertEqual(top_k(np.array([1.0, 5.0, 3.0]), 2)[0].tolist(), [1, 2])
+
+    def test_supersede_and_compact(self):
+        """
+        Test that the latest vector of an ID wins and compaction drops the superseded rows.
+        """
+        self.index.add([self.ids[0]], [-self.vectors[0]])
+        self.index.load()
+        self.assertEqual(len(self.index), 5000)
+        np.testing.assert_allclose(self.index.vector(self.ids[0]), -self.vectors[0], atol=1e-3)
+
+        self.index.compact()
+        self.assertEqual(os.path.getsize(self.index.vectors_file), 5000 * self.dim * 2)
+        np.testing.assert_allclose(self.index.vector(self.ids[0]), -self.vectors[0], atol=1e-3)
+
+    def test_quantized_search_recall(self):
+        """
+        Test that product-quantized search with re-ranking finds most true neighbours, and that rows added after
+        training are encoded with the existing codebooks.
+        """
+        self.index.train_quantizer(subspaces=4)
+        self.index.add([99999], [self.vectors[0]])
+        self.index.load()
+        self.assertEqual(len(self.index.codes), 5001)
+
+        recall = []
+        for query_row in range(0, 5000, 250):
+            ids, _ = self.index.search_quantized(self.vectors[query_row], k=10)
+            exact, _ = self.index.search(self.vectors[query_row], k=10)
+            recall.append(len(set(ids.tolist()) & set(exact.tolist())) / 10)
+        self.assertGreater(np.mean(recall), 0.9)
+        self.assertIn(99999, self.index.search_quantized(self.vectors[0], k=3)[0].tolist())
+
+    def test_build_reembeds_changed_rows(self):
+        """
+        Test that build embeds every row once, then only rows that are new or whose text changed, including rows
+        indexed before text versions were recorded.
+        """
+        db_file = os.path.join(self.directory.name, "semantic.db")
+        database = Database(db_file)
+        database.connect()
+        database.create_tables()
+        database.cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('shop', 'GitHub', 'u')")
+        database.cursor.execute("INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (1, 'file', 'pay.py', "
+                                "'u', 'pay.py')")
+        database.cursor.execute("INSERT INTO domains (name, description) VALUES ('Billing', 'Invoices')")
+        store = ChunkStore(database.connection)
+        blob_ids = [store.add_content(1, text, 1)[1] for text in ("def charge(card): pass", "def login(): pass")]
+        database.connection.commit()
+
+        generator = StubGenerator(8)
+        semantic_index = SemanticIndex(db_file, generator, dim=8)
+        self.assertEqual(semantic_index.build(), (2, 1))
+        self.assertEqual(semantic_index.build(), (0, 0))
+        stale = semantic_index.content.vector(1)
+
+        store.save_analysis(blob_ids[0], "Charges a card", "Summarize the content:\nCharges a card\n\n")
+        store.add_content(1, "def logout(): pass", 1)
+        database.cursor.execute("UPDATE domains SET description = 'Invoices and refunds' WHERE id = 1")
+        database.connection.commit()
+        generator.embedded.clear()
+        self.assertEqual(semantic_index.build(), (2, 1))
+        self.assertEqual(generator.embedded, ["Charges a card def charge(card): pass", " def logout(): pass",
+                                              "Billing Invoices and refunds"])
+        self.assertFalse(np.allclose(semantic_index.content.vector(1), stale))
+        self.assertEqual(len(semantic_index.content), 3)
+
+        os.remove(semantic_index.domains.versions_file)  # An index written before versions were stored
+        self.assertEqual(semantic_index.build(), (0, 1))
+        semantic_index.close()
+        database.disconnect()
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the pre-analysis file filter
+# - Test files are skipped from listing metadata alone (lockfiles, binary and data extensions, size)
+# - Test downloaded content is sniffed for binary bytes, generator markers and minification, and long text truncated
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from fileFilter import FileFilter, is_binary, is_generated, is_minified, LOCKFILE, BINARY_EXTENSION, DATA_FILE, \
+    MINIFIED, TOO_LARGE, EMPTY, BINARY, GENERATED, TRUNCATED
+
+## TEST CLASS ########################################################################################################
+class TestFileFilter(unittest.TestCase):
+    def test_before_download(self):
+        """
+        Test that the name, extension and listed size decide skips without any content.
+        """
+        file_filter = FileFilter(max_bytes=1000)
+        self.assertEqual(file_filter.before_download("web/package-lock.json", 50), LOCKFILE)
+        self.assertEqual(file_filter.before_download("src/output/domain_knowledge_graph.PNG", 50), BINARY_EXTENSION)
+        self.assertEqual(file_filter.before_download("static/app.min.js", 50), MINIFIED)
+        self.assertEqual(file_filter.before_download("data/records.csv", 50), DATA_FILE)
+        self.assertEqual(file_filter.before_download("src/big.py", 1001), TOO_LARGE)
+        self.assertEqual(file_filter.before_download("src/__init__.py", 0), EMPTY)
+        self.assertIsNone(file_filter.before_download("src/services/repoScraper.py", 1000))
+        self.assertIsNone(file_filter.before_download("Makefile"))
+        self.assertIsNone(FileFilter(enabled=False).before_download("yarn.lock", 10 ** 9))
+        self.assertEqual(dict(file_filter.report())[LOCKFILE], 1)
+
+    def test_after_download(self):
+        """
+        Test that binary, generated and minified content is skipped, and long text keeps its head.
+        """
+        file_filter = FileFilter(truncate_chars=100)
+        self.assertEqual(file_filter.after_download("logo", b"\x89PNG\r\n\x1a\n\x00\x00"), (None, BINARY))
+        self.assertEqual(file_filter.after_download("api_pb2.py", b"# Generated by the protocol buffer compiler.  "
+                                                                  b"DO NOT EDIT!\nimport sys\n"), (None, GENERATED))
+        self.assertEqual(file_filter.after_download("bundle.js", b"!function(e){var t={};function n(r){if(t[r])return t[r].exports;}}(e);" * 50),
+                         (None, MINIFIED))
+        self.assertEqual(file_filter.after_download("blank.py", b"  \n\n"), (None, EMPTY))
+        self.assertEqual(file_filter.after_download("small.py", b"def f():\n    return 1\n"),
+                         ("def f():\n    return 1\n", None))
+        text, reason = file_filter.after_download("long.py", ("x = 1\n" * 50).encode())
+        self.assertEqual((len(text), reason), (100, TRUNCATED))
+
+        self.assertFalse(is_binary("héllo wörld\n".encode("utf-8")))
+        self.assertTrue(is_binary(bytes(range(1, 32)) * 4))
+        self.assertFalse(is_generated("# Generates reports for the billing team\n"))
+        self.assertFalse(is_minified("def f(value):\n    return value\n" * 200))
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the graph exporter
+# - Test GraphML export round-trips through networkx
+# - Test Parquet and Arrow exports (skipped without pyarrow)
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import tempfile
+import networkx as nx
+
+## CLASS IMPORTS #####################################################################################################
+# graphExporter imports its siblings as services.*, so add the src directory
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from services import graphExporter
+from services.graphExporter import GraphExporter, load_arrow
+from services.databaseController import Database
+
+## TEST CLASS ########################################################################################################
+class TestGraphExporter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "graph.db")
+        database = Database(self.db_file)
+        database.connect()
+        database.create_tables()
+        cursor = database.cursor
+        cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('repo', 'GitHub', 'https://x/?a=1&b=2')")
+        cursor.executemany("INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (1, 'file', ?, 'u', ?)",
+                           [("a.py", "src/a.py"), ("<b>.py", "src/<b>.py")])
+        cursor.executemany("INSERT INTO domains (name) VALUES (?)", [("Auth",), ("Billing",)])
+        cursor.executemany("INSERT INTO content (fileObject_id, description, domain_id) VALUES (?, 'text', ?)",
+                           [(1, 1), (1, None), (2, 2)])
+        cursor.execute("INSERT INTO content_domain_relationships (content_id, domain_id, relatedness_percentage) "
+                       "VALUES (1, 2, 40)")
+        database.connection.commit()
+        database.disconnect()
+
+        # A batch size of 2 forces several batches per query
+        self.exporter = GraphExporter(self.db_file, batch_size=2)
+        self.exporter.connect()
+
+    def tearDown(self):
+        self.exporter.close()
+        self.directory.cleanup()
+
+    def test_graphml_round_trip(self):
+        """
+        Test that the GraphML file is valid, escaped, and holds every node and edge.
+        """
+        output_file = os.path.join(self.directory.name, "graph.graphml")
+        self.assertEqual(self.exporter.export_graphml(output_file), (8, 8))
+
+        G = nx.read_graphml(output_file)
+        self.assertEqual((G.number_of_nodes(), G.number_of_edges()), (8, 8))
+        self.assertEqual(G.nodes["file_2"]["label"], "<b>.py")
+        self.assertEqual(G.nodes["repo_1"]["url"], "https://x/?a=1&b=2")
+        self.assertEqual(G.edges["domain_2", "content_1"]["relatedness"], 40)
+        self.assertEqual(G.edges["domain_1", "content_1"]["relatedness"], 100)
+
+    @unittest.skipIf(graphExporter.pa is None, "pyarrow is not installed")
+    def test_columnar_exports(self):
+        """
+        Test that Parquet and Arrow exports hold the same tables and the Arrow file is memory-mapped.
+        """
+        self.assertEqual(self.exporter.export_parquet(self.directory.name), (8, 8))
+        self.assertEqual(self.exporter.export_arrow(self.directory.name), (8, 8))
+
+        allocated = graphExporter.pa.total_allocated_bytes()
+        edges = load_arrow(os.path.join(self.directory.name, "edges.arrow"))
+        self.assertEqual(graphExporter.pa.total_allocated_bytes(), allocated)  # Buffers point into the mapped file
+        parquet_edges = graphExporter.pq.read_table(os.path.join(self.directory.name, "edges.parquet"))
+        self.assertTrue(edges.equals(parquet_edges))
+
+        nodes = load_arrow(os.path.join(self.directory.name, "nodes.arrow")).to_pydict()
+        self.assertEqual(nodes["key"][:3], ["repo_1", "file_1", "file_2"])
+        self.assertEqual(nodes["path"][1], "src/a.py")
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the force-directed layout
+# - Test layouts are reproducible for a seed
+# - Test connected nodes are placed closer than random pairs
+# - Test degenerate graphs
+# - Test incremental layout keeps existing positions
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import numpy as np
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from graphLayout import force_directed_layout, incremental_layout, synthetic_code_graph
+
+## TEST CLASS ########################################################################################################
+class TestForceDirectedLayout(unittest.TestCase):
+    def setUp(self):
+        self.node_count = 3000
+        self.sources, self.targets = synthetic_code_graph(self.node_count, seed=1)
+
+    def test_reproducible_for_seed(self):
+        """
+        Test that the same seed gives the same layout and a different seed a different one.
+        """
+        first = force_directed_layout(self.node_count, self.sources, self.targets, seed=7)
+        second = force_directed_layout(self.node_count, self.sources, self.targets, seed=7)
+        third = force_directed_layout(self.node_count, self.sources, self.targets, seed=8)
+        np.testing.assert_array_equal(first, second)
+        self.assertFalse(np.array_equal(first, third))
+
+    def test_edges_shorter_than_random_pairs(self):
+        """
+        Test that the layout is finite, scaled to [-1, 1], and places connected nodes close together.
+        """
+        positions = force_directed_layout(self.node_count, self.sources, self.targets)
+        self.assertEqual(positions.shape, (self.node_count, 2))
+        self.assertTrue(np.isfinite(positions).all())
+        self.assertAlmostEqual(np.abs(positions).max(), 1.0)
+
+        rng = np.random.default_rng(0)
+        pairs = rng.integers(0, self.node_count, (5000, 2))
+        edge_length = np.linalg.norm(positions[self.sources] - positions[self.targets], axis=1).mean()
+        random_length = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1).mean()
+        self.assertLess(edge_length, 0.3 * random_length)
+
+    def test_degenerate_graphs(self):
+        """
+        Test empty, single-node and edgeless graphs.
+        """
+        self.assertEqual(force_directed_layout(0, [], []).shape, (0, 2))
+        self.assertEqual(force_directed_layout(1, [], []).shape, (1, 2))
+        self.assertTrue(np.isfinite(force_directed_layout(800, [], [])).all())
+
+    def test_incremental_layout_keeps_existing_positions(self):
+        """
+        Test that known nodes keep their coordinates and new nodes are placed near their neighbours.
+        """
+        positions = force_directed_layout(self.node_count, self.sources, self.targets)
+        new_count = 20
+        parents = np.arange(new_count) * 7
+        sources = np.concatenate([self.sources, parents])
+        targets = np.concatenate([self.targets, np.arange(self.node_count, self.node_count + new_count)])
+        known = np.vstack([positions, np.full((new_count, 2), np.nan)])
+
+        extended = incremental_layout(self.node_count + new_count, sources, targets, known)
+        np.testing.assert_array_equal(extended[:self.node_count], positions)
+        self.assertTrue(np.isfinite(extended).all())
+        new_edge_length = np.linalg.norm(extended[parents] - extended[self.node_count:], axis=1).mean()
+        self.assertLess(new_edge_length, 0.2)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
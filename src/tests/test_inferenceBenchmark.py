@@ -0,0 +1,104 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for InferenceBenchmark
+# - Test percentile interpolation
+# - Test the report rows of an in-process sweep with a stub generator
+# - Test an isolated configuration is measured in a child process on a tiny local GPT-2
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+import torch
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+sys.path.append(os.path.dirname(__file__))
+from inferenceBenchmark import InferenceBenchmark, percentile
+from test_classificationPool import write_tiny_model
+
+## STUB GENERATOR ####################################################################################################
+class StubTokenizer:
+    eos_token_id = 0
+
+    def encode(self, text):
+        return [len(word) for word in text.split()]
+
+class StubModel:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, min_new_tokens, do_sample, pad_token_id):
+        self.calls.append(tuple(input_ids.shape))
+        new_tokens = torch.zeros((input_ids.shape[0], max_new_tokens), dtype=torch.long)
+        return torch.cat([input_ids, new_tokens], dim=1)
+
+class StubGenerator:
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+        self.model = StubModel()
+
+## TEST CLASS ########################################################################################################
+class TestInferenceBenchmark(unittest.TestCase):
+    def test_percentile(self):
+        """
+        Test linear interpolation between the closest ranks.
+        """
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([7.0], 99), 7.0)
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertAlmostEqual(percentile(list(range(1, 11)), 95), 9.55)
+        self.assertEqual(percentile([1, 2, 3], 100), 3)
+
+    def test_report_rows(self):
+        """
+        Test one row per configuration with the configuration, throughput and RSS deltas of an in-process sweep.
+        """
+        benchmark = InferenceBenchmark(prompt_lengths=[3, 20], output_lengths=[5], batch_sizes=[1, 2],
+                                       thread_counts=[1], quantized=[True], warmup_runs=1, measured_runs=3,
+                                       isolate=False)
+        generator = StubGenerator()
+        benchmark.generators[True] = generator
+        results = benchmark.run()
+
+        self.assertEqual([(row["prompt_length"], row["batch_size"]) for row in results],
+                         [(3, 1), (3, 2), (20, 1), (20, 2)])
+        self.assertEqual(generator.model.calls[:4], [(1, 3)] * 4)  # 1 warm-up and 3 measured runs
+        self.assertEqual(generator.model.calls[-1], (2, 20))
+        row = results[-1]
+        self.assertEqual((row["quantized"], row["threads"], row["output_length"], row["runs"]), (True, 1, 5, 3))
+        self.assertAlmostEqual(row["tokens_per_second"] / row["sequences_per_second"], 5)
+        self.assertLessEqual(row["latency_ms"]["p50"], row["latency_ms"]["p99"])
+        self.assertFalse(row["memory_mb"]["isolated"])
+        self.assertEqual(set(row["memory_mb"]), {"load_delta", "run_delta", "process_peak", "isolated"})
+
+        report_dir = tempfile.mkdtemp()
+        try:
+            benchmark.write_report(os.path.join(report_dir, "report.json"))
+            with open(os.path.join(report_dir, "report.json")) as report_file:
+                report = json.load(report_file)
+        finally:
+            shutil.rmtree(report_dir)
+        self.assertEqual(report["results"], results)
+        self.assertFalse(report["settings"]["isolated"])
+
+    def test_isolated_config(self):
+        """
+        Test that an isolated configuration loads its own model in a child process and reports that process's peak.
+        """
+        model_dir = tempfile.mkdtemp()
+        try:
+            write_tiny_model(model_dir)
+            benchmark = InferenceBenchmark(model_dir, warmup_runs=1, measured_runs=2)
+            row = benchmark.benchmark_config(False, 1, 16, 4, 2)
+        finally:
+            shutil.rmtree(model_dir)
+        self.assertEqual(benchmark.generators, {})  # Nothing was loaded in this process
+        self.assertTrue(row["memory_mb"]["isolated"])
+        self.assertGreater(row["memory_mb"]["process_peak"], 0)
+        self.assertGreater(row["tokens_per_second"], 0)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
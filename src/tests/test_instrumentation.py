@@ -0,0 +1,116 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the metrics and logging instrumentation
+# - Test spans and counters aggregate per label set, and disabled metrics record nothing
+# - Test the JSON and Prometheus exports
+# - Test log records go through the queue and disabled levels are not formatted
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import io
+import sys
+import json
+import logging
+import tempfile
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from instrumentation import Metrics, timed, get_logger, configure_logging, stop_logging, METRICS
+
+## TEST CLASS ########################################################################################################
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.metrics = Metrics()
+        # Fixed durations instead of sleeping
+        for seconds in (0.002, 0.002, 0.2):
+            self.metrics.observe(("llm_call", (("model", "gpt"),)), seconds)
+        with self.metrics.span("db_write", table="content"):
+            pass
+        self.metrics.count("chunks", cached="false")
+        self.metrics.count("chunks", 2, cached="false")
+        self.metrics.count("chunks", cached="true")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_spans_and_counters_aggregate(self):
+        """
+        Test that timings and counters are kept per stage/name and label set.
+        """
+        report = self.metrics.report()
+        counters = {(c["name"], c["labels"]["cached"]): c["value"] for c in report["counters"]}
+        self.assertEqual(counters, {("chunks", "false"): 3, ("chunks", "true"): 1})
+
+        stages = {stage["stage"]: stage for stage in report["stages"]}
+        llm = stages["llm_call"]
+        self.assertEqual((llm["count"], llm["labels"]), (3, {"model": "gpt"}))
+        self.assertAlmostEqual(llm["total_seconds"], 0.204)
+        self.assertEqual(llm["max_seconds"], 0.2)
+        self.assertEqual((llm["buckets"]["0.001"], llm["buckets"]["0.005"], llm["buckets"]["0.25"], llm["buckets"]["+Inf"]),
+                         (0, 2, 3, 3))
+        self.assertEqual(stages["db_write"]["count"], 1)
+
+        disabled = Metrics(enabled=False)
+        with disabled.span("chunking"):
+            disabled.count("chunks")
+        self.assertEqual((disabled.report()["counters"], disabled.report()["stages"]), ([], []))
+
+    def test_timed_decorator(self):
+        """
+        Test that a decorated function is timed on the process-wide metrics and still returns its result.
+        """
+        @timed("test_stage")
+        def double(value):
+            return value * 2
+
+        METRICS.reset()
+        self.assertEqual(double(4), 8)
+        self.assertEqual([(s["stage"], s["count"]) for s in METRICS.report()["stages"]], [("test_stage", 1)])
+        METRICS.reset()
+
+    def test_exports(self):
+        """
+        Test the JSON report and the Prometheus textfile.
+        """
+        json_file = os.path.join(self.directory.name, "run.json")
+        prometheus_file = os.path.join(self.directory.name, "devatlas.prom")
+        self.metrics.write_json(json_file)
+        self.metrics.write_prometheus(prometheus_file)
+
+        with open(json_file) as file:
+            self.assertEqual(len(json.load(file)["stages"]), 2)
+        with open(prometheus_file) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(lines.count("# TYPE devatlas_chunks_total counter"), 1)
+        self.assertIn('devatlas_chunks_total{cached="false"} 3', lines)
+        self.assertIn("# TYPE devatlas_stage_seconds histogram", lines)
+        self.assertIn('devatlas_stage_seconds_bucket{stage="llm_call",model="gpt",le="0.005"} 2', lines)
+        self.assertIn('devatlas_stage_seconds_bucket{stage="llm_call",model="gpt",le="+Inf"} 3', lines)
+        self.assertIn('devatlas_stage_seconds_count{stage="llm_call",model="gpt"} 3', lines)
+        self.assertFalse(os.path.exists(prometheus_file + ".tmp"))
+
+    def test_queued_logging(self):
+        """
+        Test that records are written by the queue listener at the configured level, and that arguments of
+        disabled levels are never formatted.
+        """
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formatted a disabled record")
+
+        stream = io.StringIO()
+        logger = get_logger("test")
+        try:
+            configure_logging("INFO", stream)
+            logger.debug("Inserted content: ID %s", Exploding())
+            logger.info("Inserted new domain: %s", "Billing")
+        finally:
+            stop_logging()
+        output = stream.getvalue()
+        self.assertIn("INFO devatlas.test: Inserted new domain: Billing", output)
+        self.assertNotIn("Inserted content", output)
+        logging.getLogger("devatlas").handlers.clear()
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+## SUMMARY ###########################################################################################################
+# End-to-end tests of RepoScraper.run against the local GitHub and chat-completions stand-ins
+# - Test a packed, batched and concurrent run stores every chunk, and a second pass is served from the chunk cache
+# - Test a token budget stops analysis mid-run and injected GitHub rate limits are retried
+# - Test binary, lockfile, generated and oversized files are filtered before analysis, with their reasons recorded
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import sqlite3
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from services.loadTest import LoadTest, RepoShape, percentile
+from services.fileFilter import TRUNCATE_CHARS
+
+SHAPE = RepoShape(files=6, depth=1, fan_out=2, file_chars=1200, duplicate_share=0.3, ignored_files=1)
+
+## TEST CLASS ########################################################################################################
+class TestLoadTest(unittest.TestCase):
+    def test_packed_concurrent_passes(self):
+        """
+        Test that every chunk is stored and analyzed in the first pass, and that the second pass makes no LLM calls.
+        """
+        load_test = LoadTest(SHAPE, repos=2, concurrency=4, batch_size=4, pack_items=2)
+        try:
+            report = load_test.run(passes=2)
+            first, second = report["passes"]
+            self.assertEqual(first["run_status"], "completed")
+            self.assertEqual(first["files"], 2 * 7)  # Source files and the .gitignore; build/ is ignored
+            self.assertEqual(first["chunks_skipped"], 0)
+            self.assertGreater(first["chunks_analyzed"], 0)
+            self.assertIn("completion_packed", first["llm"])
+            self.assertNotIn("repo_errors", first["counters"])
+
+            self.assertEqual(second["chunks"], first["chunks"])
+            self.assertEqual((second["llm_calls"], second["chunks_cached"]), (0, second["chunks"]))
+
+            connection = sqlite3.connect(load_test.db_file)
+            stored = connection.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+            related = connection.execute("SELECT COUNT(DISTINCT content_id) FROM content_domain_relationships").fetchone()[0]
+            connection.close()
+            self.assertEqual(stored, first["chunks"] + second["chunks"])
+            self.assertEqual(related, stored)
+        finally:
+            load_test.close()
+
+    def test_budget_and_rate_limits(self):
+        """
+        Test that a small token budget leaves chunks unanalyzed, and that rate-limited GitHub requests are retried.
+        """
+        load_test = LoadTest(SHAPE, github={"rate_limit": 0.2}, token_budget=2000, seed=3)
+        try:
+            result = load_test.run()["passes"][0]
+            self.assertEqual(result["run_status"], "budget_exhausted")
+            self.assertGreater(result["chunks_skipped"], 0)
+            self.assertLessEqual(result["prompt_tokens"] + result["completion_tokens"], 2000)
+            self.assertGreater(result["github"]["rate_limited"]["requests"], 0)
+            self.assertEqual(result["files"], 7)
+        finally:
+            load_test.close()
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(percentile([], 50), 0.0)  # As in the inference benchmark's report
+
+    def test_file_filter(self):
+        """
+        Test that noise files are recorded in skipped_files with their reason and never reach the analysis.
+        """
+        load_test = LoadTest(RepoShape(files=4, depth=1, fan_out=2, file_chars=800, ignored_files=0, noise=True))
+        try:
+            result = load_test.run()["passes"][0]
+            connection = sqlite3.connect(load_test.db_file)
+            recorded = dict(connection.execute(
+                "SELECT f.path, s.action || ':' || s.reason FROM skipped_files s JOIN fileObjects f ON f.id = s.fileObject_id"
+            ).fetchall())
+            analyzed = {path for (path,) in connection.execute(
+                "SELECT DISTINCT f.path FROM content c JOIN fileObjects f ON f.id = c.fileObject_id")}
+            long_chunks = connection.execute(
+                "SELECT COUNT(*) FROM content c JOIN fileObjects f ON f.id = c.fileObject_id "
+                "WHERE f.path = 'vendor/long_module.py'").fetchone()[0]
+            connection.close()
+        finally:
+            load_test.close()
+        self.assertEqual(recorded, {
+            "assets/logo.png": "skipped:binary_extension", "package-lock.json": "skipped:lockfile",
+            "static/app.min.js": "skipped:minified", "proto/service_pb2.py": "skipped:generated",
+            "fixtures/records.csv": "skipped:data_file", "fixtures/dump.sql": "skipped:too_large",
+            "vendor/long_module.py": "truncated:truncated"})
+        self.assertFalse(analyzed & (set(recorded) - {"vendor/long_module.py"}))
+        self.assertEqual(long_chunks, TRUNCATE_CHARS // 500)
+        self.assertEqual(result["counters"]["files_filtered{action=skipped,reason=lockfile}"], 1)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the Plotly network graph
+# - Test nodes are grouped into one trace per type and edges are separated
+# - Test WebGL traces are used for large graphs
+# - Test headless HTML and JSON export
+# - Test content is aggregated into file and domain supernodes and expanded on demand
+# - Test scoped, streamed fetch_data queries
+# - Test the module still runs directly from src/services, outside the services package
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import numpy as np
+import networkx as nx
+
+## CLASS IMPORTS #####################################################################################################
+# Imported through the services package, as main.py does
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from services import networkVisualizer
+from services.networkVisualizer import InteractiveNetworkGraphVisualizer
+from services.databaseController import Database
+
+## TEST CLASS ########################################################################################################
+class TestNetworkFigure(unittest.TestCase):
+    def setUp(self):
+        self.visualizer = InteractiveNetworkGraphVisualizer(":memory:")
+        self.graph = nx.Graph()
+        self.graph.add_node("repo_1", label="repo", type="repo")
+        self.graph.add_node("file_1", label="a.py", type="file", url="u", file_type="file")
+        self.graph.add_node("file_2", label="b.py", type="file", url="u", file_type="file")
+        self.graph.add_node("domain_1", label="Auth", type="domain")
+        self.graph.add_edge("repo_1", "file_1")
+        self.graph.add_edge("repo_1", "file_2")
+        self.graph.add_edge("domain_1", "file_2")
+        self.pos = {node: (float(i), float(-i)) for i, node in enumerate(self.graph.nodes)}
+
+    def test_traces_grouped_by_type(self):
+        """
+        Test that each node type gets one trace with its nodes and that edges are NaN-separated segments.
+        """
+        fig = self.visualizer.build_figure(self.graph, self.pos)
+        traces = {trace.name: trace for trace in fig.data[1:]}
+        self.assertEqual(list(traces["File"].x), [1.0, 2.0])
+        self.assertEqual(list(traces["Repo"].y), [0.0])
+        self.assertEqual(len(traces["Content"].x), 0)
+        self.assertIn("a.py", traces["File"].text[0])
+
+        edge_x = np.asarray(fig.data[0].x, dtype=float)
+        self.assertEqual(len(edge_x), 3 * self.graph.number_of_edges())
+        self.assertTrue(np.isnan(edge_x[2::3]).all())
+        self.assertIsInstance(fig.data[0], networkVisualizer.go.Scatter)
+
+    def test_webgl_above_threshold(self):
+        """
+        Test that Scattergl traces are used once the graph exceeds the threshold.
+        """
+        threshold = networkVisualizer.WEBGL_THRESHOLD
+        try:
+            networkVisualizer.WEBGL_THRESHOLD = 2
+            fig = self.visualizer.build_figure(self.graph, self.pos)
+        finally:
+            networkVisualizer.WEBGL_THRESHOLD = threshold
+        self.assertTrue(all(isinstance(trace, networkVisualizer.go.Scattergl) for trace in fig.data))
+
+    def test_headless_export(self):
+        """
+        Test writing a self-contained HTML file and a JSON file.
+        """
+        fig = self.visualizer.build_figure(self.graph, self.pos)
+        with tempfile.TemporaryDirectory() as directory:
+            html_file = os.path.join(directory, "graph.html")
+            json_file = os.path.join(directory, "graph.json")
+            self.visualizer.write_figure(fig, html_file)
+            self.visualizer.write_figure(fig, json_file)
+
+            with open(html_file) as file:
+                html = file.read()
+            self.assertNotIn('src="https://cdn.plot.ly', html)
+            self.assertIn("Interactive Network Graph", html)
+            with open(json_file) as file:
+                self.assertEqual(len(json.load(file)["data"]), 5)
+
+class TestAggregatedGraph(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "graph.db")
+        database = Database(self.db_file)
+        database.connect()
+        database.create_tables()
+        cursor = database.cursor
+        cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('repo', 'GitHub', 'u')")
+        cursor.executemany("INSERT INTO fileObjects (repo_id, type, name, url, path) VALUES (1, 'file', ?, 'u', ?)",
+                           [("a.py", "src/a.py"), ("b.py", "docs/b.py")])
+        cursor.executemany("INSERT INTO domains (name) VALUES (?)", [("Auth",), ("Billing",)])
+        # a.py: three chunks in Auth, one of which is also related to Billing; b.py: one chunk in Billing
+        cursor.executemany("INSERT INTO content (fileObject_id, description, domain_id) VALUES (?, 'text', ?)",
+                           [(1, 1), (1, 1), (1, 1), (2, 2)])
+        cursor.executemany("INSERT INTO content_domain_relationships (content_id, domain_id, relatedness_percentage) "
+                           "VALUES (?, ?, ?)", [(1, 2, 40), (1, 1, 90)])
+        database.connection.commit()
+        database.disconnect()
+
+        self.visualizer = InteractiveNetworkGraphVisualizer(self.db_file)
+        self.visualizer.connect()
+
+    def tearDown(self):
+        self.visualizer.close()
+        self.directory.cleanup()
+
+    def test_file_level_supernodes(self):
+        """
+        Test that chunks collapse into file and domain supernodes with counts and weighted edges.
+        """
+        G = self.visualizer.create_aggregated_graph()
+        self.assertEqual(sorted(G.nodes), ["domain_1", "domain_2", "file_1", "file_2", "repo_1"])
+        self.assertEqual(G.nodes["file_1"]["count"], 3)
+        self.assertEqual(G.nodes["domain_1"]["count"], 3)
+        self.assertEqual(G.nodes["domain_2"]["count"], 2)
+        self.assertEqual(G.edges["file_1", "domain_1"]["weight"], 3)
+        self.assertEqual(G.edges["file_1", "domain_2"]["weight"], 1)
+        self.assertEqual(G.edges["file_1", "domain_2"]["relatedness"], 40)
+
+    def test_domain_level_when_too_large(self):
+        """
+        Test that the overview drops to repos and the largest domains when files exceed the bound.
+        """
+        G = self.visualizer.create_aggregated_graph(max_nodes=2)
+        self.assertEqual(sorted(G.nodes), ["domain_1", "repo_1"])
+        self.assertEqual(G.edges["repo_1", "domain_1"]["weight"], 3)
+
+    def test_expand_supernode(self):
+        """
+        Test drilling into a file and into a domain.
+        """
+        G = self.visualizer.create_aggregated_graph()
+        added = self.visualizer.expand_supernode(G, "file_1")
+        self.assertEqual(sorted(added), ["content_1", "content_2", "content_3"])
+        self.assertTrue(G.has_edge("content_1", "domain_2"))
+
+        G = self.visualizer.create_aggregated_graph(max_nodes=2)
+        added = self.visualizer.expand_supernode(G, "domain_2")
+        self.assertEqual(sorted(added), ["file_1", "file_2"])
+        self.assertEqual(G.edges["file_1", "domain_2"]["weight"], 1)
+
+    def test_scoped_fetch(self):
+        """
+        Test filtering by path prefix, domain and relatedness, with rows streamed in small batches.
+        """
+        repos, file_objects, domains, content = self.visualizer.fetch_data(path_prefix="src/", batch_size=1)
+        G = self.visualizer.create_network_graph(repos, file_objects, domains, content)
+        self.assertEqual(sorted(G.nodes), ["content_1", "content_2", "content_3", "domain_1", "domain_2",
+                                           "file_1", "repo_1"])
+        self.assertNotIn("description", G.nodes["content_1"])
+
+        data = self.visualizer.fetch_data(domains=["Billing"])
+        G = self.visualizer.create_network_graph(*data)
+        self.assertEqual(sorted(node for node in G if node.startswith(("file", "content", "domain"))),
+                         ["content_1", "content_4", "domain_2", "file_1", "file_2"])
+
+        data = self.visualizer.fetch_data(repo="repo", min_relatedness=50)
+        G = self.visualizer.create_network_graph(*data)
+        self.assertFalse(G.has_edge("content_1", "domain_2"))
+        self.assertTrue(G.has_edge("content_1", "domain_1"))
+
+    def test_descriptions_loaded_lazily(self):
+        """
+        Test that descriptions are fetched truncated, only for the requested chunks.
+        """
+        self.assertEqual(self.visualizer.fetch_descriptions([1, 4], length=2), {1: "te", 4: "te"})
+
+    def test_direct_run(self):
+        """
+        Test that python networkVisualizer.py starts from src/services, where the services package is not importable.
+        """
+        services = os.path.dirname(networkVisualizer.__file__)
+        result = subprocess.run([sys.executable, "networkVisualizer.py", "--help"], cwd=services, capture_output=True,
+                                text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,353 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for DirectoryVisualizer parsing
+# - Test definition extraction
+# - Test nested and async definitions are extracted once
+# - Test each definition is classified once
+# - Test parallel parsing matches serial parsing
+# - Test same-named definitions get distinct graph nodes
+# - Test the parse cache only re-parses changed files
+# - Test the parse cache hit / miss / invalidate cycle, and a file deleted before its lookup is evicted
+# - Test watch mode updates only the changed paths, and parses everything again after a directory rename
+# - Test watch mode keeps running when a file disappears between the inotify event and the parse
+# - Test one-pass documentation output and deep hierarchies
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import json
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from parseAST import DirectoryVisualizer, extract_definitions
+from parseCache import ParseCache, hash_file
+from directoryWatcher import IN_MODIFY, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_ISDIR
+from hierarchyRenderer import render_hierarchy, HierarchyMarkdownSink, JsonSink
+
+SAMPLE_SOURCE = '''
+class Server:
+    """Serves requests."""
+    def handle(self):
+        """Handle a request."""
+
+def helper():
+    pass
+'''
+
+NESTED_SOURCE = '''
+class Outer:
+    class Inner:
+        async def fetch(self):
+            """Fetch asynchronously."""
+
+    def method(self):
+        def local():
+            pass
+
+async def main():
+    pass
+'''
+
+## TEST CLASS ########################################################################################################
+class TestDirectoryVisualizer(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a small directory tree of Python files.
+        """
+        self.directory = tempfile.mkdtemp()
+        for index, subdirectory in enumerate(["", "api", "api/db", "ui"]):
+            path = os.path.join(self.directory, subdirectory)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, f"module_{index}.py"), "w") as file:
+                file.write(SAMPLE_SOURCE.replace("helper", f"helper_{index}"))
+        with open(os.path.join(self.directory, "broken.py"), "w") as file:
+            file.write("def broken(:\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def parse(self, workers, exclusions_files=(".pyc",)):
+        visualizer = DirectoryVisualizer(self.directory, list(exclusions_files), ["__pycache__"])
+        visualizer.parse_directory(workers=workers)
+        return visualizer
+
+    def test_extract_definitions(self):
+        """
+        Test that classes, their methods and functions are extracted with docstrings.
+        """
+        definitions = extract_definitions(os.path.join(self.directory, "module_0.py"))
+        self.assertEqual(definitions, [
+            ("class", "Server", "Serves requests.", None),
+            ("function", "handle", "Handle a request.", "Server"),
+            ("function", "helper_0", None, None)
+        ])
+
+    def test_extract_nested_and_async_definitions(self):
+        """
+        Test that nested classes, nested functions and async functions are each extracted exactly once.
+        """
+        path = os.path.join(self.directory, "nested.py")
+        with open(path, "w") as file:
+            file.write(NESTED_SOURCE)
+        self.assertEqual(extract_definitions(path), [
+            ("class", "Outer", None, None),
+            ("class", "Outer.Inner", None, "Outer"),
+            ("function", "fetch", "Fetch asynchronously.", "Outer.Inner"),
+            ("function", "method", None, "Outer"),
+            ("function", "Outer.method.local", None, None),
+            ("function", "main", None, None)
+        ])
+
+    def test_each_definition_classified_once(self):
+        """
+        Test that methods are not classified a second time as top-level functions.
+        """
+        visualizer = DirectoryVisualizer(self.directory, [".pyc"], ["__pycache__"])
+        classified = []
+        classify_node = visualizer.classify_node
+        visualizer.classify_node = lambda name, context="": classified.append(name) or classify_node(name, context)
+        visualizer.parse_python_file(os.path.join(self.directory, "module_0.py"))
+        self.assertEqual(classified, ["Server", "handle", "helper_0"])
+        self.assertEqual([f["name"] for f in visualizer.hierarchy["module_0.py"]["classes"]["Server"]["functions"]], ["handle"])
+
+    def test_parallel_matches_serial(self):
+        """
+        Test that parsing with a process pool produces the same hierarchy and graph as parsing serially.
+        """
+        serial = self.parse(workers=1)
+        parallel = self.parse(workers=3)
+        self.assertEqual(serial.hierarchy, parallel.hierarchy)
+        self.assertEqual(serial.store.names, parallel.store.names)
+        self.assertEqual(serial.store.colors, parallel.store.colors)
+        self.assertEqual(serial.store.csr()[1].tolist(), parallel.store.csr()[1].tolist())
+        self.assertNotIn("broken.py", parallel.hierarchy)
+
+    def test_same_names_stay_distinct(self):
+        """
+        Test that same-named files and functions in different places get their own graph nodes.
+        """
+        visualizer = self.parse(workers=1)
+        store = visualizer.store
+        for path in ["module_0.py", "api/module_1.py", "api/db/module_2.py"]:
+            self.assertIn(f"{path}::Server.handle", store)
+        self.assertEqual(store.kind(store.ids["api/db"]), "directory")
+        self.assertEqual(store.parents[store.ids["api/db"]], store.ids["api"])
+        self.assertEqual(store.parents[store.ids["api/module_1.py::Server.handle"]], store.ids["api/module_1.py::Server"])
+        self.assertEqual(store.get_classification(store.ids["ui/module_3.py::Server"]),
+                         visualizer.hierarchy["ui/module_3.py"]["classes"]["Server"]["classification"])
+        graph = store.to_networkx()
+        self.assertEqual(graph.number_of_nodes(), len(store))
+        self.assertEqual(graph.number_of_edges(), len(store) - 1)
+
+    def test_parse_cache_reparses_only_changed_files(self):
+        """
+        Test that a second parse loads unchanged files from the cache and reuses their classifications.
+        """
+        cache = ParseCache(os.path.join(self.directory, "cache.db")).connect()
+        first = DirectoryVisualizer(self.directory, [".pyc", ".db"], ["__pycache__"], parse_cache=cache)
+        first.parse_directory()
+
+        changed_path = os.path.join(self.directory, "ui", "module_3.py")
+        with open(changed_path, "a") as file:
+            file.write("\ndef added():\n    pass\n")
+
+        second = DirectoryVisualizer(self.directory, [".pyc", ".db"], ["__pycache__"], parse_cache=cache)
+        parsed, classified = [], []
+        parse_python_files = second.parse_python_files
+        second.parse_python_files = lambda paths, workers=1: parsed.extend(paths) or parse_python_files(paths, workers)
+        classify_node = second.classify_node
+        second.classify_node = lambda name, context="": classified.append(name) or classify_node(name, context)
+        second.parse_directory()
+        cache.close()
+
+        self.assertEqual(sorted(parsed), sorted([changed_path, os.path.join(self.directory, "broken.py")]))
+        self.assertEqual(classified, ["Server", "handle", "helper_3", "added"])
+        self.assertEqual(second.hierarchy["module_0.py"], first.hierarchy["module_0.py"])
+        self.assertIn("added", [f["name"] for f in second.hierarchy["ui/module_3.py"]["functions"]])
+
+    def test_parse_cache_cycle(self):
+        """
+        Test a miss, a stored hit, a hit after touching the file, a miss after editing it, a classifier change,
+        and eviction of an entry whose file is gone.
+        """
+        cache = ParseCache(os.path.join(self.directory, "cache.db")).connect()
+        path = os.path.join(self.directory, "module_0.py")
+        definitions = extract_definitions(path)
+        self.assertEqual(cache.lookup(path, "rules")[0], None)
+
+        _, _, fingerprint, fresh = cache.lookup(path, "rules")
+        self.assertEqual((fingerprint[2], fresh), (hash_file(path), False))
+        cache.store(path, fingerprint, "rules", definitions, ["c1", "c2", None])
+        self.assertEqual(cache.lookup(path, "rules"), (definitions, ["c1", "c2", None], fingerprint, True))
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        hit = cache.lookup(path, "rules")
+        self.assertEqual((hit[0], hit[1], hit[3]), (definitions, ["c1", "c2", None], False))  # Same content hash
+        self.assertEqual(cache.lookup(path, "gpt2:gpt2")[:2], (definitions, None))
+
+        with open(path, "a") as file:
+            file.write("\ndef added():\n    pass\n")
+        self.assertEqual(cache.lookup(path, "rules")[0], None)
+
+        os.remove(path)
+        self.assertEqual(cache.lookup(path, "rules"), (None, None, None, False))
+        cache.store(path, None, "rules", definitions, [])
+        cache.cursor.execute("SELECT COUNT(*) FROM parse_cache WHERE path = ?", (path,))
+        self.assertEqual(cache.cursor.fetchone()[0], 0)
+        cache.close()
+
+    def snapshot(self, visualizer):
+        """
+        The parse result of a visualizer independent of node numbering: hierarchy, nodes, edges and classifications.
+        """
+        store = visualizer.store
+        edges = {(store.names[source], store.names[target])
+                 for source, target in zip(store.edge_sources, store.edge_targets)}
+        classifications = {name: store.get_classification(node_id) for node_id, name in enumerate(store.names)}
+        return visualizer.hierarchy, sorted(store.names), edges, classifications
+
+    def test_watch_updates_only_changed_paths(self):
+        """
+        Test that a batch of changes re-parses only the changed files and matches a full parse of the new tree,
+        and that a renamed directory falls back to parsing the whole directory.
+        """
+        exclusions_files = [".pyc", ".db"]
+        cache = ParseCache(os.path.join(self.directory, "cache.db")).connect()
+        visualizer = DirectoryVisualizer(self.directory, exclusions_files, ["__pycache__"], parse_cache=cache)
+        visualizer.parse_directory()
+        parsed = []
+        parse_python_files = visualizer.parse_python_files
+        visualizer.parse_python_files = lambda paths, workers=1: parsed.extend(paths) or parse_python_files(paths, workers)
+
+        modified_path = os.path.join(self.directory, "ui", "module_3.py")
+        with open(modified_path, "a") as file:
+            file.write("\ndef added():\n    pass\n")
+        new_directory = os.path.join(self.directory, "api", "jobs")
+        os.makedirs(new_directory)
+        with open(os.path.join(new_directory, "module_4.py"), "w") as file:
+            file.write(SAMPLE_SOURCE.replace("helper", "helper_4"))
+        deleted_path = os.path.join(self.directory, "api", "db", "module_2.py")
+        os.remove(deleted_path)
+        with open(os.path.join(self.directory, "notes.txt"), "w") as file:
+            file.write("Not Python.\n")
+
+        rebuilt = visualizer.update_paths({
+            modified_path: IN_MODIFY,
+            new_directory: IN_CREATE | IN_ISDIR,
+            deleted_path: IN_DELETE,
+            os.path.join(self.directory, "notes.txt"): IN_CREATE
+        })
+        self.assertFalse(rebuilt)
+        self.assertEqual(sorted(parsed), sorted([modified_path, os.path.join(new_directory, "module_4.py")]))
+        self.assertEqual(self.snapshot(visualizer), self.snapshot(self.parse(1, exclusions_files)))
+        self.assertNotIn("api/db/module_2.py::Server", visualizer.store)
+        self.assertIn("added", [f["name"] for f in visualizer.hierarchy["ui/module_3.py"]["functions"]])
+        cache.cursor.execute("SELECT COUNT(*) FROM parse_cache WHERE path = ?", (deleted_path,))
+        self.assertEqual(cache.cursor.fetchone()[0], 0)
+
+        renamed = os.path.join(self.directory, "service")
+        os.rename(os.path.join(self.directory, "api"), renamed)
+        rebuilt = visualizer.update_paths({
+            os.path.join(self.directory, "api"): IN_MOVED_FROM | IN_ISDIR,
+            renamed: IN_MOVED_TO | IN_ISDIR
+        })
+        cache.close()
+        self.assertTrue(rebuilt)
+        self.assertEqual(self.snapshot(visualizer), self.snapshot(self.parse(1, exclusions_files)))
+        self.assertIn("service/jobs/module_4.py", visualizer.hierarchy)
+
+    def test_watch_survives_deleted_file(self):
+        """
+        Test that a changed file removed before its cache lookup does not end the watch loop.
+        """
+        cache_file = os.path.join(self.directory, "cache.db")
+        cache = ParseCache(cache_file).connect()
+        visualizer = DirectoryVisualizer(self.directory, [".pyc", ".db"], ["__pycache__"], parse_cache=cache)
+        visualizer.parse_directory()
+
+        deleted_path = os.path.join(self.directory, "api", "module_1.py")
+        lookup = cache.lookup
+
+        def racing_lookup(file_path, classifier):
+            if file_path == deleted_path and os.path.exists(file_path):
+                os.remove(file_path)  # The editor replaced the file between the inotify event and the lookup
+            return lookup(file_path, classifier)
+        cache.lookup = racing_lookup
+
+        updates = []
+
+        def on_update(updated):
+            updates.append(updated.hierarchy)
+            raise KeyboardInterrupt  # Stop watching after the first update
+
+        def edit():
+            for path in [os.path.join(self.directory, "ui", "module_3.py"), deleted_path]:
+                with open(path, "a") as file:
+                    file.write("\ndef edited():\n    pass\n")
+        timer = threading.Timer(0.2, edit)
+        timer.start()
+        try:
+            visualizer.watch(on_update, debounce=0.1)
+        finally:
+            timer.cancel()
+            cache.close()
+
+        self.assertEqual(len(updates), 1)
+        self.assertIn("edited", [f["name"] for f in updates[0]["ui/module_3.py"]["functions"]])
+        self.assertNotIn("api/module_1.py", updates[0])
+        cache = ParseCache(cache_file).connect()
+        self.assertEqual(cache.lookup(deleted_path, "rules"), (None, None, None, False))
+        cache.close()
+
+    def test_write_documentation_single_pass(self):
+        """
+        Test that one traversal writes the same markdown and README as the separate methods, plus the JSON hierarchy.
+        """
+        visualizer = self.parse(workers=1)
+        output = os.path.join(self.directory, "docs")
+        os.makedirs(output)
+        visualizer.save_hierarchy_to_markdown(os.path.join(output, "single.md"))
+        visualizer.generate_readme(os.path.join(output, "single_readme.md"))
+        visualizer.write_documentation(os.path.join(output, "hierarchy.md"), os.path.join(output, "readme.md"),
+                                       os.path.join(output, "hierarchy.json"))
+
+        def read(name):
+            with open(os.path.join(output, name)) as file:
+                return file.read()
+
+        self.assertEqual(read("hierarchy.md"), read("single.md"))
+        self.assertEqual(read("readme.md"), read("single_readme.md"))
+        self.assertEqual(json.loads(read("hierarchy.json")), visualizer.hierarchy)
+        self.assertIn("- api/module_1.py\n    - helper_1\n", read("hierarchy.md"))
+        self.assertIn("        > Serves requests.\n", read("hierarchy.md"))
+        self.assertIn("- **api/module_1.py**\n    Functions:\n        - helper_1\n", read("readme.md"))
+        self.assertTrue(read("readme.md").endswith("See the LICENSE file for details.\n"))
+
+    def test_deep_hierarchy_renders_without_recursion(self):
+        """
+        Test that a hierarchy deeper than the recursion limit is rendered.
+        """
+        depth = sys.getrecursionlimit() + 100
+        hierarchy = {}
+        level = hierarchy
+        for index in range(depth):
+            level[f"d{index}"] = {}
+            level = level[f"d{index}"]
+        level["leaf.py"] = {"classes": {}, "functions": [{"name": "f", "docstring": "Leaf.", "classification": None}]}
+
+        markdown_file = os.path.join(self.directory, "deep.md")
+        json_file = os.path.join(self.directory, "deep.json")
+        render_hierarchy(hierarchy, [HierarchyMarkdownSink(markdown_file), JsonSink(json_file)])
+        with open(markdown_file) as file:
+            lines = file.read().splitlines()
+        # leaf.py sits at indent depth; its functions list is re-listed under "- functions", two levels deeper
+        self.assertEqual(lines[-1], "    " * (depth + 3) + "> Leaf.")
+        with open(json_file) as file:
+            self.assertTrue(file.read().endswith('"Leaf.", "classification": null}]}' + "}" * (depth + 1)))
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
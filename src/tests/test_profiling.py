@@ -0,0 +1,90 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for the stage profiler
+# - Test CPU mode writes one .pstats per stage and nested stages do not count the same calls twice
+# - Test memory mode reports the allocations a stage keeps alive
+# - Test disabled profiling is a no-op
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import sys
+import pstats
+import tempfile
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+from profiling import StageProfiler, NULL_STAGE
+
+def outer_work():
+    return sum(range(20000))
+
+def inner_work():
+    return sorted(range(20000), reverse=True)
+
+## TEST CLASS ########################################################################################################
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def function_names(self, stats_file):
+        return {function for _, _, function in pstats.Stats(stats_file).stats}
+
+    def test_cpu_stages(self):
+        """
+        Test that each stage gets its own .pstats file and an inner stage's calls are not in the outer one.
+        """
+        profiler = StageProfiler("cpu", self.directory.name)
+        with profiler.stage("scrape"):
+            outer_work()
+            with profiler.stage("layout"):
+                inner_work()
+        with profiler.stage("scrape"):
+            outer_work()
+        report_file = profiler.close()
+
+        scrape_file = os.path.join(self.directory.name, "scrape.pstats")
+        layout_file = os.path.join(self.directory.name, "layout.pstats")
+        self.assertIn("outer_work", self.function_names(scrape_file))
+        self.assertNotIn("inner_work", self.function_names(scrape_file))
+        self.assertIn("inner_work", self.function_names(layout_file))
+        calls = {function: stats[1] for (_, _, function), stats in pstats.Stats(scrape_file).stats.items()}
+        self.assertEqual(calls["outer_work"], 2)
+        with open(report_file) as file:
+            self.assertIn("=== Stage layout", file.read())
+
+    def test_memory_stages(self):
+        """
+        Test that memory mode records the allocations made in a stage and the peak of nested stages.
+        """
+        profiler = StageProfiler("mem", self.directory.name)
+        kept = []
+        with profiler.stage("parse_directory"):
+            with profiler.stage("ast_parsing"):
+                kept.append(bytearray(4 << 20))
+        report_file = profiler.close()
+
+        inner, outer = profiler.records
+        self.assertEqual((inner["name"], outer["name"]), ("ast_parsing", "parse_directory"))
+        for record in (inner, outer):
+            self.assertGreaterEqual(record["traced_after"] - record["traced_before"], 4 << 20)
+            self.assertGreaterEqual(record["traced_peak"] - record["traced_before"], 4 << 20)
+        self.assertGreaterEqual(inner["top"][0].size_diff, 4 << 20)
+        with open(report_file) as file:
+            self.assertIn("=== Stage ast_parsing", file.read())
+
+    def test_disabled(self):
+        """
+        Test that a profiler without a mode hands out the shared no-op stage and writes nothing.
+        """
+        profiler = StageProfiler(None, self.directory.name)
+        self.assertIs(profiler.stage("scrape"), NULL_STAGE)
+        self.assertIsNone(profiler.close())
+        self.assertEqual(os.listdir(self.directory.name), [])
+        with self.assertRaises(ValueError):
+            StageProfiler("gpu")
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+## SUMMARY ###########################################################################################################
+# Unit tests for RepoScraper runs against the local GitHub and chat-completions stand-ins
+# - Test a repository can be scraped on its own, without run(): the run is opened by scrape_repo
+# - Test chunks a run stores without analysis (budget reached) are analyzed by the next run and linked to domains
+# - Test flush_pending routes packed results to every content row of a blob, splits a packed call's tokens by length,
+#   sends in-pack duplicates once and analyzes items the packed response left out on their own
+# - Test chunks whose packed or single call failed are stored without analysis, counted, and resumed by the next run
+# - Test a semantic index given to the scraper embeds the domains and reorders the run's domain shortlists
+## LIBRARIES ###########################################################################################################
+import unittest
+import os
+import re
+import sys
+import json
+import sqlite3
+import tempfile
+import numpy as np
+
+## CLASS IMPORTS #####################################################################################################
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from github import Auth, Github
+from services.loadTest import LoadTest, RepoShape, LLM_MODEL
+from services.repoScraper import RepoScraper
+from services.analysisBackends import OpenAIBackend, AnalysisBackend
+from services.contentAnalyzer import ContentAnalyzer, analysis_text
+from services.databaseController import Database
+from services.domainTaxonomy import DomainTaxonomy
+from services.embeddingIndex import SemanticIndex
+
+SHAPE = RepoShape(files=6, depth=1, fan_out=2, file_chars=1200, duplicate_share=0.5, ignored_files=0)
+
+class StubAnalyzer(ContentAnalyzer):
+    """
+    Answers packed prompts with a result per item, except items whose chunk contains "omitted", and single prompts
+    with a fixed analysis; every packed call costs 400 + 40 tokens and every single call 50 + 5. Calls with a chunk
+    containing the failing text fail.
+    """
+    def __init__(self, connection):
+        super().__init__(None, connection, AnalysisBackend("stub-model"))
+        self.packed_calls = []
+        self.single_calls = []
+        self.failing = "fails"
+
+    def analyze_prompts(self, requests):
+        answers = []
+        for prompt, _ in requests:
+            items = re.findall(r"<<<ITEM (\d+)>>>\n(.*?)\n<<<END", prompt, re.DOTALL)
+            self.packed_calls.append([int(item_id) for item_id, _ in items])
+            if self.failing and any(self.failing in chunk for _, chunk in items):
+                answers.append((None, None))
+                continue
+            results = [{"id": int(item_id), "summary": f"Packed {item_id}.", "domains": {"Billing": 80}}
+                       for item_id, chunk in items if "omitted" not in chunk]
+            answers.append((json.dumps({"results": results}), (400, 40, False)))
+        return answers
+
+    def analyze_content_with_gpt(self, content, domains, max_tokens=None, prompt=None):
+        self.single_calls.append(content)
+        if self.failing and self.failing in content:
+            self.last_usage = None
+            return None
+        self.last_usage = (50, 5, False)
+        return analysis_text("Single.", {"Billing": 60})
+
+class KeywordEmbedder:
+    """Embeds texts about signing in along one axis and everything else along the other."""
+    def embed(self, texts):
+        return np.array([[1.0, 0.0] if "login" in text or "Authentication" in text else [0.0, 1.0]
+                         for text in texts], dtype=np.float32)
+
+## TEST CLASS ########################################################################################################
+class TestRepoScraper(unittest.TestCase):
+    def setUp(self):
+        self.load_test = LoadTest(SHAPE, token_budget=1000, seed=1)
+        self.load_test.prepare_database()
+        self.load_test.github.start()
+        self.load_test.llm.start()
+
+    def tearDown(self):
+        self.load_test.github.stop()
+        self.load_test.llm.stop()
+        self.load_test.close()
+
+    def query(self, sql):
+        connection = sqlite3.connect(self.load_test.db_file)
+        rows = connection.execute(sql).fetchall()
+        connection.close()
+        return rows
+
+    def test_scrape_repo_without_run(self):
+        """
+        Test that scrape_repo opens the run itself (analyzer, taxonomy and ledger), and finish_run closes it.
+        """
+        backend = OpenAIBackend(LLM_MODEL, api_key="load-test", base_url=f"{self.load_test.llm.url}/v1")
+        scraper = RepoScraper(self.load_test.db_file, "load-test", backend=backend)
+        scraper.github = Github(auth=Auth.Token("load-test"), base_url=self.load_test.github.url,
+                                seconds_between_requests=0)
+        try:
+            scraper.scrape_repo("loadtest/repo0")
+            scraper.finish_run()
+        finally:
+            scraper.close_db()
+            backend.close()
+        self.assertIsNone(scraper.connection)
+
+        stored = self.query("SELECT COUNT(*) FROM content")[0][0]
+        related = self.query("SELECT COUNT(DISTINCT content_id) FROM content_domain_relationships")[0][0]
+        self.assertGreater(stored, 0)
+        self.assertEqual(related, stored)
+        self.assertEqual(self.query("SELECT status FROM analysis_runs"), [("completed",)])
+
+    def test_resume_unanalyzed(self):
+        """
+        Test that the next run analyzes the chunks a budget-stopped run stored without analysis, once per blob, and
+        links every content row of those blobs to their domains without inserting new rows.
+        """
+        _, first_run, _ = self.load_test.scrape()
+        unanalyzed = self.query("SELECT COUNT(*) FROM content c JOIN chunk_blobs b ON b.id = c.blob_id "
+                                "WHERE b.analysis IS NULL")[0][0]
+        blobs = self.query("SELECT COUNT(*) FROM chunk_blobs WHERE analysis IS NULL")[0][0]
+        self.assertGreater(unanalyzed, blobs)  # Duplicated files share blobs
+        stored = self.query("SELECT COUNT(*) FROM content")[0][0]
+
+        # Nothing new to scrape: the second run only resumes
+        self.load_test.token_budget = None
+        self.load_test.repo_files = {}
+        _, second_run, _ = self.load_test.scrape()
+        self.assertEqual(self.query("SELECT COUNT(*) FROM content")[0][0], stored)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM chunk_blobs WHERE analysis IS NULL"), [(0,)])
+        related = self.query("SELECT COUNT(DISTINCT content_id) FROM content_domain_relationships")[0][0]
+        self.assertEqual(related, stored)
+        self.assertEqual(self.query(f"SELECT status, chunks_analyzed FROM analysis_runs WHERE id = {second_run}"),
+                         [("completed", blobs)])
+        self.assertEqual(self.query(f"SELECT COUNT(*) FROM content WHERE run_id = {second_run}"), [(blobs,)])
+        self.assertNotEqual(first_run, second_run)
+
+class TestFlushPending(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        db_file = os.path.join(self.directory.name, "scraper.db")
+        database = Database(db_file)
+        database.connect()
+        database.create_tables()
+        database.cursor.execute("INSERT INTO domains (name) VALUES ('Billing')")
+        database.cursor.execute("INSERT INTO repos (name, platform, url) VALUES ('repo', 'GitHub', 'url')")
+        database.cursor.executemany("INSERT INTO fileObjects (repo_id, type, name, url) VALUES (1, 'file', ?, 'url')",
+                                    [(f"file{index}.py",) for index in range(4)])
+        database.connection.commit()
+        database.disconnect()
+        self.scraper = RepoScraper(db_file, None, pack_items=3, backend=AnalysisBackend("stub-model"))
+        self.scraper.start_run()
+        self.scraper.analyzer = StubAnalyzer(self.scraper.connection)
+
+    def tearDown(self):
+        self.scraper.finish_run()
+        self.scraper.close_db()
+        self.directory.cleanup()
+
+    def test_flush_pending(self):
+        """
+        Test that one packed request carries each blob once, its result and its tokens (split by chunk length) reach
+        every content row of the blob, and the item the response left out is analyzed on its own.
+        """
+        chunks = ["def charge(card): pass\n" * 4, "def refund(card): pass\n" * 12, "# omitted\n" * 10]
+        blob_ids = [self.scraper.chunk_store.get_or_create(chunk)[0] for chunk in chunks]
+        self.scraper.pending = [(1, blob_ids[0], chunks[0]), (2, blob_ids[1], chunks[1]),
+                                (3, blob_ids[0], chunks[0]), (4, blob_ids[2], chunks[2])]
+        self.scraper.flush_pending()
+
+        self.assertEqual(self.scraper.analyzer.packed_calls, [blob_ids])
+        self.assertEqual(self.scraper.analyzer.single_calls, [chunks[2]])
+        self.assertEqual(self.scraper.pending, [])
+        self.assertEqual((self.scraper.ledger.chunks["analyzed"], self.scraper.ledger.chunks["cached"]), (3, 1))
+
+        # The packed call's 400 + 40 tokens are split by chunk length; the duplicate row is cached
+        total_chars = sum(map(len, chunks))
+        share = [len(chunk) / total_chars for chunk in chunks]
+        rows = self.scraper.connection.execute(
+            "SELECT c.fileObject_id, c.blob_id, c.prompt_tokens, c.completion_tokens, r.relatedness_percentage "
+            "FROM content c JOIN content_domain_relationships r ON r.content_id = c.id ORDER BY c.fileObject_id"
+        ).fetchall()
+        self.assertEqual(rows, [
+            (1, blob_ids[0], round(400 * share[0]), round(40 * share[0]), 80),
+            (2, blob_ids[1], round(400 * share[1]), round(40 * share[1]), 80),
+            (3, blob_ids[0], None, None, 80),
+            (4, blob_ids[2], 50, 5, 60),
+        ])
+        self.assertIn(f"Packed {blob_ids[0]}.", self.scraper.chunk_store.get_or_create(chunks[0])[1])
+
+    def test_failed_calls_stored(self):
+        """
+        Test that the chunks of a failed packed call and of a failed single call get content rows without analysis
+        and are counted as failed, and that the next resume analyzes them once per blob and links every row.
+        """
+        chunks = ["def fails(card): pass\n" * 4, "def charge(card): pass\n" * 4, "def fails_alone(): pass\n" * 4]
+        blob_ids = [self.scraper.chunk_store.get_or_create(chunk)[0] for chunk in chunks]
+        self.scraper.pending = [(1, blob_ids[0], chunks[0]), (2, blob_ids[1], chunks[1]), (3, blob_ids[0], chunks[0])]
+        self.scraper.flush_pending()
+        self.scraper.analyze_chunk(4, blob_ids[2], chunks[2])
+
+        connection = self.scraper.connection
+        self.assertEqual(connection.execute("SELECT fileObject_id, blob_id FROM content ORDER BY id").fetchall(),
+                         [(1, blob_ids[0]), (2, blob_ids[1]), (3, blob_ids[0]), (4, blob_ids[2])])
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM content_domain_relationships").fetchone()[0], 0)
+        self.assertEqual(self.scraper.ledger.chunks, {"analyzed": 0, "cached": 0, "skipped": 0, "failed": 4})
+
+        self.scraper.analyzer.failing = None
+        self.assertEqual(self.scraper.resume_unanalyzed(), 3)
+        self.assertEqual(self.scraper.analyzer.single_calls, [chunks[2], chunks[0], chunks[1], chunks[2]])
+        linked = connection.execute("SELECT COUNT(DISTINCT content_id) FROM content_domain_relationships").fetchone()[0]
+        self.assertEqual(linked, 4)
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM content").fetchone()[0], 4)
+
+class TestSemanticShortlist(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "scraper.db")
+        database = Database(self.db_file)
+        database.connect()
+        database.create_tables()
+        database.cursor.executemany("INSERT INTO domains (name) VALUES (?)", [("Billing",), ("Authentication",)])
+        database.connection.commit()
+        database.disconnect()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_semantic_shortlist(self):
+        """
+        Test that start_run embeds the domains and builds the taxonomy with the semantic index, so a chunk without
+        domain words gets the domain nearest to it rather than the most used one.
+        """
+        semantic_index = SemanticIndex(self.db_file, KeywordEmbedder(), dim=2)
+        scraper = RepoScraper(self.db_file, None, shortlist_size=1, backend=AnalysisBackend("stub-model"),
+                              semantic_index=semantic_index)
+        try:
+            scraper.start_run()
+            self.assertEqual(len(semantic_index.domains), 2)
+            self.assertEqual(len(semantic_index.content), 0)  # Chunks are not embedded for shortlists
+            chunk = "def login(session): pass"
+            self.assertEqual(DomainTaxonomy(scraper.fetch_domains()).shortlist(chunk, 1), [(1, "Billing")])
+            self.assertEqual(scraper.taxonomy.shortlist(chunk, 1), [(2, "Authentication")])
+            scraper.finish_run()
+        finally:
+            scraper.close_db()
+            semantic_index.close()
+
+## MAIN ##############################################################################################################
+if __name__ == "__main__":
+    unittest.main()